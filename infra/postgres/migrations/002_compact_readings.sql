@@ -0,0 +1,69 @@
+-- Migración 002: esquema compacto de lecturas (READINGS_STORAGE=compact)
+--
+-- Comparado con sensor_readings:
+--   · sin UUID por fila → PK (device_eui, time)
+--   · alert_level como smallint (0 NORMAL, 1 WATCH, 2 WARNING, 3 CRITICAL)
+--   · float4 / smallint en lugar de float8 / int4
+--   · GPS en tabla aparte (solo ~1 de cada 10 uplinks trae fix)
+--   · water_level_cm, fill_pct y battery_pct se derivan en la vista
+--
+-- Columnas ordenadas de mayor a menor alineación para evitar padding.
+
+CREATE TABLE IF NOT EXISTS sensor_readings_compact (
+  time        TIMESTAMPTZ NOT NULL,
+  distance_cm REAL,
+  snr         REAL,
+  battery_mv  SMALLINT,
+  rssi        SMALLINT,
+  alert_code  SMALLINT    NOT NULL DEFAULT 0,
+  device_eui  VARCHAR(16) NOT NULL,
+  PRIMARY KEY (device_eui, time)
+);
+
+CREATE TABLE IF NOT EXISTS gps_fixes (
+  time       TIMESTAMPTZ NOT NULL,
+  lat_e6     INTEGER     NOT NULL,   -- grados * 1e6, igual que el payload
+  lon_e6     INTEGER     NOT NULL,
+  device_eui VARCHAR(16) NOT NULL,
+  PRIMARY KEY (device_eui, time)
+);
+
+-- Hypertables: la PK incluye time, así que TimescaleDB la acepta.
+-- Solo el índice por defecto en time; la PK cubre las queries por device.
+SELECT create_hypertable('sensor_readings_compact', 'time', if_not_exists => TRUE);
+SELECT create_hypertable('gps_fixes', 'time', if_not_exists => TRUE);
+
+-- Vista con las mismas columnas que sensor_readings.
+-- Los derivados usan la configuración ACTUAL del device.
+CREATE OR REPLACE VIEW sensor_readings_compact_v AS
+SELECT
+  -- id sintético = compact_reading_id() en app/models/reading.py
+  md5(r.device_eui || ':' || (extract(epoch FROM r.time) * 1000000)::bigint::text)::uuid
+    AS id,
+  r.time,
+  r.device_eui,
+  r.distance_cm::float8 AS distance_cm,
+  GREATEST(0, d.bridge_height_cm - r.distance_cm) AS water_level_cm,
+  LEAST(100, GREATEST(0, d.bridge_height_cm - r.distance_cm)
+             / d.bridge_height_cm * 100) AS fill_pct,
+  r.battery_mv::int AS battery_mv,
+  LEAST(100, GREATEST(0, round((r.battery_mv - 3000) / 1200.0 * 100)))::int
+    AS battery_pct,
+  r.rssi::int AS rssi,
+  r.snr::float8 AS snr,
+  g.lat_e6 / 1e6::float8 AS latitude,
+  g.lon_e6 / 1e6::float8 AS longitude,
+  CASE r.alert_code
+    WHEN 1 THEN 'WATCH'
+    WHEN 2 THEN 'WARNING'
+    WHEN 3 THEN 'CRITICAL'
+    ELSE 'NORMAL'
+  END AS alert_level
+FROM sensor_readings_compact r
+JOIN devices d USING (device_eui)
+LEFT JOIN gps_fixes g USING (device_eui, time);
+
+-- Verificar
+SELECT table_name
+FROM information_schema.tables
+WHERE table_name IN ('sensor_readings_compact', 'gps_fixes', 'sensor_readings_compact_v');
@@ -0,0 +1,21 @@
+-- Migración 004: track GPS con solo movimientos significativos
+
+CREATE TABLE IF NOT EXISTS device_tracks (
+  device_eui VARCHAR(16) NOT NULL,
+  time       TIMESTAMPTZ NOT NULL,
+  latitude   FLOAT       NOT NULL,
+  longitude  FLOAT       NOT NULL,
+  moved_m    FLOAT,
+  PRIMARY KEY (device_eui, time)
+);
+
+-- Punto inicial: último fix conocido de cada device
+INSERT INTO device_tracks (device_eui, time, latitude, longitude)
+SELECT DISTINCT ON (device_eui) device_eui, time, latitude, longitude
+FROM sensor_readings
+WHERE latitude IS NOT NULL
+ORDER BY device_eui, time DESC
+ON CONFLICT DO NOTHING;
+
+-- Verificar
+SELECT count(*) AS devices_with_track FROM device_tracks;
@@ -0,0 +1,16 @@
+-- Migración 005: topología del río (tramos aguas arriba → aguas abajo)
+
+CREATE TABLE IF NOT EXISTS river_links (
+  upstream_eui   VARCHAR(16) NOT NULL REFERENCES devices(device_eui) ON DELETE CASCADE,
+  downstream_eui VARCHAR(16) NOT NULL REFERENCES devices(device_eui) ON DELETE CASCADE,
+  distance_km    FLOAT       NOT NULL CHECK (distance_km > 0),
+  created_at     TIMESTAMPTZ DEFAULT now(),
+  PRIMARY KEY (upstream_eui, downstream_eui),
+  CHECK (upstream_eui <> downstream_eui)
+);
+
+-- Búsqueda de tramos aguas arriba de un puente
+CREATE INDEX IF NOT EXISTS river_links_downstream_idx ON river_links (downstream_eui);
+
+-- Verificar
+SELECT count(*) AS river_links FROM river_links;
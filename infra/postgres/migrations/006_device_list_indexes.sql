@@ -0,0 +1,17 @@
+-- Migración 006: índices para GET /devices paginado y filtrado
+
+-- Keyset por device_eui filtrando activos/inactivos
+CREATE INDEX IF NOT EXISTS ix_devices_active_eui ON devices (is_active, device_eui);
+
+-- Búsqueda por ubicación con ILIKE '%texto%'
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_devices_location_trgm
+  ON devices USING gin (location_name gin_trgm_ops);
+
+-- last_seen NO se indexa: el ingest lo actualiza en cada uplink y un
+-- índice sobre esa columna impide los HOT updates (cada uplink tocaría
+-- también el índice). El filtro de staleness se evalúa sobre las filas
+-- que ya recorta el keyset (LIMIT), que en esta tabla son pocas.
+
+-- Verificar
+SELECT indexname FROM pg_indexes WHERE tablename = 'devices';
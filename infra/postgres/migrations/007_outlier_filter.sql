@@ -0,0 +1,49 @@
+-- Migración 007: distancia cruda de las lecturas rechazadas por el filtro
+--
+-- distance_cm pasa a ser la distancia filtrada (de la que salen el
+-- nivel y las alertas). distance_raw_cm guarda la medición original
+-- solo cuando el filtro de Hampel la rechazó; NULL = aceptada, así
+-- que la columna marca el rechazo y no ocupa espacio en el resto.
+-- Cruda de cualquier lectura: coalesce(distance_raw_cm, distance_cm).
+
+ALTER TABLE sensor_readings
+  ADD COLUMN IF NOT EXISTS distance_raw_cm FLOAT;
+
+ALTER TABLE sensor_readings_compact
+  ADD COLUMN IF NOT EXISTS distance_raw_cm REAL;
+
+-- Vista compacta: mismas columnas que 003 + distancia cruda al final
+CREATE OR REPLACE VIEW sensor_readings_compact_v AS
+SELECT
+  md5(r.device_eui || ':' || (extract(epoch FROM r.time) * 1000000)::bigint::text)::uuid
+    AS id,
+  r.time,
+  r.device_eui,
+  r.distance_cm::float8 AS distance_cm,
+  GREATEST(0, d.bridge_height_cm - r.distance_cm) AS water_level_cm,
+  LEAST(100, GREATEST(0, d.bridge_height_cm - r.distance_cm)
+             / d.bridge_height_cm * 100) AS fill_pct,
+  r.battery_mv::int AS battery_mv,
+  LEAST(100, GREATEST(0, round((r.battery_mv - 3000) / 1200.0 * 100)))::int
+    AS battery_pct,
+  r.rssi::int AS rssi,
+  r.snr::float8 AS snr,
+  g.lat_e6 / 1e6::float8 AS latitude,
+  g.lon_e6 / 1e6::float8 AS longitude,
+  CASE r.alert_code
+    WHEN 1 THEN 'WATCH'
+    WHEN 2 THEN 'WARNING'
+    WHEN 3 THEN 'CRITICAL'
+    ELSE 'NORMAL'
+  END AS alert_level,
+  r.rise_rate_cm_min::float8 AS rise_rate_cm_min,
+  r.minutes_to_critical::float8 AS minutes_to_critical,
+  r.distance_raw_cm::float8 AS distance_raw_cm
+FROM sensor_readings_compact r
+JOIN devices d USING (device_eui)
+LEFT JOIN gps_fixes g USING (device_eui, time);
+
+-- Verificar
+SELECT table_name, column_name
+FROM information_schema.columns
+WHERE column_name = 'distance_raw_cm';
@@ -0,0 +1,14 @@
+-- Migración 008: compresión de lecturas guardadas por device
+--
+-- Con tolerancia, el ingest solo guarda las lecturas necesarias para
+-- reconstruir el nivel con error ≤ tolerancia (swinging door o
+-- deadband, STORAGE_COMPRESSION) más un heartbeat. NULL = guardar
+-- cada uplink, como hasta ahora.
+
+ALTER TABLE devices
+  ADD COLUMN IF NOT EXISTS storage_tolerance_cm FLOAT
+    CHECK (storage_tolerance_cm IS NULL OR storage_tolerance_cm >= 0);
+
+-- Verificar
+SELECT column_name FROM information_schema.columns
+WHERE table_name = 'devices' AND column_name = 'storage_tolerance_cm';
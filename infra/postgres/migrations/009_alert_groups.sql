@@ -0,0 +1,12 @@
+-- Migración 009: grupo de alertas por device
+--
+-- El dispatcher de alertas rutea cada device a los chats de su grupo
+-- según ALERT_ROUTES ("norte=-1001,-1002;sur=-1003"). NULL = el chat
+-- por defecto (TELEGRAM_CHAT_ID), como hasta ahora.
+
+ALTER TABLE devices
+  ADD COLUMN IF NOT EXISTS alert_group VARCHAR(50);
+
+-- Verificar
+SELECT column_name FROM information_schema.columns
+WHERE table_name = 'devices' AND column_name = 'alert_group';
@@ -0,0 +1,48 @@
+"""
+Archivado de meses cerrados de lecturas a Parquet.
+
+Exporta por device y mes todo lo anterior a --older-than-days
+(redondeado al inicio del mes) a ARCHIVE_DIR, verifica cada archivo
+y borra el rango de Postgres (ver app.services.cold_archive). Los
+endpoints de historial y /export leen el archivo de forma
+transparente, así que se puede correr mientras la API está arriba;
+pensado para un cron mensual.
+
+Uso (desde services/api):
+    python -m app.archive_runner --older-than-days 180 --dry-run
+"""
+import argparse
+import asyncio
+import json
+
+from app.core.config import settings
+
+
+async def _run(args) -> dict:
+    from app.core.database import engine, get_db_session
+    from app.services.cold_archive import archive_closed_months, cold_archive
+
+    try:
+        return await archive_closed_months(
+            get_db_session, cold_archive, args.older_than_days, dry_run=args.dry_run
+        )
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--dry-run", action="store_true", help="solo listar los meses pendientes")
+    args = parser.parse_args()
+
+    from app.core.logging_config import configure_logging, shutdown_logging
+
+    configure_logging()
+    report = asyncio.run(_run(args))
+    shutdown_logging()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Control de admisión de la API HTTP.
+
+El ingest MQTT y la API comparten proceso, event loop y servidor
+de DB: una tormenta de lecturas (un dashboard o scraper pidiendo
+historiales de 30 días en loop) puede retrasar _process_message y
+con eso las alertas de crecida. El ingest no pasa por HTTP, así
+que todo el control se aplica a los requests, nunca a MQTT:
+
+  1. Load shedding: si la espera del pool de escritura (ingest)
+     supera SHED_WRITE_WAIT_MS, o la del de lectura supera
+     SHED_READ_WAIT_MS, los requests se rechazan con 429 y
+     Retry-After hasta que la presión baje. El umbral del pool de
+     escritura es más bajo: apenas el ingest espera, se corta.
+  2. Token bucket por cliente (IP, o primer X-Forwarded-For detrás
+     de un proxy): RATE_LIMIT_PER_S sostenido con ráfagas de
+     RATE_LIMIT_BURST; un historial cuesta RATE_LIMIT_HISTORY_COST.
+     En memoria por defecto; con RATE_LIMIT_BACKEND=redis el balde
+     vive en Redis (un script Lua atómico) y se comparte entre
+     réplicas. Si Redis falla se sigue con el balde local.
+  3. Tope de concurrencia de historiales: como mucho
+     HISTORY_MAX_CONCURRENT en curso; el resto espera un lugar
+     hasta HISTORY_QUEUE_S y después recibe 429.
+
+/health, /metrics, los webhooks (ingest HTTP) y /admin quedan fuera.
+"""
+import asyncio
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+
+import structlog
+
+from app.core.config import settings
+from app.core.database import read_pool_stats, write_pool_stats
+
+logger = structlog.get_logger()
+
+EXEMPT_PREFIXES = ("/health", "/metrics", "/api/v1/webhooks", "/api/v1/admin")
+# Consultas que recorren historial (y toman conexión un buen rato)
+HISTORY_PATH = re.compile(
+    r"^/api/v1/(sensors/[^/]+/(readings|export|track)|grafana/query)/?$"
+)
+# Clientes recordados por el balde en memoria (LRU)
+MAX_CLIENTS = 10_000
+
+
+# ─── Token bucket ─────────────────────────────────────
+class MemoryRateLimiter:
+    """Un balde por cliente, recargado según el tiempo transcurrido."""
+
+    def __init__(self, rate_per_s: float, burst: int, clock=time.monotonic):
+        self.rate = rate_per_s
+        self.burst = burst
+        self.clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def acquire(self, client: str, cost: float = 1.0) -> float:
+        """0 si se admite; si no, segundos hasta tener `cost` tokens."""
+        now = self.clock()
+        tokens, last = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > MAX_CLIENTS:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+_REDIS_BUCKET = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local now, cost = tonumber(ARGV[3]), tonumber(ARGV[4])
+local b = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter:
+    """Mismo balde en Redis, compartido entre réplicas de la API."""
+
+    def __init__(self, url: str, rate_per_s: float, burst: int):
+        import redis.asyncio as redis
+
+        self.rate = rate_per_s
+        self.burst = burst
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_REDIS_BUCKET)
+        self._fallback = MemoryRateLimiter(rate_per_s, burst)
+        self.errors = 0
+
+    async def acquire(self, client: str, cost: float = 1.0) -> float:
+        try:
+            wait = await self._script(
+                keys=[f"aquaalert:ratelimit:{client}"],
+                args=[self.rate, self.burst, time.time(), cost],
+            )
+            return float(wait)
+        except Exception as e:   # Redis caído: no tumbar la API por el limitador
+            self.errors += 1
+            if self.errors % 100 == 1:
+                logger.warning("ratelimit.redis_failed", error=str(e), errors=self.errors)
+            return await self._fallback.acquire(client, cost)
+
+
+def make_rate_limiter():
+    if settings.RATE_LIMIT_PER_S <= 0:
+        return None
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimiter(settings.REDIS_URL, settings.RATE_LIMIT_PER_S,
+                                settings.RATE_LIMIT_BURST)
+    return MemoryRateLimiter(settings.RATE_LIMIT_PER_S, settings.RATE_LIMIT_BURST)
+
+
+# ─── Middleware ───────────────────────────────────────
+class AdmissionMiddleware:
+    """Middleware ASGI: shedding → rate limit → tope de historiales."""
+
+    def __init__(self, app, limiter="default", history_slots: int | None = None):
+        self.app = app
+        self.limiter = make_rate_limiter() if limiter == "default" else limiter
+        slots = settings.HISTORY_MAX_CONCURRENT if history_slots is None else history_slots
+        self._history = asyncio.Semaphore(slots) if slots > 0 else None
+        self.history_in_flight = 0
+        self.shed = 0
+        self.rate_limited = 0
+        self.history_rejected = 0
+        admission.middleware = self
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            return await self.app(scope, receive, send)
+
+        retry = shed_retry_after()
+        if retry:
+            self.shed += 1
+            return await _reject(send, retry, "Servidor ocupado, reintentar más tarde")
+
+        history = HISTORY_PATH.match(scope["path"]) is not None
+        if self.limiter is not None:
+            cost = settings.RATE_LIMIT_HISTORY_COST if history else 1
+            wait = await self.limiter.acquire(client_key(scope), cost)
+            if wait > 0:
+                self.rate_limited += 1
+                return await _reject(send, wait, "Demasiados requests")
+
+        if not history or self._history is None:
+            return await self.app(scope, receive, send)
+        try:
+            await asyncio.wait_for(self._history.acquire(), settings.HISTORY_QUEUE_S)
+        except asyncio.TimeoutError:
+            self.history_rejected += 1
+            return await _reject(send, 1, "Demasiadas consultas de historial en curso")
+        self.history_in_flight += 1
+        try:
+            # Incluye el streaming del body (export CSV)
+            await self.app(scope, receive, send)
+        finally:
+            self.history_in_flight -= 1
+            self._history.release()
+
+    def stats(self) -> dict:
+        return {
+            "shed": self.shed,
+            "rate_limited": self.rate_limited,
+            "history_rejected": self.history_rejected,
+            "history_in_flight": self.history_in_flight,
+        }
+
+
+def shed_retry_after() -> float:
+    """Segundos de Retry-After si hay que cortar lecturas; 0 si no."""
+    write_ms = settings.SHED_WRITE_WAIT_MS
+    read_ms = settings.SHED_READ_WAIT_MS
+    if write_ms > 0 and write_pool_stats.pressure_s() * 1000 > write_ms:
+        return 2.0
+    if read_ms > 0 and read_pool_stats.pressure_s() * 1000 > read_ms:
+        return 1.0
+    return 0.0
+
+
+def client_key(scope) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _reject(send, retry_after_s: float, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after_s))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# ─── Instancia global ─────────────────────────────────
+class _Admission:
+    """Acceso a la instancia que Starlette construye (para /metrics)."""
+
+    middleware: AdmissionMiddleware | None = None
+
+    def stats(self) -> dict:
+        return self.middleware.stats() if self.middleware else {}
+
+
+admission = _Admission()
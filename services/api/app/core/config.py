@@ -14,34 +14,200 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "dev-secret-key-change-in-production"
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:8080"
 
+    # ─── Logging ──────────────────────────────────────
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "console"          # console | json
+    LOG_SAMPLE: str = "reading.saved=10" # evento=N → 1 de cada N (warnings siempre)
+    LOG_QUEUE_SIZE: int = 10_000         # eventos en cola antes de descartar
+
+    # ─── Perfilado bajo demanda (admin) ──────────────
+    ADMIN_TOKEN: str = ""                # vacío = perfilado y /admin deshabilitados
+    PROFILE_INTERVAL_MS: float = 5.0     # período de muestreo del stack
+    PROFILE_MAX_S: float = 60.0          # tope del perfil del listener
+    PROFILE_DIR: str = "/tmp"            # perfiles pedidos con SIGUSR1 al runner
+    LOOP_BLOCK_MS: float = 0.0           # 0 = detector de bloqueos apagado
+    LOOP_BLOCK_PATHS: str = "services/mqtt_client.py,routers/"
+
     @property
     def origins_list(self) -> list[str]:
         return [o.strip() for o in self.ALLOWED_ORIGINS.split(",")]
 
     # ─── Base de datos (TimescaleDB) ──────────────────
+    # postgres → TimescaleDB; sqlite → archivo local en un gateway edge
+    DB_BACKEND: str = "postgres"
     TIMESCALE_USER: str = "aquaalert"
     TIMESCALE_PASSWORD: str = "changeme"
     TIMESCALE_DB: str = "aquaalert_ts"
 
     @property
     def DATABASE_URL(self) -> str:
+        if self.DB_BACKEND == "sqlite":
+            return f"sqlite+aiosqlite:///{self.SQLITE_PATH}"
         return (
             f"postgresql+asyncpg://{self.TIMESCALE_USER}:"
             f"{self.TIMESCALE_PASSWORD}@timescaledb:5432/{self.TIMESCALE_DB}"
         )
 
+    # Esquema de almacenamiento de lecturas:
+    #   legacy  → sensor_readings (UUID + columnas derivadas)
+    #   compact → sensor_readings_compact + gps_fixes (migración 002)
+    READINGS_STORAGE: str = "legacy"
+
+    # Réplica de lectura (streaming replication); vacío = mismo servidor
+    TIMESCALE_READ_HOST: str = ""
+
+    @property
+    def READ_DATABASE_URL(self) -> str:
+        if not self.TIMESCALE_READ_HOST or self.DB_BACKEND == "sqlite":
+            return self.DATABASE_URL
+        return self.DATABASE_URL.replace("@timescaledb:", f"@{self.TIMESCALE_READ_HOST}:")
+
+    # ─── Arranque ────────────────────────────────────
+    # Migraciones NNN_*.sql (infra/postgres/migrations; en Docker se montan en /app/migrations)
+    MIGRATIONS_DIR: str = "../../infra/postgres/migrations"
+    SCHEMA_BASELINE_VERSION: int = 1     # DB previa sin schema_migrations: aplicada a mano hasta acá (-1 = todas)
+    WARM_STATE_PATH: str = "/data/state/warm_state.pkl"  # vacío = sin snapshot
+    WARM_STATE_MAX_AGE_MIN: float = 60.0 # snapshot más viejo → warm-up desde la DB
+
+    # ─── Archivo frío (Parquet en disco local) ───────
+    ARCHIVE_DIR: str = "/data/archive"
+    ARCHIVE_AFTER_DAYS: int = 180        # meses completos más viejos salen de Postgres
+    ARCHIVE_ROW_GROUP_ROWS: int = 2880   # ~1 día de uplinks cada 30 s
+    ARCHIVE_COMPRESSION: str = "zstd"
+
+    # ─── Pools de conexiones ─────────────────────────
+    # Escritura (ingest, PATCH, jobs) y lectura (API, dashboards)
+    # en pools separados: un pico de lecturas no deja sin
+    # conexiones al ingest.
+    DB_WRITE_POOL_SIZE: int = 10
+    DB_WRITE_MAX_OVERFLOW: int = 5
+    DB_READ_POOL_SIZE: int = 10
+    DB_READ_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_S: float = 30.0
+    DB_STATEMENT_CACHE_SIZE: int = 256   # prepared statements por conexión (0 = off)
+
+    # ─── Edge: SQLite embebido en el gateway ─────────
+    # Con DB_BACKEND=sqlite (ver storage_backend y edge_sync)
+    SQLITE_PATH: str = "/data/state/aquaalert.db"
+    SQLITE_CACHE_MB: int = 8             # page cache por conexión
+    SQLITE_READERS: int = 2              # conexiones de lectura (WAL: no esperan al escritor)
+    SQLITE_COMMIT_MS: float = 500.0      # group commit de las escrituras internas (0 = commit por uso)
+    SQLITE_COMMIT_MAX: int = 100         # usos antes de confirmar sin esperar el intervalo
+    EDGE_UPSTREAM_URL: str = ""          # API central (http://central:8000); vacío = sin sync
+    EDGE_SITE_ID: str = ""               # nombre del sitio en los lotes (logs de la central)
+    EDGE_SYNC_TOKEN: str = ""            # X-Edge-Token, igual en gateway y central (vacío = central no acepta)
+    EDGE_SYNC_BATCH: int = 2000          # lecturas por POST
+    EDGE_SYNC_INTERVAL_S: float = 60.0   # al día: cada cuánto buscar lecturas nuevas
+    EDGE_SYNC_MAX_BACKOFF_S: float = 900.0  # sin enlace: reintento máx.
+    EDGE_KEEP_DAYS: int = 30             # lecturas ya sincronizadas que quedan en el gateway
+
+    # ─── Control de admisión (requests HTTP) ─────────
+    # El ingest MQTT no pasa por acá: siempre tiene prioridad.
+    RATE_LIMIT_PER_S: float = 10.0       # tokens por segundo por cliente (0 = sin límite)
+    RATE_LIMIT_BURST: int = 40
+    RATE_LIMIT_HISTORY_COST: int = 5     # tokens de una consulta de historial
+    RATE_LIMIT_BACKEND: str = "memory"   # memory | redis (compartido entre réplicas)
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # cliente = primer X-Forwarded-For
+    HISTORY_MAX_CONCURRENT: int = 4      # historiales en curso a la vez (0 = sin tope)
+    HISTORY_QUEUE_S: float = 2.0         # espera máx. por un lugar antes del 429
+    SHED_WRITE_WAIT_MS: float = 50.0     # espera del pool del ingest que corta lecturas (0 = off)
+    SHED_READ_WAIT_MS: float = 250.0     # espera del pool de lectura que corta lecturas (0 = off)
+
+    # ─── Buffer de lecturas recientes (memoria) ──────
+    RECENT_BUFFER_HOURS: int = 24        # 0 = deshabilitado
+    RECENT_BUFFER_INTERVAL_S: int = 30   # intervalo de uplink esperado
+    RECENT_BUFFER_MAX_MB: int = 128      # presupuesto total de memoria
+
+    # ─── Downsampling (LTTB) y datasource de Grafana ─
+    DOWNSAMPLE_MAX_ROWS: int = 100_000   # filas leídas por serie antes de reducir (~35 días a 30 s)
+    GRAFANA_MAX_POINTS: int = 5000       # tope de maxDataPoints por serie
+
+    # ─── Cache de respuestas (ETag / 304) ────────────
+    RESPONSE_CACHE_TTL_S: float = 30.0   # 0 = deshabilitado (ETags igual se envían)
+    RESPONSE_CACHE_MAX_MB: int = 16
+
+    # ─── Recálculo de derivados en background ────────
+    RECOMPUTE_CHUNK_HOURS: int = 24      # ventana de tiempo por UPDATE
+    RECOMPUTE_DUTY_CYCLE: float = 0.25   # fracción máx. de tiempo ocupando la DB
+    RECOMPUTE_MIN_PAUSE_S: float = 0.05  # pausa mínima entre ventanas
+
+    # ─── Filtro de ecos espurios (Hampel) ────────────
+    OUTLIER_WINDOW: int = 7              # distancias por device (0 = sin filtro)
+    OUTLIER_K: float = 3.0               # desvíos (MAD escalado) para rechazar
+    OUTLIER_MIN_DEV_CM: float = 3.0      # piso del desvío: el ruido normal no se rechaza
+    OUTLIER_MIN_SAMPLES: int = 3         # lecturas antes de empezar a rechazar
+
+    # ─── Compresión de lecturas guardadas ────────────
+    # Tolerancia por device en devices.storage_tolerance_cm (NULL = todas)
+    STORAGE_COMPRESSION: str = "deadband"        # deadband | swinging_door
+    STORAGE_HEARTBEAT_MIN: float = 15.0  # guardar al menos una lectura cada N min
+
+    # ─── Velocidad de subida (alerta RISING_FAST) ────
+    RISE_RATE_TAU_MIN: float = 15.0      # constante de tiempo del promedio EW
+    RISE_ALERT_TTC_MIN: float = 60.0     # alertar si se proyecta CRITICAL antes de esto
+
+    # ─── Pronóstico de nivel (Holt, alerta FORECAST) ─
+    FORECAST_ALPHA: float = 0.2          # suavizado del nivel por uplink
+    FORECAST_BETA: float = 0.05          # suavizado de la tendencia
+    FORECAST_Z: float = 1.645            # intervalo de ~90%
+    FORECAST_MIN_SAMPLES: int = 10       # lecturas antes de pronosticar
+    FORECAST_RESET_GAP_MIN: float = 30.0 # hueco que reinicia el modelo
+    FORECAST_ALERT_MIN: float = 45.0     # alertar si se proyecta WARNING/CRITICAL antes
+    FORECAST_WARM_HOURS: int = 6         # historial para armar el modelo bajo demanda
+
+    # ─── Pronóstico de batería ───────────────────────
+    BATTERY_FORECAST_DAYS: int = 14      # ventana de historial
+    BATTERY_FORECAST_BUCKET_H: int = 6   # promedio por bucket antes del ajuste
+    BATTERY_FORECAST_TTL_S: int = 600    # cache del resultado
+
+    # ─── Detección de nodos fuera de línea ───────────
+    OFFLINE_TICK_S: float = 5.0              # resolución de la rueda de timers
+    OFFLINE_WHEEL_SLOTS: int = 4096          # buckets (una vuelta ≈ 5.7 h)
+    OFFLINE_DEFAULT_INTERVAL_S: float = 30.0 # cadencia inicial supuesta
+    OFFLINE_FACTOR: float = 4.0              # uplinks perdidos antes de OFFLINE
+    OFFLINE_MIN_S: float = 180.0             # timeout mínimo
+
+    # ─── Índice espacial ─────────────────────────────
+    GEO_CELL_DEG: float = 0.05           # celda de la grilla (~5.5 km)
+    GEO_MOVE_THRESHOLD_M: float = 25.0   # fixes más cerca se consideran ruido
+
+    # ─── Propagación de crecidas (topología del río) ─
+    WAVE_BUCKET_MIN: int = 5             # resolución de las series correlacionadas
+    WAVE_HISTORY_DAYS: int = 7           # historial en memoria por puente
+    WAVE_WINDOW_H: int = 24              # ventana deslizante de correlación
+    WAVE_WINDOW_STEP_H: int = 6          # paso entre ventanas
+    WAVE_MAX_LAG_H: float = 6.0          # tiempo de viaje máximo buscado
+    WAVE_MIN_CORR: float = 0.6           # ventanas con menos correlación se ignoran
+    WAVE_REFRESH_S: int = 900            # refresco incremental del modelo
+    WAVE_DEFAULT_SPEED_KMH: float = 3.6  # sin estimación: ~1 m/s por el cauce
+
     # ─── MQTT ─────────────────────────────────────────
     MQTT_BROKER: str = "mosquitto"
     MQTT_PORT: int = 1883
     MQTT_USER: str = ""
     MQTT_PASSWORD: str = ""
 
+    # ─── Ingest ───────────────────────────────────────
+    #   embedded → el proceso de la API escucha MQTT (un solo core)
+    #   external → la API no escucha; corre python -m app.ingest_runner
+    INGEST_MODE: str = "embedded"
+    INGEST_WORKERS: int = 2              # procesos del runner (shard por EUI)
+    INGEST_RESTART_MAX_S: float = 30.0   # backoff máx. al reiniciar un worker caído
+
     # ─── Redis ────────────────────────────────────────
     REDIS_URL: str = "redis://redis:6379"
 
     # ─── Telegram ─────────────────────────────────────
     TELEGRAM_BOT_TOKEN: str = ""
-    TELEGRAM_CHAT_ID: str = ""
+    TELEGRAM_CHAT_ID: str = ""           # destino por defecto (devices sin grupo)
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
+    # Chats por devices.alert_group: "norte=-1001,-1002;sur=-1003";
+    # los chats de "*" reciben todas las alertas
+    ALERT_ROUTES: str = ""
+    ALERT_DIGEST_S: float = 5.0          # ventana para juntar alertas de un chat
+    TELEGRAM_CHAT_PER_MIN: float = 20.0  # límite de Telegram por grupo/canal
+    TELEGRAM_CHAT_BURST: int = 3
+    TELEGRAM_GLOBAL_PER_S: float = 30.0  # límite de Telegram por bot
 
     # ─── ChirpStack ───────────────────────────────────
     CHIRPSTACK_API_TOKEN: str = ""
@@ -3,41 +3,173 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy import DateTime
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.types import TypeDecorator
 from contextlib import asynccontextmanager
+from datetime import timezone
 from app.core.config import settings
+from app.core.storage_backend import GroupCommit, backend
+import time as _time
 import structlog
 
 logger = structlog.get_logger()
 
-# ─── Engine ───────────────────────────────────────────
-engine = create_async_engine(
+# Peso de cada checkout en el promedio EW de espera
+WAIT_EWMA_ALPHA = 0.1
+# Sin checkouts, la presión medida se reduce a la mitad cada tanto
+WAIT_HALF_LIFE_S = 2.0
+
+
+# ─── Métricas de espera del pool ──────────────────────
+class PoolWaitStats:
+    """Cuánto esperan los checkouts por una conexión libre."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.recent_wait_s = 0.0   # promedio EW, reacciona a picos
+        self.observed_at = 0.0     # monotonic del último checkout
+
+    def observe(self, wait_s: float):
+        self.checkouts += 1
+        self.total_wait_s += wait_s
+        self.max_wait_s = max(self.max_wait_s, wait_s)
+        self.recent_wait_s += WAIT_EWMA_ALPHA * (wait_s - self.recent_wait_s)
+        self.observed_at = _time.monotonic()
+
+    def pressure_s(self, now: float | None = None) -> float:
+        """
+        recent_wait_s decayendo con el tiempo sin checkouts: si el
+        load shedding corta las lecturas, el pool no queda marcado
+        como saturado para siempre.
+        """
+        idle = (now if now is not None else _time.monotonic()) - self.observed_at
+        return self.recent_wait_s * 0.5 ** (max(0.0, idle) / WAIT_HALF_LIFE_S)
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait_s / self.checkouts * 1000, 3)
+            if self.checkouts else 0.0,
+            "recent_wait_ms": round(self.recent_wait_s * 1000, 3),
+            "max_wait_ms": round(self.max_wait_s * 1000, 3),
+        }
+
+
+def _timed_pool(stats: PoolWaitStats):
+    """Clase de pool que mide la espera de cada checkout."""
+
+    class TimedQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            t0 = _time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                stats.timeouts += 1
+                raise
+            finally:
+                stats.observe(_time.perf_counter() - t0)
+
+    return TimedQueuePool
+
+
+def _make_engine(url: str, pool_size: int, max_overflow: int, stats: PoolWaitStats,
+                 writer: bool):
+    """Pool medido; tamaños y opciones del driver según el motor (storage_backend)."""
+    engine = create_async_engine(
+        url,
+        echo=settings.API_DEBUG,
+        poolclass=_timed_pool(stats),
+        pool_timeout=settings.DB_POOL_TIMEOUT_S,
+        **backend.engine_options(pool_size, max_overflow, writer),
+    )
+    backend.configure(engine, writer)
+    return engine
+
+
+# ─── Engines ──────────────────────────────────────────
+# write → ingest MQTT, PATCH/POST de devices, jobs de recálculo
+# read  → endpoints de consulta; puede apuntar a una réplica
+#         (TIMESCALE_READ_HOST), si no es un pool aparte al mismo servidor
+write_pool_stats = PoolWaitStats()
+read_pool_stats = PoolWaitStats()
+
+engine = _make_engine(
     settings.DATABASE_URL,
-    echo=settings.API_DEBUG,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    settings.DB_WRITE_POOL_SIZE,
+    settings.DB_WRITE_MAX_OVERFLOW,
+    write_pool_stats,
+    writer=True,
+)
+read_engine = _make_engine(
+    settings.READ_DATABASE_URL,
+    settings.DB_READ_POOL_SIZE,
+    settings.DB_READ_MAX_OVERFLOW,
+    read_pool_stats,
+    writer=False,
 )
 
-# ─── Session factory ──────────────────────────────────
+# ─── Session factories ────────────────────────────────
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False,
 )
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
+# SQLite: escrituras internas agrupadas en pocas transacciones
+group_commit = (
+    GroupCommit(AsyncSessionLocal, settings.SQLITE_COMMIT_MS / 1000, settings.SQLITE_COMMIT_MAX)
+    if backend.name == "sqlite" and settings.SQLITE_COMMIT_MS > 0 else None
+)
 
 # ─── Base para modelos ORM ────────────────────────────
 class Base(DeclarativeBase):
     pass
 
 
-# ─── Inicializar tablas ───────────────────────────────
-async def init_db():
-    """Crea todas las tablas si no existen"""
-    from app.models import reading, device  # noqa: F401 — registra los modelos
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    logger.info("database.initialized", url=settings.DATABASE_URL.split("@")[1])
+# ─── Tipos ────────────────────────────────────────────
+class _SQLiteUTC(TypeDecorator):
+    """SQLite guarda DATETIME sin zona: se escribe en UTC y se lee con tzinfo UTC."""
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        return value.replace(tzinfo=timezone.utc) if value is not None else None
+
+
+# timestamptz en Postgres (sin procesar en Python); aware UTC también en SQLite
+UTCDateTime = DateTime(timezone=True).with_variant(_SQLiteUTC(), "sqlite")
+
+
+# ─── Inicializar esquema ──────────────────────────────
+async def init_db() -> dict:
+    """Migraciones (Postgres) o create_all (SQLite); ver storage_backend."""
+    result = await backend.init_schema(engine)
+    logger.info("database.initialized", backend=backend.name,
+                url=backend.describe(settings.DATABASE_URL), **result)
+    return result
+
+
+async def flush_pending_writes():
+    """Confirma el group commit pendiente (apagado)."""
+    if group_commit is not None:
+        await group_commit.flush()
 
 
 # ─── Dependency FastAPI ───────────────────────────────
@@ -51,9 +183,19 @@ async def get_db() -> AsyncSession:
             raise
 
 
+async def get_read_db() -> AsyncSession:
+    """Sesión de solo lectura (pool de lectura / réplica)."""
+    async with ReadSessionLocal() as session:
+        yield session
+
+
 # ─── Context manager para uso interno (MQTT, etc.) ───
 @asynccontextmanager
 async def get_db_session():
+    if group_commit is not None:
+        async with group_commit.session() as session:
+            yield session
+        return
     async with AsyncSessionLocal() as session:
         try:
             yield session
@@ -61,3 +203,26 @@ async def get_db_session():
         except Exception:
             await session.rollback()
             raise
+
+
+# ─── Métricas (endpoint /metrics) ─────────────────────
+def storage_stats() -> dict:
+    stats = {"backend": backend.name}
+    if group_commit is not None:
+        stats["group_commit"] = group_commit.stats()
+    return stats
+
+
+def pool_stats() -> dict:
+    return {
+        name: {
+            **stats.as_dict(),
+            "checked_out": eng.pool.checkedout(),
+            "size": eng.pool.size(),
+            "overflow": eng.pool.overflow(),
+        }
+        for name, eng, stats in (
+            ("write", engine, write_pool_stats),
+            ("read", read_engine, read_pool_stats),
+        )
+    }
@@ -0,0 +1,221 @@
+"""
+Configuración de structlog para el camino de ingest.
+
+  · Filtro por nivel en el propio bound logger: un debug() con
+    LOG_LEVEL=INFO es un no-op (no corre ningún processor). Para
+    no armar siquiera los argumentos, los hot paths preguntan
+    antes con debug_enabled().
+  · Muestreo por tipo de evento (LOG_SAMPLE="reading.saved=10"):
+    se emite 1 de cada N; warnings y errores siempre pasan.
+  · Sink con cola: el event loop solo encola el dict del evento;
+    un thread aparte lo renderiza (JSON o consola) y escribe a
+    stdout en lotes. Si la cola se llena se descarta y se cuenta,
+    nunca se bloquea el ingest.
+"""
+import atexit
+import logging
+import queue
+import sys
+import threading
+
+import structlog
+
+from app.core.config import settings
+
+# Eventos con nivel >= WARNING nunca se muestrean
+_ALWAYS_LEVEL = logging.WARNING
+_METHOD_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "msg": logging.INFO,
+    "warn": logging.WARNING,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "exception": logging.ERROR,
+    "critical": logging.CRITICAL,
+    "fatal": logging.CRITICAL,
+}
+_STOP = object()
+
+_debug_enabled = True   # sin configurar, structlog emite todo
+_sink: "QueueSink | None" = None
+_sampler: "EventSampler | None" = None
+
+
+def debug_enabled() -> bool:
+    """True si LOG_LEVEL deja pasar debug (chequear antes de armar argumentos)."""
+    return _debug_enabled
+
+
+def parse_sample_rates(spec: str) -> dict[str, int]:
+    """'reading.saved=10,mqtt.x=5' → {'reading.saved': 10, 'mqtt.x': 5}"""
+    rates = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        event, n = item.split("=", 1)
+        rates[event.strip()] = max(1, int(n))
+    return rates
+
+
+class EventSampler:
+    """Processor: deja pasar 1 de cada N eventos de los tipos configurados."""
+
+    def __init__(self, rates: dict[str, int]):
+        self.rates = rates
+        self._seen: dict[str, int] = {}
+        self.dropped = 0
+
+    def __call__(self, logger, method_name, event_dict):
+        n = self.rates.get(event_dict.get("event"))
+        if n is None or n == 1:
+            return event_dict
+        if _METHOD_LEVELS.get(method_name, logging.INFO) >= _ALWAYS_LEVEL:
+            return event_dict
+        event = event_dict["event"]
+        count = self._seen.get(event, 0)
+        self._seen[event] = count + 1
+        if count % n:
+            self.dropped += 1
+            raise structlog.DropEvent
+        event_dict["sampled"] = n   # cada línea representa N eventos
+        return event_dict
+
+
+class QueueSink:
+    """Cola acotada + thread escritor que renderiza fuera del event loop."""
+
+    def __init__(self, renderer, stream, maxsize: int, batch: int = 256):
+        self._renderer = renderer
+        self._stream = stream
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._batch = batch
+        self.written = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def put(self, method_name: str, event_dict: dict):
+        try:
+            self._queue.put_nowait((method_name, event_dict))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            lines = []
+            while True:
+                if item is _STOP:
+                    self._write(lines)
+                    return
+                method_name, event_dict = item
+                try:
+                    lines.append(self._renderer(None, method_name, event_dict))
+                except Exception as e:   # un evento mal formado no mata el sink
+                    lines.append(f"log.render_failed event={event_dict.get('event')} error={e}")
+                if len(lines) >= self._batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._write(lines)
+
+    def _write(self, lines: list[str]):
+        if not lines:
+            return
+        self._stream.write("\n".join(lines) + "\n")
+        self._stream.flush()
+        self.written += len(lines)
+
+    def close(self, timeout: float = 2.0):
+        """Vacía la cola y detiene el thread (shutdown)."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+
+class _QueueLogger:
+    """
+    Logger final de structlog: solo encola en el sink activo.
+    Lo busca en cada llamada porque los proxies cacheados
+    sobreviven a una reconfiguración.
+    """
+
+    def _emit(self, method_name: str, event_dict: dict):
+        sink = _sink
+        if sink is not None:
+            sink.put(method_name, event_dict)
+
+    def debug(self, **event_dict):
+        self._emit("debug", event_dict)
+
+    def info(self, **event_dict):
+        self._emit("info", event_dict)
+
+    def warning(self, **event_dict):
+        self._emit("warning", event_dict)
+
+    def error(self, **event_dict):
+        self._emit("error", event_dict)
+
+    def critical(self, **event_dict):
+        self._emit("critical", event_dict)
+
+    msg = info
+    warn = warning
+    exception = error
+    fatal = critical
+
+
+def configure_logging(
+    level: str | None = None,
+    fmt: str | None = None,
+    sample: str | None = None,
+    stream=None,
+):
+    """Configura structlog; sin argumentos usa LOG_* de settings."""
+    global _debug_enabled, _sink, _sampler
+    shutdown_logging()
+
+    min_level = logging.getLevelName((level or settings.LOG_LEVEL).upper())
+    _debug_enabled = min_level <= logging.DEBUG
+    _sampler = EventSampler(parse_sample_rates(
+        settings.LOG_SAMPLE if sample is None else sample
+    ))
+    renderer = (
+        structlog.dev.ConsoleRenderer(colors=False)
+        if (fmt or settings.LOG_FORMAT) == "console"
+        else structlog.processors.JSONRenderer()
+    )
+    _sink = QueueSink(renderer, stream or sys.stdout, maxsize=settings.LOG_QUEUE_SIZE)
+
+    structlog.configure(
+        processors=[
+            _sampler,                       # primero: lo descartado no cuesta más
+            structlog.contextvars.merge_contextvars,
+            structlog.processors.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso", utc=True),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(min_level),
+        logger_factory=lambda *args: _QueueLogger(),
+        cache_logger_on_first_use=True,
+    )
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    global _sink
+    if _sink is not None:
+        _sink.close()
+        _sink = None
+
+
+def logging_stats() -> dict:
+    return {
+        "written": _sink.written if _sink else 0,
+        "dropped_queue_full": _sink.dropped if _sink else 0,
+        "sampled_out": _sampler.dropped if _sampler else 0,
+    }
@@ -0,0 +1,178 @@
+"""
+Migraciones versionadas del esquema de TimescaleDB.
+
+Los archivos NNN_nombre.sql de MIGRATIONS_DIR
+(infra/postgres/migrations) se aplican en orden y cada uno queda
+registrado en schema_migrations. Al arrancar, una sola query lee
+la versión aplicada; si ya es la del último archivo no se hace
+nada más. Antes cada arranque corría create_all, que revisa tabla
+por tabla contra el catálogo.
+
+Con migraciones pendientes se toma un advisory lock (varias
+réplicas pueden arrancar a la vez), se vuelve a leer la versión y
+cada archivo corre en su propia transacción junto con su registro:
+si falla, queda pendiente entero para el próximo arranque.
+
+  · DB vacía: create_all de los modelos como versión 0 y después
+    todos los archivos.
+  · DB existente sin schema_migrations (migraciones aplicadas a
+    mano): se registra como aplicada hasta SCHEMA_BASELINE_VERSION
+    (por defecto 1, el esquema previo a schema_migrations) y corren
+    los archivos siguientes. Los archivos son idempotentes (IF NOT
+    EXISTS): correr uno ya aplicado a mano no rompe nada.
+
+Un cambio de esquema es un archivo nuevo: los modelos ya no crean
+tablas solos al arrancar.
+"""
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+logger = structlog.get_logger()
+
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+# Mismo id en todas las réplicas ("AQUA")
+LOCK_ID = 0x41515541
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version     INTEGER     PRIMARY KEY,
+  name        TEXT        NOT NULL,
+  applied_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  duration_ms REAL        -- NULL = registrada al adoptar una DB existente
+)
+"""
+_INSERT = text(
+    "INSERT INTO schema_migrations (version, name, duration_ms) "
+    "VALUES (:version, :name, :duration_ms)"
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+
+
+def discover(directory: str) -> list[Migration]:
+    """Archivos de migración del directorio, ordenados por versión."""
+    root = Path(directory)
+    if not root.is_dir():
+        return []
+    found = []
+    for path in root.iterdir():
+        match = MIGRATION_FILE.match(path.name)
+        if match:
+            found.append(Migration(int(match[1]), match[2], path))
+    found.sort(key=lambda m: m.version)
+    versions = [m.version for m in found]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"Versiones de migración duplicadas en {directory}")
+    return found
+
+
+def pending(migrations: list[Migration], current: int) -> list[Migration]:
+    return [m for m in migrations if m.version > current]
+
+
+def adopted(migrations: list[Migration], baseline: int) -> list[Migration]:
+    """Las que se registran sin ejecutar al adoptar una DB (-1 = todas)."""
+    if baseline < 0:
+        return list(migrations)
+    return [m for m in migrations if m.version <= baseline]
+
+
+async def current_version(conn) -> int | None:
+    """Versión aplicada, o None si schema_migrations no existe."""
+    try:
+        result = await conn.execute(
+            text("SELECT coalesce(max(version), 0) FROM schema_migrations")
+        )
+        return result.scalar_one()
+    except ProgrammingError:
+        await conn.rollback()
+        return None
+
+
+async def migrate(engine, directory: str, baseline: int = -1) -> dict:
+    """
+    Deja el esquema en la última versión. Retorna la versión final
+    y las migraciones aplicadas en este arranque.
+    """
+    migrations = discover(directory)
+    if not migrations:
+        logger.warning("migrations.none_found", directory=directory)
+    latest = migrations[-1].version if migrations else 0
+
+    async with engine.connect() as conn:
+        current = await current_version(conn)
+        if current is not None and current >= latest:
+            await conn.rollback()
+            return {"version": current, "applied": []}
+
+        await conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": LOCK_ID})
+        await conn.commit()
+        try:
+            # Otra réplica pudo migrar mientras esperábamos el lock
+            current = await current_version(conn)
+            if current is None:
+                current = await _bootstrap(conn, migrations, baseline)
+            applied = []
+            for migration in pending(migrations, current):
+                await _apply(conn, migration)
+                applied.append(migration.version)
+                current = migration.version
+        finally:
+            await conn.rollback()
+            await conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": LOCK_ID})
+            await conn.commit()
+    return {"version": current, "applied": applied}
+
+
+async def _bootstrap(conn, migrations: list[Migration], baseline: int) -> int:
+    """Crea schema_migrations: versión 0 en una DB vacía, o adopta una existente."""
+    from app.core.database import Base
+    from app.models import device, reading, river, track  # noqa: F401 — registra los modelos
+
+    existing = (await conn.execute(
+        text("SELECT to_regclass('devices') IS NOT NULL")
+    )).scalar_one()
+    await conn.execute(text(_CREATE_TABLE))
+    if existing:
+        skipped = adopted(migrations, baseline)
+        version = skipped[-1].version if skipped else 0
+        logger.warning("migrations.adopted", version=version,
+                       hint="SCHEMA_BASELINE_VERSION = última aplicada a mano")
+    else:
+        await conn.run_sync(Base.metadata.create_all)
+        skipped, version = [], 0
+        logger.info("migrations.baseline_created")
+    await conn.execute(_INSERT, [
+        {"version": 0, "name": "baseline", "duration_ms": None},
+        *({"version": m.version, "name": m.name, "duration_ms": None} for m in skipped),
+    ])
+    await conn.commit()
+    return version
+
+
+async def _apply(conn, migration: Migration):
+    """Un archivo (varias sentencias) + su registro, en una transacción."""
+    sql = migration.path.read_text()
+    t0 = time.perf_counter()
+    await conn.execute(text("SELECT 1"))   # abre la transacción de SQLAlchemy
+    raw = await conn.get_raw_connection()
+    # asyncpg ejecuta scripts de varias sentencias solo sin parámetros
+    await raw.driver_connection.execute(sql)
+    duration_ms = round((time.perf_counter() - t0) * 1000, 1)
+    await conn.execute(_INSERT, {
+        "version": migration.version, "name": migration.name, "duration_ms": duration_ms,
+    })
+    await conn.commit()
+    logger.info("migrations.applied", version=migration.version,
+                name=migration.name, duration_ms=duration_ms)
@@ -0,0 +1,320 @@
+"""
+Perfilado bajo demanda de la API y del loop de ingest.
+
+Todo se apoya en muestrear el stack del thread del event loop
+desde un thread aparte (sys._current_frames), sin dependencias
+externas y sin instrumentar el código perfilado:
+
+  · Perfil de un request: con ADMIN_TOKEN configurado, el header
+    X-Profile: 1 (o ?profile=1) más X-Admin-Token reemplaza la
+    respuesta por los stacks muestreados mientras corría.
+  · Perfil del listener MQTT: muestrea el loop durante N segundos
+    y se queda con las muestras que están dentro de
+    MQTTClient._listen; el resto se cuenta como idle u "otro".
+  · Detector de bloqueos: una tarea latido en el loop y un thread
+    watchdog; si el latido se atrasa más de LOOP_BLOCK_MS se toma
+    el stack del loop y, si pasa por mqtt_client.py o los routers
+    (LOOP_BLOCK_PATHS), se loguea loop.blocked al destrabarse.
+
+La salida es "folded stacks" (una línea `a;b;c N` por stack), el
+formato que leen flamegraph.pl, inferno y speedscope. Las muestras
+son on-CPU del loop: el tiempo esperando la DB no aparece.
+
+Deshabilitado (ADMIN_TOKEN vacío, LOOP_BLOCK_MS=0) no hay
+middleware, ni tarea, ni thread: costo cero.
+"""
+import asyncio
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+def admin_token_ok(token: str | None) -> bool:
+    """True si hay ADMIN_TOKEN configurado y `token` coincide."""
+    expected = settings.ADMIN_TOKEN
+    return bool(expected) and bool(token) and secrets.compare_digest(token, expected)
+
+
+# ─── Stacks ───────────────────────────────────────────
+def _short_path(path: str) -> str:
+    for marker in ("/site-packages/", "/services/api/"):
+        if marker in path:
+            return path.rsplit(marker, 1)[1]
+    return path.rsplit("/", 1)[-1]
+
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def stack_codes(frame) -> list:
+    """Code objects del stack, del más externo al más interno."""
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    return codes
+
+
+def is_idle(codes: list) -> bool:
+    """El loop está en select() esperando I/O."""
+    if not codes:
+        return False
+    return codes[-1].co_name == "select" and codes[-1].co_filename.endswith("selectors.py")
+
+
+def to_folded(counts: Counter) -> str:
+    return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+
+
+@dataclass
+class Profile:
+    counts: Counter = field(default_factory=Counter)   # stack folded → muestras
+    samples: int = 0
+    matched: int = 0      # muestras dentro de `root` (o todas si no hay root)
+    idle: int = 0
+    duration_s: float = 0.0
+
+    def folded(self) -> str:
+        return to_folded(self.counts)
+
+    def summary(self) -> dict:
+        return {
+            "samples": self.samples,
+            "matched": self.matched,
+            "idle": self.idle,
+            "other": self.samples - self.matched - self.idle,
+            "duration_s": round(self.duration_s, 3),
+        }
+
+
+class StackSampler:
+    """
+    Thread que muestrea el stack de `thread_id` cada interval_s.
+    Con `root` (un code object) solo guarda los stacks que lo
+    contienen, recortados desde ese frame.
+    """
+
+    def __init__(self, thread_id: int, interval_s: float, root=None):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.root = root
+        self.profile = Profile()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        profile = self.profile
+        profile.samples += 1
+        codes = stack_codes(frame)
+        if self.root is not None:
+            try:
+                codes = codes[codes.index(self.root):]
+            except ValueError:
+                if is_idle(codes):
+                    profile.idle += 1
+                return
+        elif is_idle(codes):
+            profile.idle += 1
+            return
+        profile.matched += 1
+        profile.counts[";".join(frame_label(c) for c in codes)] += 1
+
+    def run(self, seconds: float | None = None) -> Profile:
+        """Muestrea hasta stop() o hasta `seconds` (bloqueante)."""
+        t0 = time.perf_counter()
+        deadline = None if seconds is None else t0 + seconds
+        while not self._stop.wait(self.interval_s):
+            self.sample()
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        self.profile.duration_s = time.perf_counter() - t0
+        return self.profile
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.profile
+
+
+# ─── Perfil de un request ─────────────────────────────
+def profile_requested(request) -> bool:
+    return request.headers.get("x-profile") == "1" or request.query_params.get("profile") == "1"
+
+
+async def profile_request_middleware(request, call_next):
+    """
+    Middleware HTTP; main.py solo lo registra con ADMIN_TOKEN.
+    Sin X-Profile el costo es leer un header y un query param.
+    """
+    from fastapi.responses import JSONResponse, PlainTextResponse
+
+    if not profile_requested(request):
+        return await call_next(request)
+    if not admin_token_ok(request.headers.get("x-admin-token")):
+        return JSONResponse({"detail": "Token de administración inválido"}, status_code=403)
+
+    sampler = StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL_MS / 1000)
+    sampler.start()
+    try:
+        response = await call_next(request)
+        async for _ in response.body_iterator:   # incluye el streaming del body
+            pass
+    finally:
+        profile = sampler.stop()
+    logger.info("profile.request", path=request.url.path, **profile.summary())
+    return PlainTextResponse(profile.folded(), headers={
+        "X-Profile-Status": str(response.status_code),
+        "X-Profile-Samples": str(profile.samples),
+        "X-Profile-Duration-Ms": f"{profile.duration_s * 1000:.1f}",
+    })
+
+
+# ─── Perfil del listener MQTT ─────────────────────────
+_profile_lock = asyncio.Lock()
+
+
+def profile_busy() -> bool:
+    return _profile_lock.locked()
+
+
+async def profile_loop(seconds: float, root=None, interval_s: float | None = None) -> Profile:
+    """
+    Muestrea el thread del loop que llama durante `seconds`. Uno
+    a la vez: dos samplers juntos se duplicarían el overhead.
+    """
+    async with _profile_lock:
+        sampler = StackSampler(
+            threading.get_ident(),
+            interval_s or settings.PROFILE_INTERVAL_MS / 1000,
+            root=root,
+        )
+        return await asyncio.to_thread(sampler.run, seconds)
+
+
+def listener_root():
+    from app.services.mqtt_client import MQTTClient
+
+    return MQTTClient._listen.__code__
+
+
+# ─── Detector de bloqueos del event loop ──────────────
+class LoopBlockDetector:
+    """
+    Latido en el loop cada threshold/4; el watchdog (otro thread)
+    revisa con la misma cadencia. Un bloqueo se reporta una vez,
+    al terminar, con el stack tomado mientras duraba.
+    """
+
+    def __init__(self, threshold_ms: float, paths: list[str], keep: int = 50):
+        self.threshold_s = threshold_ms / 1000
+        self.paths = paths
+        self.blocks = 0
+        self.blocks_other = 0     # bloqueos fuera de `paths`: solo se cuentan
+        self.max_blocked_ms = 0.0
+        self.recent: deque = deque(maxlen=keep)
+        self._beat = 0.0
+        self._tick = self.threshold_s / 4
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._loop_thread = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self.running or self.threshold_s <= 0:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("loop_block.started", threshold_ms=self.threshold_s * 1000)
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._thread.join)
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self._tick)
+
+    def _watch(self):
+        pending = None    # (latido que se atrasó, stack tomado)
+        while not self._stop.wait(self._tick):
+            beat = self._beat
+            if pending is not None and beat != pending[0]:
+                # El loop volvió: duración real = hueco entre latidos
+                self._report((beat - pending[0] - self._tick) * 1000, pending[1])
+                pending = None
+            if pending is None and time.monotonic() - beat > self.threshold_s + self._tick:
+                frame = sys._current_frames().get(self._loop_thread)
+                pending = (beat, stack_codes(frame) if frame is not None else [])
+
+    def _matches(self, codes: list) -> bool:
+        return any(p in c.co_filename for c in codes for p in self.paths)
+
+    def _report(self, blocked_ms: float, codes: list):
+        if not self._matches(codes):
+            self.blocks_other += 1
+            return
+        self.blocks += 1
+        self.max_blocked_ms = max(self.max_blocked_ms, blocked_ms)
+        stack = [frame_label(c) for c in codes]
+        origin = next(
+            (frame_label(c) for c in reversed(codes) if any(p in c.co_filename for p in self.paths)),
+            None,
+        )
+        self.recent.append({
+            "at": time.time(), "blocked_ms": round(blocked_ms, 1),
+            "origin": origin, "stack": stack,
+        })
+        logger.warning("loop.blocked", blocked_ms=round(blocked_ms, 1), origin=origin,
+                       frames=stack[-20:])
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "threshold_ms": self.threshold_s * 1000,
+            "blocks": self.blocks,
+            "blocks_other": self.blocks_other,
+            "max_blocked_ms": round(self.max_blocked_ms, 1),
+        }
+
+
+# ─── Instancia global ─────────────────────────────────
+loop_block_detector = LoopBlockDetector(
+    threshold_ms=settings.LOOP_BLOCK_MS,
+    paths=[p.strip() for p in settings.LOOP_BLOCK_PATHS.split(",") if p.strip()],
+)
@@ -0,0 +1,63 @@
+"""
+Tiempo de arranque por fase.
+
+Un reinicio del contenedor en medio de una crecida deja el ingest
+parado hasta que la API termina de arrancar. El timer mide:
+  · phases_ms      → duración de cada fase del lifespan
+                     (migraciones, estado en memoria, MQTT...)
+  · since_start_ms → hitos desde que se importó este módulo
+                     (primero en main.py): imports, app lista,
+                     primer SUBSCRIBE al broker (ingest andando)
+Se loguea en startup.ready y se expone en /metrics.
+
+Los módulos pesados que el ingest no necesita para arrancar
+(numpy, pyarrow, httpx, msgpack, brotli) se importan al usarse; preload_deferred()
+los carga en un thread una vez que el ingest ya corre, para que el
+primer request o la primera alerta no paguen el import.
+"""
+import importlib
+import time
+from contextlib import contextmanager
+
+import structlog
+
+logger = structlog.get_logger()
+
+DEFERRED_MODULES = ("httpx", "numpy", "pyarrow.parquet", "pyarrow.compute", "msgpack", "brotli")
+
+
+class StartupTimer:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.t0 = clock()
+        self.phases: dict[str, float] = {}
+        self.marks: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = self.clock()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((self.clock() - t0) * 1000, 1)
+
+    def mark(self, name: str):
+        """Hito desde el arranque; solo cuenta la primera vez."""
+        self.marks.setdefault(name, round((self.clock() - self.t0) * 1000, 1))
+
+    def as_dict(self) -> dict:
+        return {"phases_ms": dict(self.phases), "since_start_ms": dict(self.marks)}
+
+
+def preload_deferred():
+    """Importa los módulos diferidos (correr en un thread)."""
+    with startup_timer.phase("preload"):
+        for name in DEFERRED_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+
+
+# ─── Instancia global ─────────────────────────────────
+startup_timer = StartupTimer()
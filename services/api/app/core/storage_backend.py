@@ -0,0 +1,295 @@
+"""
+Motor de almacenamiento: TimescaleDB (servidor) o SQLite (edge).
+
+Un gateway tipo Raspberry Pi en un puente no puede correr el stack
+completo (TimescaleDB, Redis, Grafana). Con DB_BACKEND=sqlite la
+API y el ingest corren en un proceso contra un archivo local, y las
+lecturas suben a la API central cuando hay enlace (edge_sync).
+
+Routers y servicios usan sesiones de SQLAlchemy igual con los dos
+motores; lo que depende del motor pasa por `backend`:
+
+  · engine: asyncpg con cache de prepared statements, o aiosqlite
+    con WAL, synchronous=NORMAL y SQLITE_CACHE_MB de page cache. Un
+    solo escritor (pool de escritura de 1 conexión, BEGIN IMMEDIATE:
+    nunca "database is locked" a mitad de transacción) y lectores
+    que con WAL no esperan al escritor.
+  · esquema: migraciones versionadas (app.core.migrations), o
+    create_all + ALTER TABLE ADD COLUMN de las columnas nuevas (los
+    .sql de infra/postgres son de Postgres/Timescale).
+  · SQL del dialecto: upsert, greatest/least, la última fila por
+    device (DISTINCT ON en Postgres) y la agrupación por tiempo
+    (mes 'YYYY-MM' y baldes de N segundos desde el epoch), que usan
+    cold_archive, battery_forecast y river_network.
+  · escrituras internas (ingest, jobs): en SQLite cada COMMIT es una
+    escritura al WAL en la SD; se agrupan (GroupCommit).
+
+SQLite solo soporta READINGS_STORAGE=legacy: el esquema compacto
+se lee por una vista con funciones de Postgres.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import structlog
+from sqlalchemy import Integer, cast, desc, event, func, inspect, literal_column, select, tuple_
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Espera por el lock de escritura antes de "database is locked"
+SQLITE_BUSY_TIMEOUT_S = 10.0
+# Tope del archivo WAL después de cada checkpoint (la SD es chica)
+SQLITE_WAL_LIMIT_BYTES = 32 * 1024 * 1024
+
+
+# ─── Postgres / TimescaleDB ───────────────────────────
+class PostgresBackend:
+    name = "postgres"
+
+    def engine_options(self, pool_size: int, max_overflow: int, writer: bool) -> dict:
+        cache = settings.DB_STATEMENT_CACHE_SIZE
+        return {
+            "pool_pre_ping": True,
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "connect_args": {
+                # Cache de prepared statements: el de SQLAlchemy y el de asyncpg
+                "prepared_statement_cache_size": cache,
+                "statement_cache_size": cache,
+            },
+        }
+
+    def configure(self, engine, writer: bool):
+        pass
+
+    async def init_schema(self, engine) -> dict:
+        from app.core.migrations import migrate
+
+        return await migrate(engine, settings.MIGRATIONS_DIR, settings.SCHEMA_BASELINE_VERSION)
+
+    def describe(self, url: str) -> str:
+        return url.split("@")[1]
+
+    def insert(self, model):
+        from sqlalchemy.dialects.postgresql import insert
+
+        return insert(model)
+
+    def inserted_flag(self):
+        """Columna de RETURNING de un upsert: xmax = 0 → fila recién insertada."""
+        return literal_column("xmax = 0")
+
+    def greatest(self, *args):
+        return func.greatest(*args)
+
+    def least(self, *args):
+        return func.least(*args)
+
+    def latest_per(self, stmt, key, time_column):
+        """La fila más nueva de cada `key` (un DISTINCT ON)."""
+        return stmt.distinct(key).order_by(key, desc(time_column))
+
+    # Constantes inline: con parámetros bind Postgres no reconoce la
+    # misma expresión en SELECT y GROUP BY
+    def month_of(self, time_column):
+        """'YYYY-MM' (UTC) de cada fila."""
+        utc = func.timezone(literal_column("'UTC'"), time_column)
+        return func.to_char(utc, literal_column("'YYYY-MM'"))
+
+    def epoch_bucket(self, time_column, seconds: int):
+        """Índice del balde de `seconds` s (desde el epoch) de cada fila."""
+        return func.floor(func.extract("epoch", time_column) / literal_column(str(int(seconds))))
+
+
+# ─── SQLite (gateway edge) ────────────────────────────
+class SQLiteBackend:
+    name = "sqlite"
+
+    def engine_options(self, pool_size: int, max_overflow: int, writer: bool) -> dict:
+        # Un escritor; los lectores no se bloquean con WAL
+        return {
+            "pool_size": 1 if writer else settings.SQLITE_READERS,
+            "max_overflow": 0,
+            "connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_S},
+        }
+
+    def configure(self, engine, writer: bool):
+        pragmas = (
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            f"PRAGMA cache_size=-{settings.SQLITE_CACHE_MB * 1024}",
+            f"PRAGMA journal_size_limit={SQLITE_WAL_LIMIT_BYTES}",
+        )
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _connect(dbapi_connection, _record):
+            # BEGIN a mano: el de pysqlite no sirve para SAVEPOINT
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+        @event.listens_for(engine.sync_engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE" if writer else "BEGIN")
+
+    async def init_schema(self, engine) -> dict:
+        if settings.READINGS_STORAGE != "legacy":
+            raise ValueError("DB_BACKEND=sqlite solo soporta READINGS_STORAGE=legacy")
+        from app.core.database import Base
+        from app.models import device, edge, reading, river, track  # noqa: F401 — registra los modelos
+
+        async with engine.begin() as conn:
+            return await conn.run_sync(_sync_schema, Base.metadata)
+
+    def describe(self, url: str) -> str:
+        return settings.SQLITE_PATH
+
+    def insert(self, model):
+        from sqlalchemy.dialects.sqlite import insert
+
+        return insert(model)
+
+    def inserted_flag(self):
+        """Sin xmax: el caller consulta las claves existentes antes del upsert."""
+        return None
+
+    def greatest(self, *args):
+        return func.max(*args)   # max() escalar de varios argumentos
+
+    def least(self, *args):
+        return func.min(*args)
+
+    def latest_per(self, stmt, key, time_column):
+        """La fila más nueva de cada `key`: (key, time) en el máximo por grupo."""
+        newest = select(key, func.max(time_column)).group_by(key)
+        return stmt.where(tuple_(key, time_column).in_(newest))
+
+    # Las fechas se guardan como texto ISO en UTC (UTCDateTime de database)
+    def month_of(self, time_column):
+        return func.strftime(literal_column("'%Y-%m'"), time_column)
+
+    def epoch_bucket(self, time_column, seconds: int):
+        """CAST AS INTEGER trunca: es floor para epochs positivos (floor() es opcional en SQLite)."""
+        epoch = cast(func.strftime(literal_column("'%s'"), time_column), Integer)
+        return cast(epoch / literal_column(str(int(seconds))), Integer)
+
+
+def _sync_schema(conn, metadata) -> dict:
+    """create_all + las columnas que falten en tablas ya existentes."""
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    metadata.create_all(conn)
+    added = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        have = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in have:
+                # Solo nombre y tipo: SQLite no agrega NOT NULL sin DEFAULT
+                ddl = f"{column.name} {column.type.compile(dialect=conn.dialect)}"
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                added.append(f"{table.name}.{column.name}")
+    return {"created": sorted(set(metadata.tables) - existing), "added_columns": added}
+
+
+# ─── Group commit (SQLite) ────────────────────────────
+class GroupCommit:
+    """
+    Una sesión de escritura compartida por los usos internos de
+    get_db_session (ingest, jobs, monitor). Cada uso va en un
+    SAVEPOINT (un error descarta solo lo suyo) y el COMMIT se hace
+    cada interval_s, o antes si se juntan max_uses.
+
+    Lo confirmado ya es durable con synchronous=NORMAL; si el proceso
+    muere se pierden a lo sumo los últimos interval_s, como las
+    lecturas retenidas por la compresión. Los requests de la API
+    (get_db) siguen con su propia transacción.
+    """
+
+    def __init__(self, session_factory, interval_s: float, max_uses: int):
+        self.session_factory = session_factory
+        self.interval_s = interval_s
+        self.max_uses = max_uses
+        self._lock = asyncio.Lock()
+        self._session = None
+        self._uses = 0
+        self._timer: asyncio.Task | None = None
+        self.commits = 0
+        self.committed_uses = 0
+        self.rolled_back = 0
+
+    @asynccontextmanager
+    async def session(self):
+        async with self._lock:
+            if self._session is None:
+                self._session = self.session_factory()
+            savepoint = await self._session.begin_nested()
+            try:
+                yield self._session
+                await savepoint.commit()
+            except BaseException:
+                if savepoint.is_active:
+                    await savepoint.rollback()
+                self.rolled_back += 1
+                raise
+            self._uses += 1
+            if self._uses >= self.max_uses:
+                await self._commit()
+            elif self._timer is None:
+                self._timer = asyncio.create_task(self._commit_later())
+
+    async def _commit_later(self):
+        await asyncio.sleep(self.interval_s)
+        async with self._lock:
+            self._timer = None
+            try:
+                await self._commit()
+            except Exception as e:
+                logger.error("sqlite.commit_failed", error=str(e))
+
+    async def _commit(self):
+        """Confirma y cierra la sesión (con el lock tomado)."""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        session, self._session = self._session, None
+        uses, self._uses = self._uses, 0
+        if session is None:
+            return
+        try:
+            await session.commit()
+            self.commits += 1
+            self.committed_uses += uses
+        finally:
+            # Sesión nueva en el próximo grupo: nada de configs viejas
+            # en el identity map si la API cambió un device
+            await session.close()
+
+    async def flush(self):
+        """Confirma lo pendiente ya (apagado)."""
+        async with self._lock:
+            await self._commit()
+
+    def stats(self) -> dict:
+        return {
+            "commits": self.commits,
+            "uses_per_commit": round(self.committed_uses / self.commits, 1) if self.commits else None,
+            "pending_uses": self._uses,
+            "rolled_back": self.rolled_back,
+        }
+
+
+def make_backend(name: str):
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "postgres":
+        return PostgresBackend()
+    raise ValueError(f"DB_BACKEND desconocido: {name}")
+
+
+# ─── Instancia global ─────────────────────────────────
+backend = make_backend(settings.DB_BACKEND)
@@ -0,0 +1,199 @@
+"""
+Runner de ingest multi-proceso, separado del proceso de la API.
+
+Levanta INGEST_WORKERS procesos; el worker i se suscribe al mismo
+topic de uplinks pero solo procesa los devices con
+shard_of(eui, n) == i (hash estable del EUI, filtrado por topic
+antes de parsear el JSON). Así cada device cae siempre en el mismo
+worker y su estado en memoria (velocidad de subida, deadline de
+OFFLINE, última posición GPS) sigue siendo consistente. Las shared
+subscriptions de MQTT ($share/...) reparten mensajes sin afinidad
+por device, por eso no se usan.
+
+Cada worker es un proceso spawn con su propio event loop y su
+propio pool de DB (DB_WRITE_*). Un supervisor reinicia los que
+mueren con backoff exponencial (hasta INGEST_RESTART_MAX_S).
+
+La velocidad de subida arranca en frío en cada worker (necesita
+unos pocos uplinks por device antes de reportar pendiente). Un PATCH
+de altura o umbrales resetea tendencia y pronóstico solo en el
+proceso de la API; cada worker lo detecta en el próximo uplink del
+device, al leer su fila (MQTTClient._check_geometry).
+
+Con este runner la API debe correr con INGEST_MODE=external.
+
+Uso (desde services/api):
+    python -m app.ingest_runner --workers 4
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import signal
+import time
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Un worker que vive más que esto se considera sano: se resetea el backoff
+HEALTHY_AFTER_S = 60.0
+
+
+# ─── Worker ───────────────────────────────────────────
+def worker_main(index: int, total: int):
+    """Entry point de cada proceso worker."""
+    from app.core.logging_config import configure_logging
+
+    configure_logging()
+    structlog.contextvars.bind_contextvars(worker=index)
+    try:
+        asyncio.run(_run_worker(index, total))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _run_worker(index: int, total: int):
+    from app.core.database import engine, flush_pending_writes, get_db_session
+    from app.core.profiling import loop_block_detector
+    from app.services.alert_dispatcher import alert_dispatcher
+    from app.services.geo_index import geo_index
+    from app.services.mqtt_client import MQTTClient
+    from app.services.offline_monitor import offline_monitor
+    from app.services.recent_buffer import recent_buffer
+
+    # El buffer de lecturas recientes solo sirve a la API
+    recent_buffer.enabled = False
+    client = MQTTClient(shard=(index, total), identifier=f"aquaalert-ingest-{index}")
+    async with get_db_session() as db:
+        await offline_monitor.rebuild(db, owns=client.owns)
+        await geo_index.warm_up(db, owns=client.owns)
+    offline_monitor.start()
+    # Cada worker envía por su cuenta: los límites del bot se reparten
+    alert_dispatcher.share(total)
+    alert_dispatcher.start()
+    loop_block_detector.start()
+    await client.connect()
+    logger.info("ingest.worker_started", workers=total, pid=os.getpid())
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    # kill -USR1 <pid> → perfil del listener a PROFILE_DIR
+    loop.add_signal_handler(signal.SIGUSR1, lambda: asyncio.create_task(_dump_profile(index)))
+    await stop.wait()
+
+    await client.disconnect()
+    await offline_monitor.stop()
+    await alert_dispatcher.stop()
+    await loop_block_detector.stop()
+    await flush_pending_writes()
+    await engine.dispose()
+    logger.info("ingest.worker_stopped")
+
+
+async def _dump_profile(index: int):
+    """Perfil del listener de este worker, escrito como folded stacks."""
+    from app.core.profiling import listener_root, profile_busy, profile_loop
+
+    if profile_busy():
+        logger.warning("profile.busy", worker=index)
+        return
+    seconds = min(10.0, settings.PROFILE_MAX_S)
+    profile = await profile_loop(seconds, root=listener_root())
+    path = os.path.join(settings.PROFILE_DIR, f"ingest-{index}-{int(time.time())}.folded")
+    with open(path, "w") as f:
+        f.write(profile.folded())
+    logger.info("profile.written", worker=index, path=path, **profile.summary())
+
+
+# ─── Supervisor ───────────────────────────────────────
+class Supervisor:
+    """Mantiene N workers vivos; reinicia los caídos con backoff."""
+
+    def __init__(self, workers: int, target=worker_main):
+        self.workers = workers
+        self.target = target
+        self._ctx = mp.get_context("spawn")
+        self._procs: list[mp.Process | None] = [None] * workers
+        self._started_at = [0.0] * workers
+        self._backoff = [0.0] * workers
+        self._restart_at = [0.0] * workers
+        self.restarts = 0
+        self._stopping = False
+
+    def _start(self, index: int):
+        proc = self._ctx.Process(
+            target=self.target, args=(index, self.workers),
+            name=f"ingest-{index}", daemon=False,
+        )
+        proc.start()
+        self._procs[index] = proc
+        self._started_at[index] = time.monotonic()
+
+    def check(self):
+        """Revisa los workers una vez: programa y ejecuta reinicios."""
+        if self._stopping:
+            return
+        now = time.monotonic()
+        for i, proc in enumerate(self._procs):
+            if proc is not None and proc.is_alive():
+                if now - self._started_at[i] > HEALTHY_AFTER_S:
+                    self._backoff[i] = 0.0
+                continue
+            if proc is not None:
+                # Recién detectado como caído
+                logger.error("ingest.worker_died", worker=i, exitcode=proc.exitcode,
+                             restart_in=self._backoff[i])
+                proc.join()
+                self._procs[i] = None
+                self._restart_at[i] = now + self._backoff[i]
+                self._backoff[i] = min(settings.INGEST_RESTART_MAX_S,
+                                       max(1.0, self._backoff[i] * 2))
+            elif now >= self._restart_at[i]:
+                self._start(i)
+                self.restarts += 1
+
+    def run(self, poll_s: float = 0.5):
+        for i in range(self.workers):
+            self._start(i)
+        logger.info("ingest.supervisor_started", workers=self.workers, pid=os.getpid())
+
+        def _stop(*_):
+            self._stopping = True
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+        while not self._stopping:
+            time.sleep(poll_s)
+            self.check()
+        self.stop()
+
+    def stop(self, timeout: float = 10.0):
+        for proc in self._procs:
+            if proc is not None and proc.is_alive():
+                proc.terminate()   # SIGTERM → el worker cierra limpio
+        for proc in self._procs:
+            if proc is not None:
+                proc.join(timeout)
+                if proc.is_alive():
+                    proc.kill()
+        logger.info("ingest.supervisor_stopped", restarts=self.restarts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=settings.INGEST_WORKERS)
+    args = parser.parse_args()
+
+    from app.core.logging_config import configure_logging
+
+    configure_logging()
+    Supervisor(max(1, args.workers)).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,42 @@ AquaAlert IoT Platform — API Entry Point
 FastAPI application factory con lifespan para
 conexión MQTT y base de datos.
 """
+import asyncio
+import time
 from contextlib import asynccontextmanager
 
+# Primero: el timer cuenta el arranque desde acá
+from app.core.startup import preload_deferred, startup_timer
+
 import structlog
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.admission import AdmissionMiddleware, admission
 from app.core.config import settings
-from app.core.database import init_db
-from app.routers import alerts, devices, sensors, webhooks
+from app.core.database import flush_pending_writes, get_db_session, init_db, pool_stats, storage_stats
+from app.core.logging_config import configure_logging, logging_stats
+from app.core.profiling import loop_block_detector, profile_request_middleware
+from app.routers import admin, alerts, devices, grafana, jobs, river, sensors, webhooks
+from app.services import warm_state
+from app.services.alert_dispatcher import alert_dispatcher
+from app.services.edge_sync import edge_sync
+from app.services.geo_index import geo_index
+from app.services.level_forecast import level_forecaster
 from app.services.mqtt_client import MQTTClient
+from app.services.offline_monitor import offline_monitor
+from app.services.outlier_filter import outlier_filter
+from app.services.recent_buffer import recent_buffer
+from app.services.recompute_jobs import recompute_manager
+from app.services.response_cache import response_cache
+from app.services.rise_rate import rise_estimator
+from app.services.river_network import river_network
+from app.services.storage_compression import reading_compressor
+
+startup_timer.mark("imports")
 
+# Antes del primer log: nivel, muestreo y sink con cola
+configure_logging()
 logger = structlog.get_logger()
 
 # ─── Instancia global del cliente MQTT ───────────────
@@ -25,24 +50,89 @@ mqtt_client = MQTTClient()
 async def lifespan(app: FastAPI):
     """
     Maneja el ciclo de vida de la aplicación.
-    startup  → init DB + conectar MQTT broker
-    shutdown → desconectar MQTT limpiamente
+    startup  → migraciones + estado en memoria + conectar MQTT broker
+    shutdown → desconectar MQTT + snapshot del estado + cancelar jobs
     """
     # ── Startup ───────────────────────────────────────
     logger.info("aquaalert.starting", version=app.version)
 
-    # Crear tablas si no existen
-    await init_db()
+    # Migraciones pendientes (normalmente ninguna: una sola query)
+    with startup_timer.phase("migrations"):
+        await init_db()
     logger.info("database.ready")
 
-    # Conectar al broker MQTT y escuchar uplinks
-    await mqtt_client.connect()
-    logger.info("mqtt.connected", broker=settings.MQTT_BROKER)
+    embedded = settings.INGEST_MODE != "external"
+    if not embedded:
+        # El ingest corre en app.ingest_runner: esta API no ve los
+        # uplinks, así que no puede servir estado desde memoria
+        recent_buffer.enabled = False
+        response_cache.ttl_s = 0
+        logger.info("ingest.external", hint="python -m app.ingest_runner")
+
+    # Estado en memoria: snapshot del apagado anterior o desde la DB
+    with startup_timer.phase("warm_state"):
+        snapshot_at = None
+        if embedded and settings.WARM_STATE_PATH:
+            snapshot_at = warm_state.load(
+                settings.WARM_STATE_PATH, settings.WARM_STATE_MAX_AGE_MIN * 60
+            )
+        async with get_db_session() as db:
+            if snapshot_at is not None:
+                caught_up = await warm_state.catch_up(db, snapshot_at)
+                logger.info("warm_state.restored",
+                            age_s=round(time.time() - snapshot_at), caught_up=caught_up)
+            else:
+                await recent_buffer.warm_up(db)
+                if embedded:
+                    await offline_monitor.rebuild(db)
+                await geo_index.warm_up(db)
+        if embedded and snapshot_at is None:
+            # Las ventanas del filtro arrancan con las distancias ya filtradas
+            outlier_filter.warm_up(recent_buffer.iter_series("distance_cm"))
+            rise_estimator.warm_up(recent_buffer.iter_series("water_level_cm"))
+            level_forecaster.warm_up(recent_buffer.iter_series("water_level_cm"))
+
+    # Detector de bloqueos del loop (LOOP_BLOCK_MS=0 → no arranca)
+    loop_block_detector.start()
+
+    if embedded:
+        offline_monitor.start()
+        alert_dispatcher.start()
+        # Gateway edge: sube las lecturas locales a la central
+        if edge_sync.enabled:
+            edge_sync.start()
+
+        # Conectar al broker MQTT y escuchar uplinks
+        with startup_timer.phase("mqtt"):
+            await mqtt_client.connect()
+        logger.info("mqtt.connected", broker=settings.MQTT_BROKER)
+
+    startup_timer.mark("ready")
+    logger.info("startup.ready", **startup_timer.as_dict())
+    # Módulos diferidos en un thread, con el ingest ya andando
+    preload = asyncio.create_task(asyncio.to_thread(preload_deferred))
 
     yield  # ← app corriendo
 
     # ── Shutdown ──────────────────────────────────────
-    await mqtt_client.disconnect()
+    if embedded:
+        await mqtt_client.disconnect()
+        await offline_monitor.stop()
+        # Las alertas de los últimos uplinks salen sin esperar la ventana
+        await alert_dispatcher.stop()
+        await edge_sync.stop()
+        # Sin MQTT no entra nada más: el snapshot queda consistente
+        if settings.WARM_STATE_PATH:
+            try:
+                logger.info("warm_state.saved", path=settings.WARM_STATE_PATH,
+                            **warm_state.save(settings.WARM_STATE_PATH))
+            except Exception as e:
+                logger.error("warm_state.save_failed", error=str(e))
+    await recompute_manager.shutdown()
+    # SQLite: el último grupo de escrituras del ingest
+    await flush_pending_writes()
+    await loop_block_detector.stop()
+    await preload
     logger.info("aquaalert.stopped")
 
 
@@ -63,6 +153,12 @@ app = FastAPI(
 )
 
 
+# ─── Control de admisión ──────────────────────────────
+# Antes que CORS: el último agregado queda afuera, así los 429
+# también llevan los headers CORS y el navegador puede leerlos.
+app.add_middleware(AdmissionMiddleware)
+
+
 # ─── CORS ─────────────────────────────────────────────
 app.add_middleware(
     CORSMiddleware,
@@ -72,6 +168,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ─── Perfilado por request (solo con ADMIN_TOKEN) ────
+if settings.ADMIN_TOKEN:
+    app.middleware("http")(profile_request_middleware)
+
 
 # ─── Routers ──────────────────────────────────────────
 app.include_router(
@@ -89,6 +189,26 @@ app.include_router(
     prefix="/api/v1/alerts",
     tags=["🚨 Alerts"],
 )
+app.include_router(
+    jobs.router,
+    prefix="/api/v1/jobs",
+    tags=["⏳ Jobs"],
+)
+app.include_router(
+    river.router,
+    prefix="/api/v1/river",
+    tags=["🌊 River"],
+)
+app.include_router(
+    grafana.router,
+    prefix="/api/v1/grafana",
+    tags=["📈 Grafana"],
+)
+app.include_router(
+    admin.router,
+    prefix="/api/v1/admin",
+    tags=["🛠️ Admin"],
+)
 app.include_router(
     webhooks.router,
     prefix="/api/v1/webhooks",
@@ -110,6 +230,28 @@ async def health_check():
     }
 
 
+@app.get("/metrics", tags=["⚙️ System"])
+async def metrics():
+    """Métricas internas de los componentes en memoria."""
+    return {
+        "recent_buffer": recent_buffer.stats(),
+        "offline_monitor": offline_monitor.stats(),
+        "alert_dispatcher": alert_dispatcher.stats(),
+        "response_cache": response_cache.stats(),
+        "river_network": river_network.stats(),
+        "level_forecast": level_forecaster.stats(),
+        "outlier_filter": outlier_filter.stats(),
+        "storage_compression": reading_compressor.stats(),
+        "loop_blocks": loop_block_detector.stats(),
+        "db_pools": pool_stats(),
+        "storage": storage_stats(),
+        "edge_sync": edge_sync.stats(),
+        "admission": admission.stats(),
+        "logging": logging_stats(),
+        "startup": startup_timer.as_dict(),
+    }
+
+
 @app.get("/", tags=["⚙️ System"])
 async def root():
     """Información general de la API."""
@@ -122,5 +264,8 @@ async def root():
             "sensors": "/api/v1/sensors",
             "devices": "/api/v1/devices",
             "alerts":  "/api/v1/alerts",
+            "jobs":    "/api/v1/jobs",
+            "river":   "/api/v1/river",
+            "grafana": "/api/v1/grafana",
         },
     }
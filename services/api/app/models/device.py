@@ -1,8 +1,8 @@
 from sqlalchemy import (
     Column, String, Float, Boolean,
-    DateTime, Text, func
+    Text, func, Index
 )
-from app.core.database import Base
+from app.core.database import Base, UTCDateTime
 
 
 class Device(Base):
@@ -33,24 +33,42 @@ class Device(Base):
     threshold_watch_pct = Column(Float, default=50.0)    # 🟡 50%
     threshold_warning_pct = Column(Float, default=70.0)  # 🟠 70%
     threshold_critical_pct = Column(Float, default=85.0) # 🔴 85%
+    # Velocidad de subida que dispara RISING_FAST (cm/min)
+    threshold_rise_cm_min = Column(Float, default=1.0)
+
+    # ─── Compresión de lecturas guardadas ─────────────
+    # Error máximo (cm) al reconstruir el nivel desde las filas
+    # guardadas; NULL = guardar cada uplink (ver storage_compression)
+    storage_tolerance_cm = Column(Float, nullable=True)
+
+    # ─── Destino de alertas ───────────────────────────
+    # Grupo de ALERT_ROUTES (ej. "cuenca-norte"); NULL = TELEGRAM_CHAT_ID
+    alert_group = Column(String(50), nullable=True)
 
     # ─── Estado ───────────────────────────────────────
     is_active = Column(Boolean, default=True, nullable=False)
-    last_seen = Column(DateTime(timezone=True), nullable=True)
+    last_seen = Column(UTCDateTime, nullable=True)
 
     # ─── Auditoría ────────────────────────────────────
     created_at = Column(
-        DateTime(timezone=True),
+        UTCDateTime,
         server_default=func.now(),
         nullable=False,
     )
     updated_at = Column(
-        DateTime(timezone=True),
+        UTCDateTime,
         server_default=func.now(),
         onupdate=func.now(),
         nullable=False,
     )
 
+    # ─── Índices de GET /devices (keyset + filtros) ───
+    # El trigram de location_name está en la migración 006 (requiere pg_trgm).
+    # last_seen va sin índice a propósito: se actualiza en cada uplink.
+    __table_args__ = (
+        Index("ix_devices_active_eui", "is_active", "device_eui"),
+    )
+
     def __repr__(self):
         return (
             f"<Device eui={self.device_eui} "
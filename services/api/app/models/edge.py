@@ -0,0 +1,18 @@
+from sqlalchemy import BigInteger, Column, String
+from app.core.database import Base, UTCDateTime
+
+
+class SyncCursor(Base):
+    """
+    Avance del store-and-forward de un gateway edge (solo SQLite).
+    last_rowid = rowid de la última lectura de sensor_readings que
+    la API central confirmó (ver edge_sync).
+    """
+    __tablename__ = "edge_sync_cursor"
+
+    name = Column(String(32), primary_key=True)
+    last_rowid = Column(BigInteger, nullable=False, default=0)
+    synced_at = Column(UTCDateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<SyncCursor {self.name} rowid={self.last_rowid} at={self.synced_at}>"
@@ -1,11 +1,19 @@
 from sqlalchemy import (
-    Column, String, Float, Integer,
-    DateTime, func, Index
+    Column, String, Float, Integer, SmallInteger, REAL,
+    func, Index, MetaData, Table
 )
 from sqlalchemy.dialects.postgresql import UUID
-from app.core.database import Base
+from datetime import datetime, timedelta, timezone
+from app.core.config import settings
+from app.core.database import Base, UTCDateTime
+import hashlib
 import uuid
 
+# ─── Códigos de nivel de alerta (esquema compacto) ────
+# Se guardan como smallint en lugar de String(10).
+ALERT_LEVEL_CODES = {"NORMAL": 0, "WATCH": 1, "WARNING": 2, "CRITICAL": 3}
+ALERT_LEVEL_NAMES = {code: name for name, code in ALERT_LEVEL_CODES.items()}
+
 
 class SensorReading(Base):
     """
@@ -24,7 +32,7 @@ class SensorReading(Base):
 
     # ─── Tiempo (partición TimescaleDB) ───────────────
     time = Column(
-        DateTime(timezone=True),
+        UTCDateTime,
         server_default=func.now(),
         nullable=False,
         index=True,
@@ -34,7 +42,10 @@ class SensorReading(Base):
     device_eui = Column(String(16), nullable=False, index=True)
 
     # ─── Datos del sensor ultrasónico ─────────────────
+    # Distancia filtrada (Hampel): de ella salen nivel y alertas
     distance_cm = Column(Float, nullable=True)
+    # Medición cruda, solo si el filtro la rechazó (NULL = aceptada)
+    distance_raw_cm = Column(Float, nullable=True)
     # Nivel de agua calculado: altura_puente - distancia
     water_level_cm = Column(Float, nullable=True)
     # Porcentaje de llenado respecto a altura puente
@@ -50,6 +61,10 @@ class SensorReading(Base):
     latitude     = Column(Float,   nullable=True)  # GPS lat — None si no hay fix
     longitude    = Column(Float,   nullable=True)  # GPS lon — None si no hay fix
 
+    # ─── Tendencia (estimador incremental) ────────────
+    rise_rate_cm_min    = Column(Float, nullable=True)  # cm/min, + = subiendo
+    minutes_to_critical = Column(Float, nullable=True)  # None si no sube
+
     # ─── Nivel de alerta en el momento de la lectura ──
     alert_level = Column(
         String(10),
@@ -70,3 +85,127 @@ class SensorReading(Base):
             f"level={self.alert_level} "
             f"t={self.time}>"
         )
+
+
+class CompactReading(Base):
+    """
+    Esquema compacto de lecturas (READINGS_STORAGE=compact).
+    Sin UUID por fila: la clave es (device_eui, time).
+    Solo se guardan las mediciones crudas en float4/smallint;
+    water_level_cm, fill_pct y battery_pct se derivan al leer
+    en la vista sensor_readings_compact_v.
+    Ver infra/postgres/migrations/002_compact_readings.sql
+    """
+    __tablename__ = "sensor_readings_compact"
+
+    # ─── PK compuesta (también sirve de índice por device) ─
+    device_eui = Column(String(16), primary_key=True)
+    time = Column(UTCDateTime, primary_key=True)
+
+    # ─── Mediciones crudas ────────────────────────────
+    distance_cm = Column(REAL, nullable=True)
+    distance_raw_cm = Column(REAL, nullable=True)     # solo si se rechazó
+    battery_mv = Column(SmallInteger, nullable=True)  # máx 32767 mV
+    rssi = Column(SmallInteger, nullable=True)        # dBm
+    snr = Column(REAL, nullable=True)                 # dB
+    rise_rate_cm_min = Column(REAL, nullable=True)
+    minutes_to_critical = Column(REAL, nullable=True)
+
+    # ─── Nivel de alerta codificado (ALERT_LEVEL_CODES) ─
+    alert_code = Column(SmallInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return (
+            f"<CompactReading "
+            f"device={self.device_eui} "
+            f"dist={self.distance_cm}cm "
+            f"level={ALERT_LEVEL_NAMES.get(self.alert_code)} "
+            f"t={self.time}>"
+        )
+
+
+class GpsFix(Base):
+    """
+    Fixes GPS en tabla aparte (esquema compacto).
+    Solo ~1 de cada 10 uplinks trae GPS, así que no se
+    reservan columnas lat/lon vacías en cada lectura.
+    Coordenadas en microgrados int32, igual que el payload tipo B.
+    """
+    __tablename__ = "gps_fixes"
+
+    device_eui = Column(String(16), primary_key=True)
+    time = Column(UTCDateTime, primary_key=True)
+    lat_e6 = Column(Integer, nullable=False)
+    lon_e6 = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return (
+            f"<GpsFix device={self.device_eui} "
+            f"lat={self.lat_e6 / 1e6} lon={self.lon_e6 / 1e6} "
+            f"t={self.time}>"
+        )
+
+
+# ─── Vista de lectura del esquema compacto ────────────
+# MetaData propia: la vista la crea la migración 002,
+# create_all no debe intentar crearla como tabla.
+_views_metadata = MetaData()
+
+compact_readings_view = Table(
+    "sensor_readings_compact_v",
+    _views_metadata,
+    Column("id", UUID(as_uuid=True)),  # md5(device_eui, time) — sintético
+    Column("time", UTCDateTime, primary_key=True),
+    Column("device_eui", String(16), primary_key=True),
+    Column("distance_cm", Float),
+    Column("water_level_cm", Float),
+    Column("fill_pct", Float),
+    Column("battery_mv", Integer),
+    Column("battery_pct", Integer),
+    Column("rssi", Integer),
+    Column("snr", Float),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("alert_level", String(10)),
+    Column("rise_rate_cm_min", Float),
+    Column("minutes_to_critical", Float),
+    Column("distance_raw_cm", Float),
+)
+
+
+class CompactReadingView(Base):
+    """
+    Mapeo de solo lectura sobre sensor_readings_compact_v.
+    Expone las mismas columnas que SensorReading para que
+    los routers no distingan entre esquemas.
+    """
+    __table__ = compact_readings_view
+
+
+def reading_model():
+    """
+    Clase ORM a consultar para historial de lecturas,
+    según el esquema configurado en READINGS_STORAGE.
+    """
+    if settings.READINGS_STORAGE == "compact":
+        return CompactReadingView
+    return SensorReading
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def compact_reading_id(device_eui: str, time: datetime) -> uuid.UUID:
+    """
+    Id sintético de una lectura compacta: md5(eui:epoch_µs).
+    Debe coincidir con la columna id de sensor_readings_compact_v.
+    """
+    micros = (time - _EPOCH) // timedelta(microseconds=1)
+    return uuid.UUID(hashlib.md5(f"{device_eui}:{micros}".encode()).hexdigest())
+
+
+def new_reading_id(device_eui: str, time: datetime) -> uuid.UUID:
+    """Id que tendrá en la DB una lectura nueva, según el esquema."""
+    if settings.READINGS_STORAGE == "compact":
+        return compact_reading_id(device_eui, time)
+    return uuid.uuid4()
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, String, Float, ForeignKey, func
+from app.core.database import Base, UTCDateTime
+
+
+class RiverLink(Base):
+    """
+    Tramo del río entre dos puentes consecutivos.
+    upstream → downstream, con la distancia por el cauce.
+    El tiempo de viaje de la crecida se estima desde las
+    lecturas (ver services/river_network.py), no se guarda.
+    """
+    __tablename__ = "river_links"
+
+    upstream_eui = Column(
+        String(16), ForeignKey("devices.device_eui", ondelete="CASCADE"), primary_key=True
+    )
+    downstream_eui = Column(
+        String(16), ForeignKey("devices.device_eui", ondelete="CASCADE"), primary_key=True
+    )
+    distance_km = Column(Float, nullable=False)
+    created_at = Column(UTCDateTime, server_default=func.now())
+
+    def __repr__(self):
+        return (
+            f"<RiverLink {self.upstream_eui} → {self.downstream_eui} "
+            f"{self.distance_km} km>"
+        )
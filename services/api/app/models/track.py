@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, Float
+from app.core.database import Base, UTCDateTime
+
+
+class TrackPoint(Base):
+    """
+    Track GPS de un nodo: solo movimientos significativos.
+    Se guarda un punto cuando el fix se aleja más de
+    GEO_MOVE_THRESHOLD_M del anterior, no cada fix ruidoso.
+    """
+    __tablename__ = "device_tracks"
+
+    device_eui = Column(String(16), primary_key=True)
+    time = Column(UTCDateTime, primary_key=True)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    # Distancia desde el punto anterior (None en el primero)
+    moved_m = Column(Float, nullable=True)
+
+    def __repr__(self):
+        return (
+            f"<TrackPoint device={self.device_eui} "
+            f"lat={self.latitude} lon={self.longitude} t={self.time}>"
+        )
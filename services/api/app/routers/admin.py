@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.profiling import (
+    admin_token_ok,
+    listener_root,
+    loop_block_detector,
+    profile_busy,
+    profile_loop,
+)
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    """Sin ADMIN_TOKEN configurado estos endpoints no existen (404)."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not admin_token_ok(x_admin_token):
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+
+
+@router.post("/profile/ingest", dependencies=[Depends(require_admin)],
+             response_class=PlainTextResponse)
+async def profile_ingest(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(None, ge=1, le=100),
+):
+    """
+    Perfil por muestreo del listener MQTT durante `seconds`.
+    Retorna folded stacks (flamegraph.pl / speedscope); los
+    conteos de muestras van en headers X-Profile-*.
+    """
+    if settings.INGEST_MODE == "external":
+        raise HTTPException(
+            status_code=409,
+            detail="El ingest corre en app.ingest_runner: enviar SIGUSR1 al worker",
+        )
+    if profile_busy():
+        raise HTTPException(status_code=409, detail="Ya hay un perfil en curso")
+    seconds = min(seconds, settings.PROFILE_MAX_S)
+    profile = await profile_loop(
+        seconds, root=listener_root(),
+        interval_s=interval_ms / 1000 if interval_ms else None,
+    )
+    summary = profile.summary()
+    return PlainTextResponse(profile.folded(), headers={
+        f"X-Profile-{key.replace('_', '-').title()}": str(value)
+        for key, value in summary.items()
+    })
+
+
+@router.get("/loop-blocks", dependencies=[Depends(require_admin)])
+async def loop_blocks():
+    """Bloqueos del event loop detectados (más recientes primero)."""
+    return {
+        **loop_block_detector.stats(),
+        "recent": list(reversed(loop_block_detector.recent)),
+    }
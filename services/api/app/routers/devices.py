@@ -1,13 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import io
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from pydantic import BaseModel
+from sqlalchemy import or_, select
+from pydantic import BaseModel, ValidationError
 from typing import Optional
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.core.storage_backend import backend
 from app.models.device import Device
+from app.services.geo_index import geo_index
+from app.services.level_forecast import level_forecaster
+from app.services.offline_monitor import offline_monitor
+from app.services.recent_buffer import recent_buffer
+from app.services.recompute_jobs import DERIVED_INPUTS, recompute_manager
+from app.services.response_cache import response_cache
+from app.services.rise_rate import rise_estimator
 
 router = APIRouter()
 
+# Filas por request de /bulk: ~13 parámetros por fila, asyncpg admite 32767
+BULK_MAX_ROWS = 2000
+_EUI_RE = re.compile(r"^[0-9A-F]{16}$")
+
 
 # ─── Schemas ──────────────────────────────────────────
 class DeviceCreate(BaseModel):
@@ -21,6 +39,9 @@ class DeviceCreate(BaseModel):
     threshold_watch_pct: float = 50.0
     threshold_warning_pct: float = 70.0
     threshold_critical_pct: float = 85.0
+    threshold_rise_cm_min: float = 1.0
+    storage_tolerance_cm: Optional[float] = None   # None = guardar cada uplink
+    alert_group: Optional[str] = None              # None = TELEGRAM_CHAT_ID
 
 
 class DeviceOut(DeviceCreate):
@@ -31,12 +52,221 @@ class DeviceOut(DeviceCreate):
         from_attributes = True
 
 
+class BulkRowError(BaseModel):
+    row: int                        # posición en el lote (0 = primera fila de datos)
+    device_eui: Optional[str]
+    error: str
+
+
+class BulkResult(BaseModel):
+    inserted: list[str]
+    updated: list[str]
+    errors: list[BulkRowError]
+
+
+class BatteryForecastOut(BaseModel):
+    device_eui: str
+    samples: int
+    last_battery_mv: Optional[float]
+    slope_mv_per_day: Optional[float]   # negativo = descargándose
+    days_to_empty: Optional[float]      # None si no se está descargando
+
+
 # ─── Endpoints ────────────────────────────────────────
 
 @router.get("/", response_model=list[DeviceOut])
-async def list_devices(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Device))
-    return result.scalars().all()
+async def list_devices(
+    response: Response,
+    limit: int = Query(default=100, ge=1, le=1000),
+    after: Optional[str] = Query(default=None, description="Cursor: X-Next-Cursor de la página anterior"),
+    active: Optional[bool] = None,
+    location: Optional[str] = Query(default=None, description="Subcadena de location_name"),
+    stale_minutes: Optional[int] = Query(
+        default=None, ge=1, description="Solo los sin uplinks hace más de N minutos (o nunca)",
+    ),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Nodos ordenados por EUI, paginados por keyset: si hay más, el
+    header X-Next-Cursor trae el valor para `after` de la próxima
+    página (sin OFFSET: cada página cuesta lo mismo).
+    """
+    query = select(Device).order_by(Device.device_eui).limit(limit + 1)
+    if after:
+        query = query.where(Device.device_eui > after.upper())
+    if active is not None:
+        query = query.where(Device.is_active.is_(active))
+    if location:
+        query = query.where(Device.location_name.ilike(f"%{location}%"))
+    if stale_minutes:
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=stale_minutes)
+        query = query.where(or_(Device.last_seen.is_(None), Device.last_seen < cutoff))
+
+    devices = (await db.execute(query)).scalars().all()
+    if len(devices) > limit:
+        devices = devices[:limit]
+        response.headers["X-Next-Cursor"] = devices[-1].device_eui
+    return devices
+
+
+@router.post("/bulk", response_model=BulkResult)
+async def bulk_create_devices(
+    request: Request,
+    on_conflict: str = Query(default="skip", pattern="^(skip|update)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Alta masiva desde un array JSON de DeviceCreate o un CSV con
+    las mismas columnas (Content-Type: text/csv). Las filas válidas
+    van en un único INSERT ... ON CONFLICT; las inválidas, las
+    repetidas en el lote y (con on_conflict=skip) las ya registradas
+    se reportan por fila sin abortar el resto.
+
+    Con on_conflict=update solo se sobrescriben las columnas que trae
+    cada fila (un INSERT por combinación de columnas); si cambian
+    altura o umbrales se recalcula el historial como en el PATCH.
+    """
+    raw = await request.body()
+    try:
+        records = _parse_bulk(raw, request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Lote ilegible: {e}")
+    if len(records) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BULK_MAX_ROWS} filas por lote")
+
+    rows, fields, errors, positions = [], [], [], {}
+    for i, record in enumerate(records):
+        eui = str(record.get("device_eui") or "").strip().upper() or None
+        try:
+            data = DeviceCreate(**record)
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            errors.append(BulkRowError(row=i, device_eui=eui, error=detail))
+            continue
+        if not _EUI_RE.match(eui or ""):
+            errors.append(BulkRowError(row=i, device_eui=eui, error="EUI inválido (16 hex)"))
+            continue
+        if eui in positions:
+            errors.append(BulkRowError(row=i, device_eui=eui,
+                                       error=f"Repetido en el lote (fila {positions[eui]})"))
+            continue
+        data.device_eui = eui
+        positions[eui] = i
+        rows.append(data.model_dump())
+        fields.append(frozenset(data.model_fields_set))
+
+    inserted, updated = [], []
+    if rows:
+        flag = backend.inserted_flag()
+        current = {}
+        if on_conflict == "update" or flag is None:
+            # Valores actuales: para detectar cambios de altura/umbrales
+            # (y, en SQLite, cuáles ya existían)
+            tracked = ("latitude", "longitude", *DERIVED_INPUTS)
+            result = await db.execute(
+                select(Device.device_eui, *(getattr(Device, f) for f in tracked))
+                .where(Device.device_eui.in_(list(positions)))
+            )
+            current = {eui: dict(zip(tracked, values)) for eui, *values in result.all()}
+
+        # Con update, filas con las mismas columnas van juntas: las que
+        # una fila no trae no se pisan con el default
+        groups: dict[frozenset | None, list[dict]] = {}
+        for row, row_fields in zip(rows, fields):
+            groups.setdefault(row_fields if on_conflict == "update" else None, []).append(row)
+        for row_fields, group in groups.items():
+            stmt = backend.insert(Device).values(group)
+            if row_fields is not None:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Device.device_eui],
+                    set_={k: stmt.excluded[k] for k in sorted(row_fields) if k != "device_eui"},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[Device.device_eui])
+            if flag is not None:
+                # xmax = 0 → fila recién insertada; si no, la actualizó el ON CONFLICT
+                result = await db.execute(stmt.returning(Device.device_eui, flag))
+                for eui, is_new in result.all():
+                    (inserted if is_new else updated).append(eui)
+            else:
+                result = await db.execute(stmt.returning(Device.device_eui))
+                for eui in result.scalars().all():
+                    (updated if eui in current else inserted).append(eui)
+        await db.commit()
+
+        new, written = set(inserted), set(inserted) | set(updated)
+        for row, row_fields in zip(rows, fields):
+            eui = row["device_eui"]
+            if eui not in written:
+                errors.append(BulkRowError(row=positions[eui], device_eui=eui,
+                                           error="Ya está registrado"))
+                continue
+            if eui in new:
+                geo_index.set_static(eui, row["latitude"], row["longitude"])
+            else:
+                after = {**current[eui], **{k: row[k] for k in row_fields}}
+                geo_index.set_static(eui, after["latitude"], after["longitude"])
+                if any(after[f] != current[eui][f] for f in DERIVED_INPUTS):
+                    _reset_derived(eui)
+            response_cache.bump(eui)
+
+    errors.sort(key=lambda e: e.row)
+    return BulkResult(inserted=inserted, updated=updated, errors=errors)
+
+
+def _parse_bulk(raw: bytes, content_type: str) -> list[dict]:
+    """CSV (con header) o JSON array → lista de dicts; vacíos del CSV = default."""
+    text = raw.decode("utf-8-sig")
+    if "csv" in content_type:
+        reader = csv.DictReader(io.StringIO(text))
+        return [{k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+                for row in reader]
+    data = json.loads(text)
+    if not isinstance(data, list) or not all(isinstance(r, dict) for r in data):
+        raise ValueError("se esperaba un array de objetos")
+    return data
+
+
+@router.get("/battery-forecast", response_model=list[BatteryForecastOut])
+async def battery_forecast(
+    max_days: Optional[float] = Query(default=None, gt=0),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Días estimados hasta BATTERY_MIN_MV para cada nodo activo,
+    los que se agotan primero arriba. Con `max_days` solo los
+    que se agotan antes (p. ej. días hasta la próxima visita).
+    """
+    # Diferido: numpy no hace falta para arrancar
+    from app.services.battery_forecast import battery_forecaster
+
+    forecast = await battery_forecaster.get(db)
+    if max_days is None:
+        return forecast
+    return [
+        f for f in forecast
+        if f["days_to_empty"] is not None and f["days_to_empty"] <= max_days
+    ]
+
+
+@router.get("/health")
+async def devices_health(
+    status: Optional[str] = Query(default=None, pattern="^(ONLINE|OFFLINE)$"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Estado ONLINE/OFFLINE de cada nodo, servido desde memoria
+    (sin consultar la DB). OFFLINE = sin uplinks durante varias
+    veces su intervalo habitual. Con INGEST_MODE=external se
+    calcula desde devices.last_seen.
+    """
+    if settings.INGEST_MODE == "external":
+        report = await offline_monitor.health_from_db(db)
+    else:
+        report = offline_monitor.health()
+    if status:
+        report = [r for r in report if r["status"] == status]
+    return report
 
 
 @router.post("/", response_model=DeviceOut, status_code=201)
@@ -48,18 +278,22 @@ async def create_device(
     # Normalizar EUI siempre a mayúsculas
     data.device_eui = data.device_eui.upper()
 
-    # Verificar si ya existe
-    existing = await db.get(Device, data.device_eui)
-    if existing:
+    # Un solo round trip: si ya existe, el INSERT no retorna fila
+    result = await db.execute(
+        backend.insert(Device)
+        .values(**data.model_dump())
+        .on_conflict_do_nothing(index_elements=[Device.device_eui])
+        .returning(Device)
+    )
+    device = result.scalar_one_or_none()
+    if device is None:
         raise HTTPException(
             status_code=409,
             detail=f"Device EUI '{data.device_eui}' ya está registrado"
         )
-
-    device = Device(**data.model_dump())
-    db.add(device)
     await db.commit()
-    await db.refresh(device)
+    geo_index.set_static(device.device_eui, device.latitude, device.longitude)
+    response_cache.bump(device.device_eui)
     return device
 
 
@@ -80,19 +314,54 @@ async def update_device(
     data: DeviceCreate,
     db: AsyncSession = Depends(get_db)
 ):
-    """Actualiza configuración de un nodo (altura puente, umbrales)."""
+    """
+    Actualiza configuración de un nodo (altura puente, umbrales).
+    Si cambian altura o umbrales se lanza un job que recalcula
+    el historial (ver GET /api/v1/jobs).
+    """
     device = await db.get(Device, device_eui)
     if not device:
         raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
 
+    changed = False
     for field, value in data.model_dump(exclude_unset=True).items():
+        if field in DERIVED_INPUTS and getattr(device, field) != value:
+            changed = True
         setattr(device, field, value)
 
     await db.commit()
     await db.refresh(device)
+    geo_index.set_static(device.device_eui, device.latitude, device.longitude)
+    response_cache.bump(device.device_eui)
+
+    if changed:
+        _reset_derived(device.device_eui)
     return device
 
 
+def _reset_derived(device_eui: str):
+    """Los derivados guardados y en memoria dependen de altura/umbrales."""
+    recent_buffer.invalidate(device_eui)
+    rise_estimator.reset(device_eui)
+    level_forecaster.reset(device_eui)
+    recompute_manager.submit(device_eui)
+
+
+@router.post("/{device_eui}/recompute", status_code=202)
+async def recompute_device(
+    device_eui: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Recalcula en background los derivados del historial del nodo."""
+    device = await db.get(Device, device_eui)
+    if not device:
+        raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+
+    recent_buffer.invalidate(device.device_eui)
+    response_cache.bump(device.device_eui)
+    return recompute_manager.submit(device.device_eui).as_dict()
+
+
 @router.delete("/{device_eui}", status_code=204)
 async def delete_device(
     device_eui: str,
@@ -104,3 +373,6 @@ async def delete_device(
 
     device.is_active = False  # Soft delete
     await db.commit()
+    offline_monitor.forget(device.device_eui)
+    geo_index.remove(device.device_eui)
+    response_cache.bump(device.device_eui)
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import get_read_db
+from app.models.device import Device
+from app.routers.sensors import fetch_columns
+from app.services.downsample import SERIES_FIELDS, downsample_columns
+
+# Endpoints del plugin "JSON" de Grafana (simpod-json-datasource):
+# los paneles piden cada serie ya reducida a maxDataPoints en vez
+# de traer todas las filas con SQL crudo.
+router = APIRouter()
+
+
+# ─── Schemas ──────────────────────────────────────────
+class TimeRange(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    from_: datetime = Field(alias="from")
+    to: datetime
+
+
+class QueryTarget(BaseModel):
+    target: str = ""              # "{device_eui}:{campo}", acepta $variables de Grafana
+    refId: Optional[str] = None
+    hide: bool = False
+    payload: Optional[dict] = None   # {"alias": "Nivel agua"} → nombre de la serie
+
+
+class GrafanaQuery(BaseModel):
+    range: TimeRange
+    maxDataPoints: Optional[int] = None
+    targets: list[QueryTarget]
+
+
+class SearchBody(BaseModel):
+    target: str = ""
+
+
+def _parse_target(target: str) -> tuple[str, str]:
+    device_eui, _, field = target.partition(":")
+    field = field or "water_level_cm"
+    if not device_eui or field not in SERIES_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Target inválido '{target}': usar EUI:campo ({', '.join(SERIES_FIELDS)})",
+        )
+    return device_eui.upper(), field
+
+
+# ─── Endpoints ────────────────────────────────────────
+@router.get("/")
+async def test_connection():
+    """'Save & test' del datasource."""
+    return {"status": "ok"}
+
+
+async def _targets(db: AsyncSession, prefix: str) -> list[str]:
+    result = await db.execute(
+        select(Device.device_eui).where(Device.is_active).order_by(Device.device_eui)
+    )
+    return [
+        f"{eui}:{field}"
+        for eui in result.scalars().all()
+        for field in SERIES_FIELDS
+        if f"{eui}:{field}".startswith(prefix.upper())
+    ]
+
+
+@router.post("/search")
+async def search(body: SearchBody, db: AsyncSession = Depends(get_read_db)):
+    """Targets disponibles (protocolo SimpleJSON)."""
+    return await _targets(db, body.target)
+
+
+@router.post("/metrics")
+async def metrics(body: SearchBody, db: AsyncSession = Depends(get_read_db)):
+    """Targets disponibles (protocolo del plugin JSON ≥ 0.6)."""
+    return [{"label": t, "value": t} for t in await _targets(db, body.target)]
+
+
+@router.post("/query")
+async def query(body: GrafanaQuery, db: AsyncSession = Depends(get_read_db)):
+    """
+    Una serie por target, reducida con LTTB a maxDataPoints (el
+    ancho del panel). Los targets del mismo device comparten una
+    sola lectura de la ventana.
+    """
+    start, end = body.range.from_, body.range.to
+    max_points = min(body.maxDataPoints or settings.GRAFANA_MAX_POINTS,
+                     settings.GRAFANA_MAX_POINTS)
+    # Rango que llega hasta "ahora": el buffer en memoria puede servirlo
+    live = end >= datetime.now(timezone.utc) - timedelta(seconds=settings.RECENT_BUFFER_INTERVAL_S)
+
+    windows: dict[str, dict[str, list]] = {}
+    series = []
+    for t in body.targets:
+        if t.hide:
+            continue
+        device_eui, field = _parse_target(t.target)
+        if device_eui not in windows:
+            windows[device_eui] = await fetch_columns(
+                db, device_eui, start, settings.DOWNSAMPLE_MAX_ROWS,
+                until=None if live else end,
+            )
+        columns = downsample_columns(windows[device_eui], max_points, field)
+        series.append({
+            "target": (t.payload or {}).get("alias") or f"{device_eui} {field}",
+            "refId": t.refId,
+            "datapoints": [
+                [value, round(ts * 1000)]
+                for ts, value in zip(reversed(columns["time"]), reversed(columns[field]))
+                if value is not None
+            ],
+        })
+    return series
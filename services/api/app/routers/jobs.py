@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+from app.services.recompute_jobs import recompute_manager
+
+router = APIRouter()
+
+
+@router.get("/")
+async def list_jobs(device_eui: Optional[str] = None):
+    """Jobs de recálculo en background (más recientes primero)."""
+    return [
+        job.as_dict()
+        for job in recompute_manager.list_jobs()
+        if device_eui is None or job.device_eui == device_eui
+    ]
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """Estado y progreso de un job de recálculo."""
+    job = recompute_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    return job.as_dict()
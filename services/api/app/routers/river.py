@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
+from typing import Optional
+from app.core.database import get_db, get_read_db
+from app.models.device import Device
+from app.models.river import RiverLink
+from app.services.river_network import river_network
+
+router = APIRouter()
+
+
+# ─── Schemas ──────────────────────────────────────────
+class LinkCreate(BaseModel):
+    upstream_eui: str
+    downstream_eui: str
+    distance_km: float = Field(gt=0)   # por el cauce, no en línea recta
+
+
+class LinkOut(LinkCreate):
+    travel_min: float                  # tiempo de viaje estimado de la crecida
+    speed_kmh: Optional[float]
+    correlation: Optional[float]       # media de las ventanas usadas
+    windows: int                       # ventanas con correlación suficiente
+    source: str                        # correlation | distance
+
+
+class DownstreamEtaOut(BaseModel):
+    device_eui: str
+    eta_min: float
+    hops: int
+
+
+# ─── Endpoints ────────────────────────────────────────
+
+@router.get("/links", response_model=list[LinkOut])
+async def list_links(db: AsyncSession = Depends(get_read_db)):
+    """
+    Tramos del río con el tiempo de viaje estimado por correlación
+    cruzada entre los niveles de ambos puentes (o por distancia si
+    todavía no hay crecidas que correlacionar).
+    """
+    return await river_network.get(db)
+
+
+@router.post("/links", response_model=LinkCreate, status_code=201)
+async def create_link(
+    data: LinkCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Declara que downstream_eui está aguas abajo de upstream_eui."""
+    data.upstream_eui = data.upstream_eui.upper()
+    data.downstream_eui = data.downstream_eui.upper()
+    if data.upstream_eui == data.downstream_eui:
+        raise HTTPException(status_code=422, detail="Un tramo une dos puentes distintos")
+
+    for eui in (data.upstream_eui, data.downstream_eui):
+        if not await db.get(Device, eui):
+            raise HTTPException(status_code=404, detail=f"Dispositivo '{eui}' no encontrado")
+    if await db.get(RiverLink, (data.upstream_eui, data.downstream_eui)):
+        raise HTTPException(status_code=409, detail="El tramo ya existe")
+
+    db.add(RiverLink(**data.model_dump()))
+    await db.commit()
+    river_network.invalidate()
+    return data
+
+
+@router.delete("/links/{upstream_eui}/{downstream_eui}", status_code=204)
+async def delete_link(
+    upstream_eui: str,
+    downstream_eui: str,
+    db: AsyncSession = Depends(get_db)
+):
+    link = await db.get(RiverLink, (upstream_eui.upper(), downstream_eui.upper()))
+    if not link:
+        raise HTTPException(status_code=404, detail="Tramo no encontrado")
+
+    await db.delete(link)
+    await db.commit()
+    river_network.invalidate()
+
+
+@router.get("/downstream/{device_eui}", response_model=list[DownstreamEtaOut])
+async def downstream_eta(
+    device_eui: str,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Puentes aguas abajo y minutos hasta que les llegaría una
+    crecida que hoy pasa por device_eui.
+    """
+    await river_network.get(db)
+    return river_network.downstream_eta(device_eui.upper())
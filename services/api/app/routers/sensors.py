@@ -1,15 +1,44 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+import asyncio
+import csv
+import io
+import uuid
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from datetime import datetime, timezone, timedelta
 from typing import Optional
-from app.core.database import get_db
-from app.models.reading import SensorReading
+from app.core.config import settings
+from app.core.database import ReadSessionLocal, get_read_db
+from app.core.storage_backend import backend
+from app.models.reading import reading_model
 from app.models.device import Device
+from app.models.track import TrackPoint
+from app.services.cold_archive import cold_archive
+from app.services.downsample import SERIES_FIELDS, downsample_columns
+from app.services.geo_index import geo_index
+from app.services.level_forecast import level_forecaster, threshold_levels
+from app.services.reading_codec import (
+    COLUMNS as CODEC_COLUMNS,
+    MEDIA_TYPES,
+    columns_from_rows,
+    compress,
+    encode_columns,
+    negotiate_format,
+    rows_from_columns,
+)
+from app.services.recent_buffer import recent_buffer
+from app.services.response_cache import response_cache
 
 router = APIRouter()
 
+# Tabla o vista según READINGS_STORAGE (legacy | compact)
+Reading = reading_model()
+
+# Filas por lote del cursor de /export
+EXPORT_CHUNK_ROWS = 5000
+
 
 # ─── Schemas de respuesta ─────────────────────────────
 class ReadingOut(BaseModel):
@@ -24,6 +53,9 @@ class ReadingOut(BaseModel):
     snr:          Optional[float] = None
     latitude:     Optional[float] = None   # None si ese uplink no trajo GPS
     longitude:    Optional[float] = None
+    rise_rate_cm_min:    Optional[float] = None   # cm/min, + = subiendo
+    minutes_to_critical: Optional[float] = None   # None si no sube
+    distance_raw_cm:     Optional[float] = None   # cruda, solo si el filtro la rechazó
     alert_level: str
 
     class Config:
@@ -39,14 +71,62 @@ class SensorSummary(BaseModel):
     is_active: bool
 
 
+class SensorLocation(BaseModel):
+    device_eui: str
+    name: str
+    location_name: Optional[str]
+    latitude: float
+    longitude: float
+    distance_m: Optional[float] = None   # solo en /nearby
+    last_reading: Optional[ReadingOut]
+    alert_level: str
+
+
+class TrackPointOut(BaseModel):
+    time: datetime
+    latitude: float
+    longitude: float
+    moved_m: Optional[float]
+
+
+class ForecastPoint(BaseModel):
+    time: datetime
+    minutes: int
+    level_cm: float
+    lower_cm: float
+    upper_cm: float
+
+
+class ForecastCrossing(BaseModel):
+    alert_level: str
+    threshold_cm: float
+    minutes: Optional[float]   # None si la tendencia no llega
+
+
+class ForecastOut(BaseModel):
+    device_eui: str
+    last_reading_at: datetime
+    level_cm: float
+    trend_cm_min: float
+    points: list[ForecastPoint]
+    crossings: list[ForecastCrossing]
+
+
 # ─── Endpoints ────────────────────────────────────────
 
 @router.get("/", response_model=list[SensorSummary])
-async def list_sensors(db: AsyncSession = Depends(get_db)):
+async def list_sensors(request: Request, db: AsyncSession = Depends(get_read_db)):
     """
     Lista todos los dispositivos registrados
-    con su última lectura.
+    con su última lectura. Soporta If-None-Match (304).
     """
+    return await _cached_json(
+        request, "sensors", response_cache.version(),
+        lambda: _build_sensor_list(db),
+    )
+
+
+async def _build_sensor_list(db: AsyncSession) -> bytes:
     result = await db.execute(
         select(Device).where(Device.is_active.is_(True))
     )
@@ -54,99 +134,389 @@ async def list_sensors(db: AsyncSession = Depends(get_db)):
 
     summaries = []
     for device in devices:
-        # Última lectura del dispositivo
-        last_q = await db.execute(
-            select(SensorReading)
-            .where(SensorReading.device_eui == device.device_eui)
-            .order_by(desc(SensorReading.time))
-            .limit(1)
-        )
-        last_reading = last_q.scalar_one_or_none()
+        # Última lectura: primero del buffer en memoria
+        cached = recent_buffer.latest(device.device_eui)
+        if cached:
+            last = ReadingOut(**cached)
+        else:
+            last_q = await db.execute(
+                select(Reading)
+                .where(Reading.device_eui == device.device_eui)
+                .order_by(desc(Reading.time))
+                .limit(1)
+            )
+            last_reading = last_q.scalar_one_or_none()
+            last = _reading_out(last_reading) if last_reading else None
 
         summaries.append(SensorSummary(
             device_eui=device.device_eui,
             name=device.name,
             location_name=device.location_name,
-            last_reading=ReadingOut(
-                id=str(last_reading.id),
-                time=last_reading.time,
-                device_eui=last_reading.device_eui,
-                distance_cm=last_reading.distance_cm,
-                water_level_cm=last_reading.water_level_cm,
-                fill_pct=last_reading.fill_pct,
-                battery_pct=last_reading.battery_pct,
-                rssi=last_reading.rssi,
-                snr=last_reading.snr,
-                latitude=last_reading.latitude,
-                longitude=last_reading.longitude,  
-                alert_level=last_reading.alert_level,
-            ) if last_reading else None,
-            alert_level=last_reading.alert_level if last_reading else "NORMAL",
+            last_reading=last,
+            alert_level=last.alert_level if last else "NORMAL",
             is_active=device.is_active,
         ))
 
-    return summaries
+    return _SENSOR_LIST.dump_json(summaries)
+
+
+@router.get("/nearby", response_model=list[SensorLocation])
+async def sensors_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(default=5000, gt=0, le=200_000, description="metros"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Sensores a menos de `radius` metros del punto, del más
+    cercano al más lejano, con su estado actual.
+    Servido desde el índice espacial en memoria.
+    """
+    return await _current_state(db, geo_index.nearby(lat, lon, radius))
+
+
+@router.get("/bbox", response_model=list[SensorLocation])
+async def sensors_in_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Sensores dentro del rectángulo, con su estado actual."""
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=422, detail="Bounding box inválido (min > max)")
+    return await _current_state(db, geo_index.bbox(min_lat, min_lon, max_lat, max_lon))
+
+
+@router.get("/{device_eui}/track", response_model=list[TrackPointOut])
+async def get_track(
+    device_eui: str,
+    hours: int = Query(default=720, ge=1, le=8760),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Track GPS del sensor: solo movimientos mayores a
+    GEO_MOVE_THRESHOLD_M, del más viejo al más nuevo.
+    """
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    result = await db.execute(
+        select(TrackPoint)
+        .where(TrackPoint.device_eui == device_eui, TrackPoint.time >= since)
+        .order_by(TrackPoint.time)
+    )
+    return [
+        TrackPointOut(time=p.time, latitude=p.latitude,
+                      longitude=p.longitude, moved_m=p.moved_m)
+        for p in result.scalars().all()
+    ]
 
 
 @router.get("/{device_eui}/readings", response_model=list[ReadingOut])
 async def get_readings(
     device_eui: str,
+    request: Request,
     hours: int = Query(default=24, ge=1, le=720),
     limit: int = Query(default=100, ge=1, le=1000),
-    db: AsyncSession = Depends(get_db),
+    format: Optional[str] = Query(
+        default=None, pattern="^(json|columnar|msgpack)$",
+        description="Si no se indica, se negocia con el header Accept",
+    ),
+    points: Optional[int] = Query(
+        default=None, ge=3, le=5000,
+        description="Reducir la ventana completa a N puntos (LTTB); ignora `limit`",
+    ),
+    by: str = Query(
+        default="water_level_cm", pattern=f"^({'|'.join(SERIES_FIELDS)})$",
+        description="Campo que guía la reducción con `points`",
+    ),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Historial de lecturas de un sensor.
     Por defecto últimas 24h, máximo 720h (30 días).
+
+    Formatos: `json` (lista de objetos), `columnar` (un array por
+    campo) o `msgpack` (columnar binario). Con Accept-Encoding
+    br/gzip la respuesta va comprimida.
+
+    Con `points` se lee la ventana entera (hasta DOWNSAMPLE_MAX_ROWS)
+    y se reduce con LTTB sobre `by`: los picos de crecida se
+    conservan, cosa que un promedio por intervalo aplana.
     """
     since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    fmt = negotiate_format(request.headers.get("accept"), format)
 
-    result = await db.execute(
-        select(SensorReading)
-        .where(
-            SensorReading.device_eui == device_eui,
-            SensorReading.time >= since,
+    if points:
+        columns = await fetch_columns(db, device_eui, since, settings.DOWNSAMPLE_MAX_ROWS)
+        if not columns["time"]:
+            _no_readings(device_eui, hours)
+        columns = downsample_columns(columns, points, by)
+        if fmt == "json":
+            body = _READINGS.dump_json(
+                [ReadingOut(**r) for r in rows_from_columns(device_eui, columns)]
+            )
+        else:
+            body = encode_columns(device_eui, columns, fmt)
+    elif fmt == "json":
+        body = _READINGS.dump_json(await _readings_rows(db, device_eui, since, limit, hours))
+    else:
+        # Columnar: directo desde el buffer o las filas de la query
+        columns = await fetch_columns(db, device_eui, since, limit)
+        if not columns["time"]:
+            _no_readings(device_eui, hours)
+        body = encode_columns(device_eui, columns, fmt)
+
+    body, encoding = compress(body, request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+async def _readings_rows(db, device_eui: str, since: datetime, limit: int, hours: int):
+    # Ventana completa en memoria → sin tocar Postgres
+    cached = recent_buffer.window(device_eui, since, limit)
+    if cached is not None:
+        readings = [ReadingOut(**r) for r in cached]
+    else:
+        result = await db.execute(
+            select(Reading)
+            .where(
+                Reading.device_eui == device_eui,
+                Reading.time >= since,
+            )
+            .order_by(desc(Reading.time))
+            .limit(limit)
         )
-        .order_by(desc(SensorReading.time))
+        readings = [_reading_out(r) for r in result.scalars().all()]
+        # Meses viejos: lo que falte sale del archivo Parquet
+        oldest = readings[-1].time if readings else datetime.now(timezone.utc)
+        older = await _archived_columns(device_eui, since, oldest, limit - len(readings))
+        if older:
+            readings += [ReadingOut(**r) for r in rows_from_columns(device_eui, older)]
+
+    if not readings:
+        _no_readings(device_eui, hours)
+    return readings
+
+
+async def fetch_columns(
+    db: AsyncSession,
+    device_eui: str,
+    since: datetime,
+    limit: int,
+    until: Optional[datetime] = None,
+) -> dict[str, list]:
+    """
+    Hasta `limit` lecturas de [since, until) en columnas del codec,
+    más nuevas primero: del buffer si cubre la ventana (solo sin
+    `until`), si no de Postgres completando con el archivo Parquet.
+    """
+    if until is None:
+        columns = recent_buffer.window_columns(device_eui, since, limit)
+        if columns is not None:
+            return columns
+    conditions = [Reading.device_eui == device_eui, Reading.time >= since]
+    if until is not None:
+        conditions.append(Reading.time < until)
+    result = await db.execute(
+        select(*(getattr(Reading, name) for name in CODEC_COLUMNS))
+        .where(*conditions)
+        .order_by(desc(Reading.time))
         .limit(limit)
     )
-    readings = result.scalars().all()
+    columns = columns_from_rows(result.all())
+    oldest = _oldest(columns["time"]) if columns["time"] or until is None else until
+    older = await _archived_columns(device_eui, since, oldest, limit - len(columns["time"]))
+    if older:
+        for name in CODEC_COLUMNS:
+            columns[name].extend(older[name])
+    return columns
 
-    if not readings:
-        raise HTTPException(
-            status_code=404,
-            detail=f"No hay lecturas para el dispositivo '{device_eui}' en las últimas {hours}h"
+
+def _oldest(times: list[float]) -> datetime:
+    if not times:
+        return datetime.now(timezone.utc)
+    return datetime.fromtimestamp(times[-1], timezone.utc)
+
+
+async def _archived_columns(device_eui: str, since: datetime, before: datetime, limit: int):
+    """Lecturas archivadas de [since, before), más nuevas primero; None si no hay."""
+    if limit <= 0 or not cold_archive.covers(device_eui, since):
+        return None
+    return await asyncio.to_thread(
+        cold_archive.read_columns, device_eui, since, before, limit, CODEC_COLUMNS
+    )
+
+
+def _no_readings(device_eui: str, hours: int):
+    raise HTTPException(
+        status_code=404,
+        detail=f"No hay lecturas para el dispositivo '{device_eui}' en las últimas {hours}h"
+    )
+
+
+@router.get("/{device_eui}/export")
+async def export_readings(
+    device_eui: str,
+    start: datetime,
+    end: Optional[datetime] = None,
+):
+    """
+    Exporta en CSV las lecturas de [start, end) en orden de tiempo.
+    Une el archivo Parquet (meses viejos) con Postgres y se genera
+    en streaming, sin armar el rango completo en memoria.
+    """
+    start = _as_utc(start)
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    if end <= start:
+        raise HTTPException(status_code=422, detail="end debe ser posterior a start")
+
+    filename = f"{device_eui}_{start:%Y%m%d}_{end:%Y%m%d}.csv"
+    return StreamingResponse(
+        _export_csv(device_eui, start, end),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _as_utc(t: datetime) -> datetime:
+    return t if t.tzinfo else t.replace(tzinfo=timezone.utc)
+
+
+def _csv_chunk(rows) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in row])
+    return out.getvalue()
+
+
+async def _export_csv(device_eui: str, start: datetime, end: datetime):
+    yield _csv_chunk([CODEC_COLUMNS])
+
+    # 1) Archivo frío: un row group por vez, fuera del event loop
+    groups = cold_archive.iter_row_groups(device_eui, start, end, columns=list(CODEC_COLUMNS))
+    hot_from = start
+    while (table := await asyncio.to_thread(next, groups, None)) is not None:
+        columns = table.to_pydict()
+        hot_from = columns["time"][-1] + timedelta(microseconds=1)
+        columns["id"] = [uuid.UUID(bytes=b) for b in columns["id"]]
+        columns["time"] = [t.isoformat() for t in columns["time"]]
+        yield _csv_chunk(zip(*(columns[name] for name in CODEC_COLUMNS)))
+
+    # 2) Postgres: cursor del lado del servidor, en lotes
+    async with ReadSessionLocal() as db:
+        result = await db.stream(
+            select(*(getattr(Reading, name) for name in CODEC_COLUMNS))
+            .where(
+                Reading.device_eui == device_eui,
+                Reading.time >= hot_from,
+                Reading.time < end,
+            )
+            .order_by(Reading.time)
+            .execution_options(yield_per=EXPORT_CHUNK_ROWS)
         )
+        async for rows in result.partitions():
+            yield _csv_chunk(
+                (r[0], r[1].isoformat(), *r[2:]) for r in rows
+            )
 
-    return [
-        ReadingOut(
-            id=str(r.id),
-            time=r.time,
-            device_eui=r.device_eui,
-            distance_cm=r.distance_cm,
-            water_level_cm=r.water_level_cm,
-            fill_pct=r.fill_pct,
-            battery_pct=r.battery_pct,
-            rssi=r.rssi,
-            snr=r.snr,
-            latitude=r.latitude,
-            longitude=r.longitude,
-            alert_level=r.alert_level,
+
+@router.get("/{device_eui}/forecast", response_model=ForecastOut)
+async def get_forecast(
+    device_eui: str,
+    horizon_min: int = Query(default=60, ge=5, le=180),
+    step_min: int = Query(default=5, ge=1, le=60),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Pronóstico del nivel de agua (Holt lineal) cada `step_min`
+    hasta `horizon_min`, con intervalo de ~90%, y los minutos
+    proyectados hasta WARNING y CRITICAL.
+
+    El modelo se actualiza con cada uplink en el ingest; si este
+    proceso no lo ve (INGEST_MODE=external) o aún no lo armó, se
+    pone al día con las últimas FORECAST_WARM_HOURS de historial.
+    """
+    device = (await db.execute(
+        select(Device).where(Device.device_eui == device_eui)
+    )).scalar_one_or_none()
+    if not device:
+        raise HTTPException(status_code=404, detail=f"Dispositivo '{device_eui}' no encontrado")
+
+    now = datetime.now(timezone.utc)
+    last_t = level_forecaster.last_time(device_eui)
+    if settings.INGEST_MODE == "external" or not level_forecaster.ready(device_eui):
+        since = now - timedelta(hours=settings.FORECAST_WARM_HOURS)
+        if last_t is not None:
+            since = max(since, datetime.fromtimestamp(last_t, timezone.utc))
+        columns = await fetch_columns(db, device_eui, since, settings.DOWNSAMPLE_MAX_ROWS)
+        level_forecaster.feed(device_eui, reversed(columns["time"]),
+                              reversed(columns["water_level_cm"]))
+
+    state = level_forecaster.state(device_eui)
+    if state is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Datos insuficientes para pronosticar '{device_eui}'",
         )
-        for r in readings
-    ]
+    now_s = now.timestamp()
+    points = []
+    for minutes in range(step_min, horizon_min + 1, step_min):
+        at = now_s + minutes * 60
+        level, lower, upper = level_forecaster.predict(device_eui, at)
+        points.append(ForecastPoint(
+            time=datetime.fromtimestamp(at, timezone.utc), minutes=minutes,
+            level_cm=round(level, 1), lower_cm=round(lower, 1), upper_cm=round(upper, 1),
+        ))
+    crossings = []
+    for name, cm in threshold_levels(device).items():
+        minutes = level_forecaster.minutes_to(device_eui, cm, now_s)
+        crossings.append(ForecastCrossing(
+            alert_level=name, threshold_cm=round(cm, 1),
+            minutes=None if minutes is None else round(minutes, 1),
+        ))
+    return ForecastOut(
+        device_eui=device_eui,
+        last_reading_at=datetime.fromtimestamp(state["last_t"], timezone.utc),
+        level_cm=round(state["level"], 1),
+        trend_cm_min=round(state["trend"] * 60, 3),
+        points=points,
+        crossings=crossings,
+    )
 
 
 @router.get("/{device_eui}/latest", response_model=ReadingOut)
 async def get_latest(
     device_eui: str,
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """Última lectura de un sensor específico."""
+    """
+    Última lectura de un sensor específico. Soporta If-None-Match (304).
+
+    Sale del buffer en memoria si este proceso hace el ingest; si no
+    (INGEST_MODE=external), de la DB: con storage_tolerance_cm es la
+    última fila guardada, no necesariamente el último uplink (ver
+    storage_compression).
+    """
+    return await _cached_json(
+        request, f"latest:{device_eui}", response_cache.version(device_eui),
+        lambda: _build_latest(db, device_eui),
+    )
+
+
+async def _build_latest(db: AsyncSession, device_eui: str) -> bytes:
+    cached = recent_buffer.latest(device_eui)
+    if cached:
+        return _READING.dump_json(ReadingOut(**cached))
+
     result = await db.execute(
-        select(SensorReading)
-        .where(SensorReading.device_eui == device_eui)
-        .order_by(desc(SensorReading.time))
+        select(Reading)
+        .where(Reading.device_eui == device_eui)
+        .order_by(desc(Reading.time))
         .limit(1)
     )
     reading = result.scalar_one_or_none()
@@ -157,17 +527,88 @@ async def get_latest(
             detail=f"Dispositivo '{device_eui}' no encontrado o sin lecturas"
         )
 
+    return _READING.dump_json(_reading_out(reading))
+
+
+# ─── Respuestas cacheadas con ETag ────────────────────
+_SENSOR_LIST = TypeAdapter(list[SensorSummary])
+_READING = TypeAdapter(ReadingOut)
+_READINGS = TypeAdapter(list[ReadingOut])
+
+
+async def _cached_json(request: Request, key: str, version: int, build) -> Response:
+    """
+    Sirve `key` desde el cache si sigue vigente para `version`;
+    si no, lo genera con `build()` (corutina → bytes JSON).
+    Un If-None-Match que coincide se contesta 304 sin cuerpo.
+    """
+    entry = response_cache.get(key, version)
+    if entry is None:
+        entry = response_cache.put(key, version, await build())
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if response_cache.matches(entry, request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+async def _current_state(db: AsyncSession, hits: list[dict]) -> list[SensorLocation]:
+    """
+    Completa los resultados del índice espacial con datos del
+    device y su última lectura: buffer en memoria primero y una
+    sola query DISTINCT ON para los que no estén.
+    """
+    if not hits:
+        return []
+    euis = [h["device_eui"] for h in hits]
+    result = await db.execute(
+        select(Device).where(Device.device_eui.in_(euis), Device.is_active.is_(True))
+    )
+    devices = {d.device_eui: d for d in result.scalars().all()}
+
+    latest = {eui: recent_buffer.latest(eui) for eui in devices}
+    missing = [eui for eui, row in latest.items() if row is None]
+    if missing:
+        result = await db.execute(backend.latest_per(
+            select(Reading).where(Reading.device_eui.in_(missing)),
+            Reading.device_eui, Reading.time,
+        ))
+        for r in result.scalars().all():
+            latest[r.device_eui] = _reading_out(r)
+
+    states = []
+    for hit in hits:
+        device = devices.get(hit["device_eui"])
+        if device is None:
+            continue
+        last = latest.get(device.device_eui)
+        if isinstance(last, dict):
+            last = ReadingOut(**last)
+        states.append(SensorLocation(
+            **hit,
+            name=device.name,
+            location_name=device.location_name,
+            last_reading=last,
+            alert_level=last.alert_level if last else "NORMAL",
+        ))
+    return states
+
+
+def _reading_out(r) -> ReadingOut:
+    """Convierte una fila ORM (tabla o vista) a ReadingOut."""
     return ReadingOut(
-        id=str(reading.id),
-        time=reading.time,
-        device_eui=reading.device_eui,
-        distance_cm=reading.distance_cm,
-        water_level_cm=reading.water_level_cm,
-        fill_pct=reading.fill_pct,
-        battery_pct=reading.battery_pct,
-        rssi=reading.rssi,
-        snr=reading.snr,
-        latitude=reading.latitude,
-        longitude=reading.longitude,
-        alert_level=reading.alert_level,
+        id=str(r.id),
+        time=r.time,
+        device_eui=r.device_eui,
+        distance_cm=r.distance_cm,
+        water_level_cm=r.water_level_cm,
+        fill_pct=r.fill_pct,
+        battery_pct=r.battery_pct,
+        rssi=r.rssi,
+        snr=r.snr,
+        latitude=r.latitude,
+        longitude=r.longitude,
+        rise_rate_cm_min=r.rise_rate_cm_min,
+        minutes_to_critical=r.minutes_to_critical,
+        distance_raw_cm=r.distance_raw_cm,
+        alert_level=r.alert_level,
     )
@@ -1,4 +1,13 @@
-from fastapi import APIRouter
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.services.edge_sync import decode_batch, store_batch
+from app.services.recent_buffer import recent_buffer
+from app.services.response_cache import response_cache
 
 router = APIRouter()
 
@@ -11,3 +20,29 @@ async def chirpstack_webhook():
     — próximamente.
     """
     return {"message": "Webhook endpoint - coming soon"}
+
+
+def require_edge(x_edge_token: str | None = Header(None)):
+    """Sin EDGE_SYNC_TOKEN la central no recibe lotes de gateways (404)."""
+    if not settings.EDGE_SYNC_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest((x_edge_token or "").encode(), settings.EDGE_SYNC_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Token de gateway inválido")
+
+
+@router.post("/edge/readings", dependencies=[Depends(require_edge)])
+async def edge_readings(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Lote de lecturas de un gateway edge (ver edge_sync): MessagePack
+    en columnas, gzip. Idempotente: un lote reenviado no duplica.
+    """
+    try:
+        batch = decode_batch(await request.body(), request.headers.get("content-encoding"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await store_batch(db, batch)
+    await db.commit()
+    for eui in result["devices"]:
+        recent_buffer.invalidate(eui)
+        response_cache.bump(eui)
+    return result
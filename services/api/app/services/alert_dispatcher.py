@@ -0,0 +1,372 @@
+"""
+Fan-out de alertas: ruteo por grupo, límites de Telegram y resumen.
+
+En una tormenta regional decenas de puentes cruzan umbrales en pocos
+minutos y cada uplink en alerta era un mensaje al único chat: Telegram
+empieza a responder 429 (≈20 mensajes/min por grupo, 30/s por bot) y
+los responders reciben una catarata. Acá las alertas no se envían en
+el momento, se encolan:
+
+  · Ruteo: devices.alert_group elige los chats según ALERT_ROUTES
+    ("norte=-1001,-1002;sur=-1003"). Los chats de "*" reciben todo;
+    un device sin grupo, o con un grupo sin ruta, va a TELEGRAM_CHAT_ID.
+  · Cola por chat: las alertas pendientes se juntan ALERT_DIGEST_S
+    desde la primera y salen en UN mensaje (la alerta completa si es
+    una sola; si son varias, un resumen con una línea por alerta).
+    Una alerta nueva del mismo device y clase reemplaza a la pendiente.
+  · CRITICAL primero: dentro del resumen y entre chats que compiten
+    por el balde global.
+  · Token buckets: uno por chat (TELEGRAM_CHAT_PER_MIN, ráfaga
+    TELEGRAM_CHAT_BURST) y uno global del bot (TELEGRAM_GLOBAL_PER_S).
+    Sin token el chat sigue juntando: el próximo resumen trae más.
+  · 429: se respeta parameters.retry_after; el chat queda en pausa y
+    sus alertas vuelven a la cola. Errores de red o 5xx reintentan
+    tras RETRY_S; otros 4xx (chat inexistente, bot expulsado) descartan.
+
+Un resumen se corta antes de los 4096 caracteres de Telegram: lo que
+no entra queda para el próximo mensaje del chat. Con el ingest en
+varios procesos cada worker tiene sus baldes (ver share). Al apagar
+la cola se vacía durante hasta STOP_FLUSH_S; lo que quede se descarta
+con telegram.dropped_on_stop.
+"""
+import asyncio
+import time
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Orden de envío: menor = antes
+PRIORITY = {
+    "CRITICAL": 0, "RISING_FAST": 1, "DOWNSTREAM_ETA": 2, "FORECAST": 3,
+    "WARNING": 4, "OFFLINE": 5, "WATCH": 6, "BACK_ONLINE": 7,
+}
+# Niveles de llenado: uno nuevo reemplaza al pendiente del mismo device
+FILL_LEVELS = {"WATCH", "WARNING", "CRITICAL"}
+MAX_MESSAGE = 4096
+RETRY_S = 5.0
+# Al apagar: tiempo máximo para vaciar la cola respetando los baldes
+STOP_FLUSH_S = 5.0
+
+
+def parse_routes(spec: str) -> dict[str, list[str]]:
+    """ "norte=-1001,-1002;sur=-1003" → {"norte": ["-1001", "-1002"], "sur": ["-1003"]} """
+    routes = {}
+    for part in spec.split(";"):
+        group, _, chats = part.partition("=")
+        chats = [c.strip() for c in chats.split(",") if c.strip()]
+        if group.strip() and chats:
+            routes[group.strip()] = chats
+    return routes
+
+
+# ─── Token bucket ─────────────────────────────────────
+class TokenBucket:
+    """Balde de un destino; rate 0 = sin límite."""
+
+    def __init__(self, rate_per_s: float, burst: int, clock=time.monotonic):
+        self.rate = rate_per_s
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.last = clock()
+
+    def wait(self) -> float:
+        """Segundos hasta tener un token (0 = ya hay)."""
+        if self.rate <= 0:
+            return 0.0
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        if self.rate > 0:
+            self.tokens -= 1
+
+
+# ─── Dispatcher ───────────────────────────────────────
+class AlertDispatcher:
+    """Colas por chat con resumen y envío dentro de los límites del bot."""
+
+    def __init__(
+        self,
+        token: str,
+        chat_id: str,
+        routes: dict[str, list[str]],
+        digest_s: float,
+        chat_per_min: float,
+        chat_burst: int,
+        global_per_s: float,
+        api_url: str = "https://api.telegram.org",
+        clock=time.monotonic,
+    ):
+        self.token = token
+        self.default_chats = [chat_id] if chat_id else []
+        self.routes = routes
+        self.digest_s = digest_s
+        self.chat_rate = chat_per_min / 60
+        self.chat_burst = chat_burst
+        self.api_url = api_url.rstrip("/")
+        self.clock = clock
+        self._global = TokenBucket(global_per_s, max(1, int(global_per_s)), clock)
+        self._buckets: dict[str, TokenBucket] = {}
+        # chat → {(device_eui, clase): (prioridad, seq, resumen, texto)}
+        self._pending: dict[str, dict[tuple, tuple]] = {}
+        self._since: dict[str, float] = {}      # primera alerta pendiente
+        self._paused: dict[str, float] = {}     # retry_after de un 429
+        self._seq = 0
+        self._wake: asyncio.Event | None = None
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+        self._client = None
+        self.submitted = 0
+        self.collapsed = 0
+        self.messages = 0
+        self.digests = 0
+        self.delivered = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def share(self, workers: int):
+        """Reparte los límites del bot entre `workers` procesos de ingest."""
+        self.chat_rate /= workers
+        self._global.rate /= workers
+
+    def chats_for(self, group: str | None) -> list[str]:
+        chats = list(self.routes.get(group or "") or self.default_chats)
+        for chat in self.routes.get("*", ()):
+            if chat not in chats:
+                chats.append(chat)
+        return chats
+
+    # ─── Ingest ───────────────────────────────────────
+    def submit(self, group: str | None, device_eui: str, level: str,
+               text: str, summary: str) -> int:
+        """
+        Encola una alerta (texto completo + línea para el resumen)
+        en los chats del grupo. Retorna a cuántos chats va.
+        """
+        if not self.token:
+            logger.warning("telegram.not_configured")
+            return 0
+        chats = self.chats_for(group)
+        if not chats:
+            logger.warning("telegram.no_route", group=group, device=device_eui)
+            return 0
+
+        key = (device_eui, "LEVEL" if level in FILL_LEVELS else level)
+        self._seq += 1
+        item = (PRIORITY.get(level, len(PRIORITY)), self._seq, summary, text)
+        now = self.clock()
+        for chat in chats:
+            pending = self._pending.setdefault(chat, {})
+            if key in pending:
+                self.collapsed += 1
+            pending[key] = item
+            self._since.setdefault(chat, now)
+        self.submitted += 1
+        if self._wake is not None:
+            self._wake.set()
+        return len(chats)
+
+    # ─── Envío ────────────────────────────────────────
+    async def flush(self, force: bool = False) -> float | None:
+        """
+        Envía un mensaje a cada chat listo (ventana vencida, sin pausa
+        y con tokens). Retorna segundos hasta el próximo chequeo, o
+        None si no queda nada. force ignora la ventana (apagado).
+        """
+        now = self.clock()
+        next_in = None
+        batch = []
+        # Chats con un CRITICAL pendiente primero, después los más viejos
+        order = sorted(self._pending, key=lambda c: (min(self._pending[c].values())[0], self._since[c]))
+        for chat in order:
+            opens = now if force else self._since[chat] + self.digest_s
+            wait = max(opens, self._paused.get(chat, 0.0)) - now
+            if wait <= 0:
+                bucket = self._buckets.get(chat)
+                if bucket is None:
+                    bucket = self._buckets[chat] = TokenBucket(self.chat_rate, self.chat_burst, self.clock)
+                wait = max(bucket.wait(), self._global.wait())
+                if wait <= 0:
+                    bucket.take()
+                    self._global.take()
+                    batch.append((chat, self._since[chat], *self._compose(chat)))
+                    continue
+            next_in = wait if next_in is None else min(next_in, wait)
+
+        if not batch:
+            return next_in
+        try:
+            results = await asyncio.gather(*(self._post(chat, text) for chat, _, _, text in batch))
+        except asyncio.CancelledError:
+            # Ya salieron de _pending: vuelven a la cola (a lo sumo se repiten)
+            for chat, since, items, _ in batch:
+                self._requeue(chat, since, items)
+            raise
+        now = self.clock()
+        for (chat, since, items, _), (outcome, retry_s) in zip(batch, results):
+            if outcome == "sent":
+                self._paused.pop(chat, None)
+                self.messages += 1
+                self.digests += len(items) > 1
+                self.delivered += len(items)
+                logger.info("telegram.sent", chat=chat, alerts=len(items))
+            elif outcome == "dropped":
+                self.dropped += len(items)
+            else:
+                if outcome == "limited":
+                    self.rate_limited += 1
+                    logger.warning("telegram.rate_limited", chat=chat, retry_after=retry_s)
+                else:
+                    self.failed += 1
+                self._paused[chat] = now + retry_s
+                self._requeue(chat, since, items)
+        return 0.0
+
+    def _compose(self, chat: str) -> tuple[dict, str]:
+        """Saca de la cola las alertas del próximo mensaje del chat."""
+        pending = self._pending.pop(chat)
+        since = self._since.pop(chat)
+        items = sorted(pending.items(), key=lambda kv: kv[1][:2])
+        if len(items) == 1:
+            return dict(items), items[0][1][3]
+
+        lines, size = [], 200   # margen para encabezado y pie
+        for _, (_, _, summary, _) in items:
+            if size + len(summary) + 1 > MAX_MESSAGE:
+                break
+            lines.append(summary)
+            size += len(summary) + 1
+        rest = items[len(lines):]
+        text = (
+            f"📣 *RESUMEN: {len(lines)} ALERTAS*\n"
+            f"━━━━━━━━━━━━━━━━━━\n"
+            + "\n".join(lines)
+        )
+        if rest:
+            self._pending[chat] = dict(rest)
+            self._since[chat] = since
+            text += f"\n━━━━━━━━━━━━━━━━━━\n➕ {len(rest)} más en el próximo mensaje"
+        return dict(items[:len(lines)]), text
+
+    def _requeue(self, chat: str, since: float, items: dict):
+        """Devuelve alertas no enviadas; las más nuevas del mismo device ganan."""
+        pending = self._pending.setdefault(chat, {})
+        for key, item in items.items():
+            pending.setdefault(key, item)
+        self._since[chat] = min(self._since.get(chat, since), since)
+
+    async def _post(self, chat: str, text: str) -> tuple[str, float]:
+        """(sent | limited | failed | dropped, segundos de espera)."""
+        import httpx   # diferido: no hace falta para arrancar el ingest
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10.0)
+        try:
+            response = await self._client.post(
+                f"{self.api_url}/bot{self.token}/sendMessage",
+                json={"chat_id": chat, "text": text, "parse_mode": "Markdown"},
+            )
+        except httpx.HTTPError as e:
+            logger.error("telegram.send_failed", chat=chat, error=str(e))
+            return "failed", RETRY_S
+
+        if response.status_code == 429:
+            return "limited", _retry_after(response)
+        if response.is_error:
+            logger.error("telegram.send_failed", chat=chat,
+                         status=response.status_code, error=response.text[:200])
+            return ("failed", RETRY_S) if response.status_code >= 500 else ("dropped", 0.0)
+        return "sent", 0.0
+
+    # ─── Ciclo de vida ────────────────────────────────
+    def start(self):
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Sin cancelar: el envío en curso termina (o vence el timeout
+        # de httpx) y el ciclo sale en el próximo chequeo
+        if self._task:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        # Lo pendiente sale sin esperar la ventana, al ritmo de los
+        # baldes, hasta vaciar la cola o agotar STOP_FLUSH_S
+        deadline = time.monotonic() + STOP_FLUSH_S
+        while self._pending:
+            delay = await self.flush(force=True)
+            if delay is None or time.monotonic() + delay >= deadline:
+                break
+            await asyncio.sleep(delay)
+        if self._pending:
+            left = sum(len(p) for p in self._pending.values())
+            logger.warning("telegram.dropped_on_stop", alerts=left, chats=len(self._pending))
+            self.dropped += left
+            self._pending.clear()
+            self._since.clear()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self):
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                delay = await self.flush()
+            except Exception as e:
+                logger.error("telegram.flush_failed", error=str(e))
+                delay = RETRY_S
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        now = self.clock()
+        return {
+            "chats": len(self._buckets),
+            "pending": sum(len(p) for p in self._pending.values()),
+            "paused": sum(1 for until in self._paused.values() if until > now),
+            "submitted": self.submitted,
+            "collapsed": self.collapsed,
+            "messages": self.messages,
+            "digests": self.digests,
+            "delivered": self.delivered,
+            "rate_limited": self.rate_limited,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+def _retry_after(response) -> float:
+    """parameters.retry_after del cuerpo de Telegram, o el header Retry-After."""
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return RETRY_S
+
+
+# ─── Instancia global ─────────────────────────────────
+alert_dispatcher = AlertDispatcher(
+    token=settings.TELEGRAM_BOT_TOKEN,
+    chat_id=settings.TELEGRAM_CHAT_ID,
+    routes=parse_routes(settings.ALERT_ROUTES),
+    digest_s=settings.ALERT_DIGEST_S,
+    chat_per_min=settings.TELEGRAM_CHAT_PER_MIN,
+    chat_burst=settings.TELEGRAM_CHAT_BURST,
+    global_per_s=settings.TELEGRAM_GLOBAL_PER_S,
+    api_url=settings.TELEGRAM_API_URL,
+)
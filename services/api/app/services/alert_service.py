@@ -2,11 +2,15 @@
 Servicio de alertas para AquaAlert.
 Evalúa el nivel de llenado y envía notificaciones
 por Telegram cuando se superan los umbrales configurados.
+El envío (ruteo, resumen y límites) está en alert_dispatcher.
 """
-import httpx
+from datetime import datetime
+
 import structlog
 from app.core.config import settings
 from app.models.device import Device
+from app.services.alert_dispatcher import alert_dispatcher
+from app.services.rise_rate import minutes_to_level
 
 logger = structlog.get_logger()
 
@@ -16,6 +20,15 @@ ALERT_LEVELS = {
     "WATCH":    {"emoji": "🟡", "msg": "Nivel en observación"},
     "WARNING":  {"emoji": "🟠", "msg": "Nivel de advertencia"},
     "CRITICAL": {"emoji": "🔴", "msg": "NIVEL CRÍTICO"},
+    # Clase aparte: depende de la velocidad, no del nivel
+    "RISING_FAST": {"emoji": "⏫", "msg": "Subida rápida del nivel"},
+    # Estado de conectividad del nodo
+    "OFFLINE":     {"emoji": "📴", "msg": "Sensor sin reportar"},
+    "BACK_ONLINE": {"emoji": "📶", "msg": "Sensor reportando de nuevo"},
+    # El pronóstico de nivel cruza un umbral (level_forecast)
+    "FORECAST":    {"emoji": "🔮", "msg": "Crecida pronosticada"},
+    # Crecida detectada en un puente aguas arriba
+    "DOWNSTREAM_ETA": {"emoji": "🌊", "msg": "Crecida aguas arriba"},
 }
 
 
@@ -33,6 +46,48 @@ def evaluate_alert_level(fill_pct: float, device: Device) -> str:
     return "NORMAL"
 
 
+def evaluate_rise(
+    device: Device,
+    water_level_cm: float,
+    rise_rate_cm_min: float | None,
+    was_rising: bool,
+) -> tuple[float | None, bool]:
+    """
+    Evalúa la tendencia del nivel.
+
+    Returns:
+        (minutos proyectados hasta CRITICAL, True si es RISING_FAST)
+        RISING_FAST si la subida supera threshold_rise_cm_min o si
+        se proyecta CRITICAL antes de RISE_ALERT_TTC_MIN minutos.
+        Con histéresis: una vez activo se mantiene hasta bajar
+        a la mitad del umbral.
+    """
+    critical_cm = device.bridge_height_cm * device.threshold_critical_pct / 100
+    minutes_to_critical = minutes_to_level(water_level_cm, critical_cm, rise_rate_cm_min)
+    if rise_rate_cm_min is None:
+        return minutes_to_critical, False
+
+    threshold = 1.0 if device.threshold_rise_cm_min is None else device.threshold_rise_cm_min
+    if was_rising:
+        threshold /= 2
+
+    rising_fast = rise_rate_cm_min >= threshold or (
+        minutes_to_critical is not None
+        and 0 < minutes_to_critical <= settings.RISE_ALERT_TTC_MIN
+    )
+    return minutes_to_critical, rising_fast
+
+
+def _enqueue(device: Device, level: str, message: str, summary: str) -> bool:
+    """
+    Encola la alerta para los chats del grupo del device: el
+    dispatcher la junta con otras y respeta los límites de Telegram.
+    """
+    return alert_dispatcher.submit(
+        device.alert_group, device.device_eui, level, message, summary
+    ) > 0
+
+
 async def send_telegram_alert(
     device: Device,
     water_level_cm: float,
@@ -45,15 +100,11 @@ async def send_telegram_alert(
     es WATCH, WARNING o CRITICAL.
 
     Returns:
-        True si el mensaje fue enviado exitosamente.
+        True si la alerta quedó en cola para al menos un chat.
     """
     if alert_level == "NORMAL":
         return False
 
-    if not settings.TELEGRAM_BOT_TOKEN or not settings.TELEGRAM_CHAT_ID:
-        logger.warning("telegram.not_configured")
-        return False
-
     info = ALERT_LEVELS[alert_level]
 
     message = (
@@ -67,24 +118,183 @@ async def send_telegram_alert(
         f"━━━━━━━━━━━━━━━━━━\n"
         f"🆔 `{device.device_eui}`"
     )
+    summary = (
+        f"{info['emoji']} *{alert_level}* · {device.name} · "
+        f"{water_level_cm:.1f} cm ({fill_pct:.0f}%)"
+    )
 
-    url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
-
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(url, json={
-                "chat_id": settings.TELEGRAM_CHAT_ID,
-                "text": message,
-                "parse_mode": "Markdown",
-            })
-            response.raise_for_status()
-            logger.info(
-                "telegram.sent",
-                device=device.device_eui,
-                level=alert_level,
-            )
-            return True
-
-    except httpx.HTTPError as e:
-        logger.error("telegram.send_failed", error=str(e))
-        return False
+    sent = _enqueue(device, alert_level, message, summary)
+    if sent:
+        logger.info(
+            "alert.queued",
+            device=device.device_eui,
+            level=alert_level,
+        )
+    return sent
+
+
+async def send_rise_alert(
+    device: Device,
+    water_level_cm: float,
+    rise_rate_cm_min: float,
+    minutes_to_critical: float | None,
+) -> bool:
+    """
+    Envía la alerta RISING_FAST (una vez por episodio de subida).
+
+    Returns:
+        True si la alerta quedó en cola para al menos un chat.
+    """
+    info = ALERT_LEVELS["RISING_FAST"]
+    eta = (
+        f"{minutes_to_critical:.0f} min"
+        if minutes_to_critical is not None else "sin proyección"
+    )
+
+    message = (
+        f"{info['emoji']} *{info['msg'].upper()}* {info['emoji']}\n\n"
+        f"📍 *Sensor:* {device.name}\n"
+        f"📌 *Ubicación:* {device.location_name or 'Sin ubicación'}\n"
+        f"━━━━━━━━━━━━━━━━━━\n"
+        f"💧 *Nivel de agua:* {water_level_cm:.1f} cm\n"
+        f"📈 *Subida:* {rise_rate_cm_min:.2f} cm/min\n"
+        f"⏱️ *Crítico en:* {eta}\n"
+        f"━━━━━━━━━━━━━━━━━━\n"
+        f"🆔 `{device.device_eui}`"
+    )
+    summary = (
+        f"{info['emoji']} *RISING_FAST* · {device.name} · "
+        f"{rise_rate_cm_min:.2f} cm/min, crítico en {eta}"
+    )
+
+    sent = _enqueue(device, "RISING_FAST", message, summary)
+    if sent:
+        logger.info(
+            "alert.queued",
+            device=device.device_eui,
+            level="RISING_FAST",
+            rise_rate_cm_min=round(rise_rate_cm_min, 2),
+        )
+    return sent
+
+
+async def send_forecast_alert(
+    device: Device,
+    water_level_cm: float,
+    forecast_level: str,
+    minutes: float,
+    upper_cm: float | None,
+) -> bool:
+    """
+    Envía la alerta FORECAST: el pronóstico de nivel cruza el
+    umbral de forecast_level en ~minutes (una vez por episodio).
+
+    Returns:
+        True si la alerta quedó en cola para al menos un chat.
+    """
+    info = ALERT_LEVELS["FORECAST"]
+    target_info = ALERT_LEVELS[forecast_level]
+    upper = f" (hasta {upper_cm:.0f} cm)" if upper_cm is not None else ""
+
+    message = (
+        f"{info['emoji']} *{info['msg'].upper()}* {info['emoji']}\n\n"
+        f"📍 *Sensor:* {device.name}\n"
+        f"📌 *Ubicación:* {device.location_name or 'Sin ubicación'}\n"
+        f"━━━━━━━━━━━━━━━━━━\n"
+        f"💧 *Nivel de agua:* {water_level_cm:.1f} cm\n"
+        f"{target_info['emoji']} *{forecast_level} en:* ~{minutes:.0f} min{upper}\n"
+        f"━━━━━━━━━━━━━━━━━━\n"
+        f"🆔 `{device.device_eui}`"
+    )
+    summary = (
+        f"{info['emoji']} *FORECAST* · {device.name} · "
+        f"{forecast_level} en ~{minutes:.0f} min"
+    )
+
+    sent = _enqueue(device, "FORECAST", message, summary)
+    if sent:
+        logger.info(
+            "alert.queued",
+            device=device.device_eui,
+            level="FORECAST",
+            forecast_level=forecast_level,
+            minutes=round(minutes),
+        )
+    return sent
+
+
+async def send_status_alert(
+    device: Device,
+    status: str,
+    last_seen: datetime | None,
+) -> bool:
+    """
+    Envía OFFLINE / BACK_ONLINE. Un puente que deja de reportar
+    en plena creciente puede significar que el agua se lo llevó.
+
+    Returns:
+        True si la alerta quedó en cola para al menos un chat.
+    """
+    info = ALERT_LEVELS[status]
+    seen = last_seen.strftime("%Y-%m-%d %H:%M UTC") if last_seen else "nunca"
+
+    message = (
+        f"{info['emoji']} *{info['msg'].upper()}* {info['emoji']}\n\n"
+        f"📍 *Sensor:* {device.name}\n"
+        f"📌 *Ubicación:* {device.location_name or 'Sin ubicación'}\n"
+        f"━━━━━━━━━━━━━━━━━━\n"
+        f"🕒 *Último uplink:* {seen}\n"
+        f"━━━━━━━━━━━━━━━━━━\n"
+        f"🆔 `{device.device_eui}`"
+    )
+    summary = f"{info['emoji']} *{status}* · {device.name} · último uplink {seen}"
+
+    sent = _enqueue(device, status, message, summary)
+    if sent:
+        logger.info("alert.queued", device=device.device_eui, level=status)
+    return sent
+
+
+async def send_downstream_alert(
+    device: Device,
+    upstream: Device,
+    upstream_level: str,
+    eta_min: float,
+    hops: int,
+) -> bool:
+    """
+    Avisa a un puente que la crecida detectada aguas arriba
+    le llegaría en ~eta_min minutos (ver river_network).
+
+    Returns:
+        True si la alerta quedó en cola para al menos un chat.
+    """
+    info = ALERT_LEVELS["DOWNSTREAM_ETA"]
+    upstream_info = ALERT_LEVELS[upstream_level]
+
+    message = (
+        f"{info['emoji']} *{info['msg'].upper()}* {info['emoji']}\n\n"
+        f"📍 *Sensor:* {device.name}\n"
+        f"📌 *Ubicación:* {device.location_name or 'Sin ubicación'}\n"
+        f"━━━━━━━━━━━━━━━━━━\n"
+        f"⬆️ *Aguas arriba:* {upstream.name} ({hops} tramo{'s' if hops > 1 else ''})\n"
+        f"{upstream_info['emoji']} *Nivel allí:* {upstream_level}\n"
+        f"⏱️ *Llegada estimada:* {eta_min:.0f} min\n"
+        f"━━━━━━━━━━━━━━━━━━\n"
+        f"🆔 `{device.device_eui}`"
+    )
+    summary = (
+        f"{info['emoji']} *DOWNSTREAM_ETA* · {device.name} · "
+        f"{upstream_level} en {upstream.name}, llega en {eta_min:.0f} min"
+    )
+
+    sent = _enqueue(device, "DOWNSTREAM_ETA", message, summary)
+    if sent:
+        logger.info(
+            "alert.queued",
+            device=device.device_eui,
+            level="DOWNSTREAM_ETA",
+            upstream=upstream.device_eui,
+            eta_min=round(eta_min),
+        )
+    return sent
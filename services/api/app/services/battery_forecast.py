@@ -0,0 +1,157 @@
+"""
+Pronóstico de agotamiento de batería para toda la flota.
+
+Una sola query trae battery_mv promediado en buckets de
+BATTERY_FORECAST_BUCKET_H horas para la ventana de
+BATTERY_FORECAST_DAYS días, en columnas. El ajuste lineal
+mV(t) de todos los devices se hace en una pasada vectorizada
+con np.bincount (sin loops por device) y se estima cuántos
+días faltan para llegar a BATTERY_MIN_MV.
+
+El resultado se cachea BATTERY_FORECAST_TTL_S segundos.
+"""
+import asyncio
+import time as _time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import structlog
+from sqlalchemy import func, literal_column, select
+
+from app.core.config import settings
+from app.core.storage_backend import backend
+from app.models.device import Device
+from app.models.reading import reading_model
+from app.services.decoder import BATTERY_MIN_MV
+
+logger = structlog.get_logger()
+
+# Muestras (buckets) mínimas para ajustar una pendiente
+MIN_SAMPLES = 3
+
+
+def fit_depletion(
+    codes: np.ndarray,
+    t_days: np.ndarray,
+    mv: np.ndarray,
+    n_devices: int,
+    min_mv: float = BATTERY_MIN_MV,
+) -> dict[str, np.ndarray]:
+    """
+    Regresión lineal mV = a + b·t por device, vectorizada.
+
+    Args:
+        codes:  índice de device (0..n_devices-1) de cada muestra
+        t_days: tiempo de cada muestra en días (cualquier origen)
+        mv:     voltaje promedio de cada muestra
+    Returns:
+        arrays de largo n_devices: samples, slope_mv_per_day,
+        last_mv (valor ajustado en la última muestra) y
+        days_to_empty (NaN si no se está descargando)
+    """
+    n = np.bincount(codes, minlength=n_devices).astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Centrar t por device evita cancelación numérica
+        t_mean = np.bincount(codes, weights=t_days, minlength=n_devices) / n
+        tc = t_days - t_mean[codes]
+        y_mean = np.bincount(codes, weights=mv, minlength=n_devices) / n
+        s_tt = np.bincount(codes, weights=tc * tc, minlength=n_devices)
+        s_ty = np.bincount(codes, weights=tc * mv, minlength=n_devices)
+        slope = s_ty / s_tt
+
+        t_last = np.full(n_devices, -np.inf)
+        np.maximum.at(t_last, codes, t_days)
+        last_mv = y_mean + slope * (t_last - t_mean)
+
+        days = (min_mv - last_mv) / slope
+    valid = (n >= MIN_SAMPLES) & (s_tt > 0)
+    slope = np.where(valid, slope, np.nan)
+    last_mv = np.where(valid, last_mv, y_mean)
+    days = np.where(valid & (slope < 0), np.maximum(days, 0.0), np.nan)
+    return {
+        "samples": n.astype(int),
+        "slope_mv_per_day": slope,
+        "last_mv": last_mv,
+        "days_to_empty": days,
+    }
+
+
+def _clean(value: float, digits: int = 1) -> float | None:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+class BatteryForecaster:
+    """Calcula y cachea el pronóstico de batería de toda la flota."""
+
+    def __init__(self, ttl_s: int):
+        self.ttl_s = ttl_s
+        self._cached: list[dict] | None = None
+        self._computed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, db) -> list[dict]:
+        """Pronóstico cacheado; lo recalcula si venció el TTL."""
+        if self._cached is not None and _time.monotonic() - self._computed_at < self.ttl_s:
+            return self._cached
+        async with self._lock:
+            # Otro request pudo haberlo recalculado mientras esperábamos
+            if self._cached is None or _time.monotonic() - self._computed_at >= self.ttl_s:
+                self._cached = await self._compute(db)
+                self._computed_at = _time.monotonic()
+        return self._cached
+
+    async def _compute(self, db) -> list[dict]:
+        t0 = _time.perf_counter()
+        Reading = reading_model()
+        since = datetime.now(timezone.utc) - timedelta(days=settings.BATTERY_FORECAST_DAYS)
+        bucket_s = settings.BATTERY_FORECAST_BUCKET_H * 3600
+        # Inicio del balde en epoch (constante inline, ver storage_backend)
+        bucket = backend.epoch_bucket(Reading.time, bucket_s) * literal_column(str(bucket_s))
+
+        result = await db.execute(
+            select(Reading.device_eui, bucket.label("t"), func.avg(Reading.battery_mv))
+            .join(Device, Device.device_eui == Reading.device_eui)
+            .where(
+                Device.is_active.is_(True),
+                Reading.time >= since,
+                Reading.battery_mv.is_not(None),
+            )
+            .group_by(Reading.device_eui, bucket)
+        )
+        rows = result.all()
+        if not rows:
+            return []
+
+        euis, t_epoch, mv = zip(*rows)
+        names, codes = np.unique(np.array(euis), return_inverse=True)
+        fit = fit_depletion(
+            codes=codes,
+            t_days=np.asarray(t_epoch, dtype=float) / 86400.0,
+            mv=np.asarray(mv, dtype=float),
+            n_devices=len(names),
+        )
+
+        forecast = [
+            {
+                "device_eui": str(eui),
+                "samples": int(fit["samples"][i]),
+                "last_battery_mv": _clean(fit["last_mv"][i], 0),
+                "slope_mv_per_day": _clean(fit["slope_mv_per_day"][i], 2),
+                "days_to_empty": _clean(fit["days_to_empty"][i]),
+            }
+            for i, eui in enumerate(names)
+        ]
+        # Los que se agotan primero arriba; sin pronóstico al final
+        forecast.sort(key=lambda f: (f["days_to_empty"] is None, f["days_to_empty"] or 0))
+
+        logger.info(
+            "battery_forecast.computed",
+            devices=len(names),
+            samples=len(rows),
+            ms=round((_time.perf_counter() - t0) * 1000, 1),
+        )
+        return forecast
+
+
+# ─── Instancia global ─────────────────────────────────
+battery_forecaster = BatteryForecaster(ttl_s=settings.BATTERY_FORECAST_TTL_S)
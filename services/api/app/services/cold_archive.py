@@ -0,0 +1,373 @@
+"""
+Archivo frío de lecturas en Parquet (disco local).
+
+Los meses cerrados más viejos que ARCHIVE_AFTER_DAYS salen de
+Postgres a un archivo por device y mes:
+
+    {ARCHIVE_DIR}/{device_eui}/{YYYY-MM}.parquet
+
+Ordenado por time, con row groups de ARCHIVE_ROW_GROUP_ROWS filas
+(~1 día) y compresión por columna (zstd; byte-stream-split en los
+float). Cada archivo se escribe a un .tmp, se relee y se compara
+contra las filas exportadas, y recién ahí se borra el rango de
+Postgres en una transacción que verifica el conteo antes del commit.
+
+Lectura con "predicate pushdown" en dos niveles: device y mes
+eligen los archivos por ruta; dentro de cada archivo solo se leen
+los row groups cuyas estadísticas min/max de time cruzan el rango.
+
+Los derivados archivados quedan congelados: un recálculo posterior
+(PATCH de umbrales) solo reescribe lo que sigue en Postgres.
+"""
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import cache
+from pathlib import Path
+
+import structlog
+from sqlalchemy import delete, func, select
+
+from app.core.config import settings
+from app.core.storage_backend import backend
+from app.models.reading import CompactReading, GpsFix, SensorReading, reading_model
+
+logger = structlog.get_logger()
+
+# Columnas del archivo y su tipo Arrow (pyarrow se importa al usarse:
+# la API solo lo necesita para historial archivado)
+ARCHIVE_COLUMNS = (
+    ("id", "binary16"),
+    ("time", "timestamp"),
+    ("distance_cm", "float64"),
+    ("distance_raw_cm", "float64"),   # archivos previos a 007 no la tienen
+    ("water_level_cm", "float64"),
+    ("fill_pct", "float64"),
+    ("battery_mv", "int32"),
+    ("battery_pct", "int32"),
+    ("rssi", "int32"),
+    ("snr", "float64"),
+    ("latitude", "float64"),
+    ("longitude", "float64"),
+    ("rise_rate_cm_min", "float64"),
+    ("minutes_to_critical", "float64"),
+    ("alert_level", "string"),
+)
+_FLOATS = [name for name, kind in ARCHIVE_COLUMNS if kind == "float64"]
+
+
+@cache
+def schema():
+    import pyarrow as pa
+
+    types = {
+        "binary16": pa.binary(16),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "float64": pa.float64(),
+        "int32": pa.int32(),
+        "string": pa.string(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in ARCHIVE_COLUMNS])
+
+
+class ArchiveError(Exception):
+    """El archivo no coincide con lo exportado o con lo borrado."""
+
+
+def month_key(t: datetime) -> str:
+    return f"{t.year:04d}-{t.month:02d}"
+
+
+def month_bounds(key: str) -> tuple[datetime, datetime]:
+    """'2025-01' → [2025-01-01, 2025-02-01) en UTC."""
+    year, month = map(int, key.split("-"))
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+@dataclass
+class ReadStats:
+    files: int = 0
+    row_groups: int = 0
+    row_groups_skipped: int = 0
+
+
+class ColdArchive:
+    """Archivos Parquet por device y mes, con lectura por rango de tiempo."""
+
+    def __init__(self, root: str, row_group_rows: int, compression: str):
+        self.root = Path(root)
+        self.row_group_rows = row_group_rows
+        self.compression = compression
+        # device → meses archivados; se arma con un listado al primer uso
+        self._months: dict[str, set[str]] | None = None
+        self.last_read = ReadStats()
+
+    # ─── Catálogo ─────────────────────────────────────
+    def path(self, device_eui: str, key: str) -> Path:
+        return self.root / device_eui / f"{key}.parquet"
+
+    def _catalog(self) -> dict[str, set[str]]:
+        if self._months is None:
+            self._months = {}
+            if self.root.is_dir():
+                for path in self.root.glob("*/*.parquet"):
+                    self._months.setdefault(path.parent.name, set()).add(path.stem)
+        return self._months
+
+    def months(self, device_eui: str) -> list[str]:
+        return sorted(self._catalog().get(device_eui, ()))
+
+    def covers(self, device_eui: str, since: datetime) -> bool:
+        """True si hay algo archivado de device_eui desde `since`."""
+        months = self.months(device_eui)
+        return bool(months) and month_bounds(months[-1])[1] > since
+
+    # ─── Escritura ────────────────────────────────────
+    def write_month(self, device_eui: str, key: str, rows) -> int:
+        """
+        Escribe las filas (tuplas en el orden de ARCHIVE_COLUMNS) del
+        mes, uniendo con lo ya archivado si existía. Relee y verifica
+        antes de reemplazar. Retorna filas nuevas archivadas.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_arrays(
+            [pa.array(col, type=f.type) for col, f in zip(zip(*rows), schema())],
+            schema=schema(),
+        )
+        new_rows = table.num_rows
+        final = self.path(device_eui, key)
+        if final.exists():
+            # Re-archivo tras un intento previo: sin duplicar ids
+            old = _conform(pq.read_table(final), schema().names)
+            keep = pc.invert(pc.is_in(old["id"], value_set=table["id"]))
+            table = pa.concat_tables([old.filter(keep), table])
+        table = table.sort_by("time")
+
+        final.parent.mkdir(parents=True, exist_ok=True)
+        tmp = final.with_suffix(".parquet.tmp")
+        pq.write_table(
+            table, tmp,
+            row_group_size=self.row_group_rows,
+            compression=self.compression,
+            use_byte_stream_split=_FLOATS,
+            use_dictionary=["alert_level"],
+            write_statistics=True,
+        )
+        _verify(tmp, table)
+        os.replace(tmp, final)
+        self._catalog().setdefault(device_eui, set()).add(key)
+        return new_rows
+
+    # ─── Lectura ──────────────────────────────────────
+    def iter_row_groups(
+        self,
+        device_eui: str,
+        start: datetime,
+        end: datetime,
+        newest_first: bool = False,
+        columns: list[str] | None = None,
+    ):
+        """
+        Tablas (una por row group) con time en [start, end), en orden
+        de tiempo. Solo abre los meses y row groups que cruzan el rango.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        stats = self.last_read = ReadStats()
+        keys = [
+            k for k in self.months(device_eui)
+            if month_bounds(k)[0] < end and month_bounds(k)[1] > start
+        ]
+        for key in (reversed(keys) if newest_first else keys):
+            pf = pq.ParquetFile(self.path(device_eui, key))
+            stats.files += 1
+            present = set(pf.schema_arrow.names)
+            time_idx = pf.schema_arrow.get_field_index("time")
+            groups = []
+            for i in range(pf.num_row_groups):
+                col = pf.metadata.row_group(i).column(time_idx).statistics
+                if col is not None and col.has_min_max and (col.max < start or col.min >= end):
+                    stats.row_groups_skipped += 1
+                    continue
+                groups.append(i)
+            for i in (reversed(groups) if newest_first else groups):
+                stats.row_groups += 1
+                table = pf.read_row_group(
+                    i, columns=[c for c in columns if c in present] if columns else None)
+                table = _conform(table, columns or schema().names)
+                t = table["time"]
+                mask = pc.and_(pc.greater_equal(t, pa.scalar(start, t.type)),
+                               pc.less(t, pa.scalar(end, t.type)))
+                table = table.filter(mask)
+                if table.num_rows:
+                    yield table[::-1] if newest_first else table
+
+    def read_columns(
+        self,
+        device_eui: str,
+        start: datetime,
+        end: datetime,
+        limit: int,
+        columns: tuple[str, ...],
+    ) -> dict[str, list]:
+        """
+        Hasta `limit` lecturas de [start, end), más nuevas primero,
+        en el layout de reading_codec (id como 16 bytes, time epoch).
+        """
+        out = {name: [] for name in columns}
+        remaining = limit
+        for table in self.iter_row_groups(device_eui, start, end, newest_first=True,
+                                          columns=list(columns)):
+            table = table.slice(0, remaining)
+            for name in columns:
+                if name == "time":
+                    out[name].extend(t.timestamp() for t in table[name].to_pylist())
+                else:
+                    out[name].extend(table[name].to_pylist())
+            remaining -= table.num_rows
+            if remaining <= 0:
+                break
+        return out
+
+    def stats(self) -> dict:
+        catalog = self._catalog()
+        return {
+            "devices": len(catalog),
+            "months": sum(len(m) for m in catalog.values()),
+            "last_read": vars(self.last_read),
+        }
+
+
+def _conform(table, columns: list[str]):
+    """Las columnas pedidas en ese orden; las que el archivo no tiene, en NULL."""
+    import pyarrow as pa
+
+    full = schema()
+    arrays = [
+        table[name] if name in table.column_names
+        else pa.nulls(table.num_rows, type=full.field(name).type)
+        for name in columns
+    ]
+    return pa.Table.from_arrays(arrays, schema=pa.schema([full.field(n) for n in columns]))
+
+
+def _verify(path: Path, expected):
+    """Relee el archivo y compara conteo, time, ids y distance_cm."""
+    import pyarrow.parquet as pq
+
+    written = pq.read_table(path, schema=schema())
+    checks = (
+        written.num_rows == expected.num_rows,
+        written["time"].equals(expected["time"]),
+        written["id"].equals(expected["id"]),
+        written["distance_cm"].equals(expected["distance_cm"]),
+    )
+    if not all(checks):
+        path.unlink(missing_ok=True)
+        raise ArchiveError(f"Verificación fallida: {path.name}")
+
+
+# ─── Job de archivado ─────────────────────────────────
+def _archive_select(device_eui: str, start: datetime, end: datetime):
+    Reading = reading_model()
+    return (
+        select(*(getattr(Reading, name) for name, _ in ARCHIVE_COLUMNS))
+        .where(Reading.device_eui == device_eui, Reading.time >= start, Reading.time < end)
+        .order_by(Reading.time)
+    )
+
+
+def _delete_range(device_eui: str, start: datetime, end: datetime) -> list:
+    """DELETE del rango; el primero es el que se compara contra lo archivado."""
+    if settings.READINGS_STORAGE == "compact":
+        models = (CompactReading, GpsFix)
+    else:
+        models = (SensorReading,)
+    return [
+        delete(m)
+        .where(m.device_eui == device_eui, m.time >= start, m.time < end)
+        .execution_options(synchronize_session=False)
+        for m in models
+    ]
+
+
+async def pending_months(db, before: datetime) -> list[tuple[str, str, int]]:
+    """(device, mes, filas) de los meses completos anteriores a `before`."""
+    Reading = reading_model()
+    cutoff = month_bounds(month_key(before))[0]
+    month = backend.month_of(Reading.time)
+    result = await db.execute(
+        select(Reading.device_eui, month, func.count())
+        .where(Reading.time < cutoff)
+        .group_by(Reading.device_eui, month)
+        .order_by(month, Reading.device_eui)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def archive_month(db, archive: ColdArchive, device_eui: str, key: str) -> int:
+    """
+    Exporta, verifica y borra un device-mes. Si el DELETE no borra
+    exactamente lo archivado se aborta la transacción (el archivo
+    queda y el próximo intento lo une sin duplicar).
+    """
+    start, end = month_bounds(key)
+    rows = [
+        (r[0].bytes if isinstance(r[0], uuid.UUID) else uuid.UUID(str(r[0])).bytes, *r[1:])
+        for r in (await db.execute(_archive_select(device_eui, start, end))).all()
+    ]
+    if not rows:
+        return 0
+    archived = archive.write_month(device_eui, key, rows)
+
+    statements = _delete_range(device_eui, start, end)
+    deleted = (await db.execute(statements[0])).rowcount
+    if deleted != archived:
+        raise ArchiveError(
+            f"{device_eui} {key}: archivadas {archived}, borradas {deleted}"
+        )
+    for stmt in statements[1:]:
+        await db.execute(stmt)
+    await db.commit()
+    return archived
+
+
+async def archive_closed_months(session_factory, archive: ColdArchive, older_than_days: int,
+                                dry_run: bool = False) -> dict:
+    """Archiva todos los meses cerrados anteriores al corte."""
+    before = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    async with session_factory() as db:
+        pending = await pending_months(db, before)
+    report = {"pending": len(pending), "archived_months": 0, "archived_rows": 0, "failed": 0}
+    if dry_run:
+        report["months"] = [{"device_eui": e, "month": k, "rows": n} for e, k, n in pending]
+        return report
+
+    for device_eui, key, _ in pending:
+        try:
+            async with session_factory() as db:
+                rows = await archive_month(db, archive, device_eui, key)
+        except ArchiveError as e:
+            report["failed"] += 1
+            logger.error("archive.failed", device=device_eui, month=key, error=str(e))
+            continue
+        report["archived_months"] += 1
+        report["archived_rows"] += rows
+        logger.info("archive.month_done", device=device_eui, month=key, rows=rows)
+    return report
+
+
+# ─── Instancia global ─────────────────────────────────
+cold_archive = ColdArchive(
+    root=settings.ARCHIVE_DIR,
+    row_group_rows=settings.ARCHIVE_ROW_GROUP_ROWS,
+    compression=settings.ARCHIVE_COMPRESSION,
+)
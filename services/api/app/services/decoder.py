@@ -17,6 +17,8 @@ El decoder detecta el tipo por longitud del payload.
 import struct
 import structlog
 
+from app.core.logging_config import debug_enabled
+
 log = structlog.get_logger()
 
 BATTERY_MIN_MV = 3000
@@ -67,16 +69,18 @@ def decode_payload(data: bytes) -> dict:
                 result["latitude"]  = latitude
                 result["longitude"] = longitude
                 result["has_gps"]   = True
-                log.debug("decoder.gps_ok",
-                          latitude=latitude, longitude=longitude)
+                if debug_enabled():
+                    log.debug("decoder.gps_ok",
+                              latitude=latitude, longitude=longitude)
 
         except struct.error as e:
             log.warning("decoder.gps_unpack_error", error=str(e))
 
-    log.debug("decoder.ok",
-              distance_cm=distance_cm,
-              battery_pct=battery_pct,
-              has_gps=result["has_gps"])
+    if debug_enabled():
+        log.debug("decoder.ok",
+                  distance_cm=distance_cm,
+                  battery_pct=battery_pct,
+                  has_gps=result["has_gps"])
 
     return result
 
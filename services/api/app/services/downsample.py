@@ -0,0 +1,88 @@
+"""
+Downsampling visual de series de lecturas (LTTB).
+
+Largest-Triangle-Three-Buckets (Steinarsson, 2013): divide la
+serie en n-2 buckets y de cada uno elige el punto que forma el
+triángulo de mayor área con el punto elegido en el bucket anterior
+y el promedio del siguiente. A diferencia de promediar por bucket,
+un pico de crecida sobrevive: es justamente el punto que maximiza
+el área.
+
+La dependencia entre buckets es secuencial (cada uno usa el punto
+elegido en el anterior), así que el loop es por bucket; dentro de
+cada bucket las áreas y los promedios del bucket siguiente (vía
+sumas acumuladas) se calculan con numpy. El costo queda en unas
+pocas llamadas a numpy por punto de salida, casi independiente
+del largo de la ventana.
+
+numpy se importa al usarse: no está en el camino del arranque.
+"""
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Columnas numéricas que se pueden usar como eje de la reducción
+SERIES_FIELDS = (
+    "water_level_cm", "distance_cm", "fill_pct", "battery_pct",
+    "rssi", "snr", "rise_rate_cm_min",
+)
+
+
+def lttb(x: "np.ndarray", y: "np.ndarray", n_out: int) -> "np.ndarray":
+    """
+    Índices (crecientes) de los n_out puntos elegidos. `x` debe
+    estar ordenado. Con n_out >= len(x) retorna todos.
+    """
+    import numpy as np
+
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64) - x[0]   # epoch grande: cumsum sin perder precisión
+    y = np.asarray(y, dtype=np.float64)
+    # Puntos interiores [1, n-1) en n_out-2 buckets no vacíos
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+
+    # Promedio del bucket siguiente a cada uno; el último usa el punto final
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = ends[1:] - starts[1:]
+    next_x = np.append((cx[ends[1:]] - cx[starts[1:]]) / sizes, x[-1])
+    next_y = np.append((cy[ends[1:]] - cy[starts[1:]]) / sizes, y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        s, e = starts[i], ends[i]
+        ax, ay = x[a], y[a]
+        # Doble del área del triángulo (a, punto, promedio siguiente)
+        area = np.abs((ax - next_x[i]) * (y[s:e] - ay) - (ax - x[s:e]) * (next_y[i] - ay))
+        a = s + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def downsample_columns(columns: dict[str, list], n_out: int, by: str) -> dict[str, list]:
+    """
+    Reduce columnas del codec (más nuevas primero, time epoch) a
+    n_out filas eligiendo por LTTB sobre `by`. Las filas con `by`
+    nulo se descartan; el resto de las columnas acompaña a la fila.
+    """
+    import numpy as np
+
+    times = columns["time"]
+    if len(times) <= n_out:
+        return columns
+    values = np.array([np.nan if v is None else v for v in columns[by]], dtype=np.float64)
+    # Orden cronológico para LTTB
+    t = np.asarray(times, dtype=np.float64)[::-1]
+    v = values[::-1]
+    valid = np.flatnonzero(~np.isnan(v))
+    chosen = valid[lttb(t[valid], v[valid], n_out)]
+    # Vuelta a índices del orden original, más nuevas primero
+    keep = (len(times) - 1 - chosen)[::-1].tolist()
+    return {name: [col[i] for i in keep] for name, col in columns.items()}
@@ -0,0 +1,352 @@
+"""
+Store-and-forward de lecturas de un gateway edge a la API central.
+
+Con DB_BACKEND=sqlite y EDGE_UPSTREAM_URL, las lecturas guardadas
+en el gateway suben en lotes cuando hay enlace:
+
+  · cursor: rowid de la última lectura confirmada por la central
+    (tabla edge_sync_cursor). Con un solo escritor el rowid de
+    sensor_readings crece con cada INSERT confirmado, así que las
+    pendientes son rowid > cursor, por la clave primaria de SQLite.
+  · lote: hasta EDGE_SYNC_BATCH lecturas en columnas (MessagePack,
+    ids de 16 bytes, time en epoch) comprimidas con gzip →
+    POST /api/v1/webhooks/edge/readings con X-Edge-Token. La central
+    inserta con ON CONFLICT DO NOTHING: reenviar un lote (enlace
+    cortado antes de la respuesta) no duplica lecturas.
+  · sin enlace (error de red, 5xx, 429): backoff exponencial hasta
+    EDGE_SYNC_MAX_BACKOFF_S. Al volver se vacía el atraso lote tras
+    lote sin esperar EDGE_SYNC_INTERVAL_S.
+  · retención: las lecturas ya confirmadas y más viejas que
+    EDGE_KEEP_DAYS se borran del gateway.
+
+Las alertas salen del gateway (alert_dispatcher reintenta mientras
+no haya enlace); la central guarda el historial y last_seen, sin
+volver a evaluar alertas.
+"""
+import asyncio
+import gzip
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import structlog
+from sqlalchemy import delete, literal_column, or_, select, update
+
+from app.core.config import settings
+from app.core.database import ReadSessionLocal, get_db_session
+from app.core.storage_backend import backend
+from app.models.device import Device
+from app.models.edge import SyncCursor
+from app.models.reading import ALERT_LEVEL_CODES, CompactReading, GpsFix, SensorReading
+
+logger = structlog.get_logger()
+
+# Columnas de sensor_readings que suben (la central no recalcula nada)
+SYNC_COLUMNS = (
+    "id", "device_eui", "time", "distance_cm", "distance_raw_cm", "water_level_cm",
+    "fill_pct", "battery_mv", "battery_pct", "rssi", "snr", "latitude", "longitude",
+    "rise_rate_cm_min", "minutes_to_critical", "alert_level",
+)
+FORMAT_VERSION = 1
+GZIP_LEVEL = 6
+# Filas por INSERT en la central: ~16 parámetros por fila, asyncpg admite 32767
+INSERT_CHUNK = 1500
+# Tope de filas por lote que acepta la central
+MAX_BATCH_ROWS = 10_000
+PRUNE_EVERY_S = 3600.0
+
+
+# ─── Formato del lote ─────────────────────────────────
+def pack_batch(site: str, columns: dict[str, list]) -> bytes:
+    """Columnas (id en bytes, time en epoch) → msgpack, sin comprimir."""
+    import msgpack   # diferido, como en reading_codec
+
+    return msgpack.packb(
+        {"v": FORMAT_VERSION, "site": site, "columns": columns}, use_bin_type=True
+    )
+
+
+def encode_batch(site: str, columns: dict[str, list]) -> bytes:
+    return gzip.compress(pack_batch(site, columns), compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def decode_batch(body: bytes, encoding: str | None = "gzip") -> dict:
+    """Inversa de encode_batch; ValueError si el lote no es válido."""
+    import msgpack
+
+    try:
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        batch = msgpack.unpackb(body, raw=False)
+    except (OSError, EOFError, msgpack.UnpackException, ValueError) as e:
+        raise ValueError(f"Lote ilegible: {e}") from e
+    if not isinstance(batch, dict) or batch.get("v") != FORMAT_VERSION:
+        raise ValueError("Versión de lote desconocida")
+    columns = batch.get("columns") or {}
+    if set(columns) != set(SYNC_COLUMNS):
+        raise ValueError("Columnas del lote inválidas")
+    sizes = {len(values) for values in columns.values()}
+    if len(sizes) != 1:
+        raise ValueError("Columnas de distinto largo")
+    if sizes.pop() > MAX_BATCH_ROWS:
+        raise ValueError(f"Máximo {MAX_BATCH_ROWS} lecturas por lote")
+    return batch
+
+
+def columns_from_rows(rows) -> dict[str, list]:
+    """Filas (tuplas en el orden de SYNC_COLUMNS) → columnas del lote."""
+    if not rows:
+        return {name: [] for name in SYNC_COLUMNS}
+    columns = dict(zip(SYNC_COLUMNS, (list(c) for c in zip(*rows))))
+    columns["id"] = [i.bytes if isinstance(i, uuid.UUID) else uuid.UUID(str(i)).bytes
+                     for i in columns["id"]]
+    columns["time"] = [t.timestamp() for t in columns["time"]]
+    return columns
+
+
+# ─── Central: recepción ───────────────────────────────
+def _storage_rows(columns: dict[str, list]) -> list[tuple[type, list[dict]]]:
+    """Filas a insertar según READINGS_STORAGE de la central."""
+    n = len(columns["time"])
+    times = [datetime.fromtimestamp(t, timezone.utc) for t in columns["time"]]
+    if settings.READINGS_STORAGE != "compact":
+        rows = []
+        for i in range(n):
+            row = {name: columns[name][i] for name in SYNC_COLUMNS}
+            row["id"] = uuid.UUID(bytes=row["id"])
+            row["time"] = times[i]
+            rows.append(row)
+        return [(SensorReading, rows)]
+
+    readings, fixes = [], []
+    for i in range(n):
+        eui = columns["device_eui"][i]
+        readings.append({
+            "device_eui": eui,
+            "time": times[i],
+            "distance_cm": columns["distance_cm"][i],
+            "distance_raw_cm": columns["distance_raw_cm"][i],
+            "battery_mv": columns["battery_mv"][i],
+            "rssi": columns["rssi"][i],
+            "snr": columns["snr"][i],
+            "rise_rate_cm_min": columns["rise_rate_cm_min"][i],
+            "minutes_to_critical": columns["minutes_to_critical"][i],
+            "alert_code": ALERT_LEVEL_CODES.get(columns["alert_level"][i], 0),
+        })
+        lat, lon = columns["latitude"][i], columns["longitude"][i]
+        if lat is not None and lon is not None:
+            fixes.append({"device_eui": eui, "time": times[i],
+                          "lat_e6": round(lat * 1e6), "lon_e6": round(lon * 1e6)})
+    return [(CompactReading, readings), (GpsFix, fixes)]
+
+
+async def store_batch(db, batch: dict) -> dict:
+    """
+    Inserta un lote de un gateway (idempotente) y adelanta last_seen.
+    El caller invalida buffer y caches de los devices retornados.
+    """
+    columns = batch["columns"]
+    inserted = 0
+    for model, rows in _storage_rows(columns):
+        for start in range(0, len(rows), INSERT_CHUNK):
+            result = await db.execute(
+                backend.insert(model).values(rows[start:start + INSERT_CHUNK]).on_conflict_do_nothing()
+            )
+            if model is not GpsFix:
+                inserted += max(result.rowcount, 0)
+
+    newest: dict[str, float] = {}
+    for eui, t in zip(columns["device_eui"], columns["time"]):
+        if t > newest.get(eui, -1.0):
+            newest[eui] = t
+    for eui, t in newest.items():
+        seen = datetime.fromtimestamp(t, timezone.utc)
+        await db.execute(
+            update(Device)
+            .where(Device.device_eui == eui,
+                   or_(Device.last_seen.is_(None), Device.last_seen < seen))
+            .values(last_seen=seen)
+        )
+    return {
+        "site": batch.get("site"),
+        "received": len(columns["time"]),
+        "inserted": inserted,
+        "devices": sorted(newest),
+    }
+
+
+# ─── Gateway: envío ───────────────────────────────────
+class EdgeSync:
+    """Sube las lecturas locales a la central, en orden de rowid."""
+
+    def __init__(self, upstream_url: str, token: str, site: str, batch_rows: int,
+                 interval_s: float, max_backoff_s: float, keep_days: int):
+        self.upstream_url = upstream_url.rstrip("/")
+        self.token = token
+        self.site = site
+        self.batch_rows = batch_rows
+        self.interval_s = interval_s
+        self.max_backoff_s = max_backoff_s
+        self.keep_days = keep_days
+        self._cursor: int | None = None
+        self._task: asyncio.Task | None = None
+        self._client = None
+        self._pruned_at = 0.0
+        self.batches = 0
+        self.rows = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.failures = 0
+        self.pruned = 0
+        self.last_success_at: float | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.upstream_url) and backend.name == "sqlite"
+
+    async def _load_cursor(self) -> int:
+        if self._cursor is None:
+            async with get_db_session() as db:
+                cursor = await db.get(SyncCursor, "upstream")
+            self._cursor = cursor.last_rowid if cursor else 0
+        return self._cursor
+
+    async def _save_cursor(self, rowid: int):
+        self._cursor = rowid
+        async with get_db_session() as db:
+            cursor = await db.get(SyncCursor, "upstream")
+            if cursor is None:
+                cursor = SyncCursor(name="upstream")
+                db.add(cursor)
+            cursor.last_rowid = rowid
+            cursor.synced_at = datetime.now(timezone.utc)
+
+    async def read_batch(self, after_rowid: int) -> tuple[list[int], dict[str, list]]:
+        rowid = literal_column("sensor_readings.rowid")
+        async with ReadSessionLocal() as db:
+            result = await db.execute(
+                select(rowid, *(getattr(SensorReading, name) for name in SYNC_COLUMNS))
+                .where(rowid > after_rowid)
+                .order_by(rowid)
+                .limit(self.batch_rows)
+            )
+            rows = result.all()
+        return [r[0] for r in rows], columns_from_rows([r[1:] for r in rows])
+
+    async def push_once(self) -> int | None:
+        """Sube un lote. Retorna las lecturas subidas (0 = al día) o None si falló."""
+        import httpx   # diferido: no hace falta para arrancar el ingest
+
+        after = await self._load_cursor()
+        rowids, columns = await self.read_batch(after)
+        if not rowids:
+            return 0
+        raw = pack_batch(self.site, columns)
+        body = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=30.0)
+        try:
+            response = await self._client.post(
+                f"{self.upstream_url}/api/v1/webhooks/edge/readings",
+                content=body,
+                headers={
+                    "Content-Type": "application/msgpack",
+                    "Content-Encoding": "gzip",
+                    "X-Edge-Token": self.token,
+                },
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            self.failures += 1
+            logger.warning("edge_sync.failed", error=str(e), pending_from=after)
+            return None
+
+        await self._save_cursor(rowids[-1])
+        self.batches += 1
+        self.rows += len(rowids)
+        self.sent_bytes += len(body)
+        self.raw_bytes += len(raw)
+        self.last_success_at = time.time()
+        logger.info("edge_sync.pushed", rows=len(rowids), bytes=len(body),
+                    cursor=rowids[-1], inserted=response.json().get("inserted"))
+        return len(rowids)
+
+    async def prune(self) -> int:
+        """Borra lecturas confirmadas más viejas que EDGE_KEEP_DAYS."""
+        cursor = await self._load_cursor()
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.keep_days)
+        rowid = literal_column("sensor_readings.rowid")
+        async with get_db_session() as db:
+            # rowid < cursor (estricto): la última confirmada queda y el
+            # próximo rowid nunca vuelve por debajo del cursor
+            result = await db.execute(
+                delete(SensorReading).where(rowid < cursor, SensorReading.time < cutoff)
+            )
+        self.pruned += result.rowcount
+        return result.rowcount
+
+    # ─── Ciclo de vida ────────────────────────────────
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        logger.info("edge_sync.started", upstream=self.upstream_url)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self):
+        backoff = 0.0
+        while True:
+            try:
+                pushed = await self.push_once()
+            except Exception as e:
+                logger.error("edge_sync.error", error=str(e))
+                pushed = None
+            if pushed is None:
+                backoff = min(self.max_backoff_s, max(self.interval_s, backoff * 2))
+                await asyncio.sleep(backoff)
+                continue
+            backoff = 0.0
+            if pushed == self.batch_rows:
+                continue     # queda atraso: el próximo lote ya
+            if self.keep_days > 0 and time.monotonic() - self._pruned_at > PRUNE_EVERY_S:
+                self._pruned_at = time.monotonic()
+                try:
+                    await self.prune()
+                except Exception as e:
+                    logger.error("edge_sync.prune_failed", error=str(e))
+            await asyncio.sleep(self.interval_s)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "cursor": self._cursor,
+            "batches": self.batches,
+            "rows": self.rows,
+            "sent_bytes": self.sent_bytes,
+            "compression": round(self.raw_bytes / self.sent_bytes, 1) if self.sent_bytes else None,
+            "failures": self.failures,
+            "pruned": self.pruned,
+            "last_success_age_s": round(time.time() - self.last_success_at)
+            if self.last_success_at else None,
+        }
+
+
+# ─── Instancia global ─────────────────────────────────
+edge_sync = EdgeSync(
+    upstream_url=settings.EDGE_UPSTREAM_URL,
+    token=settings.EDGE_SYNC_TOKEN,
+    site=settings.EDGE_SITE_ID,
+    batch_rows=settings.EDGE_SYNC_BATCH,
+    interval_s=settings.EDGE_SYNC_INTERVAL_S,
+    max_backoff_s=settings.EDGE_SYNC_MAX_BACKOFF_S,
+    keep_days=settings.EDGE_KEEP_DAYS,
+)
@@ -0,0 +1,176 @@
+"""
+Índice espacial en memoria de la posición actual de cada sensor.
+
+Grilla regular de celdas de GEO_CELL_DEG grados (tipo geohash):
+cada celda guarda el set de devices dentro. Las búsquedas por
+radio o bounding box solo revisan las celdas que tocan el área
+y luego filtran por distancia real (haversine).
+
+El ingest solo mueve un device en el índice cuando el nuevo fix
+GPS se aleja más de GEO_MOVE_THRESHOLD_M de la última posición;
+el ruido del Air530 (unos metros) no genera movimientos ni puntos
+de track.
+"""
+import math
+
+import structlog
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.storage_backend import backend
+from app.models.device import Device
+from app.models.track import TrackPoint
+
+logger = structlog.get_logger()
+
+EARTH_RADIUS_M = 6_371_000.0
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia en metros entre dos puntos (lat/lon en grados)."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class GeoIndex:
+    """Grilla lat/lon → devices, con posición actual por device."""
+
+    def __init__(self, cell_deg: float, move_threshold_m: float):
+        self.cell_deg = cell_deg
+        self.move_threshold_m = move_threshold_m
+        self._cells: dict[tuple[int, int], set[str]] = {}
+        self._positions: dict[str, tuple[float, float]] = {}
+        self._from_gps: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def _place(self, device_eui: str, lat: float, lon: float):
+        old = self._positions.get(device_eui)
+        if old is not None:
+            old_cell = self._cell(*old)
+            members = self._cells.get(old_cell)
+            if members is not None:
+                members.discard(device_eui)
+                if not members:
+                    del self._cells[old_cell]
+        self._positions[device_eui] = (lat, lon)
+        self._cells.setdefault(self._cell(lat, lon), set()).add(device_eui)
+
+    # ─── Escritura ────────────────────────────────────
+    def set_static(self, device_eui: str, lat: float | None, lon: float | None):
+        """Coordenadas configuradas del device; el GPS tiene prioridad."""
+        if lat is None or lon is None or device_eui in self._from_gps:
+            return
+        self._place(device_eui, lat, lon)
+
+    def observe_fix(self, device_eui: str, lat: float, lon: float) -> float | None:
+        """
+        Procesa un fix GPS. Si es el primero o se alejó más de
+        move_threshold_m, mueve el device y retorna la distancia
+        recorrida (0.0 en el primero); si no, retorna None.
+        """
+        current = self._positions.get(device_eui)
+        moved = 0.0
+        if current is not None and device_eui in self._from_gps:
+            moved = haversine_m(current[0], current[1], lat, lon)
+            if moved <= self.move_threshold_m:
+                return None
+        self._from_gps.add(device_eui)
+        self._place(device_eui, lat, lon)
+        return moved
+
+    def remove(self, device_eui: str):
+        position = self._positions.pop(device_eui, None)
+        self._from_gps.discard(device_eui)
+        if position is not None:
+            cell = self._cell(*position)
+            self._cells.get(cell, set()).discard(device_eui)
+
+    def position(self, device_eui: str) -> tuple[float, float] | None:
+        return self._positions.get(device_eui)
+
+    # ─── Consultas ────────────────────────────────────
+    def _candidates(self, min_lat, min_lon, max_lat, max_lon):
+        lo_x, lo_y = self._cell(min_lat, min_lon)
+        hi_x, hi_y = self._cell(max_lat, max_lon)
+        # Área enorme: más barato recorrer los devices que las celdas
+        if (hi_x - lo_x + 1) * (hi_y - lo_y + 1) > len(self._cells):
+            yield from self._positions
+            return
+        for x in range(lo_x, hi_x + 1):
+            for y in range(lo_y, hi_y + 1):
+                yield from self._cells.get((x, y), ())
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> list[dict]:
+        """Devices dentro del rectángulo."""
+        found = []
+        for device_eui in self._candidates(min_lat, min_lon, max_lat, max_lon):
+            lat, lon = self._positions[device_eui]
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                found.append({"device_eui": device_eui, "latitude": lat, "longitude": lon})
+        return found
+
+    def nearby(self, lat: float, lon: float, radius_m: float) -> list[dict]:
+        """Devices a menos de radius_m, del más cercano al más lejano."""
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        dlon = min(180.0, dlat / cos_lat)
+        found = []
+        for device_eui in self._candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon):
+            d_lat, d_lon = self._positions[device_eui]
+            distance = haversine_m(lat, lon, d_lat, d_lon)
+            if distance <= radius_m:
+                found.append({
+                    "device_eui": device_eui,
+                    "latitude": d_lat,
+                    "longitude": d_lon,
+                    "distance_m": round(distance, 1),
+                })
+        found.sort(key=lambda f: f["distance_m"])
+        return found
+
+    # ─── Warm-up al arrancar ──────────────────────────
+    async def warm_up(self, db, owns=None):
+        """
+        Carga coordenadas configuradas y la última posición GPS de cada
+        device. `owns(eui)` limita a los devices de un worker de ingest.
+        """
+        result = await db.execute(
+            select(Device.device_eui, Device.latitude, Device.longitude)
+            .where(Device.is_active.is_(True))
+        )
+        for device_eui, lat, lon in result.all():
+            if owns is None or owns(device_eui):
+                self.set_static(device_eui, lat, lon)
+
+        # Último punto del track = última posición significativa
+        result = await db.execute(backend.latest_per(
+            select(TrackPoint.device_eui, TrackPoint.latitude, TrackPoint.longitude),
+            TrackPoint.device_eui, TrackPoint.time,
+        ))
+        for device_eui, lat, lon in result.all():
+            if owns is None or owns(device_eui):
+                self.observe_fix(device_eui, lat, lon)
+        logger.info("geo_index.warmed_up", devices=len(self), gps=len(self._from_gps))
+
+    def snapshot(self) -> dict:
+        return {"positions": dict(self._positions), "from_gps": set(self._from_gps)}
+
+    def restore(self, state: dict):
+        for device_eui, (lat, lon) in state["positions"].items():
+            self._place(device_eui, lat, lon)
+        self._from_gps = set(state["from_gps"])
+
+
+# ─── Instancia global ─────────────────────────────────
+geo_index = GeoIndex(
+    cell_deg=settings.GEO_CELL_DEG,
+    move_threshold_m=settings.GEO_MOVE_THRESHOLD_M,
+)
@@ -0,0 +1,253 @@
+"""
+Pronóstico de nivel a corto plazo (30-60 min) por device.
+
+Holt lineal (nivel + tendencia) en forma de corrección de error,
+con paso irregular: la tendencia se guarda en cm/s y cada uplink
+proyecta dt segundos antes de corregir:
+
+    pred = L + T·dt
+    e    = y - pred
+    L'   = pred + α·e
+    T'   = T + α·β·e / dt
+    σ²'  = (1-γ)·σ² + γ·e²        (error a un paso)
+
+La fórmula teórica del intervalo (ETS(A,A,N)) supone que la serie
+sigue el modelo; con uplinks cada 30 s y ruido de medición, a 60 min
+son ~120 pasos y el intervalo sale de ±150 cm. Por eso se calibra
+con el propio device: cada lectura que llega después de un
+pronóstico "de control" a CHECK_HORIZON_S mide el error real a ese
+horizonte, y su varianza (EW) se escala al horizonte pedido:
+
+    Var(h) = σ² + (σ²_H - σ²)·(h/H)²
+
+(el error de tendencia crece lineal con h). Hasta tener la primera
+medición se usa la fórmula teórica, que peca de ancha.
+Cada update es O(1) y el estado de todos los devices vive en
+arrays contiguos, como en rise_rate (73 bytes por device).
+Un hueco mayor a FORECAST_RESET_GAP_MIN reinicia nivel y tendencia:
+proyectar una tendencia vieja sobre horas de silencio no sirve.
+"""
+import math
+from array import array
+
+from app.core.config import settings
+
+_STATE = ("last_t", "level", "trend", "var", "step", "n", "check_t", "check_pred", "hvar")
+# Suavizado del error cuadrático, del paso típico y del error a H
+VAR_GAMMA = 0.05
+STEP_GAMMA = 0.1
+HVAR_GAMMA = 0.1
+# Horizonte del pronóstico de control que calibra los intervalos
+CHECK_HORIZON_S = 1800.0
+# Niveles de alerta que puede anticipar el pronóstico (de mayor a menor)
+FORECAST_LEVELS = ("CRITICAL", "WARNING")
+_LEVEL_CODES = {"WARNING": 1, "CRITICAL": 2}
+
+
+class LevelForecaster:
+    """Estado Holt por device en arrays compactos."""
+
+    def __init__(self, alpha: float, beta: float, z: float, min_samples: int, reset_gap_s: float):
+        self.alpha = alpha
+        self.beta = beta
+        self.z = z
+        self.min_samples = min_samples
+        self.reset_gap_s = reset_gap_s
+        self._slots: dict[str, int] = {}
+        self._state = {name: array("d") for name in _STATE}
+        self._alerted = array("b")   # nivel ya anticipado (0 = ninguno)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def state_bytes(self) -> int:
+        return sum(c.itemsize * len(c) for c in self._state.values()) + len(self._alerted)
+
+    def _slot(self, device_eui: str) -> int:
+        slot = self._slots.get(device_eui)
+        if slot is None:
+            slot = len(self._slots)
+            self._slots[device_eui] = slot
+            for column in self._state.values():
+                column.append(0.0)
+            self._state["last_t"][slot] = math.nan
+            self._state["hvar"][slot] = math.nan
+            self._alerted.append(0)
+        return slot
+
+    def update(self, device_eui: str, t: float, level_cm: float):
+        """Incorpora una lectura (t en epoch s). Repetidas o viejas se ignoran."""
+        i = self._slot(device_eui)
+        st = self._state
+        last_t = st["last_t"][i]
+        dt = t - last_t
+        if not dt > 0:           # también NaN: primera lectura
+            if math.isnan(last_t):
+                st["level"][i], st["trend"][i], st["n"][i] = level_cm, 0.0, 1.0
+                st["last_t"][i] = t
+            return
+        if dt > self.reset_gap_s:
+            st["level"][i], st["trend"][i], st["n"][i] = level_cm, 0.0, 1.0
+            st["last_t"][i], st["check_t"][i] = t, 0.0
+            return
+        self._check(i, t, level_cm)
+
+        level, trend = st["level"][i], st["trend"][i]
+        pred = level + trend * dt
+        e = level_cm - pred
+        st["level"][i] = pred + self.alpha * e
+        st["trend"][i] = trend + self.alpha * self.beta * e / dt
+        n = st["n"][i]
+        if n < 2:
+            st["var"][i] = e * e
+            st["step"][i] = dt
+        else:
+            st["var"][i] += VAR_GAMMA * (e * e - st["var"][i])
+            st["step"][i] += STEP_GAMMA * (dt - st["step"][i])
+        st["n"][i] = n + 1
+        st["last_t"][i] = t
+        if st["check_t"][i] == 0.0 and n + 1 >= self.min_samples:
+            st["check_t"][i] = t + CHECK_HORIZON_S
+            st["check_pred"][i] = st["level"][i] + st["trend"][i] * CHECK_HORIZON_S
+
+    def _check(self, i: int, t: float, level_cm: float):
+        """Cierra el pronóstico de control si ya llegó su instante."""
+        st = self._state
+        target = st["check_t"][i]
+        if target == 0.0 or t < target:
+            return
+        st["check_t"][i] = 0.0
+        if t - target > self.reset_gap_s:
+            return
+        e = level_cm - st["check_pred"][i]
+        hvar = st["hvar"][i]
+        st["hvar"][i] = e * e if math.isnan(hvar) else hvar + HVAR_GAMMA * (e * e - hvar)
+
+    def feed(self, device_eui: str, times, levels):
+        """Varias lecturas en orden temporal (warm-up / catch-up)."""
+        for t, level in zip(times, levels):
+            if level is not None and not math.isnan(level):
+                self.update(device_eui, t, level)
+
+    def warm_up(self, series):
+        """Series (eui, times, levels) del buffer de lecturas recientes."""
+        for device_eui, times, levels in series:
+            self.feed(device_eui, times, levels)
+
+    def last_time(self, device_eui: str) -> float | None:
+        i = self._slots.get(device_eui)
+        if i is None or math.isnan(self._state["last_t"][i]):
+            return None
+        return self._state["last_t"][i]
+
+    def ready(self, device_eui: str) -> bool:
+        i = self._slots.get(device_eui)
+        return i is not None and self._state["n"][i] >= self.min_samples
+
+    def state(self, device_eui: str) -> dict | None:
+        if not self.ready(device_eui):
+            return None
+        i = self._slots[device_eui]
+        return {name: self._state[name][i] for name in _STATE}
+
+    def predict(self, device_eui: str, at: float) -> tuple[float, float, float] | None:
+        """(punto, inferior, superior) del nivel en el instante `at`."""
+        s = self.state(device_eui)
+        if s is None:
+            return None
+        h = max(0.0, at - s["last_t"])
+        point = s["level"] + s["trend"] * h
+        if not math.isnan(s["hvar"]):
+            var = s["var"] + max(0.0, s["hvar"] - s["var"]) * (h / CHECK_HORIZON_S) ** 2
+        else:
+            k = max(1.0, h / s["step"]) if s["step"] > 0 else 1.0
+            a, b = self.alpha, self.beta
+            var = s["var"] * (1 + (k - 1) * (a * a + a * b * k + b * b * k * (2 * k - 1) / 6))
+        half = self.z * math.sqrt(var)
+        return point, point - half, point + half
+
+    def minutes_to(self, device_eui: str, target_cm: float, now: float) -> float | None:
+        """Minutos desde `now` hasta que el pronóstico puntual llega a target_cm."""
+        s = self.state(device_eui)
+        if s is None:
+            return None
+        level_now = s["level"] + s["trend"] * max(0.0, now - s["last_t"])
+        if level_now >= target_cm:
+            return 0.0
+        if s["trend"] <= 0:
+            return None
+        return (target_cm - level_now) / s["trend"] / 60
+
+    def crossing(self, device_eui: str, thresholds: dict[str, float], now: float,
+                 horizon_min: float) -> tuple[str, float] | None:
+        """
+        Nivel más alto de FORECAST_LEVELS que el pronóstico cruza
+        dentro del horizonte, con los minutos que faltan.
+        """
+        for name in FORECAST_LEVELS:
+            minutes = self.minutes_to(device_eui, thresholds[name], now)
+            if minutes is not None and 0 < minutes <= horizon_min:
+                return name, minutes
+        return None
+
+    def check_alert(self, device_eui: str, thresholds: dict[str, float], now: float,
+                    horizon_min: float) -> tuple[str, float] | None:
+        """
+        Cruce a anticipar, solo al entrar (una alerta por episodio y
+        nivel). Con histéresis: el episodio termina cuando no se
+        proyecta ningún cruce ni al doble del horizonte.
+        """
+        hit = self.crossing(device_eui, thresholds, now, horizon_min)
+        i = self._slot(device_eui)
+        if hit is None:
+            if self.crossing(device_eui, thresholds, now, 2 * horizon_min) is None:
+                self._alerted[i] = 0
+            return None
+        code = _LEVEL_CODES[hit[0]]
+        if code <= self._alerted[i]:
+            return None
+        self._alerted[i] = code
+        return hit
+
+    def snapshot(self) -> dict:
+        return {"slots": dict(self._slots), "state": self._state, "alerted": self._alerted}
+
+    def restore(self, state: dict):
+        self._slots = dict(state["slots"])
+        self._state = {name: state["state"][name] for name in _STATE}
+        self._alerted = state["alerted"]
+
+    def reset(self, device_eui: str):
+        i = self._slots.get(device_eui)
+        if i is None:
+            return
+        for column in self._state.values():
+            column[i] = 0.0
+        self._state["last_t"][i] = math.nan
+        self._state["hvar"][i] = math.nan
+        self._alerted[i] = 0
+
+    def stats(self) -> dict:
+        return {
+            "devices": len(self),
+            "ready": sum(1 for i in self._slots.values() if self._state["n"][i] >= self.min_samples),
+            "state_bytes": self.state_bytes(),
+        }
+
+
+def threshold_levels(device) -> dict[str, float]:
+    """Umbrales del device en cm de nivel de agua."""
+    return {
+        "WARNING": device.bridge_height_cm * device.threshold_warning_pct / 100,
+        "CRITICAL": device.bridge_height_cm * device.threshold_critical_pct / 100,
+    }
+
+
+# ─── Instancia global ─────────────────────────────────
+level_forecaster = LevelForecaster(
+    alpha=settings.FORECAST_ALPHA,
+    beta=settings.FORECAST_BETA,
+    z=settings.FORECAST_Z,
+    min_samples=settings.FORECAST_MIN_SAMPLES,
+    reset_gap_s=settings.FORECAST_RESET_GAP_MIN * 60,
+)
@@ -10,6 +10,7 @@ Topic ChirpStack v4:
 import asyncio
 import base64
 import json
+import zlib
 from datetime import datetime, timezone
 
 import aiomqtt
@@ -18,10 +19,36 @@ from sqlalchemy import select
 
 from app.core.config import settings
 from app.core.database import get_db_session
+from app.core.startup import startup_timer
 from app.models.device import Device
-from app.models.reading import SensorReading
-from app.services.alert_service import evaluate_alert_level, send_telegram_alert
+from app.models.track import TrackPoint
+from app.models.reading import (
+    ALERT_LEVEL_CODES,
+    CompactReading,
+    GpsFix,
+    SensorReading,
+    new_reading_id,
+)
+from app.services.alert_service import (
+    evaluate_alert_level,
+    evaluate_rise,
+    send_downstream_alert,
+    send_forecast_alert,
+    send_rise_alert,
+    send_status_alert,
+    send_telegram_alert,
+)
 from app.services.decoder import decode_payload
+from app.services.geo_index import geo_index
+from app.services.level_forecast import level_forecaster, threshold_levels
+from app.services.offline_monitor import offline_monitor
+from app.services.outlier_filter import outlier_filter
+from app.services.recompute_jobs import DERIVED_INPUTS
+from app.services.recent_buffer import recent_buffer
+from app.services.response_cache import response_cache
+from app.services.rise_rate import rise_estimator
+from app.services.river_network import river_network
+from app.services.storage_compression import reading_compressor
 
 logger = structlog.get_logger()
 
@@ -35,23 +62,59 @@ class MQTTClient:
     de uplinks LoRaWAN desde ChirpStack.
     """
 
-    def __init__(self):
+    def __init__(self, shard: tuple[int, int] | None = None, identifier: str | None = None):
+        """
+        shard=(i, n): solo procesa los devices con shard_of(eui, n) == i
+        (worker i de n del runner de ingest). None = todos.
+        """
         self._task: asyncio.Task | None = None
+        self.shard = shard
+        self.identifier = identifier
+        # device → DERIVED_INPUTS con que se alimentaron tendencia y pronóstico
+        self._geometry: dict[str, tuple] = {}
+
+    def owns(self, device_eui: str) -> bool:
+        if self.shard is None:
+            return True
+        index, total = self.shard
+        return shard_of(device_eui, total) == index
+
+    def _check_geometry(self, device: Device):
+        """
+        Resetea tendencia y pronóstico si cambiaron altura o umbrales
+        desde el último uplink. El PATCH ya lo hace en su proceso; con
+        INGEST_MODE=external los workers se enteran por acá, al leer
+        la fila del device en el próximo uplink.
+        """
+        geometry = tuple(getattr(device, f) for f in DERIVED_INPUTS)
+        previous = self._geometry.get(device.device_eui)
+        self._geometry[device.device_eui] = geometry
+        if previous is not None and previous != geometry:
+            rise_estimator.reset(device.device_eui)
+            level_forecaster.reset(device.device_eui)
+            logger.info("ingest.device_reconfigured", device=device.device_eui)
 
     async def connect(self):
         """Inicia la escucha de mensajes MQTT en background."""
         self._task = asyncio.create_task(self._listen())
-        logger.info("mqtt.listener_started", topic=UPLINK_TOPIC)
+        logger.info("mqtt.listener_started", topic=UPLINK_TOPIC, shard=self.shard)
 
     async def disconnect(self):
-        """Cancela la tarea de escucha limpiamente."""
+        """
+        Cancela la tarea de escucha limpiamente y persiste las
+        lecturas que la compresión tenía retenidas.
+        """
         if self._task:
             self._task.cancel()
             try:
                 await self._task
             except asyncio.CancelledError:
                 pass
-        logger.info("mqtt.listener_stopped")
+        held = reading_compressor.drain()
+        if held:
+            async with get_db_session() as db:
+                db.add_all(held)
+        logger.info("mqtt.listener_stopped", held_rows=len(held))
 
     async def _listen(self):
         """
@@ -65,6 +128,7 @@ class MQTTClient:
                     port=settings.MQTT_PORT,
                     username=settings.MQTT_USER or None,
                     password=settings.MQTT_PASSWORD or None,
+                    identifier=self.identifier,
                 ) as client:
                     logger.info(
                         "mqtt.connected",
@@ -72,10 +136,15 @@ class MQTTClient:
                         port=settings.MQTT_PORT,
                     )
                     await client.subscribe(UPLINK_TOPIC)
+                    startup_timer.mark("mqtt_subscribed")
 
                     async for message in client.messages:
+                        topic = str(message.topic)
+                        # Sharding por EUI: se descarta antes de parsear el JSON
+                        if not self.owns(topic_device_eui(topic)):
+                            continue
                         await self._process_message(
-                            topic=str(message.topic),
+                            topic=topic,
                             payload=message.payload,
                         )
 
@@ -92,44 +161,21 @@ class MQTTClient:
         Procesa un uplink de ChirpStack:
         1. Parsea JSON del mensaje
         2. Decodifica payload base64 del sensor
-        3. Calcula nivel de agua con altura del puente
+        3. Filtra ecos espurios (Hampel por device) y calcula
+           el nivel de agua con altura del puente
         4. Evalúa nivel de alerta según umbrales del device
-        5. Persiste SensorReading en TimescaleDB
-        6. Envía alerta Telegram si es necesario
+           y velocidad de subida (RISING_FAST)
+        5. Persiste SensorReading en TimescaleDB (o la retiene si el
+           device tiene compresión y la serie no la necesita aún)
+        6. Agrega la lectura al buffer de lecturas recientes
+           (siempre, aunque la fila haya quedado retenida)
+        7. Envía alertas Telegram si es necesario (y el aviso
+           aguas abajo si el puente entra en WARNING)
         """
-        try:
-            data = json.loads(payload)
-        except json.JSONDecodeError:
-            logger.error("mqtt.invalid_json", topic=topic)
-            return
-
-        # Extraer device EUI del mensaje ChirpStack
-        device_eui = (
-            data.get("deviceInfo", {}).get("devEui", "")
-            or data.get("devEUI", "")
-        ).upper()
-
-        if not device_eui:
-            logger.warning("mqtt.no_device_eui", topic=topic)
-            return
-
-        # Decodificar payload base64 → bytes del sensor
-        raw_b64 = data.get("data", "")
-        if not raw_b64:
-            logger.warning("mqtt.empty_payload", device=device_eui)
-            return
-
-        raw_bytes = base64.b64decode(raw_b64)
-        decoded = decode_payload(raw_bytes)
-
-        if not decoded:
-            logger.warning("mqtt.decode_failed", device=device_eui)
+        parsed = parse_uplink(topic, payload)
+        if parsed is None:
             return
-
-        # Señal LoRa
-        rx_info = data.get("rxInfo", [{}])[0]
-        rssi = rx_info.get("rssi")
-        snr  = rx_info.get("snr")
+        device_eui, decoded, rssi, snr = parsed
 
         async with get_db_session() as db:
             # Buscar configuración del dispositivo
@@ -145,45 +191,119 @@ class MQTTClient:
                     hint="Register it via POST /api/v1/devices",
                 )
                 return
+            self._check_geometry(device)
+
+            # Ecos espurios del ultrasónico: se reemplazan por la mediana
+            raw_cm = decoded["distance_cm"]
+            distance_cm, rejected = outlier_filter.update(device_eui, raw_cm)
+            if rejected:
+                decoded = {**decoded, "distance_cm": distance_cm}
+                logger.info("reading.outlier_rejected", device=device_eui,
+                            raw_cm=raw_cm, filtered_cm=distance_cm)
 
             # Calcular nivel de agua
-            distance_cm  = decoded["distance_cm"]
             water_level  = max(0.0, device.bridge_height_cm - distance_cm)
             fill_pct     = min(100.0, (water_level / device.bridge_height_cm) * 100)
             alert_level  = evaluate_alert_level(fill_pct, device)
+            reading_time = datetime.now(timezone.utc)
+
+            # Tendencia: velocidad de subida y tiempo a CRITICAL (O(1))
+            rise_rate = rise_estimator.update(
+                device_eui, reading_time.timestamp(), water_level
+            )
+            minutes_to_critical, rising_fast = evaluate_rise(
+                device, water_level, rise_rate,
+                was_rising=rise_estimator.is_rising(device_eui),
+            )
+            rise_alert = rise_estimator.mark_rising(device_eui, rising_fast)
 
-            # Persistir lectura
-            reading = SensorReading(
-                device_eui    = device_eui,
-                time          = datetime.now(timezone.utc),
-                distance_cm   = distance_cm,
-                water_level_cm= water_level,
-                fill_pct      = fill_pct,
-                battery_mv    = decoded["battery_mv"],
-                battery_pct   = decoded["battery_pct"],
-                rssi          = rssi,
-                snr           = snr,
-                latitude      = decoded.get("latitude"),
-                longitude     = decoded.get("longitude"),
-                alert_level   = alert_level,
+            # Pronóstico Holt (O(1)): ¿cruza WARNING/CRITICAL pronto?
+            now_s = reading_time.timestamp()
+            level_forecaster.update(device_eui, now_s, water_level)
+            forecast_alert = level_forecaster.check_alert(
+                device_eui, threshold_levels(device), now_s, settings.FORECAST_ALERT_MIN
             )
-            db.add(reading)
 
-            # Actualizar last_seen del device
-            device.last_seen = reading.time
+            # Persistir lectura (con tolerancia, solo las que hacen falta
+            # para reconstruir la serie; ver storage_compression)
+            reading_id   = new_reading_id(device_eui, reading_time)
+            reading_row, *extra_rows = _build_rows(
+                reading_id  = reading_id,
+                device_eui  = device_eui,
+                time        = reading_time,
+                decoded     = decoded,
+                water_level = water_level,
+                fill_pct    = fill_pct,
+                alert_level = alert_level,
+                rssi        = rssi,
+                snr         = snr,
+                rise_rate   = rise_rate,
+                minutes_to_critical = minutes_to_critical,
+                distance_raw_cm = raw_cm if rejected else None,
+            )
+            rows = reading_compressor.offer(
+                device_eui, now_s, water_level, device.storage_tolerance_cm, reading_row,
+                code=ALERT_LEVEL_CODES[alert_level],
+                # Con GPS siempre: la vista compacta parte de las lecturas
+                # (LEFT JOIN gps_fixes), un fix sin lectura no se vería
+                force=rejected or bool(decoded.get("has_gps")),
+            )
+            db.add_all(rows)
+            db.add_all(extra_rows)   # GpsFix: siempre
 
+            # Actualizar last_seen del device y su deadline de OFFLINE
+            device.last_seen = reading_time
+            back_online = offline_monitor.touch(device_eui, reading_time.timestamp())
+
+            # Índice espacial: solo los movimientos significativos van al track
+            if decoded.get("has_gps"):
+                moved = geo_index.observe_fix(
+                    device_eui, decoded["latitude"], decoded["longitude"]
+                )
+                if moved is not None:
+                    db.add(TrackPoint(
+                        device_eui = device_eui,
+                        time       = reading_time,
+                        latitude   = decoded["latitude"],
+                        longitude  = decoded["longitude"],
+                        moved_m    = moved or None,   # None en el primer fix
+                    ))
+
+            # reading.compressed: la compresión no la guardó (o la retuvo)
             logger.info(
-                "reading.saved",
+                "reading.saved" if any(r is reading_row for r in rows) else "reading.compressed",
                 device=device_eui,
                 water_level_cm=water_level,
                 fill_pct=round(fill_pct, 1),
                 alert=alert_level,
+                rise_rate_cm_min=rise_rate,
                 battery_pct=decoded["battery_pct"],
                 has_gps=decoded.get("has_gps", False),
                 latitude=decoded.get("latitude"),
                 longitude=decoded.get("longitude"),
             )
 
+        # El buffer sirve la serie sin comprimir: cada uplink, también
+        # los retenidos por storage_compression que aún no tienen fila
+        recent_buffer.append(device_eui, {
+            "id":             reading_id,
+            "time":           reading_time,
+            "distance_cm":    distance_cm,
+            "distance_raw_cm": raw_cm if rejected else None,
+            "water_level_cm": water_level,
+            "fill_pct":       fill_pct,
+            "battery_pct":    decoded["battery_pct"],
+            "rssi":           rssi,
+            "snr":            snr,
+            "latitude":       decoded.get("latitude"),
+            "longitude":      decoded.get("longitude"),
+            "rise_rate_cm_min":    rise_rate,
+            "minutes_to_critical": minutes_to_critical,
+            "alert_level":    alert_level,
+        })
+        # Invalida ETags y respuestas cacheadas del device
+        response_cache.bump(device_eui)
+
         # Enviar alerta Telegram (fuera de la sesión DB)
         if alert_level != "NORMAL":
             await send_telegram_alert(
@@ -193,3 +313,172 @@ class MQTTClient:
                 alert_level  = alert_level,
                 battery_pct  = decoded["battery_pct"],
             )
+
+        if back_online:
+            await send_status_alert(device, "BACK_ONLINE", reading_time)
+
+        # Alerta de tendencia: solo al entrar en RISING_FAST
+        if rise_alert:
+            await send_rise_alert(
+                device              = device,
+                water_level_cm      = water_level,
+                rise_rate_cm_min    = rise_rate,
+                minutes_to_critical = minutes_to_critical,
+            )
+
+        # Pronóstico: solo al anticipar un nivel más alto que el último
+        if forecast_alert:
+            forecast_level, minutes = forecast_alert
+            predicted = level_forecaster.predict(device_eui, now_s + minutes * 60)
+            await send_forecast_alert(
+                device         = device,
+                water_level_cm = water_level,
+                forecast_level = forecast_level,
+                minutes        = minutes,
+                upper_cm       = predicted[2] if predicted else None,
+            )
+
+        # Crecida: avisar a los puentes aguas abajo con su ETA
+        if river_network.entered_flood(device_eui, alert_level):
+            await self._notify_downstream(device, alert_level)
+
+    async def _notify_downstream(self, device: Device, alert_level: str):
+        """Alerta DOWNSTREAM_ETA a cada puente aguas abajo de device."""
+        async with get_db_session() as db:
+            await river_network.get(db)
+            etas = river_network.downstream_eta(device.device_eui)
+            if not etas:
+                return
+            result = await db.execute(
+                select(Device).where(
+                    Device.device_eui.in_([e["device_eui"] for e in etas]),
+                    Device.is_active.is_(True),
+                )
+            )
+            targets = {d.device_eui: d for d in result.scalars()}
+
+        for eta in etas:
+            target = targets.get(eta["device_eui"])
+            if target is not None:
+                await send_downstream_alert(
+                    device         = target,
+                    upstream       = device,
+                    upstream_level = alert_level,
+                    eta_min        = eta["eta_min"],
+                    hops           = eta["hops"],
+                )
+
+
+def parse_uplink(topic: str, payload: bytes):
+    """
+    Parsea y decodifica un uplink de ChirpStack (sin tocar la DB).
+    Retorna (device_eui, decoded, rssi, snr) o None si es inválido.
+    """
+    try:
+        data = json.loads(payload)
+    except json.JSONDecodeError:
+        logger.error("mqtt.invalid_json", topic=topic)
+        return None
+
+    # Extraer device EUI del mensaje ChirpStack
+    device_eui = (
+        data.get("deviceInfo", {}).get("devEui", "")
+        or data.get("devEUI", "")
+    ).upper()
+
+    if not device_eui:
+        logger.warning("mqtt.no_device_eui", topic=topic)
+        return None
+
+    # Decodificar payload base64 → bytes del sensor
+    raw_b64 = data.get("data", "")
+    if not raw_b64:
+        logger.warning("mqtt.empty_payload", device=device_eui)
+        return None
+
+    raw_bytes = base64.b64decode(raw_b64)
+    decoded = decode_payload(raw_bytes)
+
+    if not decoded:
+        logger.warning("mqtt.decode_failed", device=device_eui)
+        return None
+
+    # Señal LoRa
+    rx_info = data.get("rxInfo", [{}])[0]
+    rssi = rx_info.get("rssi")
+    snr  = rx_info.get("snr")
+    return device_eui, decoded, rssi, snr
+
+
+def shard_of(device_eui: str, total: int) -> int:
+    """Shard dueño de un device: hash estable del EUI (igual en todos los procesos)."""
+    return zlib.crc32(device_eui.upper().encode()) % total
+
+
+def topic_device_eui(topic: str) -> str:
+    """EUI desde el topic application/{app}/device/{eui}/event/up."""
+    parts = topic.split("/")
+    return parts[3].upper() if len(parts) > 3 else ""
+
+
+def _build_rows(
+    reading_id,
+    device_eui: str,
+    time: datetime,
+    decoded: dict,
+    water_level: float,
+    fill_pct: float,
+    alert_level: str,
+    rssi: int | None,
+    snr: float | None,
+    rise_rate: float | None = None,
+    minutes_to_critical: float | None = None,
+    distance_raw_cm: float | None = None,
+) -> list:
+    """
+    Construye las filas a persistir según READINGS_STORAGE.
+    decoded["distance_cm"] es la distancia ya filtrada;
+    distance_raw_cm, la cruda si el filtro la rechazó.
+    legacy  → 1 SensorReading con columnas derivadas
+    compact → 1 CompactReading (+ 1 GpsFix si el uplink trajo GPS)
+    """
+    if settings.READINGS_STORAGE != "compact":
+        return [SensorReading(
+            id            = reading_id,
+            device_eui    = device_eui,
+            time          = time,
+            distance_cm   = decoded["distance_cm"],
+            distance_raw_cm = distance_raw_cm,
+            water_level_cm= water_level,
+            fill_pct      = fill_pct,
+            battery_mv    = decoded["battery_mv"],
+            battery_pct   = decoded["battery_pct"],
+            rssi          = rssi,
+            snr           = snr,
+            latitude      = decoded.get("latitude"),
+            longitude     = decoded.get("longitude"),
+            alert_level   = alert_level,
+            rise_rate_cm_min    = rise_rate,
+            minutes_to_critical = minutes_to_critical,
+        )]
+
+    rows = [CompactReading(
+        device_eui  = device_eui,
+        time        = time,
+        distance_cm = decoded["distance_cm"],
+        distance_raw_cm = distance_raw_cm,
+        battery_mv  = min(decoded["battery_mv"], 32767),  # smallint
+        rssi        = rssi,
+        snr         = snr,
+        alert_code  = ALERT_LEVEL_CODES[alert_level],
+        rise_rate_cm_min    = rise_rate,
+        minutes_to_critical = minutes_to_critical,
+    )]
+    if decoded.get("has_gps"):
+        rows.append(GpsFix(
+            device_eui = device_eui,
+            time       = time,
+            lat_e6     = round(decoded["latitude"] * 1_000_000),
+            lon_e6     = round(decoded["longitude"] * 1_000_000),
+        ))
+    return rows
@@ -0,0 +1,286 @@
+"""
+Detección de nodos fuera de línea con una rueda de timers.
+
+Cada uplink reprograma el deadline del device en O(1):
+    deadline = last_seen + max(OFFLINE_MIN_S, OFFLINE_FACTOR · intervalo)
+donde el intervalo esperado se aprende de la cadencia de uplinks: el
+menor de los primeros LEARN_GAPS huecos y después un EWMA de los
+huecos que no cruzaron el deadline (un nodo lento, p. ej. cada 10 min,
+no depende de OFFLINE_DEFAULT_INTERVAL_S para aprender su cadencia).
+
+Una tarea en background avanza la rueda cada OFFLINE_TICK_S y solo
+revisa los buckets que vencieron, sin escanear la tabla devices.
+Emite OFFLINE cuando vence un deadline y BACK_ONLINE cuando un nodo
+caído vuelve a reportar. Al arrancar se reconstruye desde last_seen.
+"""
+import asyncio
+import math
+import time as _time
+from datetime import datetime, timezone
+
+import structlog
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import get_db_session
+from app.models.device import Device
+from app.services.alert_service import send_status_alert
+
+logger = structlog.get_logger()
+
+# Peso de cada nuevo intervalo en el promedio EW
+INTERVAL_ALPHA = 0.2
+# Huecos iniciales de los que se toma el mínimo como cadencia
+LEARN_GAPS = 3
+
+
+class TimerWheel:
+    """
+    Rueda de timers con hash: `slots` buckets de `tick_s` segundos.
+    schedule/cancel son O(1); advance solo recorre los buckets
+    de los ticks transcurridos (a lo sumo una vuelta).
+    """
+
+    def __init__(self, tick_s: float, slots: int, now: float):
+        self.tick_s = tick_s
+        self.slots = slots
+        self._buckets: list[set[str]] = [set() for _ in range(slots)]
+        self._deadline: dict[str, int] = {}   # key → tick de vencimiento
+        self._current = math.floor(now / tick_s)
+
+    def __len__(self) -> int:
+        return len(self._deadline)
+
+    def schedule(self, key: str, deadline: float):
+        """(Re)programa `key` para vencer en el epoch `deadline`."""
+        tick = max(math.ceil(deadline / self.tick_s), self._current + 1)
+        old = self._deadline.get(key)
+        if old is not None:
+            self._buckets[old % self.slots].discard(key)
+        self._deadline[key] = tick
+        self._buckets[tick % self.slots].add(key)
+
+    def cancel(self, key: str):
+        old = self._deadline.pop(key, None)
+        if old is not None:
+            self._buckets[old % self.slots].discard(key)
+
+    def deadline(self, key: str) -> float | None:
+        tick = self._deadline.get(key)
+        return None if tick is None else tick * self.tick_s
+
+    def advance(self, now: float) -> list[str]:
+        """Avanza hasta `now` y retorna las keys vencidas."""
+        target = math.floor(now / self.tick_s)
+        steps = min(target - self._current, self.slots)
+        expired = []
+        for step in range(1, steps + 1):
+            bucket = self._buckets[(self._current + step) % self.slots]
+            # Deadlines a más de una vuelta comparten bucket: filtrar por tick
+            due = [key for key in bucket if self._deadline[key] <= target]
+            for key in due:
+                bucket.discard(key)
+                del self._deadline[key]
+            expired.extend(due)
+        self._current = max(self._current, target)
+        return expired
+
+
+class OfflineMonitor:
+    """Estado online/offline de la flota, servido desde memoria."""
+
+    def __init__(self):
+        now = _time.time()
+        self.wheel = TimerWheel(settings.OFFLINE_TICK_S, settings.OFFLINE_WHEEL_SLOTS, now)
+        self._last_seen: dict[str, float] = {}
+        self._interval: dict[str, float] = {}
+        self._learning: dict[str, int] = {}     # huecos iniciales que faltan
+        self._offline_since: dict[str, float] = {}
+        self._task: asyncio.Task | None = None
+
+    # ─── Ingest ───────────────────────────────────────
+    def touch(self, device_eui: str, t: float) -> bool:
+        """
+        Registra un uplink y reprograma el deadline.
+        Retorna True si el device estaba OFFLINE (→ BACK_ONLINE).
+        """
+        previous = self._last_seen.get(device_eui)
+        if previous is not None and t > previous:
+            dt = t - previous
+            expected = self._interval.get(device_eui)
+            if expected is None:
+                self._interval[device_eui] = dt
+                self._learning[device_eui] = LEARN_GAPS - 1
+            elif device_eui in self._learning:
+                # Primeros huecos: la cadencia es el menor (uno pudo ser una caída)
+                self._interval[device_eui] = min(expected, dt)
+                self._learning[device_eui] -= 1
+                if not self._learning[device_eui]:
+                    del self._learning[device_eui]
+            # Un hueco que cruzó el deadline es una caída, no la cadencia
+            elif dt <= self._timeout(device_eui) and device_eui not in self._offline_since:
+                self._interval[device_eui] = expected + INTERVAL_ALPHA * (dt - expected)
+
+        self._last_seen[device_eui] = t
+        self.wheel.schedule(device_eui, t + self._timeout(device_eui))
+        return self._offline_since.pop(device_eui, None) is not None
+
+    def forget(self, device_eui: str):
+        """Deja de vigilar un device (p. ej. desactivado)."""
+        self.wheel.cancel(device_eui)
+        for state in (self._last_seen, self._interval, self._learning, self._offline_since):
+            state.pop(device_eui, None)
+
+    def _timeout(self, device_eui: str) -> float:
+        expected = self._interval.get(device_eui, settings.OFFLINE_DEFAULT_INTERVAL_S)
+        return max(settings.OFFLINE_MIN_S, settings.OFFLINE_FACTOR * expected)
+
+    # ─── Vencimientos ─────────────────────────────────
+    def expire(self, now: float) -> list[str]:
+        """Marca OFFLINE los devices vencidos y los retorna."""
+        expired = self.wheel.advance(now)
+        for device_eui in expired:
+            self._offline_since[device_eui] = now
+        return expired
+
+    async def rebuild(self, db, owns=None):
+        """
+        Reconstruye el estado desde devices.last_seen (al arrancar).
+        `owns(eui)` limita a los devices de un worker de ingest.
+        """
+        result = await db.execute(
+            select(Device.device_eui, Device.last_seen)
+            .where(Device.is_active.is_(True), Device.last_seen.is_not(None))
+        )
+        now = _time.time()
+        for device_eui, last_seen in result.all():
+            if owns is not None and not owns(device_eui):
+                continue
+            self._watch(device_eui, last_seen.timestamp(), now)
+        logger.info("offline_monitor.rebuilt",
+                    watching=len(self.wheel), offline=len(self._offline_since))
+
+    def _watch(self, device_eui: str, t: float, now: float):
+        self._last_seen[device_eui] = t
+        deadline = t + self._timeout(device_eui)
+        if deadline <= now:
+            # Ya estaba caído antes del reinicio: sin alerta repetida
+            self._offline_since.setdefault(device_eui, deadline)
+        else:
+            self.wheel.schedule(device_eui, deadline)
+
+    def snapshot(self) -> dict:
+        return {
+            "last_seen": dict(self._last_seen),
+            "interval": dict(self._interval),
+            "offline_since": dict(self._offline_since),
+        }
+
+    def restore(self, state: dict):
+        """Como rebuild() pero desde un snapshot(), con la cadencia aprendida."""
+        self._interval.update(state["interval"])
+        self._offline_since.update(state["offline_since"])
+        now = _time.time()
+        for device_eui, t in state["last_seen"].items():
+            self._watch(device_eui, t, now)
+
+    # ─── Tarea en background ──────────────────────────
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.OFFLINE_TICK_S)
+            expired = self.expire(_time.time())
+            if not expired:
+                continue
+            logger.warning("offline_monitor.offline", devices=expired)
+            try:
+                await self._notify(expired, "OFFLINE")
+            except Exception as e:
+                logger.error("offline_monitor.notify_failed", error=str(e))
+
+    async def _notify(self, device_euis: list[str], status: str):
+        async with get_db_session() as db:
+            result = await db.execute(
+                select(Device).where(Device.device_eui.in_(device_euis))
+            )
+            devices = result.scalars().all()
+        for device in devices:
+            await send_status_alert(device, status, self.last_seen(device.device_eui))
+
+    # ─── Consulta (endpoint /devices/health) ──────────
+    def last_seen(self, device_eui: str) -> datetime | None:
+        t = self._last_seen.get(device_eui)
+        return datetime.fromtimestamp(t, tz=timezone.utc) if t else None
+
+    def stats(self) -> dict:
+        return {
+            "watching": len(self.wheel),
+            "offline": len(self._offline_since),
+        }
+
+    def health(self) -> list[dict]:
+        now = _time.time()
+        report = []
+        for device_eui, t in self._last_seen.items():
+            offline_since = self._offline_since.get(device_eui)
+            deadline = self.wheel.deadline(device_eui)
+            report.append({
+                "device_eui": device_eui,
+                "status": "OFFLINE" if offline_since is not None else "ONLINE",
+                "last_seen": datetime.fromtimestamp(t, tz=timezone.utc),
+                "silent_s": round(now - t, 1),
+                "expected_interval_s": round(
+                    self._interval.get(device_eui, settings.OFFLINE_DEFAULT_INTERVAL_S), 1
+                ),
+                "offline_at": (
+                    datetime.fromtimestamp(deadline, tz=timezone.utc) if deadline else None
+                ),
+                "offline_since": (
+                    datetime.fromtimestamp(offline_since, tz=timezone.utc)
+                    if offline_since is not None else None
+                ),
+            })
+        return report
+
+    async def health_from_db(self, db) -> list[dict]:
+        """
+        Mismo reporte que health() pero desde devices.last_seen, con
+        el timeout por defecto. Para INGEST_MODE=external: el monitor
+        con la cadencia aprendida corre en los workers de ingest.
+        """
+        result = await db.execute(
+            select(Device.device_eui, Device.last_seen)
+            .where(Device.is_active.is_(True), Device.last_seen.is_not(None))
+        )
+        now = _time.time()
+        timeout = max(settings.OFFLINE_MIN_S,
+                      settings.OFFLINE_FACTOR * settings.OFFLINE_DEFAULT_INTERVAL_S)
+        report = []
+        for device_eui, last_seen in result.all():
+            t = last_seen.timestamp()
+            deadline = datetime.fromtimestamp(t + timeout, tz=timezone.utc)
+            offline = now >= t + timeout
+            report.append({
+                "device_eui": device_eui,
+                "status": "OFFLINE" if offline else "ONLINE",
+                "last_seen": last_seen,
+                "silent_s": round(now - t, 1),
+                "expected_interval_s": settings.OFFLINE_DEFAULT_INTERVAL_S,
+                "offline_at": None if offline else deadline,
+                "offline_since": deadline if offline else None,
+            })
+        return report
+
+
+# ─── Instancia global ─────────────────────────────────
+offline_monitor = OfflineMonitor()
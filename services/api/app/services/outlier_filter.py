@@ -0,0 +1,152 @@
+"""
+Filtro de Hampel por device sobre distance_cm (ecos espurios).
+
+El JSN-SR04T devuelve ecos cortos falsos (arañas, lluvia, basura
+flotando) que el decoder no distingue de una medición real: una
+sola lectura de 40 cm en un puente de 300 cm es un CRITICAL falso
+y una ráfaga de Telegrams. Antes de calcular el nivel, cada uplink
+pasa por una ventana móvil de las últimas OUTLIER_WINDOW
+distancias crudas del device:
+
+    med = mediana(ventana)
+    σ   = 1.4826 · mediana(|ventana - med|)      (MAD escalado)
+    rechazo si |x - med| > OUTLIER_K · max(σ, OUTLIER_MIN_DEV_CM)
+
+Una lectura rechazada se reemplaza por la mediana; la cruda queda
+en la ventana, así que un cambio real y sostenido (una crecida
+súbita) se acepta cuando ocupa la mitad de la ventana (con 7 y
+uplinks cada 30 s, ~1.5 min de demora).
+
+Cada device tiene un ring de distancias y una copia ordenada del
+mismo tamaño, en arrays contiguos indexados por slot (como
+rise_rate). Actualizar es una búsqueda binaria para sacar la más
+vieja y otra para insertar la nueva (O(log N) + memmove de N
+floats); la mediana sale de la copia ordenada. El MAD (O(N)) solo
+se calcula si la lectura se aleja de la mediana más que el piso.
+"""
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+
+from app.core.config import settings
+
+# MAD → desviación estándar para ruido gaussiano
+MAD_SCALE = 1.4826
+
+
+class OutlierFilter:
+    """Ventanas de Hampel por device en arrays compactos."""
+
+    def __init__(self, window: int, k: float, min_dev: float, min_samples: int):
+        self.window = window
+        self.k = k
+        self.min_dev = min_dev
+        self.min_samples = min_samples
+        self._slots: dict[str, int] = {}
+        self._ring = array("d")
+        self._sorted = array("d")
+        self._count = array("H")
+        self._head = array("H")
+        self.updates = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def state_bytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in
+                   (self._ring, self._sorted, self._count, self._head))
+
+    def _slot(self, device_eui: str) -> int:
+        slot = self._slots.get(device_eui)
+        if slot is None:
+            slot = len(self._slots)
+            self._slots[device_eui] = slot
+            self._ring.frombytes(bytes(8 * self.window))
+            self._sorted.frombytes(bytes(8 * self.window))
+            self._count.append(0)
+            self._head.append(0)
+        return slot
+
+    def update(self, device_eui: str, distance_cm: float) -> tuple[float, bool]:
+        """
+        Agrega una distancia cruda. Retorna (distancia filtrada, rechazada):
+        la misma si se acepta, la mediana de la ventana si no.
+        """
+        if self.window <= 0:
+            return distance_cm, False
+        i = self._slot(device_eui)
+        n, base = self.window, i * self.window
+        srt = self._sorted
+        count, head = self._count[i], self._head[i]
+
+        # Sacar de la copia ordenada la que sale del ring
+        if count == n:
+            p = bisect_left(srt, self._ring[base + head], base, base + n)
+            srt[p:base + n - 1] = srt[p + 1:base + n]
+            count -= 1
+        # Insertar la nueva en orden
+        q = bisect_right(srt, distance_cm, base, base + count)
+        srt[q + 1:base + count + 1] = srt[q:base + count]
+        srt[q] = distance_cm
+        count += 1
+        self._ring[base + head] = distance_cm
+        self._head[i] = (head + 1) % n
+        self._count[i] = count
+        self.updates += 1
+
+        if count < self.min_samples:
+            return distance_cm, False
+        med = _median(srt, base, count)
+        dev = abs(distance_cm - med)
+        if dev <= self.k * self.min_dev:
+            return distance_cm, False
+        mad = _median(sorted(abs(srt[j] - med) for j in range(base, base + count)), 0, count)
+        if dev <= self.k * max(MAD_SCALE * mad, self.min_dev):
+            return distance_cm, False
+        self.rejected += 1
+        return med, True
+
+    def warm_up(self, series):
+        """Llena las ventanas con series (eui, times, distancias) en orden temporal."""
+        for device_eui, _, values in series:
+            for value in values[-self.window:] if self.window > 0 else ():
+                if not math.isnan(value):
+                    self.update(device_eui, value)
+        self.updates = self.rejected = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "slots": dict(self._slots),
+            "arrays": (self._ring, self._sorted, self._count, self._head),
+        }
+
+    def restore(self, state: dict):
+        self._slots = dict(state["slots"])
+        self._ring, self._sorted, self._count, self._head = state["arrays"]
+
+    def stats(self) -> dict:
+        return {
+            "devices": len(self._slots),
+            "window": self.window,
+            "updates": self.updates,
+            "rejected": self.rejected,
+            "state_bytes": self.state_bytes(),
+        }
+
+
+def _median(values, start: int, count: int) -> float:
+    """Mediana de values[start:start+count], ya ordenados."""
+    mid = start + count // 2
+    if count % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2
+
+
+# ─── Instancia global ─────────────────────────────────
+outlier_filter = OutlierFilter(
+    window=settings.OUTLIER_WINDOW,
+    k=settings.OUTLIER_K,
+    min_dev=settings.OUTLIER_MIN_DEV_CM,
+    min_samples=settings.OUTLIER_MIN_SAMPLES,
+)
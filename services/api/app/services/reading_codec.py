@@ -0,0 +1,125 @@
+"""
+Formatos compactos para el historial de lecturas (GET /{eui}/readings).
+
+  · json     → lista de objetos ReadingOut (formato histórico)
+  · columnar → JSON con un array por campo, sin repetir claves
+  · msgpack  → mismo layout columnar en MessagePack (id como 16 bytes)
+
+En los formatos columnares time va como epoch en milisegundos y
+device_eui una sola vez. Las columnas se arman directo desde las
+filas de la query o del buffer en memoria, sin pasar por ReadingOut.
+
+Además se comprime con brotli o gzip según Accept-Encoding, solo si
+el cuerpo pasa de COMPRESS_MIN_BYTES (lo chico no vale el CPU).
+msgpack y brotli se importan al usarse: no están en el camino del
+arranque.
+"""
+import functools
+import gzip
+import json
+import uuid
+from datetime import datetime, timezone
+
+FORMATS = ("json", "columnar", "msgpack")
+MEDIA_TYPES = {
+    "json": "application/json",
+    "columnar": "application/vnd.aquaalert.columnar+json",
+    "msgpack": "application/msgpack",
+}
+# Alias de Accept → formato
+_ACCEPT = {
+    "application/vnd.aquaalert.columnar+json": "columnar",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+}
+
+# Orden de las columnas en la respuesta
+COLUMNS = (
+    "id", "time", "distance_cm", "distance_raw_cm", "water_level_cm", "fill_pct",
+    "battery_pct", "rssi", "snr", "latitude", "longitude",
+    "rise_rate_cm_min", "minutes_to_critical", "alert_level",
+)
+
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5   # ~gzip -6 en CPU, 10-20% más chico
+
+
+def negotiate_format(accept: str | None, requested: str | None = None) -> str:
+    """`?format=` manda; si no, el primer tipo conocido del header Accept."""
+    if requested:
+        return requested
+    for part in (accept or "").split(","):
+        fmt = _ACCEPT.get(part.split(";")[0].strip().lower())
+        if fmt:
+            return fmt
+    return "json"
+
+
+def columns_from_rows(rows) -> dict[str, list]:
+    """
+    Filas de la query (tuplas en el orden de COLUMNS) → columnas.
+    id como 16 bytes y time como epoch, igual que el buffer.
+    """
+    if not rows:
+        return {name: [] for name in COLUMNS}
+    columns = dict(zip(COLUMNS, (list(c) for c in zip(*rows))))
+    columns["id"] = [i.bytes if isinstance(i, uuid.UUID) else uuid.UUID(str(i)).bytes
+                     for i in columns["id"]]
+    columns["time"] = [t.timestamp() for t in columns["time"]]
+    return columns
+
+
+def rows_from_columns(device_eui: str, columns: dict[str, list]) -> list[dict]:
+    """Inversa de columns_from_rows: columnas → dicts con los campos de ReadingOut."""
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    for row in rows:
+        row["id"] = str(uuid.UUID(bytes=row["id"]))
+        row["time"] = datetime.fromtimestamp(row["time"], timezone.utc)
+        row["device_eui"] = device_eui
+    return rows
+
+
+def _layout(device_eui: str, columns: dict[str, list], ids) -> dict:
+    out = {name: columns[name] for name in COLUMNS}
+    out["id"] = ids
+    out["time"] = [round(t * 1000) for t in columns["time"]]
+    return {"device_eui": device_eui, "count": len(out["time"]), "columns": out}
+
+
+@functools.cache
+def _brotli():
+    """brotli es opcional: sin él se ofrece solo gzip."""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def encode_columns(device_eui: str, columns: dict[str, list], fmt: str) -> bytes:
+    """Serializa las columnas en `columnar` o `msgpack`."""
+    if fmt == "msgpack":
+        import msgpack
+
+        return msgpack.packb(_layout(device_eui, columns, columns["id"]), use_bin_type=True)
+    ids = [str(uuid.UUID(bytes=b)) for b in columns["id"]]
+    return json.dumps(_layout(device_eui, columns, ids), separators=(",", ":")).encode()
+
+
+def compress(body: bytes, accept_encoding: str | None) -> tuple[bytes, str | None]:
+    """Comprime según Accept-Encoding; retorna (cuerpo, Content-Encoding)."""
+    if len(body) < COMPRESS_MIN_BYTES or not accept_encoding:
+        return body, None
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in accept_encoding.split(",")
+        if not part.strip().endswith("q=0")
+    }
+    brotli = _brotli() if "br" in accepted else None
+    if brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+    return body, None
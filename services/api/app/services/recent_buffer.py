@@ -0,0 +1,348 @@
+"""
+Buffer en memoria de lecturas recientes por dispositivo.
+
+El listener MQTT agrega cada lectura a un ring buffer acotado
+por device (columnas en array, no objetos ORM) con las últimas
+RECENT_BUFFER_HOURS horas. Los endpoints de historial sirven
+desde aquí las ventanas contenidas en el buffer y solo van a
+Postgres cuando la ventana pedida es más vieja.
+
+Al arrancar se precarga la ventana desde la DB (warm_up), o se
+restaura del snapshot escrito al apagar (ver warm_state).
+El total de memoria se limita con RECENT_BUFFER_MAX_MB:
+si no caben más devices se descarta el menos reciente (LRU).
+"""
+import math
+import uuid
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import structlog
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.reading import ALERT_LEVEL_CODES, ALERT_LEVEL_NAMES, reading_model
+
+logger = structlog.get_logger()
+
+# Columnas numéricas guardadas como float64 (NaN = None)
+FLOAT_COLUMNS = (
+    "time",            # epoch en segundos
+    "distance_cm",
+    "water_level_cm",
+    "fill_pct",
+    "battery_pct",
+    "rssi",
+    "snr",
+    "latitude",
+    "longitude",
+    "rise_rate_cm_min",
+    "minutes_to_critical",
+    "distance_raw_cm",   # solo en lecturas rechazadas por outlier_filter
+)
+INT_COLUMNS = ("battery_pct", "rssi")
+
+# Bytes por slot: floats + alert_code (int8) + id (16 bytes)
+SLOT_BYTES = len(FLOAT_COLUMNS) * 8 + 1 + 16
+
+
+class DeviceRing:
+    """
+    Ring buffer columnar de capacidad fija para un device.
+    `covered_since` es el epoch desde el cual el buffer tiene
+    TODAS las lecturas del device (ni una menos).
+    """
+
+    __slots__ = ("device_eui", "capacity", "columns", "alert_codes",
+                 "ids", "head", "size", "covered_since")
+
+    def __init__(self, device_eui: str, capacity: int, covered_since: float):
+        self.device_eui = device_eui
+        self.capacity = capacity
+        self.columns = {
+            name: array("d", bytes(8 * capacity)) for name in FLOAT_COLUMNS
+        }
+        self.alert_codes = array("b", bytes(capacity))
+        self.ids = bytearray(16 * capacity)
+        self.head = 0   # próximo slot a escribir
+        self.size = 0
+        self.covered_since = covered_since
+
+    @classmethod
+    def from_state(cls, device_eui: str, capacity: int, state: tuple) -> "DeviceRing":
+        """Ring restaurado de un snapshot (sin reservar arrays nuevos)."""
+        ring = cls.__new__(cls)
+        ring.device_eui = device_eui
+        ring.capacity = capacity
+        (ring.columns, ring.alert_codes, ring.ids,
+         ring.head, ring.size, ring.covered_since) = state
+        return ring
+
+    def state(self) -> tuple:
+        return (self.columns, self.alert_codes, self.ids,
+                self.head, self.size, self.covered_since)
+
+    def append(self, reading: dict):
+        """Agrega una lectura (dict con las columnas de ReadingOut)."""
+        slot = self.head
+        if self.size == self.capacity:
+            # Se sobrescribe la más vieja: la cobertura empieza
+            # en la que queda como nueva más vieja
+            oldest = (slot + 1) % self.capacity
+            self.covered_since = self.columns["time"][oldest]
+        else:
+            self.size += 1
+
+        self.columns["time"][slot] = reading["time"].timestamp()
+        for name in FLOAT_COLUMNS[1:]:
+            value = reading.get(name)
+            self.columns[name][slot] = math.nan if value is None else value
+        self.alert_codes[slot] = ALERT_LEVEL_CODES[reading["alert_level"]]
+        self.ids[16 * slot:16 * slot + 16] = uuid.UUID(str(reading["id"])).bytes
+        self.head = (slot + 1) % self.capacity
+
+    def _row(self, slot: int) -> dict:
+        row = {
+            "id": str(uuid.UUID(bytes=bytes(self.ids[16 * slot:16 * slot + 16]))),
+            "device_eui": self.device_eui,
+            "alert_level": ALERT_LEVEL_NAMES[self.alert_codes[slot]],
+        }
+        for name in FLOAT_COLUMNS:
+            value = self.columns[name][slot]
+            if math.isnan(value):
+                row[name] = None
+            elif name in INT_COLUMNS:
+                row[name] = int(value)
+            else:
+                row[name] = value
+        row["time"] = datetime.fromtimestamp(row["time"], tz=timezone.utc)
+        return row
+
+    def series(self, name: str) -> tuple[list[float], list[float]]:
+        """(epochs, valores) de una columna, de la más vieja a la más nueva."""
+        start = (self.head - self.size) % self.capacity
+        slots = [(start + k) % self.capacity for k in range(self.size)]
+        times, values = self.columns["time"], self.columns[name]
+        return [times[i] for i in slots], [values[i] for i in slots]
+
+    def newest(self) -> dict | None:
+        if not self.size:
+            return None
+        return self._row((self.head - 1) % self.capacity)
+
+    def window(self, since: float, limit: int) -> list[dict] | None:
+        """
+        Lecturas con time >= since, de la más nueva a la más vieja,
+        máximo `limit`. Retorna None si el buffer no puede
+        garantizar la respuesta completa (hay que ir a la DB).
+        """
+        times = self.columns["time"]
+        rows = []
+        for k in range(self.size):
+            slot = (self.head - 1 - k) % self.capacity
+            if times[slot] < since:
+                break
+            rows.append(self._row(slot))
+            if len(rows) == limit:
+                return rows
+        if self.covered_since <= since:
+            return rows
+        return None
+
+    def window_columns(self, since: float, limit: int) -> dict[str, list] | None:
+        """
+        Igual que window() pero en columnas, sin armar un dict por fila:
+        id como 16 bytes, time como epoch, alert_level como nombre.
+        """
+        times = self.columns["time"]
+        slots = []
+        for k in range(min(self.size, limit)):
+            slot = (self.head - 1 - k) % self.capacity
+            if times[slot] < since:
+                break
+            slots.append(slot)
+        if len(slots) < limit and self.covered_since > since:
+            return None
+
+        out = {
+            "id": [bytes(self.ids[16 * i:16 * i + 16]) for i in slots],
+            "alert_level": [ALERT_LEVEL_NAMES[self.alert_codes[i]] for i in slots],
+        }
+        for name in FLOAT_COLUMNS:
+            column = self.columns[name]
+            values = [column[i] for i in slots]
+            if name in INT_COLUMNS:
+                out[name] = [None if math.isnan(v) else int(v) for v in values]
+            elif name == "time":
+                out[name] = values
+            else:
+                out[name] = [None if math.isnan(v) else v for v in values]
+        return out
+
+
+class RecentReadingsBuffer:
+    """Ring buffers por device con presupuesto global de memoria (LRU)."""
+
+    def __init__(self, hours: int, interval_s: int, max_mb: int):
+        self.span = timedelta(hours=hours)
+        self.capacity = max(1, hours * 3600 // max(1, interval_s))
+        budget = max_mb * 1024 * 1024
+        self.max_devices = budget // (self.capacity * SLOT_BYTES)
+        self.enabled = hours > 0 and self.max_devices > 0
+        self._rings: OrderedDict[str, DeviceRing] = OrderedDict()
+        # Epoch de la última lectura descartada por device (LRU / invalidate)
+        self._dropped_at: dict[str, float] = {}
+        self._started_at = datetime.now(timezone.utc).timestamp()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ─── Escritura (ingest) ───────────────────────────
+    def _ring(self, device_eui: str, covered_since: float) -> DeviceRing:
+        ring = self._rings.get(device_eui)
+        if ring is None:
+            if len(self._rings) >= self.max_devices:
+                self._drop(next(iter(self._rings)))
+                self.evictions += 1
+            # Si ya tuvo buffer, solo se garantiza lo posterior al descarte
+            dropped_at = self._dropped_at.pop(device_eui, None)
+            if dropped_at is not None:
+                covered_since = max(covered_since, dropped_at)
+            ring = DeviceRing(device_eui, self.capacity, covered_since)
+            self._rings[device_eui] = ring
+        else:
+            self._rings.move_to_end(device_eui)
+        return ring
+
+    def append(self, device_eui: str, reading: dict):
+        """Agrega un uplink procesado al buffer del device (tenga fila o no)."""
+        if not self.enabled:
+            return
+        # Un device nuevo solo garantiza lo visto desde que arrancó el buffer
+        ring = self._ring(device_eui, covered_since=self._started_at)
+        ring.append(reading)
+
+    def invalidate(self, device_eui: str):
+        """Descarta el buffer de un device (p. ej. si cambió su configuración)."""
+        if device_eui in self._rings:
+            self._drop(device_eui)
+
+    def _drop(self, device_eui: str):
+        ring = self._rings.pop(device_eui)
+        newest = ring.newest()
+        if newest is not None:
+            self._dropped_at[device_eui] = newest["time"].timestamp() + 1e-6
+
+    # ─── Lectura (routers) ────────────────────────────
+    def latest(self, device_eui: str) -> dict | None:
+        """Última lectura del device, o None si no está en memoria."""
+        ring = self._rings.get(device_eui) if self.enabled else None
+        row = ring.newest() if ring else None
+        self._count(row is not None)
+        return row
+
+    def window(self, device_eui: str, since: datetime, limit: int) -> list[dict] | None:
+        """Ventana [since, ahora] si está completa en memoria, si no None."""
+        ring = self._rings.get(device_eui) if self.enabled else None
+        rows = ring.window(since.timestamp(), limit) if ring else None
+        self._count(rows is not None)
+        return rows
+
+    def window_columns(self, device_eui: str, since: datetime, limit: int) -> dict[str, list] | None:
+        """Ventana en formato columnar (ver DeviceRing.window_columns)."""
+        ring = self._rings.get(device_eui) if self.enabled else None
+        columns = ring.window_columns(since.timestamp(), limit) if ring else None
+        self._count(columns is not None)
+        return columns
+
+    def iter_series(self, name: str):
+        """(eui, epochs, valores) de cada device en memoria, en orden temporal."""
+        for device_eui, ring in self._rings.items():
+            times, values = ring.series(name)
+            yield device_eui, times, values
+
+    def _count(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    # ─── Warm-up al arrancar ──────────────────────────
+    async def warm_up(self, db):
+        """Precarga desde la DB las lecturas de la ventana del buffer."""
+        if not self.enabled:
+            return
+        Reading = reading_model()
+        since = datetime.now(timezone.utc) - self.span
+        result = await db.execute(
+            select(Reading)
+            .where(Reading.time >= since)
+            .order_by(Reading.device_eui, Reading.time)
+        )
+        loaded = 0
+        for r in result.scalars():
+            ring = self._ring(r.device_eui, covered_since=since.timestamp())
+            ring.append(reading_dict(r))
+            loaded += 1
+        # Todo lo posterior al warm-up llega por append()
+        self._started_at = since.timestamp()
+        logger.info("recent_buffer.warmed_up", devices=len(self._rings), readings=loaded)
+
+    # ─── Snapshot (arranque en caliente) ──────────────
+    def snapshot(self) -> dict:
+        return {
+            "started_at": self._started_at,
+            "dropped_at": dict(self._dropped_at),
+            "rings": [(eui, ring.state()) for eui, ring in self._rings.items()],
+        }
+
+    def restore(self, state: dict):
+        """Carga un snapshot() de un buffer con la misma capacidad."""
+        self._rings.clear()
+        for device_eui, ring_state in state["rings"][-self.max_devices:]:
+            self._rings[device_eui] = DeviceRing.from_state(device_eui, self.capacity, ring_state)
+        self._dropped_at = dict(state["dropped_at"])
+        self._started_at = state["started_at"]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "devices": len(self._rings),
+            "max_devices": self.max_devices,
+            "capacity_per_device": self.capacity,
+            "memory_mb": round(len(self._rings) * self.capacity * SLOT_BYTES / 1024 / 1024, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "evictions": self.evictions,
+        }
+
+
+def reading_dict(r) -> dict:
+    """Fila ORM de reading_model() → dict de append()."""
+    return {
+        "id": r.id,
+        "time": r.time,
+        "distance_cm": r.distance_cm,
+        "water_level_cm": r.water_level_cm,
+        "fill_pct": r.fill_pct,
+        "battery_pct": r.battery_pct,
+        "rssi": r.rssi,
+        "snr": r.snr,
+        "latitude": r.latitude,
+        "longitude": r.longitude,
+        "rise_rate_cm_min": r.rise_rate_cm_min,
+        "minutes_to_critical": r.minutes_to_critical,
+        "distance_raw_cm": r.distance_raw_cm,
+        "alert_level": r.alert_level,
+    }
+
+
+# ─── Instancia global ─────────────────────────────────
+recent_buffer = RecentReadingsBuffer(
+    hours=settings.RECENT_BUFFER_HOURS,
+    interval_s=settings.RECENT_BUFFER_INTERVAL_S,
+    max_mb=settings.RECENT_BUFFER_MAX_MB,
+)
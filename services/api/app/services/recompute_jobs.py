@@ -0,0 +1,216 @@
+"""
+Recálculo en background de columnas derivadas.
+
+water_level_cm, fill_pct y alert_level se calculan al ingerir con
+bridge_height_cm y los umbrales del device. Si se corrige esa
+configuración (PATCH /devices/{eui}), este job reescribe el historial:
+
+  · trabaja en ventanas de tiempo acotadas y ordenadas (RECOMPUTE_CHUNK_HOURS)
+  · cada ventana es UN UPDATE set-based en su propia transacción corta
+  · se auto-limita: duerme entre ventanas para no pasar de
+    RECOMPUTE_DUTY_CYCLE del tiempo de DB, y solo corre una
+    ventana a la vez en todo el proceso (el ingest tiene prioridad)
+
+Con READINGS_STORAGE=compact solo se reescribe alert_code;
+los demás derivados ya se calculan en la vista.
+"""
+import asyncio
+import time as _time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import structlog
+from sqlalchemy import case, func, select, update
+
+from app.core.config import settings
+from app.core.database import get_db_session
+from app.core.storage_backend import backend
+from app.models.device import Device
+from app.models.reading import ALERT_LEVEL_CODES, CompactReading, SensorReading
+from app.services.response_cache import response_cache
+
+logger = structlog.get_logger()
+
+# Campos del device que invalidan los derivados guardados
+DERIVED_INPUTS = (
+    "bridge_height_cm",
+    "threshold_watch_pct",
+    "threshold_warning_pct",
+    "threshold_critical_pct",
+)
+
+
+@dataclass
+class RecomputeJob:
+    device_eui: str
+    range_start: datetime | None = None
+    range_end: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = "pending"   # pending | running | done | failed | cancelled
+    cursor: datetime | None = None
+    chunks_done: int = 0
+    rows_updated: int = 0
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: datetime | None = None
+    error: str | None = None
+
+    @property
+    def progress_pct(self) -> float:
+        if self.status == "done":
+            return 100.0
+        if not self.range_start or not self.cursor:
+            return 0.0
+        total = (self.range_end - self.range_start).total_seconds()
+        done = (self.cursor - self.range_start).total_seconds()
+        return round(min(100.0, done / total * 100), 1) if total > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "device_eui": self.device_eui,
+            "status": self.status,
+            "progress_pct": self.progress_pct,
+            "chunks_done": self.chunks_done,
+            "rows_updated": self.rows_updated,
+            "range_start": self.range_start,
+            "range_end": self.range_end,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+def _derived_values(device: Device, model) -> dict:
+    """Expresiones SQL de los derivados — mismas fórmulas que el ingest."""
+    height = device.bridge_height_cm
+    water = backend.greatest(0.0, height - model.distance_cm)
+    fill = backend.least(100.0, water / height * 100)
+
+    def level(watch, warning, critical, normal):
+        return case(
+            (fill >= device.threshold_critical_pct, critical),
+            (fill >= device.threshold_warning_pct, warning),
+            (fill >= device.threshold_watch_pct, watch),
+            else_=normal,
+        )
+
+    if model is CompactReading:
+        codes = ALERT_LEVEL_CODES
+        return {"alert_code": level(codes["WATCH"], codes["WARNING"],
+                                    codes["CRITICAL"], codes["NORMAL"])}
+    return {
+        "water_level_cm": water,
+        "fill_pct": fill,
+        "alert_level": level("WATCH", "WARNING", "CRITICAL", "NORMAL"),
+    }
+
+
+class RecomputeManager:
+    """Registra y ejecuta jobs de recálculo (uno activo por device)."""
+
+    def __init__(self):
+        self._jobs: dict[str, RecomputeJob] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._latest_by_device: dict[str, str] = {}
+        # Solo una ventana de UPDATE a la vez en todo el proceso
+        self._db_slot = asyncio.Semaphore(1)
+
+    def submit(self, device_eui: str) -> RecomputeJob:
+        """Crea un job; si el device ya tenía uno activo, lo reemplaza."""
+        previous = self._latest_by_device.get(device_eui)
+        if previous and previous in self._tasks:
+            self._tasks[previous].cancel()
+
+        job = RecomputeJob(device_eui=device_eui)
+        self._jobs[job.id] = job
+        self._latest_by_device[device_eui] = job.id
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+        self._prune()
+        logger.info("recompute.submitted", job=job.id, device=device_eui)
+        return job
+
+    def get(self, job_id: str) -> RecomputeJob | None:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> list[RecomputeJob]:
+        return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    async def shutdown(self):
+        """Cancela los jobs en curso (se pierden; re-lanzar tras el reinicio)."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _prune(self, keep: int = 200):
+        finished = [j for j in self.list_jobs() if j.id not in self._tasks]
+        for job in finished[keep:]:
+            del self._jobs[job.id]
+
+    async def _run(self, job: RecomputeJob):
+        job.status = "running"
+        try:
+            await self._recompute(job)
+            job.status = "done"
+            logger.info("recompute.done", job=job.id, device=job.device_eui,
+                        rows=job.rows_updated, chunks=job.chunks_done)
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error("recompute.failed", job=job.id, device=job.device_eui, error=str(e))
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            self._tasks.pop(job.id, None)
+            # El historial reescrito cambia la última lectura servida
+            response_cache.bump(job.device_eui)
+
+    async def _recompute(self, job: RecomputeJob):
+        model = CompactReading if settings.READINGS_STORAGE == "compact" else SensorReading
+
+        async with get_db_session() as db:
+            device = await db.get(Device, job.device_eui)
+            if device is None:
+                raise ValueError("Dispositivo no encontrado")
+            values = _derived_values(device, model)
+            job.range_start = await db.scalar(
+                select(func.min(model.time)).where(model.device_eui == job.device_eui)
+            )
+
+        if job.range_start is None:
+            return  # sin historial
+
+        chunk = timedelta(hours=settings.RECOMPUTE_CHUNK_HOURS)
+        job.cursor = job.range_start
+        while job.cursor < job.range_end:
+            chunk_end = min(job.cursor + chunk, job.range_end)
+
+            async with self._db_slot:
+                t0 = _time.perf_counter()
+                async with get_db_session() as db:
+                    result = await db.execute(
+                        update(model)
+                        .where(
+                            model.device_eui == job.device_eui,
+                            model.time >= job.cursor,
+                            model.time < chunk_end,
+                            model.distance_cm.is_not(None),
+                        )
+                        .values(**values)
+                        .execution_options(synchronize_session=False)
+                    )
+                elapsed = _time.perf_counter() - t0
+
+            job.rows_updated += result.rowcount or 0
+            job.chunks_done += 1
+            job.cursor = chunk_end
+
+            # Duty cycle: por cada segundo de UPDATE, dormir (1/duty - 1) s
+            duty = min(1.0, max(0.01, settings.RECOMPUTE_DUTY_CYCLE))
+            await asyncio.sleep(max(settings.RECOMPUTE_MIN_PAUSE_S, elapsed * (1 / duty - 1)))
+
+
+# ─── Instancia global ─────────────────────────────────
+recompute_manager = RecomputeManager()
@@ -0,0 +1,135 @@
+"""
+Cache de respuestas y ETags para los endpoints de estado actual.
+
+Cada device tiene un contador de versión que se incrementa con cada
+uplink ingerido (_process_message) y con cada cambio de configuración
+(create/PATCH/delete, fin de un recálculo); un contador de flota
+se incrementa con cualquiera de ellos.
+
+Una respuesta cacheada solo es válida mientras la versión de la que
+depende no cambió y no venció su TTL. El ETag combina esa versión con
+un hash del cuerpo, así que un If-None-Match que coincide se contesta
+con 304 sin tocar Postgres ni serializar nada.
+
+Las entradas se desalojan por LRU cuando se pasa de
+RESPONSE_CACHE_MAX_MB. El TTL acota lo que tarda en verse un cambio
+hecho por fuera de la API (p. ej. SQL manual).
+"""
+import hashlib
+import time as _time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from app.core.config import settings
+
+# Overhead aproximado por entrada (key, tupla, nodo del OrderedDict)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+    version: int
+    expires_at: float
+
+
+class ResponseCache:
+    """Versiones por device + cuerpos JSON serializados con LRU y TTL."""
+
+    def __init__(self, ttl_s: float, max_mb: float):
+        self.ttl_s = ttl_s
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._versions: dict[str, int] = {}
+        self._fleet_version = 0
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ─── Versiones ────────────────────────────────────
+    def bump(self, device_eui: str):
+        """Nuevo uplink o config del device: invalida sus respuestas y las de flota."""
+        self._versions[device_eui] = self._versions.get(device_eui, 0) + 1
+        self._fleet_version += 1
+
+    def version(self, device_eui: str | None = None) -> int:
+        """Versión de un device, o de toda la flota si device_eui es None."""
+        if device_eui is None:
+            return self._fleet_version
+        return self._versions.get(device_eui, 0)
+
+    # ─── Entradas ─────────────────────────────────────
+    def get(self, key: str, version: int) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version or entry.expires_at <= _time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, version: int, body: bytes) -> CachedResponse:
+        """
+        Guarda el cuerpo generado para `version` (la leída ANTES de
+        generarlo: si llegó un uplink mientras tanto, la entrada ya
+        nace vieja y el próximo request la regenera).
+        """
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        entry = CachedResponse(
+            etag=f'W/"{version}-{digest}"',
+            body=body,
+            version=version,
+            expires_at=_time.monotonic() + self.ttl_s,
+        )
+        if key in self._entries:
+            self._drop(key)
+        size = len(body) + ENTRY_OVERHEAD_BYTES
+        if self.ttl_s <= 0 or size > self.max_bytes:
+            return entry   # deshabilitado o no entra: se sirve sin cachear
+        while self._bytes + size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+        self._entries[key] = entry
+        self._bytes += size
+        return entry
+
+    def matches(self, entry: CachedResponse, if_none_match: str | None) -> bool:
+        """True si el ETag del cliente sigue vigente (→ 304)."""
+        if not if_none_match:
+            return False
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        if "*" in tags or entry.etag in tags:
+            self.not_modified += 1
+            return True
+        return False
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body) + ENTRY_OVERHEAD_BYTES
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+        }
+
+
+# ─── Instancia global ─────────────────────────────────
+response_cache = ResponseCache(
+    ttl_s=settings.RESPONSE_CACHE_TTL_S,
+    max_mb=settings.RESPONSE_CACHE_MAX_MB,
+)
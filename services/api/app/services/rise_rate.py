@@ -0,0 +1,135 @@
+"""
+Estimador incremental de velocidad de subida del nivel (cm/min).
+
+Regresión lineal ponderada exponencialmente sobre water_level_cm:
+cada uplink actualiza 5 sumas por device en O(1), sin guardar la serie.
+Los tiempos se guardan relativos a la última muestra, así que las
+sumas se "desplazan" dt segundos en cada actualización:
+
+    a     = exp(-dt / tau)
+    S_w'  = a·S_w + 1
+    S_t'  = a·(S_t  - dt·S_w)
+    S_tt' = a·(S_tt - 2·dt·S_t + dt²·S_w)
+    S_y'  = a·S_y + y
+    S_ty' = a·(S_ty - dt·S_y)
+
+    pendiente = (S_w·S_ty - S_t·S_y) / (S_w·S_tt - S_t²)
+
+El estado de todos los devices vive en arrays contiguos (float64),
+indexados por un slot por device.
+"""
+import math
+from array import array
+
+from app.core.config import settings
+
+# Peso efectivo mínimo (≈ muestras recientes) para reportar pendiente
+MIN_EFFECTIVE_SAMPLES = 3.0
+
+_STATE = ("last_t", "s_w", "s_t", "s_tt", "s_y", "s_ty")
+
+
+class RiseRateEstimator:
+    """Estado de regresión EW por device en arrays compactos."""
+
+    def __init__(self, tau_s: float):
+        self.tau_s = tau_s
+        self._slots: dict[str, int] = {}
+        self._state = {name: array("d") for name in _STATE}
+        self._rising = array("b")
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def state_bytes(self) -> int:
+        """Memoria ocupada por los arrays de estado."""
+        return sum(c.itemsize * len(c) for c in self._state.values()) + len(self._rising)
+
+    def _slot(self, device_eui: str) -> int:
+        slot = self._slots.get(device_eui)
+        if slot is None:
+            slot = len(self._slots)
+            self._slots[device_eui] = slot
+            for column in self._state.values():
+                column.append(0.0)
+            self._state["last_t"][slot] = math.nan
+            self._rising.append(0)
+        return slot
+
+    def update(self, device_eui: str, t: float, level_cm: float) -> float | None:
+        """
+        Agrega una muestra (t en epoch s) y retorna la velocidad
+        de subida en cm/min, o None si aún no hay suficientes datos.
+        """
+        i = self._slot(device_eui)
+        st = self._state
+        last_t = st["last_t"][i]
+        dt = 0.0 if math.isnan(last_t) else max(0.0, t - last_t)
+        a = math.exp(-dt / self.tau_s)
+
+        s_w, s_t, s_tt = st["s_w"][i], st["s_t"][i], st["s_tt"][i]
+        s_y, s_ty = st["s_y"][i], st["s_ty"][i]
+
+        st["s_tt"][i] = s_tt = a * (s_tt - 2 * dt * s_t + dt * dt * s_w)
+        st["s_t"][i] = s_t = a * (s_t - dt * s_w)
+        st["s_ty"][i] = s_ty = a * (s_ty - dt * s_y)
+        st["s_w"][i] = s_w = a * s_w + 1.0
+        st["s_y"][i] = s_y = a * s_y + level_cm
+        st["last_t"][i] = t
+
+        if s_w < MIN_EFFECTIVE_SAMPLES:
+            return None
+        denom = s_w * s_tt - s_t * s_t
+        if denom <= 1e-9:
+            return None
+        slope_per_s = (s_w * s_ty - s_t * s_y) / denom
+        return slope_per_s * 60.0
+
+    def is_rising(self, device_eui: str) -> bool:
+        i = self._slots.get(device_eui)
+        return i is not None and bool(self._rising[i])
+
+    def mark_rising(self, device_eui: str, rising: bool) -> bool:
+        """Guarda el estado RISING_FAST; True solo al entrar en él."""
+        i = self._slot(device_eui)
+        was_rising = bool(self._rising[i])
+        self._rising[i] = int(rising)
+        return rising and not was_rising
+
+    def warm_up(self, series):
+        """Alimenta el estimador con series (eui, times, levels) en orden temporal."""
+        for device_eui, times, levels in series:
+            for t, level in zip(times, levels):
+                if not math.isnan(level):
+                    self.update(device_eui, t, level)
+
+    def snapshot(self) -> dict:
+        return {"slots": dict(self._slots), "state": self._state, "rising": self._rising}
+
+    def restore(self, state: dict):
+        self._slots = dict(state["slots"])
+        self._state = {name: state["state"][name] for name in _STATE}
+        self._rising = state["rising"]
+
+    def reset(self, device_eui: str):
+        """Olvida la historia de un device (p. ej. tras recalibrar)."""
+        i = self._slots.get(device_eui)
+        if i is None:
+            return
+        for column in self._state.values():
+            column[i] = 0.0
+        self._state["last_t"][i] = math.nan
+        self._rising[i] = 0
+
+
+def minutes_to_level(level_cm: float, target_cm: float, rate_cm_min: float | None) -> float | None:
+    """Minutos proyectados hasta `target_cm` al ritmo actual (None si no sube)."""
+    if rate_cm_min is None or rate_cm_min <= 0:
+        return None
+    if level_cm >= target_cm:
+        return 0.0
+    return (target_cm - level_cm) / rate_cm_min
+
+
+# ─── Instancia global ─────────────────────────────────
+rise_estimator = RiseRateEstimator(tau_s=settings.RISE_RATE_TAU_MIN * 60)
@@ -0,0 +1,367 @@
+"""
+Topología del río y tiempo de viaje de las crecidas entre puentes.
+
+Los tramos (river_links) unen un puente con el siguiente aguas
+abajo. El tiempo que tarda una crecida en recorrer cada tramo se
+estima con correlación cruzada con retardo de water_level_cm:
+
+  · Una query agrupada baja las series a buckets de
+    WAVE_BUCKET_MIN minutos; viven en una matriz puentes × buckets
+    con WAVE_HISTORY_DAYS días.
+  · Se correlacionan las primeras diferencias (subidas y bajadas,
+    no el nivel absoluto) en ventanas de WAVE_WINDOW_H horas cada
+    WAVE_WINDOW_STEP_H, buscando el retardo 0..WAVE_MAX_LAG_H con
+    mayor correlación. Todos los tramos y ventanas van en la misma
+    pasada NumPy; el único loop es sobre los retardos.
+  · El tiempo de viaje es la mediana de los retardos de las
+    ventanas con correlación >= WAVE_MIN_CORR. Si no hay ninguna
+    se usa distancia / WAVE_DEFAULT_SPEED_KMH.
+
+El refresco (cada WAVE_REFRESH_S) es incremental: trae solo los
+buckets nuevos, corre la matriz y recalcula las ventanas que los
+tocan; el resto conserva su resultado.
+
+Cuando un puente entra en WARNING o CRITICAL se avisa a los de
+aguas abajo con la llegada estimada, acumulando tramo a tramo.
+El aviso (entered_flood) corre en el ingest; numpy solo se importa
+al refrescar el modelo, no al arrancar.
+"""
+import asyncio
+import heapq
+import time as _time
+import warnings
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+import structlog
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.storage_backend import backend
+from app.models.reading import reading_model
+from app.models.river import RiverLink
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = structlog.get_logger()
+
+# Pares válidos mínimos (fracción de la ventana) para confiar en una correlación
+MIN_OVERLAP_FRAC = 0.5
+# Niveles que disparan el aviso aguas abajo
+_FLOOD_LEVELS = ("WARNING", "CRITICAL")
+
+
+def lagged_xcorr(
+    up: "np.ndarray",
+    down: "np.ndarray",
+    max_lag: int,
+    min_overlap: int = 2,
+) -> tuple["np.ndarray", "np.ndarray"]:
+    """
+    Correlación de Pearson entre up[..., t] y down[..., t + k] para
+    k = 0..max_lag, en todas las filas a la vez.
+
+    Args:
+        up:   (..., W) serie aguas arriba (NaN = sin dato)
+        down: (..., W + max_lag) serie aguas abajo
+    Returns:
+        (retardo en buckets con mayor correlación, esa correlación).
+        NaN donde ningún retardo tiene min_overlap pares con varianza.
+    """
+    import numpy as np
+
+    w = up.shape[-1]
+    up_ok = ~np.isnan(up)
+    up0 = np.where(up_ok, up, 0.0)
+    corr = np.full((max_lag + 1,) + up.shape[:-1], np.nan)
+    for k in range(max_lag + 1):
+        b = down[..., k:k + w]
+        m = up_ok & ~np.isnan(b)
+        n = m.sum(axis=-1)
+        a = np.where(m, up0, 0.0)
+        b = np.where(m, b, 0.0)
+        sa, sb = a.sum(axis=-1), b.sum(axis=-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = (a * b).sum(axis=-1) - sa * sb / n
+            va = (a * a).sum(axis=-1) - sa * sa / n
+            vb = (b * b).sum(axis=-1) - sb * sb / n
+            r = cov / np.sqrt(va * vb)
+        corr[k] = np.where((n >= min_overlap) & (va > 1e-12) & (vb > 1e-12), r, np.nan)
+
+    empty = np.isnan(corr).all(axis=0)
+    best = np.argmax(np.where(np.isnan(corr), -np.inf, corr), axis=0)
+    best_corr = np.take_along_axis(corr, best[None], axis=0)[0]
+    return np.where(empty, np.nan, best.astype(float)), best_corr
+
+
+def summarize_windows(
+    lags: "np.ndarray",
+    corrs: "np.ndarray",
+    min_corr: float,
+) -> tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    Resultados por ventana (tramos × ventanas) → por tramo:
+    (mediana del retardo, correlación media, ventanas usadas),
+    solo con las ventanas de correlación >= min_corr.
+    """
+    import numpy as np
+
+    ok = np.nan_to_num(corrs, nan=-1.0) >= min_corr
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # tramos sin ventanas
+        lag = np.nanmedian(np.where(ok, lags, np.nan), axis=1)
+        corr = np.nanmean(np.where(ok, corrs, np.nan), axis=1)
+    return lag, corr, ok.sum(axis=1)
+
+
+class RiverNetwork:
+    """Tramos del río + tiempos de viaje estimados, con refresco incremental."""
+
+    def __init__(
+        self,
+        bucket_min: int,
+        history_days: int,
+        window_h: int,
+        step_h: int,
+        max_lag_h: float,
+        refresh_s: int,
+    ):
+        self.bucket_s = bucket_min * 60
+        self.n_buckets = history_days * 24 * 60 // bucket_min
+        self.window = window_h * 60 // bucket_min
+        self.step = max(1, step_h * 60 // bucket_min)
+        self.max_lag = int(max_lag_h * 60 // bucket_min)
+        self.refresh_s = refresh_s
+
+        self._links: list[tuple[str, str, float]] = []
+        self._index: dict[str, int] = {}
+        self._levels: "np.ndarray | None" = None
+        self._col0 = 0          # bucket absoluto de la columna 0
+        self._loaded_to = 0     # último bucket traído (puede estar incompleto)
+        self._windows: dict[int, tuple["np.ndarray", "np.ndarray"]] = {}
+
+        self._estimates: list[dict] = []
+        self._by_upstream: dict[str, list[dict]] = {}
+        self._computed_at: float | None = None
+        self._lock = asyncio.Lock()
+        self._levels_seen: dict[str, str] = {}
+        self.last_refresh_ms = 0.0
+
+    # ─── Modelo ───────────────────────────────────────
+    def _fresh(self) -> bool:
+        return (
+            self._computed_at is not None
+            and _time.monotonic() - self._computed_at < self.refresh_s
+        )
+
+    async def get(self, db) -> list[dict]:
+        """Tramos con su tiempo de viaje; refresca si venció el intervalo."""
+        if self._fresh():
+            return self._estimates
+        async with self._lock:
+            if not self._fresh():
+                await self._refresh(db)
+        return self._estimates
+
+    def invalidate(self):
+        """Fuerza el refresco en el próximo get() (alta/baja de tramos)."""
+        self._computed_at = None
+
+    async def _refresh(self, db):
+        import numpy as np
+
+        t0 = _time.perf_counter()
+        result = await db.execute(
+            select(RiverLink.upstream_eui, RiverLink.downstream_eui, RiverLink.distance_km)
+            .order_by(RiverLink.upstream_eui, RiverLink.downstream_eui)
+        )
+        links = [(u, d, float(km)) for u, d, km in result.all()]
+        now_b = int(_time.time() // self.bucket_s)
+        col0 = now_b - self.n_buckets + 1
+
+        if links != self._links or self._levels is None:
+            # Topología nueva: se arma la matriz desde cero
+            self._links = links
+            euis = sorted({e for u, d, _ in links for e in (u, d)})
+            self._index = {eui: i for i, eui in enumerate(euis)}
+            self._levels = np.full((len(euis), self.n_buckets), np.nan)
+            self._windows = {}
+            fetch_from = col0
+        else:
+            self._shift(col0)
+            fetch_from = max(col0, self._loaded_to)
+        self._col0 = col0
+
+        if self._index:
+            self._store(await self._fetch(db, fetch_from), now_b)
+            starts = [
+                s for s in range(-(-col0 // self.step) * self.step, now_b + 2 - self.window, self.step)
+                if s not in self._windows or s + self.window + self.max_lag > fetch_from
+            ]
+            if starts:
+                self._windows.update(
+                    await asyncio.to_thread(self._correlate, np.asarray(starts))
+                )
+        self._build_estimates()
+        self._computed_at = _time.monotonic()
+        self.last_refresh_ms = round((_time.perf_counter() - t0) * 1000, 1)
+        logger.info(
+            "river_network.refreshed",
+            links=len(links),
+            buckets_from=fetch_from - col0,
+            windows=len(self._windows),
+            ms=self.last_refresh_ms,
+        )
+
+    def _shift(self, col0: int):
+        """Corre la matriz a la izquierda hasta la nueva columna 0."""
+        import numpy as np
+
+        shift = col0 - self._col0
+        if shift <= 0:
+            return
+        if shift >= self.n_buckets:
+            self._levels[:] = np.nan
+        else:
+            self._levels[:, :-shift] = self._levels[:, shift:]
+            self._levels[:, -shift:] = np.nan
+        for start in [s for s in self._windows if s < col0]:
+            del self._windows[start]
+
+    async def _fetch(self, db, from_bucket: int):
+        Reading = reading_model()
+        bucket = backend.epoch_bucket(Reading.time, self.bucket_s)
+        since = datetime.fromtimestamp(from_bucket * self.bucket_s, timezone.utc)
+        result = await db.execute(
+            select(Reading.device_eui, bucket.label("b"), func.avg(Reading.water_level_cm))
+            .where(
+                Reading.device_eui.in_(list(self._index)),
+                Reading.time >= since,
+                Reading.water_level_cm.is_not(None),
+            )
+            .group_by(Reading.device_eui, bucket)
+        )
+        return result.all()
+
+    def _store(self, rows, now_b: int):
+        import numpy as np
+
+        if rows:
+            euis, b, level = zip(*rows)
+            rows_idx = np.fromiter((self._index[e] for e in euis), dtype=np.intp, count=len(euis))
+            cols = np.asarray(b, dtype=np.int64) - self._col0
+            keep = (cols >= 0) & (cols < self.n_buckets)
+            self._levels[rows_idx[keep], cols[keep]] = np.asarray(level, dtype=float)[keep]
+        self._loaded_to = now_b
+
+    def _correlate(self, starts: "np.ndarray") -> dict[int, tuple["np.ndarray", "np.ndarray"]]:
+        """Retardo y correlación de todos los tramos en las ventanas dadas."""
+        import numpy as np
+
+        up_idx = np.array([self._index[u] for u, _, _ in self._links])
+        down_idx = np.array([self._index[d] for _, d, _ in self._links])
+        diff = np.diff(self._levels, axis=1, prepend=np.nan)
+        # Las ventanas más nuevas miran buckets aguas abajo que aún no llegan
+        down = np.concatenate(
+            [diff[down_idx], np.full((len(down_idx), self.max_lag), np.nan)], axis=1
+        )
+        offsets = (starts - self._col0)[:, None]
+        up_w = diff[up_idx][:, offsets + np.arange(self.window)]
+        down_w = down[:, offsets + np.arange(self.window + self.max_lag)]
+        lag, corr = lagged_xcorr(
+            up_w, down_w, self.max_lag,
+            min_overlap=int(self.window * MIN_OVERLAP_FRAC),
+        )
+        return {int(s): (lag[:, j], corr[:, j]) for j, s in enumerate(starts)}
+
+    def _build_estimates(self):
+        import numpy as np
+
+        starts = sorted(self._windows)
+        if self._links and starts:
+            lag, corr, used = summarize_windows(
+                np.stack([self._windows[s][0] for s in starts], axis=1),
+                np.stack([self._windows[s][1] for s in starts], axis=1),
+                settings.WAVE_MIN_CORR,
+            )
+        else:
+            lag = corr = np.full(len(self._links), np.nan)
+            used = np.zeros(len(self._links), dtype=int)
+
+        bucket_min = self.bucket_s / 60
+        estimates = []
+        for i, (up, down, km) in enumerate(self._links):
+            if used[i]:
+                travel_min, source = float(lag[i]) * bucket_min, "correlation"
+            else:
+                travel_min, source = km / settings.WAVE_DEFAULT_SPEED_KMH * 60, "distance"
+            estimates.append({
+                "upstream_eui": up,
+                "downstream_eui": down,
+                "distance_km": km,
+                "travel_min": round(travel_min, 1),
+                "speed_kmh": round(km / (travel_min / 60), 2) if travel_min > 0 else None,
+                "correlation": None if np.isnan(corr[i]) else round(float(corr[i]), 3),
+                "windows": int(used[i]),
+                "source": source,
+            })
+        self._estimates = estimates
+        self._by_upstream = {}
+        for est in estimates:
+            self._by_upstream.setdefault(est["upstream_eui"], []).append(est)
+
+    # ─── Consultas ────────────────────────────────────
+    def downstream_eta(self, device_eui: str) -> list[dict]:
+        """
+        Puentes aguas abajo y minutos estimados hasta que les llegue
+        una crecida que hoy pasa por device_eui (camino más corto si
+        dos brazos confluyen).
+        """
+        heap = [(0.0, device_eui, 0)]
+        reached: dict[str, tuple[float, int]] = {}
+        while heap:
+            eta, eui, hops = heapq.heappop(heap)
+            if eui in reached:
+                continue
+            reached[eui] = (eta, hops)
+            for link in self._by_upstream.get(eui, ()):
+                heapq.heappush(heap, (eta + link["travel_min"], link["downstream_eui"], hops + 1))
+        reached.pop(device_eui)
+        return sorted(
+            ({"device_eui": eui, "eta_min": round(eta, 1), "hops": hops}
+             for eui, (eta, hops) in reached.items()),
+            key=lambda r: r["eta_min"],
+        )
+
+    def entered_flood(self, device_eui: str, alert_level: str) -> bool:
+        """True solo en el uplink en que el puente pasa a WARNING/CRITICAL."""
+        previous = self._levels_seen.get(device_eui)
+        self._levels_seen[device_eui] = alert_level
+        return alert_level in _FLOOD_LEVELS and previous not in _FLOOD_LEVELS
+
+    def snapshot(self) -> dict:
+        return {"levels_seen": dict(self._levels_seen)}
+
+    def restore(self, state: dict):
+        self._levels_seen.update(state["levels_seen"])
+
+    def stats(self) -> dict:
+        return {
+            "links": len(self._links),
+            "devices": len(self._index),
+            "windows": len(self._windows),
+            "correlated_links": sum(e["source"] == "correlation" for e in self._estimates),
+            "last_refresh_ms": self.last_refresh_ms,
+        }
+
+
+# ─── Instancia global ─────────────────────────────────
+river_network = RiverNetwork(
+    bucket_min=settings.WAVE_BUCKET_MIN,
+    history_days=settings.WAVE_HISTORY_DAYS,
+    window_h=settings.WAVE_WINDOW_H,
+    step_h=settings.WAVE_WINDOW_STEP_H,
+    max_lag_h=settings.WAVE_MAX_LAG_H,
+    refresh_s=settings.WAVE_REFRESH_S,
+)
@@ -0,0 +1,179 @@
+"""
+Compresión de las lecturas guardadas, opcional por device.
+
+En estiaje un puente reporta el mismo nivel cada 30 s durante meses
+y cada uplink es una fila. Con devices.storage_tolerance_cm (NULL =
+guardar todo) solo se persisten las lecturas necesarias para
+reconstruir water_level_cm con error ≤ tolerancia:
+
+  · swinging_door → interpolación lineal entre filas guardadas.
+    Desde la última guardada A se mantiene el intervalo de
+    pendientes [low, up] de las rectas que pasan a ≤ tolerancia de
+    todas las lecturas posteriores. La lectura más nueva queda
+    retenida (sin guardar) mientras la recta A→nueva caiga en el
+    intervalo; si no, se guarda la retenida (que sí cumplía) y pasa
+    a ser A. La fila se escribe con una lectura de atraso.
+  · deadband      → escalón: se guarda cuando el nivel se aleja más
+    que la tolerancia de la última guardada.
+
+Además se guarda siempre con STORAGE_HEARTBEAT_MIN sin filas (para
+distinguir "nivel estable" de "sin datos"), al cambiar el nivel de
+alerta, y cuando el caller lo fuerza (lectura rechazada por el
+filtro de ecos, uplink con fix GPS).
+
+Solo afecta lo que se escribe en la DB: en el proceso de ingest,
+alertas, tendencia, pronóstico, last_seen y el buffer de lecturas
+recientes ven cada uplink (en el log, reading.compressed en vez
+de reading.saved). Las filas retenidas se escriben al desconectar
+MQTT (drain), así la serie guardada no pierde su último tramo.
+
+Con INGEST_MODE=external la API no tiene ese buffer: /latest y el
+historial salen de la DB y ven solo las filas guardadas. La última
+puede atrasar hasta STORAGE_HEARTBEAT_MIN (nivel estable) o una
+lectura (swinging_door); devices.last_seen sí es el último uplink.
+
+Estado por device en arrays contiguos indexados por slot (como
+rise_rate); la fila retenida, en un dict aparte.
+"""
+import math
+from array import array
+
+from app.core.config import settings
+
+_STATE = ("anchor_t", "anchor_v", "low", "up", "held_t", "held_v")
+
+
+class ReadingCompressor:
+    """Decide qué filas de lecturas se persisten, por device."""
+
+    def __init__(self, mode: str, heartbeat_s: float):
+        self.mode = mode
+        self.heartbeat_s = heartbeat_s
+        self._slots: dict[str, int] = {}
+        self._state = {name: array("d") for name in _STATE}
+        self._code = array("b")
+        self._held: dict[str, object] = {}
+        self.offered = 0
+        self.stored = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _slot(self, device_eui: str) -> int:
+        slot = self._slots.get(device_eui)
+        if slot is None:
+            slot = len(self._slots)
+            self._slots[device_eui] = slot
+            for column in self._state.values():
+                column.append(math.nan)
+            self._code.append(-1)
+        return slot
+
+    def offer(self, device_eui: str, t: float, value: float, tolerance: float | None,
+              row, code: int = 0, force: bool = False) -> list:
+        """
+        Lectura nueva (t epoch, value = nivel) con su fila ORM.
+        Retorna las filas a persistir ahora (0, 1 o 2: la retenida
+        y la nueva). `code` es el nivel de alerta: si cambia se guarda.
+        """
+        self.offered += 1
+        if not tolerance or tolerance <= 0:
+            out = self._release(device_eui)
+            out.append(row)
+            self.stored += len(out)
+            return out
+
+        i = self._slot(device_eui)
+        st = self._state
+        anchor_t = st["anchor_t"][i]
+        force = (force or math.isnan(anchor_t) or code != self._code[i]
+                 or t - anchor_t >= self.heartbeat_s or t <= anchor_t)
+        self._code[i] = code
+        out = []
+
+        if self.mode == "deadband":
+            if force or abs(value - st["anchor_v"][i]) > tolerance:
+                self._anchor(i, t, value)
+                out.append(row)
+            self.stored += len(out)
+            return out
+
+        # Swinging door: ¿la recta ancla → nueva pasa cerca de todas?
+        dt = t - anchor_t
+        fits = dt > 0 and st["low"][i] <= (value - st["anchor_v"][i]) / dt <= st["up"][i]
+        if not fits and device_eui in self._held:
+            # La retenida cumplía: se guarda y pasa a ser el ancla
+            out.append(self._held.pop(device_eui))
+            self._anchor(i, st["held_t"][i], st["held_v"][i])
+            dt = t - st["anchor_t"][i]
+        if force or dt <= 0:
+            self._held.pop(device_eui, None)
+            self._anchor(i, t, value)
+            out.append(row)
+        else:
+            low = (value - tolerance - st["anchor_v"][i]) / dt
+            up = (value + tolerance - st["anchor_v"][i]) / dt
+            st["low"][i] = max(st["low"][i], low)
+            st["up"][i] = min(st["up"][i], up)
+            st["held_t"][i], st["held_v"][i] = t, value
+            self._held[device_eui] = row
+        self.stored += len(out)
+        return out
+
+    def _anchor(self, i: int, t: float, value: float):
+        st = self._state
+        st["anchor_t"][i], st["anchor_v"][i] = t, value
+        st["low"][i], st["up"][i] = -math.inf, math.inf
+
+    def _release(self, device_eui: str) -> list:
+        """Suelta la fila retenida de un device y su estado."""
+        i = self._slots.get(device_eui)
+        if i is None:
+            return []
+        for column in self._state.values():
+            column[i] = math.nan
+        self._code[i] = -1
+        held = self._held.pop(device_eui, None)
+        return [] if held is None else [held]
+
+    def drain(self) -> list:
+        """Filas retenidas de todos los devices (al apagar); reinicia el estado."""
+        held = list(self._held.values())
+        for device_eui in list(self._slots):
+            self._release(device_eui)
+        self.stored += len(held)
+        return held
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "devices": len(self._slots),
+            "held": len(self._held),
+            "offered": self.offered,
+            "stored": self.stored,
+            "ratio": round(self.offered / self.stored, 2) if self.stored else None,
+        }
+
+
+def reconstruct(times, values, at, mode: str = "swinging_door") -> list[float]:
+    """
+    Nivel en los instantes `at` (ordenados) a partir de las filas
+    guardadas: interpolación lineal (swinging_door) o escalón (deadband).
+    """
+    out, j = [], 0
+    for t in at:
+        while j + 1 < len(times) and times[j + 1] <= t:
+            j += 1
+        if mode == "deadband" or j + 1 >= len(times) or t <= times[j]:
+            out.append(values[j])
+        else:
+            w = (t - times[j]) / (times[j + 1] - times[j])
+            out.append(values[j] + w * (values[j + 1] - values[j]))
+    return out
+
+
+# ─── Instancia global ─────────────────────────────────
+reading_compressor = ReadingCompressor(
+    mode=settings.STORAGE_COMPRESSION,
+    heartbeat_s=settings.STORAGE_HEARTBEAT_MIN * 60,
+)
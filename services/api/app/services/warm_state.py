@@ -0,0 +1,140 @@
+"""
+Snapshot del estado en memoria del ingest para arrancar en caliente.
+
+Al apagar (con MQTT ya cortado, así no entra nada más) se escribe
+en WARM_STATE_PATH el estado de los componentes del ingest:
+buffer de lecturas recientes (última lectura de cada device
+incluida), monitor de OFFLINE con la cadencia aprendida, índice
+espacial, ventanas del filtro de ecos, estimadores de subida y
+pronóstico con sus alertas abiertas, y qué puentes ya avisaron
+aguas abajo.
+
+Al arrancar, si el snapshot tiene menos de WARM_STATE_MAX_AGE_MIN
+y es del mismo formato, se restaura en lugar de los warm-up desde
+la DB (el del buffer recorre RECENT_BUFFER_HOURS de lecturas de
+toda la flota). Una query trae lo persistido después del snapshot
+(otra réplica, un apagado sin snapshot) y lo aplica en orden.
+
+Formato: pickle. Los arrays se serializan como bloques de bytes,
+sin tocar cada elemento. El archivo lo escribe y lo lee el propio
+proceso; debe vivir en un volumen privado del contenedor. Se
+escribe a un .tmp y se renombra: un crash a mitad de escritura no
+deja un snapshot roto.
+"""
+import os
+import pickle
+import time
+from datetime import datetime, timezone
+
+import structlog
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.reading import reading_model
+from app.services import level_forecast, rise_rate
+from app.services.geo_index import geo_index
+from app.services.level_forecast import level_forecaster
+from app.services.offline_monitor import offline_monitor
+from app.services.outlier_filter import outlier_filter
+from app.services.recent_buffer import FLOAT_COLUMNS, reading_dict, recent_buffer
+from app.services.rise_rate import rise_estimator
+from app.services.river_network import river_network
+
+logger = structlog.get_logger()
+
+FORMAT_VERSION = 1
+
+
+def _components() -> dict:
+    return {
+        "recent_buffer": recent_buffer,
+        "offline_monitor": offline_monitor,
+        "geo_index": geo_index,
+        "rise_estimator": rise_estimator,
+        "level_forecaster": level_forecaster,
+        "river_network": river_network,
+        "outlier_filter": outlier_filter,
+    }
+
+
+def _fingerprint() -> dict:
+    """Lo que tiene que coincidir para que el snapshot sirva."""
+    return {
+        "version": FORMAT_VERSION,
+        "storage": settings.READINGS_STORAGE,
+        "buffer_capacity": recent_buffer.capacity if recent_buffer.enabled else 0,
+        "buffer_columns": FLOAT_COLUMNS,
+        "rise_state": rise_rate._STATE,
+        "forecast_state": level_forecast._STATE,
+        "outlier_window": outlier_filter.window,
+    }
+
+
+def save(path: str) -> dict:
+    """Escribe el snapshot; retorna bytes y ms."""
+    t0 = time.perf_counter()
+    payload = {
+        "fingerprint": _fingerprint(),
+        "written_at": time.time(),
+        "state": {name: c.snapshot() for name, c in _components().items()},
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return {"bytes": os.path.getsize(path), "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+
+def load(path: str, max_age_s: float) -> float | None:
+    """
+    Restaura el snapshot si existe, es compatible y no es viejo.
+    Retorna su written_at (epoch), o None si hay que arrancar desde la DB.
+    """
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("warm_state.unreadable", path=path, error=str(e))
+        return None
+
+    age_s = time.time() - payload["written_at"]
+    if payload["fingerprint"] != _fingerprint():
+        logger.info("warm_state.incompatible", path=path)
+        return None
+    if not 0 <= age_s <= max_age_s:
+        logger.info("warm_state.too_old", path=path, age_s=round(age_s))
+        return None
+    for name, component in _components().items():
+        component.restore(payload["state"][name])
+    return payload["written_at"]
+
+
+async def catch_up(db, since: float) -> int:
+    """
+    Aplica las lecturas persistidas después de `since` como lo haría
+    el ingest (sin alertas). Tras un apagado limpio no hay ninguna.
+    """
+    Reading = reading_model()
+    result = await db.execute(
+        select(Reading)
+        .where(Reading.time > datetime.fromtimestamp(since, timezone.utc))
+        .order_by(Reading.time)
+    )
+    applied = 0
+    for r in result.scalars():
+        t = r.time.timestamp()
+        if r.distance_cm is not None:
+            outlier_filter.update(r.device_eui, r.distance_raw_cm or r.distance_cm)
+        recent_buffer.append(r.device_eui, reading_dict(r))
+        offline_monitor.touch(r.device_eui, t)
+        if r.water_level_cm is not None:
+            rise_estimator.update(r.device_eui, t, r.water_level_cm)
+            level_forecaster.update(r.device_eui, t, r.water_level_cm)
+        if r.latitude is not None and r.longitude is not None:
+            geo_index.observe_fix(r.device_eui, r.latitude, r.longitude)
+        river_network.entered_flood(r.device_eui, r.alert_level)
+        applied += 1
+    return applied
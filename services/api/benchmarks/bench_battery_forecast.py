@@ -0,0 +1,59 @@
+"""
+Benchmark del ajuste vectorizado de batería (fit_depletion).
+
+Genera datos columnares sintéticos como los que devuelve la query
+de BatteryForecaster (un promedio por device y bucket) y mide el
+tiempo del ajuste de toda la flota.
+
+Uso (desde services/api):
+    python -m benchmarks.bench_battery_forecast --devices 5000 --days 14 --bucket-h 6
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.services.battery_forecast import fit_depletion
+
+
+def run(args) -> dict:
+    rng = np.random.default_rng(42)
+    buckets = args.days * 24 // args.bucket_h
+    codes = np.repeat(np.arange(args.devices), buckets)
+    t_days = np.tile(np.arange(buckets) * args.bucket_h / 24.0, args.devices) + 20_000
+    slope = rng.uniform(-40, 5, args.devices)
+    start = rng.uniform(3600, 4150, args.devices)
+    mv = start[codes] + slope[codes] * (t_days - 20_000) + rng.normal(0, 15, codes.size)
+
+    samples = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        fit = fit_depletion(codes, t_days, mv, args.devices)
+        samples.append((time.perf_counter() - t0) * 1000)
+
+    error = np.nanmax(np.abs(fit["slope_mv_per_day"] - slope))
+    return {
+        "devices": args.devices,
+        "samples": int(codes.size),
+        "fit_ms_min": round(min(samples), 2),
+        "fit_ms_median": round(float(np.median(samples)), 2),
+        "max_slope_error_mv_per_day": round(float(error), 2),
+        "depleting_devices": int(np.count_nonzero(~np.isnan(fit["days_to_empty"]))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--bucket-h", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark del archivo frío en Parquet (cold_archive).
+
+Escribe --months meses de un device con uplinks cada 30 s (como
+los exporta archive_month), y mide tamaño en disco contra el
+estimado en Postgres, y lectura de un día (row groups podados
+por estadísticas de time) contra la lectura del mes completo.
+
+Uso (desde services/api):
+    python -m benchmarks.bench_cold_archive --months 3
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import json
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+
+from app.services.cold_archive import ColdArchive, month_bounds
+
+EUI = "A840411D3181BD6B"
+# Fila de sensor_readings en Postgres: header de tupla + columnas + índices (aprox.)
+PG_ROW_BYTES = 180
+
+
+def _month_rows(key: str, rng, interval_s: int) -> list[tuple]:
+    start, end = month_bounds(key)
+    n = int((end - start).total_seconds() // interval_s)
+    level = 80 + np.cumsum(rng.normal(0, 0.3, n)).clip(-70, 200)
+    rows = []
+    for k in range(n):
+        gps = k % 10 == 0
+        rows.append((
+            uuid.uuid4().bytes, start + timedelta(seconds=k * interval_s),
+            round(300 - level[k], 1), round(level[k], 1), round(level[k] / 3, 1),
+            3900 - k // 2000, 80, int(rng.integers(-110, -70)), round(float(rng.normal(7, 2)), 1),
+            20.659699 if gps else None, -103.349609 if gps else None,
+            None, None, "NORMAL",
+        ))
+    return rows
+
+
+def run(args) -> dict:
+    rng = np.random.default_rng(42)
+    keys = [f"2024-{m:02d}" for m in range(1, args.months + 1)]
+    with tempfile.TemporaryDirectory() as root:
+        archive = ColdArchive(root, row_group_rows=args.row_group_rows, compression=args.compression)
+        rows_total = 0
+        t0 = time.perf_counter()
+        for key in keys:
+            rows = _month_rows(key, rng, args.interval_s)
+            rows_total += archive.write_month(EUI, key, rows)
+        write_s = time.perf_counter() - t0
+        size = sum(p.stat().st_size for p in Path(root).rglob("*.parquet"))
+
+        month_start, month_end = month_bounds(keys[-1])
+        day = month_start + timedelta(days=10)
+
+        def timed(start, end):
+            samples = []
+            for _ in range(args.repeat):
+                t = time.perf_counter()
+                n = sum(tb.num_rows for tb in archive.iter_row_groups(EUI, start, end))
+                samples.append((time.perf_counter() - t) * 1000)
+            return n, float(np.median(samples)), dict(vars(archive.last_read))
+
+        day_rows, day_ms, day_stats = timed(day, day + timedelta(days=1))
+        month_rows, month_ms, month_stats = timed(month_start, month_end)
+
+    return {
+        "months": args.months,
+        "rows": rows_total,
+        "write_rows_per_s": round(rows_total / write_s),
+        "parquet_bytes_per_row": round(size / rows_total, 1),
+        "postgres_bytes_per_row_est": PG_ROW_BYTES,
+        "one_day": {"rows": day_rows, "ms": round(day_ms, 2), **day_stats},
+        "full_month": {"rows": month_rows, "ms": round(month_ms, 2), **month_stats},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--interval-s", type=int, default=30)
+    parser.add_argument("--row-group-rows", type=int, default=2880)
+    parser.add_argument("--compression", default="zstd")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
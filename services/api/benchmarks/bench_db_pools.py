@@ -0,0 +1,172 @@
+"""
+Benchmark de pools bajo carga mixta: ingest + lecturas de dashboard.
+
+Compara dos configuraciones contra la misma base:
+  · shared → un solo engine (pool 10 + 20) para ingest y lecturas
+  · split  → engine de escritura y engine de lectura separados
+             (DB_WRITE_* / DB_READ_*), como en app.core.database
+
+Los escritores insertan a ritmo fijo (uplinks/s) mientras --readers
+tareas consultan historial de 24 h sin pausa. Reporta latencia de
+INSERT (incluida la espera de conexión), espera del pool por lado
+y lecturas/s. Con --no-cache desactiva el cache de prepared statements.
+
+Uso (desde services/api, con TimescaleDB accesible):
+    python -m benchmarks.bench_db_pools --seconds 20 --readers 60 --rate 200
+    python -m benchmarks.bench_db_pools --dsn postgresql+asyncpg://u:p@localhost:5433/aquaalert_ts
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.core.database import PoolWaitStats, _timed_pool
+
+SCHEMA = "bench_pools"
+DEVICES = 100
+
+DDL = [
+    f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE",
+    f"CREATE SCHEMA {SCHEMA}",
+    f"""CREATE TABLE {SCHEMA}.readings (
+          time        TIMESTAMPTZ NOT NULL,
+          device_eui  VARCHAR(16) NOT NULL,
+          distance_cm REAL,
+          PRIMARY KEY (device_eui, time))""",
+    f"""INSERT INTO {SCHEMA}.readings
+        SELECT now() - (i / {DEVICES}) * interval '30 seconds',
+               upper(lpad(to_hex(i % {DEVICES}), 16, '0')),
+               150 + i % 97
+        FROM generate_series(1, 300000) i""",
+    f"ANALYZE {SCHEMA}.readings",
+]
+
+INSERT = text(
+    f"INSERT INTO {SCHEMA}.readings (time, device_eui, distance_cm) "
+    f"VALUES (clock_timestamp(), :eui, :d) ON CONFLICT DO NOTHING"
+)
+HISTORY = text(
+    f"SELECT * FROM {SCHEMA}.readings "
+    f"WHERE device_eui = :eui AND time >= now() - interval '24 hours' "
+    f"ORDER BY time DESC LIMIT 1000"
+)
+
+
+def _engine(dsn: str, pool_size: int, max_overflow: int, stats: PoolWaitStats, cache: int):
+    return create_async_engine(
+        dsn,
+        poolclass=_timed_pool(stats),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT_S,
+        connect_args={"prepared_statement_cache_size": cache, "statement_cache_size": cache},
+    )
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[int(len(ordered) * 0.99) - 1] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def _writer(engine, stop: float, rate: float, latencies: list[float]):
+    n = 0
+    next_at = time.perf_counter()
+    while time.perf_counter() < stop:
+        t0 = time.perf_counter()
+        async with engine.begin() as conn:
+            await conn.execute(INSERT, {"eui": f"{n % DEVICES:016X}", "d": 150.0 + n % 97})
+        latencies.append(time.perf_counter() - t0)
+        n += 1
+        next_at += 1.0 / rate
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+
+
+async def _reader(engine, stop: float, worker: int, counter: list[int]):
+    n = worker
+    while time.perf_counter() < stop:
+        async with engine.connect() as conn:
+            await (await conn.execute(HISTORY, {"eui": f"{n % DEVICES:016X}"})).fetchall()
+        counter[0] += 1
+        n += 1
+
+
+async def _scenario(args, mode: str) -> dict:
+    cache = 0 if args.no_cache else settings.DB_STATEMENT_CACHE_SIZE
+    write_stats, read_stats = PoolWaitStats(), PoolWaitStats()
+    if mode == "shared":
+        write_engine = read_engine = _engine(args.dsn, 10, 20, write_stats, cache)
+    else:
+        write_engine = _engine(args.dsn, settings.DB_WRITE_POOL_SIZE,
+                               settings.DB_WRITE_MAX_OVERFLOW, write_stats, cache)
+        read_engine = _engine(args.dsn, settings.DB_READ_POOL_SIZE,
+                              settings.DB_READ_MAX_OVERFLOW, read_stats, cache)
+
+    latencies: list[float] = []
+    reads = [0]
+    stop = time.perf_counter() + args.seconds
+    # El ritmo total de ingest se reparte entre 4 escritores
+    tasks = [_writer(write_engine, stop, args.rate / 4, latencies) for _ in range(4)]
+    tasks += [_reader(read_engine, stop, i, reads) for i in range(args.readers)]
+    await asyncio.gather(*tasks)
+
+    await write_engine.dispose()
+    if read_engine is not write_engine:
+        await read_engine.dispose()
+    return {
+        "ingest_latency": _percentiles(latencies),
+        "ingest_rate_achieved": round(len(latencies) / args.seconds, 1),
+        "reads_per_s": round(reads[0] / args.seconds, 1),
+        "write_pool": write_stats.as_dict(),
+        "read_pool": read_stats.as_dict() if mode == "split" else None,
+    }
+
+
+async def run(args) -> dict:
+    args.dsn = args.dsn or settings.DATABASE_URL
+    setup = create_async_engine(args.dsn)
+    async with setup.begin() as conn:
+        for stmt in DDL:
+            await conn.execute(text(stmt))
+    try:
+        results = {
+            "seconds": args.seconds,
+            "readers": args.readers,
+            "target_ingest_rate": args.rate,
+            "statement_cache": not args.no_cache,
+        }
+        for mode in ("shared", "split"):
+            results[mode] = await _scenario(args, mode)
+        return results
+    finally:
+        async with setup.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await setup.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--readers", type=int, default=60)
+    parser.add_argument("--rate", type=float, default=200, help="INSERTs/s objetivo")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark de downsampling LTTB contra las series crudas de Grafana.
+
+Para ventanas de 1, 7 y 30 días a un uplink cada 30 s genera una
+crecida súbita sintética (subida, pico y recesión en ~1 h) más un
+pico de un solo uplink, y compara para un panel de --points puntos:
+  · raw  → todas las filas, como las trae hoy el rawSql del panel
+  · lttb → /api/v1/grafana/query (downsample_columns + datapoints)
+  · avg  → promedio por bucket, para ver cuánto pico se pierde
+midiendo bytes del JSON de datapoints, tiempo de armado (p50) y
+el máximo que queda en la serie. También compara lttb vectorizado
+contra una versión en Python puro.
+
+La lectura de la ventana en la DB es la misma en los tres casos;
+lo que cambia es lo que viaja y lo que el navegador dibuja.
+
+Uso (desde services/api):
+    python -m benchmarks.bench_downsample --days 1 7 30 --points 1000
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import json
+import math
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.services.downsample import downsample_columns, lttb
+from app.services.reading_codec import COLUMNS
+
+INTERVAL_S = 30
+
+
+def make_columns(days: int, seed: int = 42) -> dict[str, list]:
+    """Columnas del codec, más nuevas primero, con la crecida al 70% de la ventana."""
+    rng = np.random.default_rng(seed)
+    n = days * 86400 // INTERVAL_S
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    t = start.timestamp() + np.arange(n) * INTERVAL_S
+    hours = (t - t[0]) / 3600
+    peak_h = hours[-1] * 0.7
+    flood = 180 * np.exp(-((hours - peak_h) / 0.5) ** 2)   # crecida súbita (~1 h)
+    level = 80 + 10 * np.sin(hours / 24 * 2 * math.pi) + flood + rng.normal(0, 1.5, n)
+    level[int(n * 0.3)] += 120                  # pico de un solo uplink
+    rows = {
+        "id": [uuid.uuid4().bytes for _ in range(n)],
+        "time": t.tolist(),
+        "distance_cm": (300 - level).tolist(),
+        "water_level_cm": level.tolist(),
+        "fill_pct": (level / 3).tolist(),
+        "battery_pct": [75] * n,
+        "rssi": [-95] * n,
+        "snr": [7.5] * n,
+        "latitude": [None] * n,
+        "longitude": [None] * n,
+        "rise_rate_cm_min": [None] * n,
+        "minutes_to_critical": [None] * n,
+        "alert_level": ["NORMAL"] * n,
+    }
+    return {name: rows[name][::-1] for name in COLUMNS}
+
+
+def datapoints(columns: dict[str, list], field: str) -> bytes:
+    points = [
+        [v, round(ts * 1000)]
+        for ts, v in zip(reversed(columns["time"]), reversed(columns[field]))
+        if v is not None
+    ]
+    return json.dumps([{"target": field, "datapoints": points}], separators=(",", ":")).encode()
+
+
+def bucket_average(columns: dict[str, list], n_out: int, field: str) -> dict[str, list]:
+    t = np.asarray(columns["time"][::-1])
+    v = np.asarray(columns[field][::-1], dtype=np.float64)
+    edges = np.linspace(0, len(t), n_out + 1).astype(np.int64)
+    return {
+        "time": [float(t[a:b].mean()) for a, b in zip(edges[:-1], edges[1:])][::-1],
+        field: [float(v[a:b].mean()) for a, b in zip(edges[:-1], edges[1:])][::-1],
+    }
+
+
+def lttb_python(x: list, y: list, n_out: int) -> list[int]:
+    """Referencia en Python puro (misma partición de buckets)."""
+    n = len(x)
+    edges = [int(1 + i * (n - 2) / (n_out - 2)) for i in range(n_out - 1)]
+    out, a = [0], 0
+    for i in range(n_out - 2):
+        if i + 2 < len(edges):
+            ns, ne = edges[i + 1], edges[i + 2]
+            avg_x = sum(x[ns:ne]) / (ne - ns)
+            avg_y = sum(y[ns:ne]) / (ne - ns)
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        best, best_area = edges[i], -1.0
+        for j in range(edges[i], edges[i + 1]):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        out.append(best)
+        a = best
+    out.append(n - 1)
+    return out
+
+
+def _p50_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def run(args) -> dict:
+    field = "water_level_cm"
+    results = {}
+    for days in args.days:
+        columns = make_columns(days)
+        true_max = max(columns[field])
+        reduced = downsample_columns(columns, args.points, field)
+        averaged = bucket_average(columns, args.points, field)
+        raw_bytes = len(datapoints(columns, field))
+
+        x = np.asarray(columns["time"][::-1])
+        y = np.asarray(columns[field][::-1])
+        entry = {
+            "rows": len(columns["time"]),
+            "raw": {
+                "bytes": raw_bytes,
+                "build_ms": _p50_ms(lambda: datapoints(columns, field), args.repeat),
+                "max": round(true_max, 1),
+            },
+            "lttb": {
+                "bytes": len(datapoints(reduced, field)),
+                "build_ms": _p50_ms(
+                    lambda: datapoints(downsample_columns(columns, args.points, field), field),
+                    args.repeat,
+                ),
+                "max": round(max(reduced[field]), 1),
+            },
+            "avg": {
+                "bytes": len(datapoints(averaged, field)),
+                "max": round(max(averaged[field]), 1),
+            },
+            "lttb_numpy_ms": _p50_ms(lambda: lttb(x, y, args.points), args.repeat),
+            "lttb_python_ms": _p50_ms(
+                lambda: lttb_python(x.tolist(), y.tolist(), args.points), max(1, args.repeat // 5)
+            ),
+        }
+        entry["lttb"]["size_ratio"] = round(entry["lttb"]["bytes"] / raw_bytes, 4)
+        entry["lttb"]["peak_kept_pct"] = round(100 * entry["lttb"]["max"] / true_max, 1)
+        entry["avg"]["peak_kept_pct"] = round(100 * entry["avg"]["max"] / true_max, 1)
+        results[f"{days}d"] = entry
+    return {"points": args.points, "repeat": args.repeat, "windows": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7, 30])
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
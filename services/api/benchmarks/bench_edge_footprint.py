@@ -0,0 +1,178 @@
+"""
+Benchmark de footprint de un gateway edge (DB_BACKEND=sqlite).
+
+Corre el ingest real (_process_message) contra SQLite en un archivo
+temporal para un sitio de --devices nodos con un uplink cada 30 s,
+durante --hours simuladas (reloj del ingest adelantado a mano, sin
+esperar), y reporta:
+  · memoria: RSS después de los imports, al terminar y pico
+  · CPU por uplink (process_time) y % de un core al ritmo del sitio
+  · group commit: COMMITs y uplinks por COMMIT (--commit-ms 0 =
+    un COMMIT por uplink, para comparar)
+  · disco: tamaño de la DB + WAL y bytes por lectura
+  · sync: lotes de EDGE_SYNC_BATCH lecturas en MessagePack+gzip,
+    tamaño por lectura, compresión y CPU por lote
+
+Las alertas no salen a la red. Settings se leen del entorno, por eso
+las variables del edge se fijan antes de importar la app.
+
+Uso (desde services/api):
+    python -m benchmarks.bench_edge_footprint --devices 50 --hours 6
+    python -m benchmarks.bench_edge_footprint --devices 50 --hours 6 --commit-ms 0
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+INTERVAL_S = 30
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KB en Linux
+
+
+def _sim_clock(start: datetime):
+    """datetime del ingest con now() controlado por el benchmark."""
+
+    class SimDatetime(datetime):
+        current = start
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+
+    return SimDatetime
+
+
+async def _run(args, workdir: str) -> dict:
+    from app.core.database import (
+        engine, flush_pending_writes, get_db_session, init_db, read_engine, storage_stats,
+    )
+    from app.core.logging_config import configure_logging
+    from app.models.device import Device
+    from app.services.edge_sync import GZIP_LEVEL, EdgeSync, pack_batch
+    from app.services.mqtt_client import MQTTClient
+    from benchmarks.suite import _eui, _patched_ingest, _uplink
+
+    configure_logging(level="WARNING", stream=sys.stderr)
+    rss_imported = _rss_mb()
+    await init_db()
+    async with get_db_session() as db:
+        db.add_all(Device(device_eui=_eui(n), name=f"Edge {n}", bridge_height_cm=300.0)
+                   for n in range(args.devices))
+    await flush_pending_writes()
+
+    client = MQTTClient()
+    clock = _sim_clock(datetime.now(timezone.utc) - timedelta(hours=args.hours))
+    rounds = args.hours * 3600 // INTERVAL_S
+    patches = [*_patched_ingest(get_db_session),
+               mock.patch("app.services.mqtt_client.datetime", clock)]
+    for p in patches:
+        p.start()
+    try:
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        for k in range(rounds):
+            for n in range(args.devices):
+                clock.current += timedelta(seconds=INTERVAL_S / args.devices)
+                await client._process_message(*_uplink(_eui(n), k * args.devices + n))
+        await flush_pending_writes()
+        cpu_s, wall_s = time.process_time() - cpu0, time.perf_counter() - t0
+    finally:
+        for p in patches:
+            p.stop()
+    uplinks = rounds * args.devices
+    uplinks_per_s = args.devices / INTERVAL_S
+
+    # Sync: todo el atraso en lotes, como al volver el enlace
+    sync = EdgeSync("http://central", "", "bench", args.batch, 60.0, 900.0, 0)
+    raw_bytes = sent_bytes = batches = rows = 0
+    sync_cpu = time.process_time()
+    after = 0
+    while True:
+        rowids, columns = await sync.read_batch(after)
+        if not rowids:
+            break
+        raw = pack_batch("bench", columns)
+        raw_bytes += len(raw)
+        sent_bytes += len(gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0))
+        batches += 1
+        rows += len(rowids)
+        after = rowids[-1]
+    sync_cpu = time.process_time() - sync_cpu
+    # Los threads de aiosqlite no dejan terminar el proceso con conexiones abiertas
+    await engine.dispose()
+    await read_engine.dispose()
+
+    path = os.path.join(workdir, "edge.db")
+    db_bytes = sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+    return {
+        "uplinks": uplinks,
+        "ingest_wall_s": round(wall_s, 2),
+        "cpu_us_per_uplink": round(cpu_s / uplinks * 1e6, 1),
+        "cpu_pct_at_site_rate": round(cpu_s / uplinks * uplinks_per_s * 100, 3),
+        "rss_after_imports_mb": round(rss_imported, 1),
+        "rss_end_mb": round(_rss_mb(), 1),
+        "rss_peak_mb": round(_peak_rss_mb(), 1),
+        "storage": storage_stats(),
+        "db_mb": round(db_bytes / 2**20, 2),
+        "db_bytes_per_reading": round(db_bytes / uplinks),
+        "db_mb_per_day": round(db_bytes / uplinks * args.devices * 86400 / INTERVAL_S / 2**20, 1),
+        "sync": {
+            "batches": batches,
+            "rows": rows,
+            "bytes_per_reading": round(sent_bytes / rows, 1) if rows else None,
+            "compression": round(raw_bytes / sent_bytes, 1) if sent_bytes else None,
+            "cpu_ms_per_batch": round(sync_cpu / batches * 1000, 1) if batches else None,
+            "kb_per_day": round(sent_bytes / rows * args.devices * 86400 / INTERVAL_S / 1024)
+            if rows else None,
+        },
+    }
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ.update({
+            "DB_BACKEND": "sqlite",
+            "SQLITE_PATH": os.path.join(workdir, "edge.db"),
+            "SQLITE_COMMIT_MS": str(args.commit_ms),
+            "READINGS_STORAGE": "legacy",
+            "EDGE_SYNC_BATCH": str(args.batch),
+            "WARM_STATE_PATH": "",
+        })
+        results = asyncio.run(_run(args, workdir))
+    return {
+        "devices": args.devices,
+        "hours": args.hours,
+        "commit_ms": args.commit_ms,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--hours", type=int, default=6)
+    parser.add_argument("--commit-ms", type=float, default=500.0)
+    parser.add_argument("--batch", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
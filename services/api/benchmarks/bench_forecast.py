@@ -0,0 +1,198 @@
+"""
+Backtest del pronóstico de nivel (level_forecast).
+
+Recorre cada serie en orden, como el ingest: después de cada
+lectura pronostica el nivel a +30 y +60 min y lo compara con el
+nivel real en ese instante (interpolado). Reporta por horizonte:
+  · MAE y RMSE del modelo, y MAE de persistencia (nivel actual)
+  · cobertura del intervalo (debería rondar el ~90% nominal)
+y para las alertas FORECAST: anticipación media respecto del cruce
+real de WARNING y alertas sin cruce posterior (casi siempre picos
+que se quedan cerca del umbral: la tendencia lineal no ve el pico). También el costo
+por update con N devices en round-robin y los bytes de estado.
+
+Datos: crecidas sintéticas (subida de 1-3 h, recesión más lenta,
+ruido de 1 cm) o, con --dsn, el historial real de --devices.
+
+Uso (desde services/api):
+    python -m benchmarks.bench_forecast --series 50 --days 3
+    python -m benchmarks.bench_forecast --dsn postgresql+asyncpg://u:p@localhost:5433/aquaalert_ts --devices A81758FFFE000001 --days 30
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.level_forecast import LevelForecaster
+
+HORIZONS_MIN = (30, 60)
+BRIDGE_CM = 300.0
+WARNING_CM = BRIDGE_CM * 0.70
+INTERVAL_S = 30
+DEBOUNCE = 1800 // INTERVAL_S
+
+
+def _forecaster() -> LevelForecaster:
+    return LevelForecaster(
+        alpha=settings.FORECAST_ALPHA,
+        beta=settings.FORECAST_BETA,
+        z=settings.FORECAST_Z,
+        min_samples=settings.FORECAST_MIN_SAMPLES,
+        reset_gap_s=settings.FORECAST_RESET_GAP_MIN * 60,
+    )
+
+
+def synthetic_series(n_series: int, days: int, seed: int = 42):
+    """(nombre, times, levels) con 0-3 crecidas por serie."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(days * 86400 // INTERVAL_S) * float(INTERVAL_S)
+    hours = t / 3600
+    for k in range(n_series):
+        level = 60 + 8 * np.sin(hours / 24 * 2 * math.pi + rng.uniform(0, 6))
+        for _ in range(rng.integers(0, 4)):
+            start = rng.uniform(0, hours[-1] - 12)
+            rise_h = rng.uniform(1, 3)
+            peak = rng.uniform(90, 200)
+            x = hours - start
+            shape = np.where(x < rise_h, x / rise_h, np.exp(-(x - rise_h) / 4))
+            level += peak * np.clip(shape, 0, None) * (x > 0)
+        yield f"synthetic-{k}", t, level + rng.normal(0, 1.0, len(t))
+
+
+async def db_series(dsn: str, devices: list[str], days: int):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(dsn)
+    out = []
+    async with engine.connect() as conn:
+        for eui in devices:
+            rows = (await conn.execute(text(
+                "SELECT extract(epoch FROM time), water_level_cm FROM sensor_readings "
+                "WHERE device_eui = :eui AND time > now() - make_interval(days => :days) "
+                "AND water_level_cm IS NOT NULL ORDER BY time"
+            ), {"eui": eui, "days": days})).all()
+            if rows:
+                t, y = (np.array(c, dtype=np.float64) for c in zip(*rows))
+                out.append((eui, t, y))
+    await engine.dispose()
+    return out
+
+
+def backtest(series) -> dict:
+    errors = {h: [] for h in HORIZONS_MIN}
+    naive = {h: [] for h in HORIZONS_MIN}
+    covered = {h: 0 for h in HORIZONS_MIN}
+    leads, false_alerts, crossings = [], 0, 0
+    thresholds = {"WARNING": WARNING_CM, "CRITICAL": BRIDGE_CM * 0.85}
+
+    for name, t, y in series:
+        fc = _forecaster()
+        # Cruces reales de WARNING (subida, tras 30 min debajo) para medir anticipación
+        above = y >= WARNING_CM
+        recent = np.convolve(above, np.ones(DEBOUNCE), mode="full")[:len(y)]
+        cross_idx = np.flatnonzero(above[1:] & (recent[:-1] == 0)) + 1
+        cross_times = t[cross_idx]
+        crossings += len(cross_times)
+        for i in range(len(t)):
+            fc.update(name, t[i], y[i])
+            if not fc.ready(name):
+                continue
+            for h in HORIZONS_MIN:
+                at = t[i] + h * 60
+                if at > t[-1]:
+                    continue
+                actual = float(np.interp(at, t, y))
+                point, lower, upper = fc.predict(name, at)
+                errors[h].append(point - actual)
+                naive[h].append(y[i] - actual)
+                covered[h] += lower <= actual <= upper
+            hit = fc.check_alert(name, thresholds, t[i], settings.FORECAST_ALERT_MIN)
+            if hit and hit[0] == "WARNING":
+                later = cross_times[cross_times >= t[i]]
+                if len(later) and later[0] - t[i] <= 2 * settings.FORECAST_ALERT_MIN * 60:
+                    leads.append((later[0] - t[i]) / 60)
+                elif not above[i]:
+                    false_alerts += 1
+
+    def _score(h):
+        e, n = np.asarray(errors[h]), np.asarray(naive[h])
+        return {
+            "samples": len(e),
+            "mae_cm": round(float(np.abs(e).mean()), 2) if len(e) else None,
+            "rmse_cm": round(float(np.sqrt((e ** 2).mean())), 2) if len(e) else None,
+            "persistence_mae_cm": round(float(np.abs(n).mean()), 2) if len(n) else None,
+            "interval_coverage": round(covered[h] / len(e), 3) if len(e) else None,
+        }
+
+    return {
+        "horizons": {f"{h}min": _score(h) for h in HORIZONS_MIN},
+        "warning_alerts": {
+            "real_crossings": crossings,
+            "anticipated": len(leads),
+            "mean_lead_min": round(float(np.mean(leads)), 1) if leads else None,
+            "false_alerts": false_alerts,
+        },
+    }
+
+
+def update_cost(devices: int, rounds: int) -> dict:
+    rng = np.random.default_rng(1)
+    fc = _forecaster()
+    euis = [f"{n:016X}" for n in range(devices)]
+    levels = rng.uniform(20, 120, devices)
+    elapsed = 0.0
+    for r in range(rounds):
+        noise = rng.normal(0.05, 0.5, devices)
+        now = r * float(INTERVAL_S)
+        for k, eui in enumerate(euis):
+            levels[k] += noise[k]
+            value = float(levels[k])
+            t0 = time.perf_counter()
+            fc.update(eui, now, value)
+            elapsed += time.perf_counter() - t0
+    return {
+        "devices": devices,
+        "update_us": round(elapsed / (devices * rounds) * 1e6, 3),
+        "state_bytes_per_device": fc.state_bytes() / devices,
+    }
+
+
+def run(args) -> dict:
+    if args.dsn:
+        series = asyncio.run(db_series(args.dsn, args.devices, args.days))
+        source = {"dsn": args.dsn.split("@")[-1], "devices": len(series)}
+    else:
+        series = list(synthetic_series(args.series, args.days))
+        source = {"synthetic": args.series, "days": args.days}
+    return {
+        "source": source,
+        "params": {
+            "alpha": settings.FORECAST_ALPHA, "beta": settings.FORECAST_BETA,
+            "z": settings.FORECAST_Z, "alert_min": settings.FORECAST_ALERT_MIN,
+        },
+        **backtest(series),
+        "cost": update_cost(args.cost_devices, args.cost_rounds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--series", type=int, default=50)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--devices", nargs="*", default=[])
+    parser.add_argument("--cost-devices", type=int, default=5000)
+    parser.add_argument("--cost-rounds", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
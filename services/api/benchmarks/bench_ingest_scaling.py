@@ -0,0 +1,123 @@
+"""
+Benchmark de escalado del ingest multi-proceso (app.ingest_runner).
+
+Cada worker recibe el stream completo de uplinks ChirpStack (como
+con la suscripción real), descarta por topic los que no son de su
+shard y procesa los suyos con el mismo camino de CPU que
+_process_message: parse_uplink (JSON + base64 + decode), nivel y
+alerta, velocidad de subida y armado de filas ORM. La DB queda
+afuera: mide el techo de CPU por core, que es lo que el runner
+reparte (cada worker además trae su propio pool de conexiones).
+
+Uso (desde services/api):
+    python -m benchmarks.bench_ingest_scaling --messages 200000 --workers 1 2 4 8
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import base64
+import json
+import multiprocessing as mp
+import os
+import random
+import struct
+import time
+from datetime import datetime, timezone
+
+
+def _messages(n: int, devices: int) -> list[tuple[str, bytes]]:
+    """Stream sintético determinista (el mismo en todos los workers)."""
+    rng = random.Random(7)
+    euis = [f"{0xA840411D00000000 + k:016X}" for k in range(devices)]
+    out = []
+    for k in range(n):
+        eui = euis[k % devices]
+        if k % 10 == 0:
+            raw = struct.pack(">HHii", rng.randint(800, 2800), 3900, 20659699, -103349609)
+        else:
+            raw = struct.pack(">HH", rng.randint(800, 2800), 3900)
+        body = json.dumps({
+            "deviceInfo": {"devEui": eui, "applicationId": "1"},
+            "data": base64.b64encode(raw).decode(),
+            "rxInfo": [{"rssi": rng.randint(-110, -60), "snr": round(rng.uniform(-5, 10), 1)}],
+        }).encode()
+        out.append((f"application/1/device/{eui.lower()}/event/up", body))
+    return out
+
+
+def _worker(index: int, total: int, n: int, devices: int) -> tuple[int, float]:
+    from app.core import logging_config
+    from app.models.device import Device
+    from app.models.reading import new_reading_id
+    from app.services.alert_service import evaluate_alert_level, evaluate_rise
+    from app.services.mqtt_client import _build_rows, parse_uplink, shard_of, topic_device_eui
+    from app.services.rise_rate import RiseRateEstimator
+
+    logging_config.configure_logging(level="WARNING", sample="", stream=open(os.devnull, "w"))
+    stream = _messages(n, devices)
+    config = {}
+    estimator = RiseRateEstimator(tau_s=15 * 60)
+
+    processed = 0
+    t0 = time.perf_counter()
+    for topic, payload in stream:
+        if shard_of(topic_device_eui(topic), total) != index:
+            continue
+        device_eui, decoded, rssi, snr = parse_uplink(topic, payload)
+        device = config.get(device_eui)
+        if device is None:
+            device = config[device_eui] = Device(
+                device_eui=device_eui, bridge_height_cm=300.0,
+                threshold_watch_pct=50.0, threshold_warning_pct=70.0,
+                threshold_critical_pct=85.0, threshold_rise_cm_min=1.0,
+            )
+        water = max(0.0, device.bridge_height_cm - decoded["distance_cm"])
+        fill = min(100.0, water / device.bridge_height_cm * 100)
+        alert = evaluate_alert_level(fill, device)
+        now = datetime.now(timezone.utc)
+        rate = estimator.update(device_eui, now.timestamp(), water)
+        ttc, fast = evaluate_rise(device, water, rate, estimator.is_rising(device_eui))
+        estimator.mark_rising(device_eui, fast)
+        _build_rows(new_reading_id(device_eui, now), device_eui, now, decoded,
+                    water, fill, alert, rssi, snr, rate, ttc)
+        processed += 1
+    return processed, time.perf_counter() - t0
+
+
+def run(args) -> dict:
+    ctx = mp.get_context("spawn")
+    results = {}
+    base = None
+    for workers in args.workers:
+        with ctx.Pool(workers) as pool:
+            parts = pool.starmap(
+                _worker, [(i, workers, args.messages, args.devices) for i in range(workers)]
+            )
+        processed = sum(p for p, _ in parts)
+        wall = max(s for _, s in parts)   # los workers corren en paralelo
+        rate = processed / wall
+        base = base or rate
+        results[str(workers)] = {
+            "msgs_per_s": round(rate),
+            "speedup": round(rate / base, 2),
+            "per_worker_msgs": [p for p, _ in parts],
+        }
+    return {
+        "messages": args.messages,
+        "devices": args.devices,
+        "cpu_count": os.cpu_count(),
+        "workers": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
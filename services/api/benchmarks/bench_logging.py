@@ -0,0 +1,100 @@
+"""
+Benchmark del costo de logging por uplink en el camino de ingest.
+
+Por cada mensaje hace lo mismo que el ingest en cuanto a logs:
+decode_payload (2 debug por payload con GPS) + reading.saved con
+sus 9 campos. Compara:
+  · before → structlog sin configurar (todo nivel pasa, render y
+             write síncronos en el hilo que loguea)
+  · after  → configure_logging: LOG_LEVEL=INFO, reading.saved
+             muestreado 1/N y sink con cola en otro thread
+
+Reporta µs por mensaje en el hilo del event loop y, para "after",
+el tiempo hasta que el sink terminó de escribir todo.
+
+Uso (desde services/api):
+    python -m benchmarks.bench_logging --messages 50000 --sample 10
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import json
+import os
+import struct
+import time
+
+import structlog
+
+from app.core import logging_config
+from app.services.decoder import decode_payload
+
+PAYLOADS = (
+    struct.pack(">HH", 1834, 3912),
+    struct.pack(">HHii", 1834, 3912, 20659699, -103349609),
+)
+
+
+def _ingest_logs(n: int):
+    log = structlog.get_logger()
+    for k in range(n):
+        decoded = decode_payload(PAYLOADS[k % 10 == 0])
+        log.info(
+            "reading.saved",
+            device="A840411D3181BD6B",
+            water_level_cm=116.6,
+            fill_pct=38.9,
+            alert="NORMAL",
+            rise_rate_cm_min=0.12,
+            battery_pct=decoded["battery_pct"],
+            has_gps=decoded["has_gps"],
+            latitude=decoded.get("latitude"),
+            longitude=decoded.get("longitude"),
+        )
+
+
+def run(args) -> dict:
+    devnull = open(os.devnull, "w")
+
+    # before: config por defecto de structlog, escribiendo síncrono
+    structlog.reset_defaults()
+    structlog.configure(logger_factory=structlog.PrintLoggerFactory(file=devnull))
+    t0 = time.perf_counter()
+    _ingest_logs(args.messages)
+    before_s = time.perf_counter() - t0
+
+    # after: nivel + muestreo + sink con cola
+    logging_config.configure_logging(
+        level="INFO", fmt=args.format, sample=f"reading.saved={args.sample}", stream=devnull,
+    )
+    t0 = time.perf_counter()
+    _ingest_logs(args.messages)
+    caller_s = time.perf_counter() - t0
+    stats = logging_config.logging_stats()
+    logging_config.shutdown_logging()
+    drained_s = time.perf_counter() - t0
+    devnull.close()
+
+    return {
+        "messages": args.messages,
+        "sample": args.sample,
+        "format": args.format,
+        "before_us_per_msg": round(before_s / args.messages * 1e6, 2),
+        "after_us_per_msg": round(caller_s / args.messages * 1e6, 2),
+        "after_drained_us_per_msg": round(drained_s / args.messages * 1e6, 2),
+        "speedup_on_loop": round(before_s / caller_s, 1),
+        "lines_sampled_out": stats["sampled_out"],
+        "lines_dropped_queue_full": stats["dropped_queue_full"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=50_000)
+    parser.add_argument("--sample", type=int, default=10)
+    parser.add_argument("--format", choices=("console", "json"), default="json")
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
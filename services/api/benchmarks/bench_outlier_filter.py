@@ -0,0 +1,202 @@
+"""
+Benchmark del filtro de ecos espurios (outlier_filter).
+
+Reproduce series de distancia como las recibe el ingest, con y sin
+el filtro, y evalúa el nivel de alerta de cada lectura igual que
+_process_message (cada lectura no NORMAL es un Telegram):
+  · alertas falsas: lecturas con un nivel de alerta más alto que el
+    de la serie limpia (sin ecos), crudas vs filtradas
+  · rechazos de lecturas buenas y demora en ver los cruces reales
+    de WARNING (el costo del filtro en una crecida súbita)
+y el costo por update con N devices en round-robin, con los bytes
+de estado.
+
+Datos: crecidas sintéticas con ecos cortos inyectados (sueltos y en
+ráfagas de 2-3), o, con --dsn, el historial real de --devices
+(distancia cruda: coalesce(distance_raw_cm, distance_cm)). Con datos
+reales no hay serie limpia: se reportan solo las alertas y rechazos.
+
+Uso (desde services/api):
+    python -m benchmarks.bench_outlier_filter --series 100 --days 3
+    python -m benchmarks.bench_outlier_filter --dsn postgresql+asyncpg://u:p@localhost:5433/aquaalert_ts --devices A81758FFFE000001 --days 30
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+
+from app.core.config import settings
+from app.models.device import Device
+from app.services.alert_service import evaluate_alert_level
+from app.services.outlier_filter import OutlierFilter
+
+BRIDGE_CM = 300.0
+INTERVAL_S = 30
+LEVEL_RANK = {"NORMAL": 0, "WATCH": 1, "WARNING": 2, "CRITICAL": 3}
+
+
+def _filter() -> OutlierFilter:
+    return OutlierFilter(
+        window=settings.OUTLIER_WINDOW,
+        k=settings.OUTLIER_K,
+        min_dev=settings.OUTLIER_MIN_DEV_CM,
+        min_samples=settings.OUTLIER_MIN_SAMPLES,
+    )
+
+
+def _device(eui: str) -> Device:
+    return Device(
+        device_eui=eui,
+        bridge_height_cm=BRIDGE_CM,
+        threshold_watch_pct=50.0,
+        threshold_warning_pct=70.0,
+        threshold_critical_pct=85.0,
+    )
+
+
+def _alert(device: Device, distance_cm: float) -> str:
+    level = max(0.0, BRIDGE_CM - distance_cm)
+    return evaluate_alert_level(min(100.0, level / BRIDGE_CM * 100), device)
+
+
+def synthetic_series(n_series: int, days: int, echo_rate: float, seed: int = 42):
+    """(nombre, distancias limpias, distancias con ecos) con 0-3 crecidas por serie."""
+    rng = random.Random(seed)
+    n = days * 86400 // INTERVAL_S
+    for k in range(n_series):
+        phase = rng.uniform(0, 6)
+        floods = [(rng.uniform(0, days * 24 - 12), rng.uniform(0.5, 3), rng.uniform(90, 200))
+                  for _ in range(rng.randint(0, 3))]
+        clean, noisy = [], []
+        burst = 0
+        for i in range(n):
+            hours = i * INTERVAL_S / 3600
+            level = 60 + 8 * math.sin(hours / 24 * 2 * math.pi + phase)
+            for start, rise_h, peak in floods:
+                x = hours - start
+                if x > 0:
+                    level += peak * (x / rise_h if x < rise_h else math.exp(-(x - rise_h) / 4))
+            distance = round(max(20.0, BRIDGE_CM - level) + rng.gauss(0, 1.0), 1)
+            clean.append(distance)
+            if burst == 0 and rng.random() < echo_rate:
+                burst = rng.choice((1, 1, 1, 2, 3))
+            if burst:
+                burst -= 1
+                noisy.append(round(rng.uniform(20, 80), 1))   # eco corto
+            else:
+                noisy.append(distance)
+        yield f"synthetic-{k}", clean, noisy
+
+
+async def db_series(dsn: str, devices: list[str], days: int):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(dsn)
+    out = []
+    async with engine.connect() as conn:
+        for eui in devices:
+            rows = (await conn.execute(text(
+                "SELECT coalesce(distance_raw_cm, distance_cm) FROM sensor_readings "
+                "WHERE device_eui = :eui AND time > now() - make_interval(days => :days) "
+                "AND distance_cm IS NOT NULL ORDER BY time"
+            ), {"eui": eui, "days": days})).scalars().all()
+            if rows:
+                out.append((eui, None, list(rows)))
+    await engine.dispose()
+    return out
+
+
+def replay(series) -> dict:
+    report = {"readings": 0, "rejected": 0, "good_rejected": 0,
+              "raw_alerts": 0, "filtered_alerts": 0,
+              "raw_false_alerts": 0, "filtered_false_alerts": 0,
+              "warning_crossings": 0, "crossing_delay_readings": []}
+    for name, clean, noisy in series:
+        device, flt = _device(name), _filter()
+        pending = None   # índice del último cruce real de WARNING sin ver
+        prev_true = 0
+        for i, raw in enumerate(noisy):
+            filtered, rejected = flt.update(name, raw)
+            raw_alert, alert = _alert(device, raw), _alert(device, filtered)
+            report["readings"] += 1
+            report["rejected"] += rejected
+            report["raw_alerts"] += raw_alert != "NORMAL"
+            report["filtered_alerts"] += alert != "NORMAL"
+            if clean is None:
+                continue
+            true_rank = LEVEL_RANK[_alert(device, clean[i])]
+            report["good_rejected"] += rejected and raw == clean[i]
+            report["raw_false_alerts"] += LEVEL_RANK[raw_alert] > true_rank
+            report["filtered_false_alerts"] += LEVEL_RANK[alert] > true_rank
+            if true_rank >= 2 > prev_true:
+                report["warning_crossings"] += 1
+                pending = i
+            if pending is not None and LEVEL_RANK[alert] >= 2:
+                report["crossing_delay_readings"].append(i - pending)
+                pending = None
+            prev_true = true_rank
+
+    delays = report.pop("crossing_delay_readings")
+    if report["warning_crossings"]:
+        report["max_crossing_delay_s"] = max(delays, default=0) * INTERVAL_S
+        report["mean_crossing_delay_s"] = round(sum(delays) / max(1, len(delays)) * INTERVAL_S, 1)
+    else:
+        for key in ("good_rejected", "raw_false_alerts", "filtered_false_alerts",
+                    "warning_crossings"):
+            report.pop(key)
+    return report
+
+
+def cost(devices: int, rounds: int) -> dict:
+    rng = random.Random(7)
+    euis = [f"{n:016X}" for n in range(devices)]
+    distance = {eui: rng.uniform(100, 250) for eui in euis}
+    flt = _filter()
+    elapsed = 0.0
+    for _ in range(rounds):
+        for eui in euis:
+            distance[eui] += rng.gauss(0, 0.5)
+            x = distance[eui] if rng.random() > 0.01 else 40.0
+            t0 = time.perf_counter()
+            flt.update(eui, x)
+            elapsed += time.perf_counter() - t0
+    return {
+        "devices": devices,
+        "update_us": round(elapsed / (devices * rounds) * 1e6, 3),
+        "state_bytes": flt.state_bytes(),
+    }
+
+
+def run(args) -> dict:
+    if args.dsn:
+        series = asyncio.run(db_series(args.dsn, args.devices, args.days))
+    else:
+        series = synthetic_series(args.series, args.days, args.echo_rate)
+    return {
+        "window": settings.OUTLIER_WINDOW,
+        "k": settings.OUTLIER_K,
+        "replay": replay(series),
+        "cost": cost(args.fleet, args.rounds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--series", type=int, default=100)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--echo-rate", type=float, default=0.005)
+    parser.add_argument("--dsn")
+    parser.add_argument("--devices", nargs="*", default=[])
+    parser.add_argument("--fleet", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark de formatos de respuesta para GET /{eui}/readings.
+
+Para varios tamaños de respuesta genera filas sintéticas (como las
+devuelve la query) y mide, por formato y compresión:
+  · bytes en el cable
+  · tiempo de armado + serialización + compresión
+
+json arma ReadingOut por fila (camino histórico); columnar y msgpack
+salen directo de las filas.
+
+Uso (desde services/api):
+    python -m benchmarks.bench_reading_formats --sizes 10 100 1000 --repeat 50
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pydantic import TypeAdapter
+
+from app.routers.sensors import ReadingOut
+from app.services.reading_codec import COLUMNS, columns_from_rows, compress, encode_columns
+
+EUI = "A840411D3181BD6B"
+ENCODINGS = (None, "gzip", "br")
+_READINGS = TypeAdapter(list[ReadingOut])
+
+
+def make_rows(n: int, rng: random.Random) -> list[tuple]:
+    now = datetime.now(timezone.utc)
+    rows = []
+    for k in range(n):
+        distance = rng.uniform(120, 280)
+        has_gps = k % 10 == 0
+        rows.append((
+            uuid.uuid4(), now - timedelta(seconds=30 * k), distance, 300 - distance,
+            (300 - distance) / 3, rng.randint(40, 100), rng.randint(-120, -60),
+            round(rng.uniform(-10, 10), 1),
+            20.659699 if has_gps else None, -103.349609 if has_gps else None,
+            round(rng.gauss(0, 0.3), 3), None, "NORMAL",
+        ))
+    return rows
+
+
+def encode(rows: list[tuple], fmt: str) -> bytes:
+    if fmt == "json":
+        readings = []
+        for row in rows:
+            fields = dict(zip(COLUMNS, row))
+            fields["id"] = str(fields["id"])
+            readings.append(ReadingOut(device_eui=EUI, **fields))
+        return _READINGS.dump_json(readings)
+    return encode_columns(EUI, columns_from_rows(rows), fmt)
+
+
+def run(args) -> dict:
+    rng = random.Random(42)
+    results = {}
+    for size in args.sizes:
+        rows = make_rows(size, rng)
+        by_format = {}
+        for fmt in ("json", "columnar", "msgpack"):
+            for encoding in ENCODINGS:
+                samples = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    body, _ = compress(encode(rows, fmt), encoding)
+                    samples.append(time.perf_counter() - t0)
+                by_format[f"{fmt}+{encoding or 'identity'}"] = {
+                    "bytes": len(body),
+                    "p50_ms": round(statistics.median(samples) * 1000, 3),
+                }
+        baseline = by_format["json+identity"]["bytes"]
+        for entry in by_format.values():
+            entry["size_ratio"] = round(entry["bytes"] / baseline, 3)
+        results[str(size)] = by_format
+    return {"repeat": args.repeat, "sizes": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark del estimador de velocidad de subida.
+
+Simula una flota de N devices reportando en round-robin y mide
+el costo por lectura de rise_estimator.update + evaluate_rise
+(lo que agrega el paso de tendencia a _process_message).
+
+Uso (desde services/api):
+    python -m benchmarks.bench_rise_rate --devices 10000 --rounds 20
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import json
+import random
+import time
+
+from app.models.device import Device
+from app.services.alert_service import evaluate_rise
+from app.services.rise_rate import RiseRateEstimator
+
+
+def run(args) -> dict:
+    rng = random.Random(42)
+    euis = [f"{n:016X}" for n in range(args.devices)]
+    devices = {
+        eui: Device(
+            device_eui=eui,
+            bridge_height_cm=300.0,
+            threshold_watch_pct=50.0,
+            threshold_warning_pct=70.0,
+            threshold_critical_pct=85.0,
+            threshold_rise_cm_min=1.0,
+        )
+        for eui in euis
+    }
+    levels = {eui: rng.uniform(20, 120) for eui in euis}
+    est = RiseRateEstimator(tau_s=15 * 60)
+
+    update_s = 0.0
+    evaluate_s = 0.0
+    rising = 0
+    for rnd in range(args.rounds):
+        t = rnd * 30.0
+        for eui in euis:
+            levels[eui] += rng.gauss(0.05, 0.5)
+            t0 = time.perf_counter()
+            rate = est.update(eui, t, levels[eui])
+            t1 = time.perf_counter()
+            _, fast = evaluate_rise(devices[eui], levels[eui], rate, est.is_rising(eui))
+            rising += est.mark_rising(eui, fast)
+            t2 = time.perf_counter()
+            update_s += t1 - t0
+            evaluate_s += t2 - t1
+
+    readings = args.devices * args.rounds
+    return {
+        "devices": args.devices,
+        "readings": readings,
+        "update_us_per_reading": round(update_s / readings * 1e6, 3),
+        "evaluate_us_per_reading": round(evaluate_s / readings * 1e6, 3),
+        "state_bytes": est.state_bytes(),
+        "rising_fast_alerts": rising,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark del arranque: imports y estado en memoria.
+
+  · import_ms   → `import app.main` en un proceso nuevo, con los
+                  módulos diferidos (numpy, pyarrow, httpx) y sin ellos
+  · warm-up     → reconstruir buffer + estimadores de subida y
+                  pronóstico desde N devices × ventana del buffer de
+                  filas (sin contar la query), contra save/load del
+                  snapshot de warm_state con el mismo estado
+
+Uso (desde services/api):
+    python -m benchmarks.bench_startup --devices 1000 --hours 6
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from unittest import mock
+
+from app.core.startup import DEFERRED_MODULES
+from app.services import warm_state
+from app.services.level_forecast import LevelForecaster
+from app.services.recent_buffer import RecentReadingsBuffer
+from app.services.rise_rate import RiseRateEstimator
+
+INTERVAL_S = 30
+
+
+def import_ms(preload: bool, repeat: int) -> float:
+    """Mejor de `repeat` procesos nuevos, en ms."""
+    extra = "".join(f"import {m};" for m in DEFERRED_MODULES) if preload else ""
+    code = (
+        "import time; t0 = time.perf_counter();"
+        f"import app.main; {extra}"
+        "print((time.perf_counter() - t0) * 1000)"
+    )
+    best = float("inf")
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                             text=True, check=True)
+        best = min(best, float(out.stdout.strip().splitlines()[-1]))
+    return round(best, 1)
+
+
+def make_rows(devices: int, per_device: int, now: float):
+    """Filas como las que retorna la query del warm-up, como (eui, lectura)."""
+    rng = random.Random(42)
+    for n in range(devices):
+        eui = f"{n:016X}"
+        level = rng.uniform(20, 120)
+        for k in range(per_device):
+            t = now - (per_device - k) * INTERVAL_S
+            level = max(0.0, level + rng.gauss(0.0, 0.5))
+            yield eui, {
+                "id": uuid.uuid4(),
+                "time": datetime.fromtimestamp(t, timezone.utc),
+                "distance_cm": 300.0 - level,
+                "water_level_cm": level,
+                "fill_pct": level / 3,
+                "battery_pct": 80,
+                "rssi": -90,
+                "snr": 7.5,
+                "latitude": None,
+                "longitude": None,
+                "alert_level": "NORMAL",
+            }
+
+
+def fresh(hours: int):
+    return {
+        "recent_buffer": RecentReadingsBuffer(hours=hours, interval_s=INTERVAL_S, max_mb=4096),
+        "rise_estimator": RiseRateEstimator(tau_s=15 * 60),
+        "level_forecaster": LevelForecaster(
+            alpha=0.2, beta=0.05, z=1.64, min_samples=10, reset_gap_s=3600,
+        ),
+    }
+
+
+def rebuild(c: dict, rows, since: float):
+    """Lo que hace el lifespan sin snapshot, después de la query."""
+    buf = c["recent_buffer"]
+    for eui, reading in rows:
+        buf._ring(eui, covered_since=since).append(reading)
+    buf._started_at = since
+    c["rise_estimator"].warm_up(buf.iter_series("water_level_cm"))
+    c["level_forecaster"].warm_up(buf.iter_series("water_level_cm"))
+
+
+def run(args) -> dict:
+    now = time.time()
+    per_device = args.hours * 3600 // INTERVAL_S
+    rows = list(make_rows(args.devices, per_device, now))
+    since = now - args.hours * 3600
+
+    c = fresh(args.hours)
+    t0 = time.perf_counter()
+    rebuild(c, rows, since)
+    rebuild_ms = (time.perf_counter() - t0) * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "warm_state.pkl")
+        with mock.patch.multiple(warm_state, **c):
+            saved = warm_state.save(path)
+        restored = fresh(args.hours)
+        with mock.patch.multiple(warm_state, **restored):
+            t0 = time.perf_counter()
+            assert warm_state.load(path, max_age_s=3600) is not None
+            load_ms = (time.perf_counter() - t0) * 1000
+
+    result = {
+        "devices": args.devices,
+        "readings": len(rows),
+        "rebuild_ms": round(rebuild_ms, 1),
+        "snapshot_save_ms": saved["ms"],
+        "snapshot_load_ms": round(load_ms, 1),
+        "snapshot_mb": round(saved["bytes"] / 2**20, 2),
+    }
+    if not args.skip_imports:
+        result["import_ms"] = {
+            "deferred": import_ms(False, args.repeat),
+            "eager": import_ms(True, args.repeat),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--hours", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-imports", action="store_true")
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
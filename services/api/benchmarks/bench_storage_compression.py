@@ -0,0 +1,134 @@
+"""
+Benchmark de la compresión de lecturas guardadas (storage_compression).
+
+Reproduce series de nivel como las recibe el ingest, con cada modo
+(swinging_door, deadband) y tolerancia, y reporta:
+  · filas guardadas y reducción (lecturas / filas)
+  · error de reconstrucción de water_level_cm en cada uplink
+    original: máximo (debe ser ≤ tolerancia) y medio
+  · costo por offer en µs
+Con STORAGE_HEARTBEAT_MIN se guarda igual una fila cada N min.
+
+Datos: meses de estiaje sintéticos (nivel casi plano con ruido de
+0.3 cm y ciclo diario leve) con alguna crecida, o, con --dsn, el
+historial real de --devices.
+
+Uso (desde services/api):
+    python -m benchmarks.bench_storage_compression --series 20 --days 30
+    python -m benchmarks.bench_storage_compression --dsn postgresql+asyncpg://u:p@localhost:5433/aquaalert_ts --devices A81758FFFE000001 --days 30
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+
+from app.core.config import settings
+from app.services.storage_compression import ReadingCompressor, reconstruct
+
+MODES = ("swinging_door", "deadband")
+INTERVAL_S = 30
+
+
+def synthetic_series(n_series: int, days: int, seed: int = 42):
+    """(nombre, times, levels): estiaje con 0-1 crecidas por serie."""
+    rng = random.Random(seed)
+    n = days * 86400 // INTERVAL_S
+    for k in range(n_series):
+        base = rng.uniform(30, 80)
+        phase = rng.uniform(0, 6)
+        flood = (rng.uniform(0, days * 24 - 48), rng.uniform(1, 3), rng.uniform(60, 150)) \
+            if rng.random() < 0.5 else None
+        times, levels = [], []
+        for i in range(n):
+            hours = i * INTERVAL_S / 3600
+            level = base + 1.5 * math.sin(hours / 24 * 2 * math.pi + phase)
+            if flood:
+                start, rise_h, peak = flood
+                x = hours - start
+                if x > 0:
+                    level += peak * (x / rise_h if x < rise_h else math.exp(-(x - rise_h) / 6))
+            times.append(i * float(INTERVAL_S))
+            levels.append(round(level + rng.gauss(0, 0.3), 1))
+        yield f"synthetic-{k}", times, levels
+
+
+async def db_series(dsn: str, devices: list[str], days: int):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(dsn)
+    out = []
+    async with engine.connect() as conn:
+        for eui in devices:
+            rows = (await conn.execute(text(
+                "SELECT extract(epoch FROM time), water_level_cm FROM sensor_readings "
+                "WHERE device_eui = :eui AND time > now() - make_interval(days => :days) "
+                "AND water_level_cm IS NOT NULL ORDER BY time"
+            ), {"eui": eui, "days": days})).all()
+            if rows:
+                out.append((eui, [float(t) for t, _ in rows], [float(y) for _, y in rows]))
+    await engine.dispose()
+    return out
+
+
+def replay(series, mode: str, tolerance: float) -> dict:
+    readings = rows = 0
+    max_err = sum_err = 0.0
+    elapsed = 0.0
+    for name, times, levels in series:
+        comp = ReadingCompressor(mode=mode, heartbeat_s=settings.STORAGE_HEARTBEAT_MIN * 60)
+        stored = []
+        for i, (t, y) in enumerate(zip(times, levels)):
+            t0 = time.perf_counter()
+            stored += comp.offer(name, t, y, tolerance, i)
+            elapsed += time.perf_counter() - t0
+        stored += comp.drain()
+        stored.sort()
+        rebuilt = reconstruct([times[i] for i in stored], [levels[i] for i in stored],
+                              times, mode)
+        errors = [abs(a - b) for a, b in zip(rebuilt, levels)]
+        readings += len(levels)
+        rows += len(stored)
+        max_err = max(max_err, max(errors))
+        sum_err += sum(errors)
+    return {
+        "rows": rows,
+        "reduction": round(readings / rows, 1) if rows else None,
+        "max_error_cm": round(max_err, 3),
+        "mean_error_cm": round(sum_err / readings, 3) if readings else None,
+        "offer_us": round(elapsed / readings * 1e6, 3) if readings else None,
+    }
+
+
+def run(args) -> dict:
+    if args.dsn:
+        series = asyncio.run(db_series(args.dsn, args.devices, args.days))
+    else:
+        series = list(synthetic_series(args.series, args.days))
+    return {
+        "readings": sum(len(levels) for _, _, levels in series),
+        "heartbeat_min": settings.STORAGE_HEARTBEAT_MIN,
+        "results": {
+            mode: {f"{tol:g}cm": replay(series, mode, tol) for tol in args.tolerances}
+            for mode in MODES
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--series", type=int, default=20)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--tolerances", type=float, nargs="+", default=[0.5, 1.0, 2.0])
+    parser.add_argument("--dsn")
+    parser.add_argument("--devices", nargs="*", default=[])
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
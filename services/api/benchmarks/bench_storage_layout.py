@@ -0,0 +1,221 @@
+"""
+Benchmark de almacenamiento: sensor_readings (legacy) vs esquema compacto.
+
+Crea ambas tablas en un schema temporal, genera N filas sintéticas
+del lado del servidor (generate_series, 10% con GPS) y reporta:
+  · bytes en disco por millón de filas (tabla + índices)
+  · latencia de las queries frecuentes de la API
+
+Uso (desde services/api, con TimescaleDB accesible):
+    python -m benchmarks.bench_storage_layout --rows 1000000 --devices 100
+    python -m benchmarks.bench_storage_layout --dsn postgresql://u:p@localhost:5433/aquaalert_ts
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import asyncpg
+
+from app.core.config import settings
+
+SCHEMA = "bench_layout"
+
+LEGACY_DDL = f"""
+CREATE TABLE {SCHEMA}.sensor_readings (
+  id             UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  time           TIMESTAMPTZ NOT NULL DEFAULT now(),
+  device_eui     VARCHAR(16) NOT NULL,
+  distance_cm    FLOAT8,
+  water_level_cm FLOAT8,
+  fill_pct       FLOAT8,
+  battery_mv     INTEGER,
+  battery_pct    INTEGER,
+  rssi           INTEGER,
+  snr            FLOAT8,
+  latitude       FLOAT8,
+  longitude      FLOAT8,
+  alert_level    VARCHAR(10) NOT NULL DEFAULT 'NORMAL'
+);
+CREATE INDEX ON {SCHEMA}.sensor_readings (time);
+CREATE INDEX ON {SCHEMA}.sensor_readings (device_eui);
+CREATE INDEX ON {SCHEMA}.sensor_readings (device_eui, time);
+"""
+
+COMPACT_DDL = f"""
+CREATE TABLE {SCHEMA}.sensor_readings_compact (
+  time        TIMESTAMPTZ NOT NULL,
+  distance_cm REAL,
+  snr         REAL,
+  battery_mv  SMALLINT,
+  rssi        SMALLINT,
+  alert_code  SMALLINT    NOT NULL DEFAULT 0,
+  device_eui  VARCHAR(16) NOT NULL,
+  PRIMARY KEY (device_eui, time)
+);
+CREATE INDEX ON {SCHEMA}.sensor_readings_compact (time);
+CREATE TABLE {SCHEMA}.gps_fixes (
+  time       TIMESTAMPTZ NOT NULL,
+  lat_e6     INTEGER     NOT NULL,
+  lon_e6     INTEGER     NOT NULL,
+  device_eui VARCHAR(16) NOT NULL,
+  PRIMARY KEY (device_eui, time)
+);
+CREATE TABLE {SCHEMA}.devices (
+  device_eui       VARCHAR(16) PRIMARY KEY,
+  bridge_height_cm FLOAT8 NOT NULL DEFAULT 300
+);
+CREATE VIEW {SCHEMA}.sensor_readings_compact_v AS
+SELECT r.time, r.device_eui, r.distance_cm::float8 AS distance_cm,
+       GREATEST(0, d.bridge_height_cm - r.distance_cm) AS water_level_cm,
+       LEAST(100, GREATEST(0, d.bridge_height_cm - r.distance_cm)
+                  / d.bridge_height_cm * 100) AS fill_pct,
+       r.battery_mv::int AS battery_mv, r.rssi::int AS rssi, r.snr::float8 AS snr,
+       g.lat_e6 / 1e6::float8 AS latitude, g.lon_e6 / 1e6::float8 AS longitude,
+       r.alert_code
+FROM {SCHEMA}.sensor_readings_compact r
+JOIN {SCHEMA}.devices d USING (device_eui)
+LEFT JOIN {SCHEMA}.gps_fixes g USING (device_eui, time);
+"""
+
+# Filas sintéticas: un uplink cada 30 s por device, 1 de cada 10 con GPS
+SERIES = """
+SELECT
+  upper(lpad(to_hex(i % $2), 16, '0'))             AS device_eui,
+  now() - ((i / $2) * interval '30 seconds')        AS time,
+  (150 + (i % 97))::float8                          AS distance_cm,
+  (3300 + (i % 800))                                AS battery_mv,
+  (-60 - (i % 50))                                  AS rssi,
+  ((i % 15) - 5)::float8                            AS snr,
+  CASE WHEN i % 10 = 0 THEN 20.6597 END             AS latitude,
+  CASE WHEN i % 10 = 0 THEN -103.3496 END           AS longitude
+FROM generate_series(1, $1) AS i
+"""
+
+LEGACY_FILL = f"""
+INSERT INTO {SCHEMA}.sensor_readings
+  (time, device_eui, distance_cm, water_level_cm, fill_pct,
+   battery_mv, battery_pct, rssi, snr, latitude, longitude, alert_level)
+SELECT time, device_eui, distance_cm, 300 - distance_cm,
+       (300 - distance_cm) / 3, battery_mv,
+       LEAST(100, GREATEST(0, (battery_mv - 3000) / 12)),
+       rssi, snr, latitude, longitude, 'NORMAL'
+FROM ({SERIES}) s
+"""
+
+COMPACT_FILL = f"""
+WITH s AS ({SERIES}),
+r AS (
+  INSERT INTO {SCHEMA}.sensor_readings_compact
+    (time, device_eui, distance_cm, battery_mv, rssi, snr, alert_code)
+  SELECT time, device_eui, distance_cm, battery_mv, rssi, snr, 0 FROM s
+)
+INSERT INTO {SCHEMA}.gps_fixes (time, device_eui, lat_e6, lon_e6)
+SELECT time, device_eui, round(latitude * 1e6), round(longitude * 1e6)
+FROM s WHERE latitude IS NOT NULL
+"""
+
+QUERIES = {
+    "latest": {
+        "legacy": f"SELECT * FROM {SCHEMA}.sensor_readings "
+                  f"WHERE device_eui = $1 ORDER BY time DESC LIMIT 1",
+        "compact": f"SELECT * FROM {SCHEMA}.sensor_readings_compact_v "
+                   f"WHERE device_eui = $1 ORDER BY time DESC LIMIT 1",
+    },
+    "history_24h": {
+        "legacy": f"SELECT * FROM {SCHEMA}.sensor_readings "
+                  f"WHERE device_eui = $1 AND time >= now() - interval '24 hours' "
+                  f"ORDER BY time DESC LIMIT 1000",
+        "compact": f"SELECT * FROM {SCHEMA}.sensor_readings_compact_v "
+                   f"WHERE device_eui = $1 AND time >= now() - interval '24 hours' "
+                   f"ORDER BY time DESC LIMIT 1000",
+    },
+}
+
+
+def _dsn(args) -> str:
+    return args.dsn or settings.DATABASE_URL.replace("+asyncpg", "")
+
+
+async def _relation_bytes(conn, *tables: str) -> int:
+    total = 0
+    for table in tables:
+        total += await conn.fetchval(
+            "SELECT pg_total_relation_size($1::regclass)", f"{SCHEMA}.{table}"
+        )
+    return total
+
+
+async def _time_query(conn, sql: str, device_eui: str, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await conn.fetch(sql, device_eui)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+async def run(args) -> dict:
+    conn = await asyncpg.connect(_dsn(args))
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+        await conn.execute(LEGACY_DDL)
+        await conn.execute(COMPACT_DDL)
+        await conn.execute(
+            f"INSERT INTO {SCHEMA}.devices (device_eui) "
+            f"SELECT upper(lpad(to_hex(i), 16, '0')) FROM generate_series(0, $1 - 1) i",
+            args.devices,
+        )
+
+        results = {"rows": args.rows, "devices": args.devices, "layouts": {}}
+        for layout, fill, tables in (
+            ("legacy", LEGACY_FILL, ("sensor_readings",)),
+            ("compact", COMPACT_FILL, ("sensor_readings_compact", "gps_fixes")),
+        ):
+            t0 = time.perf_counter()
+            await conn.execute(fill, args.rows, args.devices)
+            load_s = time.perf_counter() - t0
+            for table in tables:
+                await conn.execute(f"VACUUM ANALYZE {SCHEMA}.{table}")
+
+            size = await _relation_bytes(conn, *tables)
+            results["layouts"][layout] = {
+                "load_s": round(load_s, 2),
+                "total_bytes": size,
+                "bytes_per_million_rows": round(size / args.rows * 1_000_000),
+                "queries": {
+                    name: await _time_query(conn, sql[layout], "0" * 16, args.repeat)
+                    for name, sql in QUERIES.items()
+                },
+            }
+
+        legacy = results["layouts"]["legacy"]["total_bytes"]
+        compact = results["layouts"]["compact"]["total_bytes"]
+        results["size_ratio"] = round(compact / legacy, 3)
+        return results
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="no borrar el schema al terminar")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+"""
+Suite de benchmarks de regresión del ingest y la API.
+
+Mide, con el mismo código que corre en producción:
+  · decode_payload (tipo A y B) y evaluate_alert_level, en µs/op
+  · _process_message completo (parse + nivel + tendencia + filas
+    ORM + buffer), en mensajes/s
+  · GET /sensors con 10 / 100 / 1000 devices (buffer frío = una
+    query por device, y buffer caliente)
+  · GET /sensors/{eui}/readings con tablas de tamaño creciente
+
+Backends:
+  · fake     → sesión en memoria (sin red ni DB): mide el CPU propio
+               de la app, estable entre corridas; es el default
+  · postgres → TimescaleDB local (--dsn); siembra devices BE0C… y
+               lecturas con generate_series y los borra al terminar
+Con --mqtt HOST además publica uplinks a un mosquitto local y mide
+el pipeline completo del listener (suscripción → _process_message).
+
+La salida es JSON: cada métrica con valor, unidad y sentido
+("lower"/"higher" es mejor). Con --baseline compara contra un JSON
+guardado y marca como regresión lo que empeore más de --threshold;
+en ese caso el exit code es 1 (para CI).
+
+Uso (desde services/api):
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --backend postgres --dsn postgresql+asyncpg://u:p@localhost:5433/aquaalert_ts
+
+Imprime un JSON en stdout.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import platform
+import struct
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from app.models.device import Device
+from app.models.reading import SensorReading
+
+EUI_PREFIX = "BE0C"
+LIST_SIZES = (10, 100, 1000)
+TABLE_SIZES = (10_000, 100_000, 1_000_000)
+READINGS_LIMIT = 1000
+
+
+# ─── Métricas ─────────────────────────────────────────
+def metric(value: float, unit: str, better: str = "lower") -> dict:
+    return {"value": round(value, 3), "unit": unit, "better": better}
+
+
+def _best_per_op(fn, n: int, repeat: int) -> float:
+    """Mejor de `repeat` corridas de n llamadas, en µs por llamada."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / n * 1e6
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> dict:
+    """
+    Cambio de cada métrica contra el baseline. change_pct > 0 es
+    peor (más lento o menos throughput); regresión si supera threshold.
+    """
+    report = {}
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base or not base["value"]:
+            report[name] = {"baseline": None, "value": current["value"], "regression": False}
+            continue
+        ratio = current["value"] / base["value"]
+        if current["better"] == "lower":
+            worse = ratio - 1
+        else:
+            worse = 1 / ratio - 1 if ratio else float("inf")
+        report[name] = {
+            "baseline": base["value"],
+            "value": current["value"],
+            "change_pct": round(worse * 100, 1),
+            "regression": worse > threshold,
+        }
+    return report
+
+
+# ─── Datos sintéticos ─────────────────────────────────
+def _eui(n: int) -> str:
+    return f"{EUI_PREFIX}{n:012X}"
+
+
+def _device(n: int) -> Device:
+    return Device(
+        device_eui=_eui(n), name=f"Bench {n}", location_name="Benchmark",
+        bridge_height_cm=300.0, threshold_watch_pct=50.0, threshold_warning_pct=70.0,
+        threshold_critical_pct=85.0, threshold_rise_cm_min=1.0, is_active=True,
+    )
+
+
+def _reading(eui: str, t: datetime, k: int) -> SensorReading:
+    return SensorReading(
+        id=uuid.uuid4(), time=t, device_eui=eui, distance_cm=200.0 + k % 50,
+        water_level_cm=100.0 - k % 50, fill_pct=33.3, battery_mv=3900, battery_pct=75,
+        rssi=-95, snr=7.5, alert_level="NORMAL",
+    )
+
+
+def _uplink(eui: str, k: int) -> tuple[str, bytes]:
+    if k % 10 == 0:
+        raw = struct.pack(">HHii", 1200 + k % 800, 3900, 20659699, -103349609)
+    else:
+        raw = struct.pack(">HH", 1200 + k % 800, 3900)
+    body = json.dumps({
+        "deviceInfo": {"devEui": eui},
+        "data": base64.b64encode(raw).decode(),
+        "rxInfo": [{"rssi": -95, "snr": 7.5}],
+    }).encode()
+    return f"application/1/device/{eui}/event/up", body
+
+
+# ─── Backend en memoria ───────────────────────────────
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+    def scalar_one_or_none(self):
+        return self._rows[0] if self._rows else None
+
+
+class FakeSession:
+    """
+    Responde los SELECT de los routers y del ingest desde listas en
+    memoria; el historial se busca por bisección sobre time (como
+    el índice (device_eui, time)), no con un scan.
+    """
+
+    def __init__(self, devices: list[Device], readings: dict[str, list]):
+        self.devices = {d.device_eui: d for d in devices}
+        self.readings = readings   # eui → lecturas ordenadas de más nueva a más vieja
+
+    async def execute(self, stmt):
+        entity = stmt.column_descriptions[0]["entity"]
+        params = stmt.compile().params
+        eui = next((v for k, v in params.items() if k.startswith("device_eui")), None)
+        if entity is Device:
+            if eui is not None:
+                return _Result([self.devices[eui]] if eui in self.devices else [])
+            return _Result([d for d in self.devices.values() if d.is_active])
+        rows = self.readings.get(eui, [])
+        since = next((v for k, v in params.items() if k.startswith("time")), None)
+        limit = next((v for k, v in params.items() if k.startswith("param")), len(rows))
+        if since is not None:
+            rows = rows[:_count_newer(rows, since)]
+        return _Result(rows[:limit])
+
+    def add(self, _row):
+        pass
+
+    def add_all(self, _rows):
+        pass
+
+    async def commit(self):
+        pass
+
+
+def _count_newer(rows: list, since: datetime) -> int:
+    lo, hi = 0, len(rows)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if rows[mid].time >= since:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+# ─── Casos ────────────────────────────────────────────
+def bench_decoder(args) -> dict:
+    from app.services.alert_service import evaluate_alert_level
+    from app.services.decoder import decode_payload
+
+    type_a = struct.pack(">HH", 1500, 3900)
+    type_b = struct.pack(">HHii", 1500, 3900, 20659699, -103349609)
+    device = _device(0)
+    n = args.ops
+    return {
+        "decode_payload_a_us": metric(_best_per_op(lambda: decode_payload(type_a), n, args.repeat), "us"),
+        "decode_payload_b_us": metric(_best_per_op(lambda: decode_payload(type_b), n, args.repeat), "us"),
+        "evaluate_alert_level_us": metric(
+            _best_per_op(lambda: evaluate_alert_level(72.5, device), n, args.repeat), "us"
+        ),
+    }
+
+
+def _patched_ingest(session_factory):
+    """Parches del ingest: sesión del benchmark y alertas sin red."""
+    async def no_alert(*_args, **_kwargs):
+        return False
+
+    return [
+        mock.patch("app.services.mqtt_client.get_db_session", session_factory),
+        *(mock.patch(f"app.services.mqtt_client.{name}", no_alert) for name in (
+            "send_telegram_alert", "send_rise_alert", "send_status_alert", "send_downstream_alert",
+            "send_forecast_alert",
+        )),
+    ]
+
+
+async def bench_process_message(args, session_factory) -> dict:
+    from app.services.mqtt_client import MQTTClient
+
+    client = MQTTClient()
+    messages = [_uplink(_eui(k % 100), k) for k in range(args.messages)]
+    patches = _patched_ingest(session_factory)
+    for p in patches:
+        p.start()
+    try:
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            for topic, payload in messages:
+                await client._process_message(topic, payload)
+            best = min(best, time.perf_counter() - t0)
+    finally:
+        for p in patches:
+            p.stop()
+    return {"process_message_per_s": metric(len(messages) / best, "msg/s", "higher")}
+
+
+async def bench_mqtt_pipeline(args, session_factory) -> dict:
+    """Uplinks publicados a mosquitto hasta procesados por el listener."""
+    import aiomqtt
+
+    from app.services.mqtt_client import MQTTClient
+
+    client = MQTTClient()
+    processed = 0
+    done = asyncio.Event()
+    original = client._process_message
+
+    async def counting(topic, payload):
+        nonlocal processed
+        await original(topic, payload)
+        processed += 1
+        if processed >= args.messages:
+            done.set()
+
+    client._process_message = counting
+    patches = _patched_ingest(session_factory) + [
+        mock.patch("app.services.mqtt_client.settings.MQTT_BROKER", args.mqtt),
+    ]
+    for p in patches:
+        p.start()
+    try:
+        await client.connect()
+        await asyncio.sleep(1.0)   # suscripción activa
+        async with aiomqtt.Client(hostname=args.mqtt) as pub:
+            t0 = time.perf_counter()
+            for k in range(args.messages):
+                topic, payload = _uplink(_eui(k % 100), k)
+                await pub.publish(topic, payload)
+            await asyncio.wait_for(done.wait(), timeout=120)
+            elapsed = time.perf_counter() - t0
+    finally:
+        await client.disconnect()
+        for p in patches:
+            p.stop()
+    return {"mqtt_pipeline_per_s": metric(args.messages / elapsed, "msg/s", "higher")}
+
+
+def _http_client(session_factory):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.core.database import get_read_db
+    from app.routers import sensors
+
+    app = FastAPI()
+    app.include_router(sensors.router, prefix="/sensors")
+
+    async def db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_read_db] = db
+    # Como context manager: un solo event loop para todos los requests
+    return TestClient(app)
+
+
+def _clear_buffer(n: int):
+    from app.services.recent_buffer import recent_buffer
+
+    for k in range(n):
+        recent_buffer.invalidate(_eui(k))
+
+
+def _time_requests(client, url: str, params: dict, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        response = client.get(url, params=params)
+        best = min(best, time.perf_counter() - t0)
+        response.raise_for_status()
+    return best * 1000
+
+
+def bench_list_sensors(args, backend) -> dict:
+    from app.services.recent_buffer import recent_buffer
+    from app.services.response_cache import response_cache
+
+    response_cache.ttl_s = 0   # medir la construcción, no el cache
+    out = {}
+    for n in LIST_SIZES:
+        _clear_buffer(max(LIST_SIZES))
+        with _http_client(backend.with_devices(n)) as client:
+            out[f"list_sensors_{n}_cold_ms"] = metric(
+                _time_requests(client, "/sensors/", {}, args.repeat), "ms"
+            )
+            for k in range(n):
+                recent_buffer.append(_eui(k), {
+                    "id": uuid.uuid4(), "time": datetime.now(timezone.utc),
+                    "distance_cm": 200.0, "water_level_cm": 100.0, "fill_pct": 33.3,
+                    "battery_pct": 75, "rssi": -95, "snr": 7.5, "latitude": None,
+                    "longitude": None, "alert_level": "NORMAL",
+                })
+            out[f"list_sensors_{n}_buffer_ms"] = metric(
+                _time_requests(client, "/sensors/", {}, args.repeat), "ms"
+            )
+    _clear_buffer(max(LIST_SIZES))
+    return out
+
+
+def bench_get_readings(args, backend) -> dict:
+    _clear_buffer(max(LIST_SIZES))   # historial desde la DB, no del buffer
+    out = {}
+    for size in TABLE_SIZES[:args.table_sizes]:
+        with _http_client(backend.with_table(size)) as client:
+            url = f"/sensors/{_eui(0)}/readings"
+            for hours in (1, 24):
+                out[f"get_readings_{size}_{hours}h_ms"] = metric(_time_requests(
+                    client, url, {"hours": hours, "limit": READINGS_LIMIT}, args.repeat,
+                ), "ms")
+    return out
+
+
+class FakeBackend:
+    name = "fake"
+
+    def __init__(self):
+        self._session = FakeSession([_device(k) for k in range(100)], {})
+
+    def session_factory(self):
+        session = self._session
+
+        @asynccontextmanager
+        async def factory():
+            yield session
+
+        return factory
+
+    def with_devices(self, n: int):
+        devices = [_device(k) for k in range(n)]
+        now = datetime.now(timezone.utc)
+        self._session = FakeSession(devices, {d.device_eui: [_reading(d.device_eui, now, 0)]
+                                              for d in devices})
+        return self.session_factory()
+
+    def with_table(self, size: int):
+        # 10 devices; el consultado tiene size/10 filas cada 30 s
+        eui = _eui(0)
+        now = datetime.now(timezone.utc)
+        rows = [_reading(eui, now - timedelta(seconds=30 * k), k) for k in range(size // 10)]
+        self._session = FakeSession([_device(k) for k in range(10)], {eui: rows})
+        return self.session_factory()
+
+    async def close(self):
+        pass
+
+
+class PostgresBackend:
+    """Siembra en la DB indicada; todo lo sembrado usa EUIs BE0C…"""
+    name = "postgres"
+
+    def __init__(self, dsn: str):
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        self.engine = create_async_engine(dsn, pool_size=5)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self._rows = 0
+
+    def session_factory(self):
+        return self.sessions
+
+    async def _sql(self, *statements: str, **params):
+        from sqlalchemy import text
+
+        # Cada fase corre en su propio event loop: no reusar conexiones de otro
+        await self.engine.dispose(close=False)
+        async with self.engine.begin() as conn:
+            for sql in statements:
+                await conn.execute(text(sql), params)
+        await self.engine.dispose(close=False)
+
+    async def seed_devices(self, n: int):
+        await self._sql(
+            f"DELETE FROM devices WHERE device_eui LIKE '{EUI_PREFIX}%'",
+            f"""INSERT INTO devices (device_eui, name, location_name, bridge_height_cm,
+                  threshold_watch_pct, threshold_warning_pct, threshold_critical_pct,
+                  threshold_rise_cm_min, is_active)
+                SELECT '{EUI_PREFIX}' || lpad(upper(to_hex(i)), 12, '0'), 'Bench ' || i,
+                       'Benchmark', 300, 50, 70, 85, 1, true
+                FROM generate_series(0, :n - 1) i""",
+            n=n,
+        )
+
+    async def grow_table(self, size: int):
+        """Lleva las lecturas sembradas a `size` filas (10 devices, cada 30 s)."""
+        from app.core.config import settings
+
+        missing = size - self._rows
+        if missing <= 0:
+            return
+        if settings.READINGS_STORAGE == "compact":
+            insert = f"""INSERT INTO sensor_readings_compact
+                  (device_eui, time, distance_cm, battery_mv, rssi, snr, alert_code)
+                SELECT '{EUI_PREFIX}' || lpad(upper(to_hex(i % 10)), 12, '0'),
+                       now() - (i / 10) * interval '30 seconds', 200 + i % 50, 3900, -95, 7.5, 0
+                FROM generate_series(:lo, :hi - 1) i"""
+        else:
+            insert = f"""INSERT INTO sensor_readings
+                  (id, device_eui, time, distance_cm, water_level_cm, fill_pct,
+                   battery_mv, battery_pct, rssi, snr, alert_level)
+                SELECT gen_random_uuid(), '{EUI_PREFIX}' || lpad(upper(to_hex(i % 10)), 12, '0'),
+                       now() - (i / 10) * interval '30 seconds', 200 + i % 50, 100 - i % 50,
+                       33.3, 3900, 75, -95, 7.5, 'NORMAL'
+                FROM generate_series(:lo, :hi - 1) i"""
+        await self._sql(insert, lo=self._rows, hi=size)
+        await self._sql(f"ANALYZE {'sensor_readings_compact' if 'compact' in insert else 'sensor_readings'}")
+        self._rows = size
+
+    def with_devices(self, n: int):
+        asyncio.run(self.seed_devices(n))
+        return self.sessions
+
+    def with_table(self, size: int):
+        asyncio.run(self.grow_table(size))
+        return self.sessions
+
+    async def close(self):
+        await self._sql(
+            f"DELETE FROM sensor_readings WHERE device_eui LIKE '{EUI_PREFIX}%'",
+            f"DELETE FROM devices WHERE device_eui LIKE '{EUI_PREFIX}%'",
+        )
+        await self.engine.dispose()
+
+
+# ─── Runner ───────────────────────────────────────────
+def run(args) -> dict:
+    from app.core.logging_config import configure_logging
+
+    # Logs a stderr y muestreados como en producción; no ensucian el JSON
+    configure_logging(level="WARNING", stream=sys.stderr)
+    backend = PostgresBackend(args.dsn) if args.backend == "postgres" else FakeBackend()
+
+    results = bench_decoder(args)
+    if args.backend == "postgres":
+        asyncio.run(backend.seed_devices(100))
+    results |= asyncio.run(bench_process_message(args, backend.session_factory()))
+    if args.mqtt:
+        results |= asyncio.run(bench_mqtt_pipeline(args, backend.session_factory()))
+    results |= bench_list_sensors(args, backend)
+    results |= bench_get_readings(args, backend)
+    if args.backend == "postgres":
+        asyncio.run(backend.close())
+
+    return {
+        "backend": backend.name,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=("fake", "postgres"), default="fake")
+    parser.add_argument("--dsn", default=None, help="DSN asyncpg (default: DATABASE_URL)")
+    parser.add_argument("--mqtt", default=None, help="host de mosquitto para el pipeline completo")
+    parser.add_argument("--ops", type=int, default=20_000)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--table-sizes", type=int, default=len(TABLE_SIZES),
+                        help=f"cuántos de {TABLE_SIZES} medir")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=None, help="JSON guardado con --save-baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="0.25 = 25%% peor")
+    parser.add_argument("--save-baseline", default=None)
+    args = parser.parse_args()
+    if args.backend == "postgres" and args.dsn is None:
+        from app.core.config import settings
+
+        args.dsn = settings.DATABASE_URL
+
+    report = run(args)
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["threshold"] = args.threshold
+        report["comparison"] = compare(report["results"], baseline["results"], args.threshold)
+        report["regressions"] = [k for k, v in report["comparison"].items() if v["regression"]]
+        exit_code = 1 if report["regressions"] else 0
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({k: v for k, v in report.items() if k not in ("comparison", "regressions")},
+                      f, indent=2)
+            f.write("\n")
+
+    print(json.dumps(report, indent=2))
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import admission as adm
+from app.core.admission import AdmissionMiddleware, MemoryRateLimiter
+from app.core.database import PoolWaitStats
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def test_token_bucket_burst_then_refill():
+    clock = _Clock()
+    limiter = MemoryRateLimiter(rate_per_s=2.0, burst=4, clock=clock)
+    assert [await limiter.acquire("a") for _ in range(4)] == [0.0] * 4
+    assert await limiter.acquire("a") == 0.5
+    assert await limiter.acquire("b") == 0.0     # otro cliente, otro balde
+    clock.now = 1.0
+    assert await limiter.acquire("a", cost=2) == 0.0
+    assert await limiter.acquire("a", cost=2) == 1.0
+
+
+def test_pool_pressure_decays_without_checkouts():
+    stats = PoolWaitStats()
+    for _ in range(50):
+        stats.observe(1.0)
+    now = stats.observed_at
+    assert stats.pressure_s(now) == stats.recent_wait_s
+    assert stats.pressure_s(now + 4.0) < stats.recent_wait_s / 3
+
+
+def _app(limiter=None, history_slots=0):
+    app = FastAPI()
+
+    @app.get("/api/v1/sensors/")
+    async def sensors():
+        return []
+
+    @app.get("/api/v1/sensors/{eui}/readings")
+    async def readings(eui: str):
+        await asyncio.sleep(0.2)
+        return []
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    app.add_middleware(AdmissionMiddleware, limiter=limiter, history_slots=history_slots)
+    return app
+
+
+def test_rate_limit_returns_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(adm.settings, "RATE_LIMIT_HISTORY_COST", 3)
+    limiter = MemoryRateLimiter(rate_per_s=0.5, burst=4)
+    with TestClient(_app(limiter)) as client:
+        assert client.get("/api/v1/sensors/EUI/readings").status_code == 200   # cuesta 3
+        assert client.get("/api/v1/sensors/").status_code == 200
+        r = client.get("/api/v1/sensors/")
+        assert r.status_code == 429
+        assert int(r.headers["retry-after"]) >= 1
+        assert client.get("/health").status_code == 200   # exento
+
+
+def test_load_shedding_when_ingest_pool_waits(monkeypatch):
+    stats = PoolWaitStats()
+    monkeypatch.setattr(adm, "write_pool_stats", stats)
+    monkeypatch.setattr(adm.settings, "SHED_WRITE_WAIT_MS", 50.0)
+    with TestClient(_app()) as client:
+        assert client.get("/api/v1/sensors/").status_code == 200
+        for _ in range(30):
+            stats.observe(0.5)
+        r = client.get("/api/v1/sensors/")
+        assert r.status_code == 429 and r.headers["retry-after"] == "2"
+        assert client.get("/health").status_code == 200
+        stats.observed_at -= 30          # sin checkouts un rato: la presión decae
+        assert client.get("/api/v1/sensors/").status_code == 200
+
+
+async def test_history_concurrency_cap(monkeypatch):
+    import httpx
+
+    monkeypatch.setattr(adm.settings, "HISTORY_QUEUE_S", 0.05)
+    app = _app(history_slots=1)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first, second, cheap = await asyncio.gather(
+            client.get("/api/v1/sensors/A/readings"),
+            client.get("/api/v1/sensors/B/readings"),
+            client.get("/api/v1/sensors/"),
+        )
+    assert sorted([first.status_code, second.status_code]) == [200, 429]
+    assert cheap.status_code == 200
+    assert adm.admission.stats()["history_rejected"] == 1
@@ -0,0 +1,270 @@
+import asyncio
+import json
+import time
+
+import pytest
+from structlog.testing import capture_logs
+
+from app.services.alert_dispatcher import AlertDispatcher, parse_routes
+
+
+class FakeTelegram:
+    """
+    sendMessage HTTP local: acepta un mensaje por chat cada
+    `interval` s; antes de eso responde 429 con retry_after.
+    """
+
+    def __init__(self, interval: float = 0.2, retry_after: float = 0.2, status: dict | None = None,
+                 clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self.retry_after = retry_after
+        self.status = status or {}      # chat → status forzado
+        self.accepted: list[tuple[str, str, float]] = []
+        self.limited = 0
+        self._last: dict[str, float] = {}
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = next(int(line.split(b":")[1]) for line in head.split(b"\r\n")
+                              if line.lower().startswith(b"content-length"))
+                code, body = self._reply(json.loads(await reader.readexactly(length)))
+                payload = json.dumps(body).encode()
+                writer.write(
+                    f"HTTP/1.1 {code} X\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    def _reply(self, msg: dict) -> tuple[int, dict]:
+        chat, now = msg["chat_id"], self.clock()
+        if chat in self.status:
+            return self.status[chat], {"ok": False, "description": "Bad Request: chat not found"}
+        if now - self._last.get(chat, -1e9) < self.interval:
+            self.limited += 1
+            return 429, {"ok": False, "error_code": 429,
+                         "parameters": {"retry_after": self.retry_after}}
+        self._last[chat] = now
+        self.accepted.append((chat, msg["text"], now))
+        return 200, {"ok": True, "result": {}}
+
+
+class FakeClock:
+    """Reloj manual compartido por el dispatcher y FakeTelegram."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_dispatcher(url: str, **kwargs) -> AlertDispatcher:
+    options = dict(token="T", chat_id="default", routes={}, digest_s=0.05,
+                   chat_per_min=300.0, chat_burst=1, global_per_s=30.0)
+    options.update(kwargs)
+    return AlertDispatcher(api_url=url, **options)
+
+
+def alert(d: AlertDispatcher, eui: str, level: str, group: str | None = None) -> int:
+    return d.submit(group, eui, level, f"{level} completo {eui}", f"{level} {eui}")
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timeout"
+        await asyncio.sleep(0.01)
+
+
+def test_routes_by_group_with_catch_all():
+    d = make_dispatcher("http://x", routes=parse_routes("norte=-1, -2;sur=-3;*=-9"))
+    assert d.chats_for("norte") == ["-1", "-2", "-9"]
+    assert d.chats_for("sur") == ["-3", "-9"]
+    assert d.chats_for("otro") == ["default", "-9"]
+    assert d.chats_for(None) == ["default", "-9"]
+    assert parse_routes("") == {}
+
+
+async def test_pending_alerts_collapse_into_one_digest_critical_first():
+    async with FakeTelegram() as tg:
+        d = make_dispatcher(tg.url, digest_s=0.1)
+        d.start()
+        for k, level in enumerate(["WATCH", "WARNING", "FORECAST", "CRITICAL"]):
+            alert(d, f"EUI{k}", level)
+        alert(d, "EUI1", "WARNING")     # mismo device y clase: reemplaza
+        await wait_for(lambda: d.delivered == 4)
+        await d.stop()
+
+    assert len(tg.accepted) == 1
+    lines = tg.accepted[0][1].splitlines()
+    assert lines[0].startswith("📣 *RESUMEN: 4 ALERTAS*")
+    assert lines[2:] == ["CRITICAL EUI3", "FORECAST EUI2", "WARNING EUI1", "WATCH EUI0"]
+    assert d.stats()["collapsed"] == 1
+
+
+async def test_single_alert_is_sent_in_full():
+    async with FakeTelegram() as tg:
+        d = make_dispatcher(tg.url)
+        d.start()
+        alert(d, "EUI0", "CRITICAL")
+        await wait_for(lambda: d.messages == 1)
+        await d.stop()
+    assert tg.accepted[0][1] == "CRITICAL completo EUI0"
+
+
+async def test_429_retry_after_is_honoured():
+    # El balde local permite más que el servidor: le toca el 429
+    async with FakeTelegram(interval=0.3, retry_after=0.3) as tg:
+        d = make_dispatcher(tg.url, chat_per_min=6000.0, chat_burst=5, digest_s=0)
+        d.start()
+        alert(d, "EUI0", "WARNING")
+        await wait_for(lambda: d.delivered == 1)
+        alert(d, "EUI1", "CRITICAL")
+        await wait_for(lambda: d.delivered == 2)
+        await d.stop()
+
+    assert d.rate_limited >= 1
+    assert tg.limited == d.rate_limited
+    assert tg.accepted[1][2] - tg.accepted[0][2] >= 0.3
+
+
+async def test_bucket_matching_provider_limit_avoids_429():
+    # Tormenta: 20 devices x 3 uplinks en dos grupos, servidor a 1 msg / 0.2 s por chat.
+    # Sin ciclo de fondo: flush() a mano y el reloj avanza lo que pide
+    clock = FakeClock()
+    async with FakeTelegram(interval=0.2, clock=clock) as tg:
+        d = make_dispatcher(tg.url, routes=parse_routes("norte=-1;sur=-2"),
+                            chat_per_min=60 / 0.25, chat_burst=1, clock=clock)
+        for _ in range(3):
+            for k in range(20):
+                alert(d, f"EUI{k}", "CRITICAL" if k % 5 == 0 else "WARNING",
+                      group="norte" if k < 10 else "sur")
+            await d.flush()
+            clock.now += 0.05
+        while (delay := await d.flush()) is not None:
+            clock.now += delay
+        await d.stop()
+
+    assert d.stats()["pending"] == 0
+    assert tg.limited == 0
+    assert d.submitted == 60
+    assert d.delivered < 60                     # uplinks repetidos se juntaron
+    assert len(tg.accepted) == d.messages < 10
+    assert {chat for chat, _, _ in tg.accepted} == {"-1", "-2"}
+    for chat in ("-1", "-2"):
+        sent = [t for c, _, t in tg.accepted if c == chat]
+        assert all(b - a >= 0.2 for a, b in zip(sent, sent[1:]))
+
+
+async def test_invalid_chat_is_dropped_and_stop_flushes_pending():
+    async with FakeTelegram(status={"-404": 400}) as tg:
+        d = make_dispatcher(tg.url, routes={"x": ["-404"]}, digest_s=60)
+        d.start()
+        alert(d, "EUI0", "CRITICAL", group="x")
+        alert(d, "EUI1", "WATCH")
+        await d.stop()          # no espera la ventana de 60 s
+
+    assert d.stats()["dropped"] == 1
+    assert [text for _, text, _ in tg.accepted] == ["WATCH completo EUI1"]
+
+
+async def test_stop_waits_for_in_flight_send():
+    d = make_dispatcher("http://x", digest_s=0)
+    release, sent = asyncio.Event(), []
+
+    async def slow_post(chat, text):
+        await release.wait()
+        sent.append(text)
+        return "sent", 0.0
+
+    d._post = slow_post
+    d.start()
+    alert(d, "EUI0", "CRITICAL")
+    await wait_for(lambda: d.stats()["pending"] == 0)    # en vuelo
+    stopping = asyncio.create_task(d.stop())
+    await asyncio.sleep(0.05)
+    assert not stopping.done()
+    release.set()
+    await stopping
+    assert sent == ["CRITICAL completo EUI0"] and d.delivered == 1
+
+
+async def test_cancelled_send_is_requeued():
+    d = make_dispatcher("http://x", digest_s=0)
+
+    async def hung_post(chat, text):
+        await asyncio.Event().wait()
+
+    d._post = hung_post
+    alert(d, "EUI0", "CRITICAL")
+    task = asyncio.create_task(d.flush())
+    await wait_for(lambda: d.stats()["pending"] == 0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert d.stats()["pending"] == 1
+
+
+def _recording(d: AlertDispatcher) -> list[str]:
+    sent = []
+
+    async def post(chat, text):
+        sent.append(text)
+        return "sent", 0.0
+
+    d._post = post
+    return sent
+
+
+async def test_stop_drains_queue_at_bucket_rate():
+    d = make_dispatcher("http://x", chat_per_min=600.0, chat_burst=1)   # 1 token / 0.1 s
+    sent = _recording(d)
+    alert(d, "EUI0", "CRITICAL")
+    await d.flush(force=True)                   # se lleva el único token
+    alert(d, "EUI1", "WARNING")
+    await d.stop()
+    assert sent == ["CRITICAL completo EUI0", "WARNING completo EUI1"]
+    assert d.stats()["pending"] == 0 and d.dropped == 0
+
+
+async def test_stop_logs_alerts_it_cannot_send():
+    d = make_dispatcher("http://x", chat_per_min=1.0, chat_burst=1)     # 1 token / min
+    sent = _recording(d)
+    alert(d, "EUI0", "CRITICAL")
+    await d.flush(force=True)
+    alert(d, "EUI1", "WARNING")
+    alert(d, "EUI2", "WATCH", group="x")        # mismo chat por defecto
+    with capture_logs() as logs:
+        await d.stop()
+    assert len(sent) == 1
+    (event,) = [e for e in logs if e["event"] == "telegram.dropped_on_stop"]
+    assert event["alerts"] == 2
+    assert d.stats()["pending"] == 0 and d.dropped == 2
+
+
+def test_not_configured_queues_nothing():
+    d = make_dispatcher("http://x", token="")
+    assert alert(d, "EUI0", "CRITICAL") == 0
+    assert d.stats()["pending"] == 0
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_share_splits_limits(workers):
+    d = make_dispatcher("http://x", chat_per_min=20.0, global_per_s=30.0)
+    d.share(workers)
+    assert d.chat_rate == pytest.approx(20 / 60 / workers)
+    assert d._global.rate == pytest.approx(30 / workers)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from app.services.battery_forecast import fit_depletion
+
+
+def test_linear_depletion_per_device():
+    # device 0: 4000 mV bajando 20 mV/día; device 1: plano en 3900 mV
+    t = np.tile(np.arange(10, dtype=float), 2)
+    codes = np.repeat([0, 1], 10)
+    mv = np.concatenate([4000 - 20 * t[:10], np.full(10, 3900.0)])
+
+    fit = fit_depletion(codes, t, mv, n_devices=2)
+
+    assert fit["slope_mv_per_day"][0] == pytest.approx(-20.0)
+    assert fit["last_mv"][0] == pytest.approx(3820.0)
+    assert fit["days_to_empty"][0] == pytest.approx(41.0)
+    assert fit["slope_mv_per_day"][1] == pytest.approx(0.0)
+    assert np.isnan(fit["days_to_empty"][1])
+
+
+def test_unordered_samples_and_large_epochs():
+    rng = np.random.default_rng(0)
+    t = 20_000.0 + np.arange(8, dtype=float)
+    order = rng.permutation(8)
+    fit = fit_depletion(np.zeros(8, dtype=int), t[order], (3500 - 50 * (t - t[0]))[order], 1)
+    assert fit["slope_mv_per_day"][0] == pytest.approx(-50.0)
+    assert fit["days_to_empty"][0] == pytest.approx((3150 - 3000) / 50)
+
+
+def test_too_few_samples_has_no_forecast():
+    fit = fit_depletion(np.array([0, 0]), np.array([0.0, 1.0]), np.array([3800.0, 3700.0]), 1)
+    assert np.isnan(fit["slope_mv_per_day"][0])
+    assert np.isnan(fit["days_to_empty"][0])
+    assert fit["last_mv"][0] == pytest.approx(3750.0)
+
+
+def test_already_empty_is_zero_days():
+    t = np.arange(5, dtype=float)
+    fit = fit_depletion(np.zeros(5, dtype=int), t, 3050 - 30 * t, 1)
+    assert fit["days_to_empty"][0] == 0.0
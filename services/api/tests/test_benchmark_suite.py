@@ -0,0 +1,26 @@
+from benchmarks.suite import compare, metric
+
+
+def test_compare_flags_slower_latency():
+    baseline = {"q_ms": metric(10.0, "ms")}
+    report = compare({"q_ms": metric(13.0, "ms")}, baseline, threshold=0.2)
+    assert report["q_ms"]["change_pct"] == 30.0
+    assert report["q_ms"]["regression"] is True
+
+
+def test_compare_flags_lower_throughput():
+    baseline = {"ingest": metric(1000.0, "msg/s", "higher")}
+    ok = compare({"ingest": metric(950.0, "msg/s", "higher")}, baseline, threshold=0.2)
+    slow = compare({"ingest": metric(500.0, "msg/s", "higher")}, baseline, threshold=0.2)
+    assert ok["ingest"]["regression"] is False
+    assert slow["ingest"]["change_pct"] == 100.0
+    assert slow["ingest"]["regression"] is True
+
+
+def test_compare_improvement_and_new_metric():
+    baseline = {"q_ms": metric(10.0, "ms")}
+    report = compare({"q_ms": metric(5.0, "ms"), "new_ms": metric(1.0, "ms")},
+                     baseline, threshold=0.2)
+    assert report["q_ms"]["change_pct"] == -50.0
+    assert report["q_ms"]["regression"] is False
+    assert report["new_ms"]["baseline"] is None
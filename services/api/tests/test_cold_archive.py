@@ -0,0 +1,162 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.database import get_read_db
+from app.routers import sensors
+from app.services import cold_archive as archive_module
+from app.services.cold_archive import ArchiveError, ColdArchive, archive_month, month_bounds
+
+EUI = "A840411D3181BD6B"
+COLD_EUI = "A840411D0000C01D"   # sin lecturas en el buffer de otros tests
+
+
+def _rows(start: datetime, n: int, step_s: int = 30):
+    return [
+        (
+            uuid.uuid4().bytes, start + timedelta(seconds=k * step_s),
+            250.0 - k % 50, None, 50.0 + k % 50, 16.7, 3900, 80, -90, 7.0,
+            None, None, None, None, "NORMAL",
+        )
+        for k in range(n)
+    ]
+
+
+def _archive(tmp_path) -> ColdArchive:
+    return ColdArchive(str(tmp_path), row_group_rows=100, compression="zstd")
+
+
+def test_month_bounds_wrap_year():
+    start, end = month_bounds("2024-12")
+    assert start == datetime(2024, 12, 1, tzinfo=timezone.utc)
+    assert end == datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def test_range_read_skips_row_groups(tmp_path):
+    archive = _archive(tmp_path)
+    start = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    assert archive.write_month(EUI, "2024-03", _rows(start, 1000)) == 1000
+
+    lo, hi = start + timedelta(seconds=30 * 250), start + timedelta(seconds=30 * 260)
+    tables = list(archive.iter_row_groups(EUI, lo, hi))
+    assert sum(t.num_rows for t in tables) == 10
+    assert archive.last_read.row_groups == 1
+    assert archive.last_read.row_groups_skipped == 9
+
+    cols = archive.read_columns(EUI, start, hi, limit=5, columns=("id", "time", "distance_cm"))
+    assert len(cols["time"]) == 5
+    assert cols["time"] == sorted(cols["time"], reverse=True)
+    assert cols["time"][0] == pytest.approx((hi - timedelta(seconds=30)).timestamp())
+
+
+def test_raw_distance_survives_archive(tmp_path):
+    import pyarrow.parquet as pq
+
+    archive = _archive(tmp_path)
+    start = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    rows = _rows(start, 10)
+    rows[4] = rows[4][:3] + (812.0,) + rows[4][4:]     # eco rechazado por el filtro
+    archive.write_month(EUI, "2024-03", rows)
+    cols = archive.read_columns(EUI, start, start + timedelta(days=1), limit=10,
+                                columns=("time", "distance_cm", "distance_raw_cm"))
+    assert cols["distance_raw_cm"][::-1] == [None] * 4 + [812.0] + [None] * 5
+
+    # Archivo escrito antes de la columna: se lee en NULL y se puede re-archivar
+    old = pq.read_table(archive.path(EUI, "2024-03")).drop_columns(["distance_raw_cm"])
+    pq.write_table(old, archive.path(EUI, "2024-04"))
+    archive._catalog()[EUI].add("2024-04")
+    april = datetime(2024, 4, 1, tzinfo=timezone.utc)
+    cols = archive.read_columns(EUI, start, april + timedelta(days=1), limit=20,
+                                columns=("time", "distance_raw_cm"))
+    assert len(cols["time"]) == 20
+    assert archive.write_month(EUI, "2024-04", _rows(april + timedelta(days=2), 3)) == 3
+
+
+def test_rewrite_merges_without_duplicates(tmp_path):
+    archive = _archive(tmp_path)
+    start = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    rows = _rows(start, 300)
+    archive.write_month(EUI, "2024-03", rows[:200])
+    archive.write_month(EUI, "2024-03", rows[100:])   # reintento con solapamiento
+    tables = list(archive.iter_row_groups(EUI, start, start + timedelta(days=31)))
+    assert sum(t.num_rows for t in tables) == 300
+
+
+def test_catalog_is_rebuilt_from_disk(tmp_path):
+    _archive(tmp_path).write_month(EUI, "2024-03", _rows(datetime(2024, 3, 5, tzinfo=timezone.utc), 10))
+    archive = _archive(tmp_path)
+    assert archive.months(EUI) == ["2024-03"]
+    assert archive.covers(EUI, datetime(2024, 3, 20, tzinfo=timezone.utc))
+    assert not archive.covers(EUI, datetime(2024, 4, 1, tzinfo=timezone.utc))
+
+
+class _Result:
+    def __init__(self, rows=(), rowcount=0):
+        self._rows = list(rows)
+        self.rowcount = rowcount
+
+    def all(self):
+        return self._rows
+
+    def scalars(self):
+        return self
+
+
+class _FakeDb:
+    def __init__(self, *results):
+        self._results = list(results)
+        self.committed = False
+
+    async def execute(self, _stmt):
+        return self._results.pop(0)
+
+    async def commit(self):
+        self.committed = True
+
+
+def _db_rows(n):
+    return [(uuid.UUID(bytes=r[0]), *r[1:]) for r in _rows(datetime(2024, 3, 1, tzinfo=timezone.utc), n)]
+
+
+async def test_archive_month_deletes_after_verify(tmp_path):
+    archive = _archive(tmp_path)
+    db = _FakeDb(_Result(_db_rows(120)), _Result(rowcount=120))
+    assert await archive_month(db, archive, EUI, "2024-03") == 120
+    assert db.committed
+    assert archive.path(EUI, "2024-03").exists()
+
+
+async def test_archive_month_aborts_on_delete_mismatch(tmp_path):
+    archive = _archive(tmp_path)
+    db = _FakeDb(_Result(_db_rows(120)), _Result(rowcount=121))
+    with pytest.raises(ArchiveError):
+        await archive_month(db, archive, EUI, "2024-03")
+    assert not db.committed
+
+
+def test_history_falls_back_to_archive(tmp_path, monkeypatch):
+    archive = _archive(tmp_path)
+    start = datetime.now(timezone.utc) - timedelta(hours=5)
+    archive.write_month(COLD_EUI, archive_module.month_key(start), _rows(start, 20))
+    monkeypatch.setattr(sensors, "cold_archive", archive)
+
+    app = FastAPI()
+    app.include_router(sensors.router, prefix="/sensors")
+
+    async def empty_db():
+        yield _FakeDb(_Result(), _Result())   # Postgres ya no tiene ese rango
+
+    app.dependency_overrides[get_read_db] = empty_db
+    client = TestClient(app)
+
+    readings = client.get(f"/sensors/{COLD_EUI}/readings", params={"hours": 6, "limit": 15}).json()
+    assert len(readings) == 15
+    assert readings[0]["time"] > readings[-1]["time"]
+    assert readings[0]["device_eui"] == COLD_EUI
+
+    body = client.get(f"/sensors/{COLD_EUI}/readings",
+                      params={"hours": 6, "limit": 15, "format": "columnar"}).json()
+    assert body["count"] == 15
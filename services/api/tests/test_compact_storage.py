@@ -0,0 +1,66 @@
+import uuid
+from datetime import datetime, timezone
+
+from app.core.config import settings
+from app.models.reading import (
+    CompactReading,
+    CompactReadingView,
+    GpsFix,
+    SensorReading,
+    compact_reading_id,
+    reading_model,
+)
+from app.services.mqtt_client import _build_rows
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def build(decoded: dict) -> list:
+    return _build_rows(
+        reading_id=uuid.uuid4(),
+        device_eui="A840411D3181BD6B",
+        time=NOW,
+        decoded=decoded,
+        water_level=46.8,
+        fill_pct=15.6,
+        alert_level="WARNING",
+        rssi=-80,
+        snr=7.5,
+    )
+
+
+def test_legacy_rows(monkeypatch):
+    monkeypatch.setattr(settings, "READINGS_STORAGE", "legacy")
+    rows = build({"distance_cm": 253.2, "battery_mv": 3800,
+                  "battery_pct": 67, "has_gps": False})
+    assert len(rows) == 1
+    assert isinstance(rows[0], SensorReading)
+    assert rows[0].alert_level == "WARNING"
+    assert reading_model() is SensorReading
+
+
+def test_compact_rows_without_gps(monkeypatch):
+    monkeypatch.setattr(settings, "READINGS_STORAGE", "compact")
+    rows = build({"distance_cm": 253.2, "battery_mv": 3800,
+                  "battery_pct": 67, "has_gps": False})
+    assert len(rows) == 1
+    assert isinstance(rows[0], CompactReading)
+    assert rows[0].alert_code == 2
+    assert reading_model() is CompactReadingView
+
+
+def test_compact_rows_with_gps(monkeypatch):
+    monkeypatch.setattr(settings, "READINGS_STORAGE", "compact")
+    rows = build({"distance_cm": 253.2, "battery_mv": 3800, "battery_pct": 67,
+                  "has_gps": True, "latitude": 20.659699, "longitude": -103.349609})
+    assert len(rows) == 2
+    fix = rows[1]
+    assert isinstance(fix, GpsFix)
+    assert fix.lat_e6 == 20659699
+    assert fix.lon_e6 == -103349609
+
+
+def test_compact_reading_id_is_stable():
+    eui = "A840411D3181BD6B"
+    assert compact_reading_id(eui, NOW) == compact_reading_id(eui, NOW)
+    assert compact_reading_id(eui, NOW) != compact_reading_id("0" * 16, NOW)
@@ -0,0 +1,30 @@
+from app.core.config import Settings
+from app.core.database import PoolWaitStats, engine, pool_stats, read_engine
+
+
+def test_read_url_defaults_to_primary():
+    s = Settings(TIMESCALE_READ_HOST="")
+    assert s.READ_DATABASE_URL == s.DATABASE_URL
+
+
+def test_read_url_points_to_replica():
+    s = Settings(TIMESCALE_READ_HOST="timescaledb-replica")
+    assert "@timescaledb-replica:5432/" in s.READ_DATABASE_URL
+    assert "@timescaledb:5432/" in s.DATABASE_URL
+
+
+def test_read_and_write_pools_are_separate():
+    assert read_engine is not engine
+    assert read_engine.pool is not engine.pool
+    assert set(pool_stats()) == {"write", "read"}
+
+
+def test_pool_wait_stats():
+    stats = PoolWaitStats()
+    for wait in (0.0, 0.002, 0.010):
+        stats.observe(wait)
+    report = stats.as_dict()
+    assert report["checkouts"] == 3
+    assert report["avg_wait_ms"] == 4.0
+    assert report["max_wait_ms"] == 10.0
+    assert 0 < report["recent_wait_ms"] < 10.0
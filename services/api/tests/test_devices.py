@@ -0,0 +1,173 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.core.database import get_db, get_read_db
+from app.models.device import Device
+from app.routers import devices
+from app.services.level_forecast import level_forecaster
+from app.services.rise_rate import rise_estimator
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+    def scalars(self):
+        return self
+
+
+class _FakeDb:
+    """Registra los statements y responde como si `existing` ya estuvieran."""
+
+    def __init__(self, existing=(), listed=()):
+        self.existing = set(existing)
+        self.listed = list(listed)
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        if stmt.is_insert:
+            params = stmt.compile(dialect=postgresql.dialect()).params
+            euis = [v for k, v in params.items() if k.startswith("device_eui")]
+            return _Result([(e, True) for e in euis if e not in self.existing])
+        return _Result(self.listed)
+
+    async def commit(self):
+        pass
+
+
+def _client(db) -> TestClient:
+    app = FastAPI()
+    app.include_router(devices.router, prefix="/devices")
+
+    async def fake_db():
+        yield db
+
+    app.dependency_overrides[get_db] = fake_db
+    app.dependency_overrides[get_read_db] = fake_db
+    return TestClient(app)
+
+
+def test_bulk_csv_reports_errors_per_row():
+    csv_body = (
+        "device_eui,name,location_name,bridge_height_cm\n"
+        "a840411d00000001,Puente 1,Río Verde,320\n"
+        "A840411D00000002,Puente 2,,abc\n"        # altura inválida
+        "XYZ,Puente 3,,\n"                        # EUI inválido
+        "A840411D00000001,Repetido,,\n"           # repetido en el lote
+        "A840411D00000004,Ya existe,,\n"
+    )
+    db = _FakeDb(existing={"A840411D00000004"})
+    body = _client(db).post(
+        "/devices/bulk", content=csv_body, headers={"Content-Type": "text/csv"},
+    ).json()
+
+    assert body["inserted"] == ["A840411D00000001"]
+    assert [(e["row"], e["device_eui"]) for e in body["errors"]] == [
+        (1, "A840411D00000002"), (2, "XYZ"), (3, "A840411D00000001"), (4, "A840411D00000004"),
+    ]
+    assert "bridge_height_cm" in body["errors"][0]["error"]
+    inserts = [s for s in db.statements if s.startswith("INSERT")]
+    assert len(inserts) == 1 and "ON CONFLICT (device_eui) DO NOTHING" in inserts[0]
+
+
+def test_bulk_json_update_mode():
+    db = _FakeDb()
+    body = _client(db).post("/devices/bulk", params={"on_conflict": "update"}, json=[
+        {"device_eui": "A840411D00000010", "name": "A"},
+        {"device_eui": "A840411D00000011", "name": "B", "threshold_warning_pct": 65},
+    ]).json()
+    assert body["inserted"] == ["A840411D00000010", "A840411D00000011"]
+    inserts = [s for s in db.statements if s.startswith("INSERT")]
+    assert len(inserts) == 2                    # distintas columnas: un INSERT cada una
+    assert all("DO UPDATE SET" in s for s in inserts)
+
+
+def test_bulk_update_keeps_omitted_columns_and_recomputes(monkeypatch):
+    moved, same = "A840411D00000020", "A840411D00000021"
+
+    class _Db(_FakeDb):
+        async def execute(self, stmt):
+            if stmt.is_insert:
+                self.statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+                params = stmt.compile(dialect=postgresql.dialect()).params
+                return _Result([(v, False) for k, v in params.items() if k.startswith("device_eui")])
+            # latitude, longitude y DERIVED_INPUTS actuales
+            return _Result([(eui, -34.6, -58.4, 300.0, 50.0, 70.0, 85.0) for eui in (moved, same)])
+
+    submitted = []
+    monkeypatch.setattr(devices.recompute_manager, "submit", submitted.append)
+    level_forecaster.update(moved, 0.0, 100.0)
+    db = _Db()
+    body = _client(db).post("/devices/bulk", params={"on_conflict": "update"},
+                            content="device_eui,name,bridge_height_cm\n"
+                                    f"{moved},Movido,350\n{same},Igual,300\n",
+                            headers={"Content-Type": "text/csv"}).json()
+
+    assert body["updated"] == [moved, same]
+    assert submitted == [moved]
+    assert level_forecaster.last_time(moved) is None
+    (insert,) = db.statements
+    update_set = insert.split("DO UPDATE SET")[1]
+    assert "bridge_height_cm" in update_set and "name" in update_set
+    assert "threshold_warning_pct" not in update_set
+
+
+def test_bulk_rejects_non_array():
+    response = _client(_FakeDb()).post("/devices/bulk", json={"device_eui": "X"})
+    assert response.status_code == 422
+
+
+def _device(n: int) -> Device:
+    return Device(device_eui=f"A840411D{n:08X}", name=f"D{n}", bridge_height_cm=300.0,
+                  threshold_watch_pct=50, threshold_warning_pct=70,
+                  threshold_critical_pct=85, threshold_rise_cm_min=1.0, is_active=True)
+
+
+def test_list_devices_keyset_page():
+    db = _FakeDb(listed=[_device(n) for n in range(4)])
+    response = _client(db).get("/devices/", params={
+        "limit": 3, "after": "a840411d00000000", "active": True, "stale_minutes": 30,
+    })
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+    assert response.headers["x-next-cursor"] == "A840411D00000002"
+    sql = db.statements[0]
+    assert "devices.device_eui > " in sql and "LIMIT" in sql and "OFFSET" not in sql
+    assert "devices.last_seen IS NULL OR devices.last_seen <" in sql
+
+
+def test_list_devices_last_page_has_no_cursor():
+    response = _client(_FakeDb(listed=[_device(1)])).get("/devices/", params={"limit": 3})
+    assert "x-next-cursor" not in response.headers
+
+
+def test_patch_height_resets_trend_and_forecast(monkeypatch):
+    eui = "A840411D000000FF"
+    device = Device(device_eui=eui, name="Puente", bridge_height_cm=300.0,
+                    threshold_watch_pct=50.0, threshold_warning_pct=70.0,
+                    threshold_critical_pct=85.0, threshold_rise_cm_min=1.0, is_active=True)
+
+    class _Db(_FakeDb):
+        async def get(self, _model, _eui):
+            return device
+
+        async def refresh(self, _obj):
+            pass
+
+    submitted = []
+    monkeypatch.setattr(devices.recompute_manager, "submit", submitted.append)
+    for k in range(10):
+        rise_estimator.update(eui, k * 60.0, 100.0 + k)
+        level_forecaster.update(eui, k * 60.0, 100.0 + k)
+    assert level_forecaster.ready(eui)
+
+    r = _client(_Db()).patch(f"/devices/{eui}", json={"device_eui": eui, "name": "Puente", "bridge_height_cm": 350.0})
+    assert r.status_code == 200
+    assert submitted == [eui]
+    assert not level_forecaster.ready(eui)
+    assert level_forecaster.last_time(eui) is None
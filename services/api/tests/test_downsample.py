@@ -0,0 +1,112 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.database import get_read_db
+from app.routers import grafana
+from app.services.downsample import downsample_columns, lttb
+from app.services.reading_codec import COLUMNS
+
+EUI = "A81758FFFE00D0E1"
+
+
+def _flood_series(n: int = 10_000, peak_at: int = 6_123):
+    x = np.arange(n, dtype=np.float64) * 30
+    y = 100 + 5 * np.sin(x / 3600)
+    y[peak_at] = 400.0          # pico de un solo uplink
+    return x, y
+
+
+def test_lttb_keeps_endpoints_count_and_peak():
+    x, y = _flood_series()
+    idx = lttb(x, y, 200)
+    assert len(idx) == 200
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert y[idx].max() == 400.0
+    # Un promedio por bucket aplana el pico
+    assert y.reshape(200, -1).mean(axis=1).max() < 110
+
+
+def test_lttb_short_series_untouched():
+    x, y = _flood_series(50, 10)
+    assert lttb(x, y, 100).tolist() == list(range(50))
+
+
+def _columns(n: int, start: datetime):
+    """Columnas del codec, más nuevas primero; cada 7ma sin nivel."""
+    rows = []
+    for k in range(n):
+        t = start + timedelta(seconds=30 * k)
+        level = None if k % 7 == 3 else 100.0 + (300.0 if k == n // 2 + 1 else k % 5)
+        rows.append((uuid.uuid4().bytes, t.timestamp(), 200.0, None, level, 33.3, 75, -95, 7.5,
+                     None, None, None, None, "NORMAL"))
+    rows.reverse()
+    return {name: [r[i] for r in rows] for i, name in enumerate(COLUMNS)}
+
+
+def test_downsample_columns_newest_first_and_skips_nulls():
+    columns = _columns(1000, datetime(2025, 1, 1, tzinfo=timezone.utc))
+    out = downsample_columns(columns, 50, "water_level_cm")
+    assert len(out["time"]) == 50
+    assert out["time"] == sorted(out["time"], reverse=True)
+    assert None not in out["water_level_cm"]
+    assert max(out["water_level_cm"]) == 400.0
+    assert all(len(col) == 50 for col in out.values())
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _FakeDb:
+    def __init__(self, columns):
+        self.columns = columns
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        rows = list(zip(*(self.columns[name] for name in COLUMNS)))
+        return _Result([
+            (uuid.UUID(bytes=r[0]), datetime.fromtimestamp(r[1], timezone.utc), *r[2:])
+            for r in rows
+        ])
+
+
+def test_grafana_query_reduces_to_max_data_points():
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    db = _FakeDb(_columns(2000, start))
+
+    async def fake_db():
+        yield db
+
+    app = FastAPI()
+    app.include_router(grafana.router)
+    app.dependency_overrides[get_read_db] = fake_db
+    body = {
+        "range": {"from": start.isoformat(), "to": (start + timedelta(days=1)).isoformat()},
+        "maxDataPoints": 100,
+        "targets": [
+            {"target": f"{EUI}:water_level_cm", "refId": "A", "payload": {"alias": "Nivel"}},
+            {"target": f"{EUI}:rssi", "refId": "B"},
+        ],
+    }
+    with TestClient(app) as client:
+        r = client.post("/query", json=body)
+        bad = client.post("/query", json={**body, "targets": [{"target": f"{EUI}:nope"}]})
+    assert r.status_code == 200
+    level, rssi = r.json()
+    assert level["target"] == "Nivel" and rssi["target"] == f"{EUI} rssi"
+    assert len(level["datapoints"]) == 100
+    times = [t for _, t in level["datapoints"]]
+    assert times == sorted(times)
+    assert max(v for v, _ in level["datapoints"]) == 400.0
+    assert db.queries == 1          # una lectura por device
+    assert bad.status_code == 400
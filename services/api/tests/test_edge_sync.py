@@ -0,0 +1,319 @@
+import asyncio
+import gzip
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.storage_backend import GroupCommit, PostgresBackend, SQLiteBackend
+from app.models.edge import SyncCursor
+from app.models.reading import SensorReading
+from app.services import cold_archive
+from app.services import edge_sync as edge_sync_module
+from app.services.edge_sync import (
+    MAX_BATCH_ROWS,
+    SYNC_COLUMNS,
+    EdgeSync,
+    columns_from_rows,
+    decode_batch,
+    encode_batch,
+    store_batch,
+)
+
+T0 = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class SQLiteDB:
+    """Un archivo SQLite con los engines de escritura y lectura del backend edge."""
+
+    def __init__(self, path):
+        self.backend = SQLiteBackend()
+        url = f"sqlite+aiosqlite:///{path}"
+        self.engine = self._engine(url, writer=True)
+        self.read_engine = self._engine(url, writer=False)
+        self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.ReadSession = async_sessionmaker(self.read_engine, expire_on_commit=False)
+
+    def _engine(self, url: str, writer: bool):
+        engine = create_async_engine(url, poolclass=AsyncAdaptedQueuePool,
+                                     **self.backend.engine_options(5, 5, writer))
+        self.backend.configure(engine, writer)
+        return engine
+
+    @asynccontextmanager
+    async def session(self):
+        async with self.Session() as session:
+            yield session
+            await session.commit()
+
+    async def count(self) -> int:
+        async with self.ReadSession() as db:
+            return await db.scalar(select(func.count()).select_from(SensorReading))
+
+    async def close(self):
+        await self.engine.dispose()
+        await self.read_engine.dispose()
+
+
+@pytest.fixture
+async def make_db(tmp_path):
+    dbs = []
+
+    async def make(name: str = "edge") -> SQLiteDB:
+        db = SQLiteDB(tmp_path / f"{name}.db")
+        await db.backend.init_schema(db.engine)
+        dbs.append(db)
+        return db
+
+    yield make
+    for db in dbs:
+        await db.close()
+
+
+def reading(eui: str, minutes: float, distance: float = 100.0) -> SensorReading:
+    return SensorReading(device_eui=eui, time=T0 + timedelta(minutes=minutes),
+                         distance_cm=distance, alert_level="NORMAL")
+
+
+async def test_schema_sync_adds_missing_columns(tmp_path):
+    db = SQLiteDB(tmp_path / "old.db")
+    async with db.engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE edge_sync_cursor (name VARCHAR(32) PRIMARY KEY)"))
+    try:
+        result = await db.backend.init_schema(db.engine)
+        assert "sensor_readings" in result["created"]
+        assert sorted(result["added_columns"]) == [
+            "edge_sync_cursor.last_rowid", "edge_sync_cursor.synced_at"]
+        assert await db.backend.init_schema(db.engine) == {"created": [], "added_columns": []}
+        async with db.ReadSession() as s:
+            assert await s.scalar(text("PRAGMA journal_mode")) == "wal"
+    finally:
+        await db.close()
+
+
+async def test_datetimes_round_trip_as_utc(make_db):
+    db = await make_db()
+    local = T0.astimezone(timezone(timedelta(hours=-3)))
+    async with db.session() as s:
+        s.add(SensorReading(device_eui="A", time=local, distance_cm=1.0))
+    async with db.ReadSession() as s:
+        row = await s.scalar(select(SensorReading))
+        stored = await s.scalar(text("SELECT time FROM sensor_readings"))
+    assert row.time == T0 and row.time.tzinfo == timezone.utc
+    assert stored.startswith("2024-05-01 12:00:00")
+
+
+async def test_latest_per_device(make_db):
+    db = await make_db()
+    async with db.session() as s:
+        s.add_all([reading("A", 0, 10), reading("A", 5, 11), reading("B", 3, 20),
+                   reading("B", 1, 21), reading("C", 0, 30)])
+    async with db.ReadSession() as s:
+        rows = (await s.execute(db.backend.latest_per(
+            select(SensorReading).where(SensorReading.device_eui.in_(["A", "B"])),
+            SensorReading.device_eui, SensorReading.time,
+        ))).scalars().all()
+    assert sorted((r.device_eui, r.distance_cm) for r in rows) == [("A", 11), ("B", 20)]
+
+
+async def test_group_commit_isolates_failed_use(make_db):
+    db = await make_db()
+    group = GroupCommit(db.Session, interval_s=60.0, max_uses=3)
+    async with group.session() as s:
+        s.add(reading("A", 0))
+    with pytest.raises(RuntimeError):
+        async with group.session() as s:
+            s.add(reading("A", 1))
+            await s.flush()
+            raise RuntimeError("uplink roto")
+    assert await db.count() == 0          # nada confirmado todavía
+
+    async with group.session() as s:
+        s.add(reading("A", 2))
+    await group.flush()
+    assert await db.count() == 2
+    assert group.stats() == {"commits": 1, "uses_per_commit": 2.0,
+                             "pending_uses": 0, "rolled_back": 1}
+
+
+async def test_group_commit_timer_commits(make_db):
+    db = await make_db()
+    # Ventana holgada: los 5 usos caen en ella aunque la máquina esté cargada
+    group = GroupCommit(db.Session, interval_s=0.5, max_uses=100)
+    for k in range(5):
+        async with group.session() as s:
+            s.add(reading("A", k))
+    assert group.commits == 0
+    for _ in range(200):
+        if group.commits:
+            break
+        await asyncio.sleep(0.01)
+    assert await db.count() == 5
+    assert group.commits == 1
+
+
+def test_batch_round_trip_and_rejects_bad_input():
+    rows = [(uuid.uuid4(), "A", T0 + timedelta(seconds=k), 100.0 + k, None, 200.0, 66.6,
+             3600, 90, -80, 7.5, None, None, 0.1, None, "NORMAL") for k in range(50)]
+    columns = columns_from_rows(rows)
+    body = encode_batch("puente-1", columns)
+    batch = decode_batch(body, "gzip")
+    assert batch["site"] == "puente-1"
+    assert batch["columns"]["distance_cm"] == [r[3] for r in rows]
+    assert [uuid.UUID(bytes=i) for i in batch["columns"]["id"]] == [r[0] for r in rows]
+
+    with pytest.raises(ValueError):
+        decode_batch(body[:-10], "gzip")
+    with pytest.raises(ValueError):
+        decode_batch(encode_batch("x", {"id": []}), "gzip")
+    big = {name: [None] * (MAX_BATCH_ROWS + 1) for name in SYNC_COLUMNS}
+    with pytest.raises(ValueError):
+        decode_batch(gzip.decompress(encode_batch("x", big)), None)
+
+
+class FakeCentral:
+    """POST /api/v1/webhooks/edge/readings guardando en otra SQLite; 503 las primeras `fail` veces."""
+
+    def __init__(self, db: SQLiteDB, fail: int = 0):
+        self.db = db
+        self.fail = fail
+        self.results: list[dict] = []
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                headers = dict(line.decode().lower().split(": ", 1)
+                               for line in head.split(b"\r\n")[1:] if b": " in line)
+                body = await reader.readexactly(int(headers["content-length"]))
+                if self.fail:
+                    self.fail -= 1
+                    code, payload = 503, b"{}"
+                else:
+                    assert headers["x-edge-token"] == "secreto"
+                    batch = decode_batch(body, headers.get("content-encoding"))
+                    async with self.db.session() as s:
+                        result = await store_batch(s, batch)
+                    self.results.append(result)
+                    code, payload = 200, b'{"inserted": %d}' % result["inserted"]
+                writer.write(f"HTTP/1.1 {code} X\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+
+def make_sync(url: str, **kwargs) -> EdgeSync:
+    options = dict(token="secreto", site="puente-1", batch_rows=40,
+                   interval_s=0.05, max_backoff_s=0.1, keep_days=7)
+    options.update(kwargs)
+    return EdgeSync(upstream_url=url, **options)
+
+
+@pytest.fixture
+async def gateway(make_db, monkeypatch):
+    db = await make_db("edge")
+    monkeypatch.setattr(edge_sync_module, "get_db_session", db.session)
+    monkeypatch.setattr(edge_sync_module, "ReadSessionLocal", db.ReadSession)
+    monkeypatch.setattr(edge_sync_module, "backend", db.backend)
+    return db
+
+
+async def test_push_survives_outage_and_is_idempotent(gateway, make_db):
+    central = await make_db("central")
+    async with gateway.session() as s:
+        s.add_all([reading(f"EUI{k % 5}", k) for k in range(100)])
+
+    async with FakeCentral(central, fail=1) as upstream:
+        sync = make_sync(upstream.url)
+        assert sync.enabled
+        assert await sync.push_once() is None          # sin enlace
+        assert sync.failures == 1 and await central.count() == 0
+        assert [await sync.push_once() for _ in range(4)] == [40, 40, 20, 0]
+        await sync.stop()
+
+        # Se perdió la respuesta: el cursor vuelve atrás y reenvía
+        async with gateway.session() as s:
+            await s.merge(SyncCursor(name="upstream", last_rowid=60))
+        again = make_sync(upstream.url)
+        assert await again._load_cursor() == 60
+        assert await again.push_once() == 40
+        await again.stop()
+
+    assert await central.count() == 100
+    assert upstream.results[-1]["inserted"] == 0
+    assert upstream.results[0]["devices"] == [f"EUI{k}" for k in range(5)]
+    async with central.ReadSession() as s:
+        newest = await s.scalar(select(func.max(SensorReading.time)))
+    assert newest == T0 + timedelta(minutes=99)
+    assert sync.stats()["compression"] > 1
+
+
+async def test_run_loop_backs_off_then_drains(gateway, make_db):
+    central = await make_db("central")
+    async with gateway.session() as s:
+        s.add_all([reading("A", k) for k in range(90)])
+    async with FakeCentral(central, fail=2) as upstream:
+        sync = make_sync(upstream.url)
+        sync.start()
+        for _ in range(200):
+            if sync.rows == 90:
+                break
+            await asyncio.sleep(0.02)
+        await sync.stop()
+    assert sync.failures == 2
+    assert await central.count() == 90
+
+
+async def test_prune_keeps_unsynced_and_recent(gateway, make_db):
+    now = datetime.now(timezone.utc)
+    async with gateway.session() as s:
+        s.add_all([SensorReading(device_eui="A", time=now - timedelta(days=30 - k),
+                                 distance_cm=1.0) for k in range(30)])
+    sync = make_sync("http://central", keep_days=7)
+    async with gateway.session() as s:
+        s.add(SyncCursor(name="upstream", last_rowid=20))
+    # confirmadas: rowid 1..20 (días -30..-11) → se borran las 19 anteriores al cursor
+    assert await sync.prune() == 19
+    assert await gateway.count() == 11
+
+
+async def test_time_grouping_on_sqlite(make_db, monkeypatch):
+    db = await make_db()
+    monkeypatch.setattr(cold_archive, "backend", db.backend)
+    async with db.session() as s:
+        s.add_all([reading("A", 0), reading("A", 59), reading("B", 60 * 24 * 31)])
+    async with db.ReadSession() as s:
+        months = await cold_archive.pending_months(s, T0 + timedelta(days=62))
+        bucket = db.backend.epoch_bucket(SensorReading.time, 3600)
+        buckets = (await s.execute(
+            select(SensorReading.device_eui, bucket, func.count())
+            .group_by(SensorReading.device_eui, bucket)
+        )).all()
+    assert months == [("A", "2024-05", 2), ("B", "2024-06", 1)]
+    hour = int(T0.timestamp()) // 3600
+    assert sorted(buckets) == [("A", hour, 2), ("B", hour + 24 * 31, 1)]
+
+
+def test_time_grouping_on_postgres():
+    from sqlalchemy.dialects import postgresql
+
+    pg = PostgresBackend()
+    sql = lambda expr: str(select(expr).compile(dialect=postgresql.dialect()))  # noqa: E731
+    assert "to_char(timezone('UTC', sensor_readings.time), 'YYYY-MM')" in sql(
+        pg.month_of(SensorReading.time))
+    assert "floor(EXTRACT(epoch FROM sensor_readings.time) / CAST(3600 AS NUMERIC))" in sql(
+        pg.epoch_bucket(SensorReading.time, 3600))
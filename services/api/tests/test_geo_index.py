@@ -0,0 +1,72 @@
+import pytest
+
+from app.services.geo_index import GeoIndex, haversine_m
+
+# Guadalajara y alrededores
+GDL = (20.6597, -103.3496)
+ZAPOPAN = (20.7236, -103.3848)
+TLAQUEPAQUE = (20.6409, -103.3127)
+MONTERREY = (25.6866, -100.3161)
+
+
+def make_index() -> GeoIndex:
+    index = GeoIndex(cell_deg=0.05, move_threshold_m=25.0)
+    index.set_static("GDL", *GDL)
+    index.set_static("ZAP", *ZAPOPAN)
+    index.set_static("TLQ", *TLAQUEPAQUE)
+    index.set_static("MTY", *MONTERREY)
+    return index
+
+
+def test_haversine_known_distance():
+    # Guadalajara – Monterrey ≈ 650 km en línea recta
+    assert haversine_m(*GDL, *MONTERREY) == pytest.approx(650_000, rel=0.03)
+
+
+def test_nearby_sorted_by_distance():
+    index = make_index()
+    found = index.nearby(*GDL, radius_m=10_000)
+    assert [f["device_eui"] for f in found] == ["GDL", "TLQ", "ZAP"]
+    assert found[0]["distance_m"] == 0.0
+
+
+def test_nearby_radius_excludes_far():
+    index = make_index()
+    assert [f["device_eui"] for f in index.nearby(*GDL, radius_m=5_000)] == ["GDL", "TLQ"]
+
+
+def test_bbox():
+    index = make_index()
+    found = index.bbox(20.6, -103.4, 20.7, -103.3)
+    assert sorted(f["device_eui"] for f in found) == ["GDL", "TLQ"]
+
+
+def test_gps_noise_is_not_a_move():
+    index = GeoIndex(cell_deg=0.05, move_threshold_m=25.0)
+    assert index.observe_fix("A", *GDL) == 0.0
+    assert index.observe_fix("A", GDL[0] + 0.00005, GDL[1]) is None  # ~5 m
+    moved = index.observe_fix("A", GDL[0] + 0.001, GDL[1])            # ~110 m
+    assert moved == pytest.approx(111, rel=0.05)
+    assert index.position("A") == (GDL[0] + 0.001, GDL[1])
+
+
+def test_move_across_cells():
+    index = GeoIndex(cell_deg=0.05, move_threshold_m=25.0)
+    index.observe_fix("A", *GDL)
+    index.observe_fix("A", *MONTERREY)
+    assert index.nearby(*GDL, radius_m=1_000) == []
+    assert index.nearby(*MONTERREY, radius_m=1_000)[0]["device_eui"] == "A"
+
+
+def test_static_does_not_override_gps():
+    index = GeoIndex(cell_deg=0.05, move_threshold_m=25.0)
+    index.observe_fix("A", *GDL)
+    index.set_static("A", *MONTERREY)
+    assert index.position("A") == GDL
+
+
+def test_remove():
+    index = make_index()
+    index.remove("GDL")
+    assert [f["device_eui"] for f in index.nearby(*GDL, radius_m=1_000)] == []
+    assert len(index) == 3
@@ -0,0 +1,82 @@
+import base64
+import json
+import struct
+import sys
+import time
+
+from app.ingest_runner import Supervisor
+from app.models.device import Device
+from app.services.level_forecast import level_forecaster
+from app.services.mqtt_client import MQTTClient, parse_uplink, shard_of, topic_device_eui
+from app.services.rise_rate import rise_estimator
+
+EUIS = [f"{0xA840411D00000000 + k:016X}" for k in range(200)]
+
+
+def test_shards_are_disjoint_and_cover_all_devices():
+    clients = [MQTTClient(shard=(i, 4)) for i in range(4)]
+    for eui in EUIS:
+        owners = [c for c in clients if c.owns(eui)]
+        assert len(owners) == 1
+    # Reparto razonable entre workers
+    counts = [sum(c.owns(eui) for eui in EUIS) for c in clients]
+    assert min(counts) > 20
+
+
+def test_shard_is_case_insensitive_and_stable():
+    assert shard_of(EUIS[0].lower(), 8) == shard_of(EUIS[0], 8)
+    assert MQTTClient().owns(EUIS[0])
+
+
+def test_topic_device_eui():
+    assert topic_device_eui("application/1/device/a840411d3181bd6b/event/up") == "A840411D3181BD6B"
+    assert topic_device_eui("bad/topic") == ""
+
+
+def test_parse_uplink():
+    body = json.dumps({
+        "deviceInfo": {"devEui": "a840411d3181bd6b"},
+        "data": base64.b64encode(struct.pack(">HH", 1834, 3912)).decode(),
+        "rxInfo": [{"rssi": -80, "snr": 7.5}],
+    }).encode()
+    device_eui, decoded, rssi, snr = parse_uplink("t", body)
+    assert device_eui == "A840411D3181BD6B"
+    assert decoded["distance_cm"] == 183.4
+    assert (rssi, snr) == (-80, 7.5)
+    assert parse_uplink("t", b"not json") is None
+
+
+def test_supervisor_restarts_crashed_workers():
+    # sys.exit(index, total) → TypeError en el hijo: muere con exitcode 1
+    sup = Supervisor(2, target=sys.exit)
+    for i in range(2):
+        sup._start(i)
+    try:
+        deadline = time.monotonic() + 30
+        while sup.restarts < 2 and time.monotonic() < deadline:
+            sup.check()
+            time.sleep(0.05)
+        assert sup.restarts >= 2
+    finally:
+        sup._stopping = True
+        sup.stop(timeout=5)
+
+
+def test_worker_resets_trend_when_device_is_reconfigured():
+    # Con INGEST_MODE=external el PATCH no llega a los workers: lo ven en la fila
+    eui = EUIS[7]
+    device = Device(device_eui=eui, bridge_height_cm=300.0, threshold_watch_pct=50.0,
+                    threshold_warning_pct=70.0, threshold_critical_pct=85.0)
+    client = MQTTClient(shard=(0, 1))
+    client._check_geometry(device)
+    for k in range(10):
+        rise_estimator.update(eui, k * 60.0, 100.0 + k)
+        level_forecaster.update(eui, k * 60.0, 100.0 + k)
+    client._check_geometry(device)              # sin cambios: conserva la historia
+    assert level_forecaster.ready(eui)
+
+    device.bridge_height_cm = 350.0
+    client._check_geometry(device)
+    assert not level_forecaster.ready(eui)
+    assert level_forecaster.last_time(eui) is None
+    assert rise_estimator.update(eui, 660.0, 150.0) is None
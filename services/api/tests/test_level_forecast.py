@@ -0,0 +1,95 @@
+import pytest
+
+from app.services.level_forecast import CHECK_HORIZON_S, LevelForecaster
+
+EUI = "A840411D3181BD6B"
+THRESHOLDS = {"WARNING": 210.0, "CRITICAL": 255.0}
+
+
+def make_forecaster(**overrides) -> LevelForecaster:
+    params = dict(alpha=0.2, beta=0.05, z=1.645, min_samples=10, reset_gap_s=1800)
+    params.update(overrides)
+    return LevelForecaster(**params)
+
+
+def ramp(fc: LevelForecaster, rate_cm_min: float, n: int, start: float = 100.0, t0: float = 0.0):
+    for k in range(n):
+        t = t0 + k * 30.0
+        fc.update(EUI, t, start + rate_cm_min * (t - t0) / 60)
+    return t0 + (n - 1) * 30.0
+
+
+def test_not_ready_until_min_samples():
+    fc = make_forecaster()
+    ramp(fc, 1.0, 9)
+    assert fc.predict(EUI, 1000.0) is None
+    ramp(fc, 1.0, 1, t0=270.0, start=104.5)
+    assert fc.predict(EUI, 1000.0) is not None
+
+
+def test_trend_converges_on_linear_rise():
+    fc = make_forecaster()
+    last = ramp(fc, 2.0, 400)
+    level_now = 100.0 + 2.0 * last / 60
+    point, lower, upper = fc.predict(EUI, last + 1800)
+    assert point == pytest.approx(level_now + 60.0, abs=0.5)
+    assert lower <= point <= upper
+
+
+def test_interval_widens_with_horizon():
+    fc = make_forecaster()
+    for k in range(200):
+        fc.update(EUI, k * 30.0, 100.0 + (1.0 if k % 2 else -1.0))
+    last = 199 * 30.0
+    widths = [hi - lo for _, lo, hi in (fc.predict(EUI, last + m * 60) for m in (5, 30, 60))]
+    assert widths[0] < widths[1] < widths[2]
+
+
+def test_intervals_calibrate_from_control_forecast():
+    fc = make_forecaster()
+    ramp(fc, 0.0, 10)
+    assert fc.state(EUI)["check_t"] == pytest.approx(9 * 30.0 + CHECK_HORIZON_S)
+    last = ramp(fc, 0.0, 100, t0=300.0)
+    assert last > fc.state(EUI)["check_t"] - CHECK_HORIZON_S
+    # Serie plana: el error real a 30 min es ~0 y el intervalo se cierra
+    _, lower, upper = fc.predict(EUI, last + 3600)
+    assert upper - lower < 1.0
+
+
+def test_gap_resets_model():
+    fc = make_forecaster()
+    last = ramp(fc, 3.0, 50)
+    fc.update(EUI, last + 7200, 50.0)
+    assert not fc.ready(EUI)
+    assert fc.last_time(EUI) == last + 7200
+
+
+def test_alert_fires_once_per_level_and_rearms():
+    fc = make_forecaster()
+    fired = []
+    for k in range(120):
+        t = k * 30.0
+        fc.update(EUI, t, 120.0 + 2.0 * t / 60)
+        hit = fc.check_alert(EUI, THRESHOLDS, t, 45.0)
+        if hit:
+            fired.append(hit[0])
+    assert fired == ["WARNING", "CRITICAL"]
+    # Baja y se estabiliza: se rearma solo sin cruces ni al doble del horizonte
+    for k in range(120, 400):
+        t = k * 30.0
+        fc.update(EUI, t, 100.0)
+        assert fc.check_alert(EUI, THRESHOLDS, t, 45.0) is None
+    for k in range(400, 520):
+        t = k * 30.0
+        fc.update(EUI, t, 100.0 + 2.0 * (t - 400 * 30.0) / 60)
+        hit = fc.check_alert(EUI, THRESHOLDS, t, 45.0)
+        if hit:
+            fired.append(hit[0])
+    assert fired == ["WARNING", "CRITICAL", "WARNING", "CRITICAL"]
+
+
+def test_state_is_compact():
+    fc = make_forecaster()
+    for n in range(1000):
+        fc.update(f"{n:016X}", 0.0, 50.0)
+    assert fc.state_bytes() / len(fc) == 73
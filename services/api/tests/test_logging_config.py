@@ -0,0 +1,70 @@
+import io
+import json
+
+import pytest
+import structlog
+
+from app.core import logging_config
+from app.core.logging_config import EventSampler, parse_sample_rates
+
+
+@pytest.fixture
+def configured():
+    stream = io.StringIO()
+
+    def _configure(**kwargs):
+        logging_config.configure_logging(stream=stream, fmt="json", **kwargs)
+        return stream
+
+    yield _configure
+    logging_config.shutdown_logging()
+    structlog.reset_defaults()
+    logging_config._debug_enabled = True
+
+
+def _lines(stream: io.StringIO) -> list[dict]:
+    logging_config.shutdown_logging()   # vacía la cola
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("reading.saved=10, mqtt.x=0,bad") == {
+        "reading.saved": 10, "mqtt.x": 1,
+    }
+
+
+def test_sampler_keeps_one_in_n_and_all_warnings():
+    sampler = EventSampler({"reading.saved": 4})
+    kept = 0
+    for _ in range(12):
+        try:
+            sampler(None, "info", {"event": "reading.saved"})
+            kept += 1
+        except structlog.DropEvent:
+            pass
+    assert kept == 3 and sampler.dropped == 9
+    assert sampler(None, "warning", {"event": "reading.saved"})
+    assert sampler(None, "info", {"event": "other"}) == {"event": "other"}
+
+
+def test_debug_filtered_and_sampled(configured):
+    stream = configured(level="INFO", sample="reading.saved=5")
+    assert not logging_config.debug_enabled()
+    log = structlog.get_logger()
+    log.debug("decoder.ok", distance_cm=1.0)
+    for n in range(10):
+        log.info("reading.saved", n=n)
+    log.error("mqtt.error", error="x")
+
+    lines = _lines(stream)
+    assert [line["event"] for line in lines] == ["reading.saved", "reading.saved", "mqtt.error"]
+    assert [line.get("n") for line in lines[:2]] == [0, 5]
+    assert lines[0]["sampled"] == 5
+    assert lines[2]["level"] == "error" and "timestamp" in lines[2]
+
+
+def test_debug_level_enables_decoder_logs(configured):
+    stream = configured(level="DEBUG", sample="")
+    assert logging_config.debug_enabled()
+    structlog.get_logger().debug("decoder.ok")
+    assert _lines(stream)[0]["level"] == "debug"
@@ -0,0 +1,94 @@
+from app.core.config import settings
+from app.services.offline_monitor import OfflineMonitor, TimerWheel
+
+EUI = "A840411D3181BD6B"
+
+
+def test_wheel_expires_only_due_keys():
+    wheel = TimerWheel(tick_s=5, slots=8, now=0)
+    wheel.schedule("a", 12)
+    wheel.schedule("b", 31)
+    assert wheel.advance(10) == []
+    assert wheel.advance(15) == ["a"]
+    assert wheel.advance(29) == []
+    assert wheel.advance(35) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_wheel_reschedule_moves_key():
+    wheel = TimerWheel(tick_s=5, slots=8, now=0)
+    wheel.schedule("a", 12)
+    wheel.schedule("a", 100)
+    assert wheel.advance(20) == []
+    assert wheel.advance(100) == ["a"]
+
+
+def test_wheel_deadline_beyond_one_turn():
+    wheel = TimerWheel(tick_s=5, slots=4, now=0)   # una vuelta = 20 s
+    wheel.schedule("far", 47)
+    assert wheel.advance(20) == []
+    assert wheel.advance(40) == []
+    assert wheel.advance(50) == ["far"]
+
+
+def test_wheel_large_jump_scans_every_bucket_once():
+    wheel = TimerWheel(tick_s=5, slots=4, now=0)
+    for n, t in enumerate((6, 11, 16, 21, 300)):
+        wheel.schedule(f"k{n}", t)
+    assert sorted(wheel.advance(1000)) == ["k0", "k1", "k2", "k3", "k4"]
+
+
+def test_wheel_cancel():
+    wheel = TimerWheel(tick_s=5, slots=8, now=0)
+    wheel.schedule("a", 12)
+    wheel.cancel("a")
+    assert wheel.advance(100) == []
+
+
+def test_offline_then_back_online(monkeypatch):
+    monkeypatch.setattr(settings, "OFFLINE_MIN_S", 60.0)
+    monitor = OfflineMonitor()
+    t0 = monitor.wheel._current * monitor.wheel.tick_s
+    for k in range(5):
+        assert monitor.touch(EUI, t0 + 30 * k) is False
+    last = t0 + 120
+    assert monitor.expire(last + 100) == []
+    assert monitor.expire(last + 200) == [EUI]
+    assert monitor.health()[0]["status"] == "OFFLINE"
+    assert monitor.touch(EUI, last + 500) is True
+    assert monitor.health()[0]["status"] == "ONLINE"
+
+
+def test_learns_slow_cadence(monkeypatch):
+    monkeypatch.setattr(settings, "OFFLINE_MIN_S", 60.0)
+    monitor = OfflineMonitor()
+    t0 = monitor.wheel._current * monitor.wheel.tick_s
+    # Nodo que reporta cada 100 s: el intervalo aprendido converge
+    for k in range(40):
+        monitor.touch(EUI, t0 + 100 * k)
+    assert 90 < monitor._interval[EUI] <= 100
+    last = t0 + 3900
+    assert monitor.expire(last + 200) == []
+
+
+def test_learns_cadence_above_default_timeout():
+    # Cada 600 s: muy por encima de OFFLINE_FACTOR · OFFLINE_DEFAULT_INTERVAL_S
+    monitor = OfflineMonitor()
+    t0 = monitor.wheel._current * monitor.wheel.tick_s
+    back_online = 0
+    for k in range(29):
+        monitor.expire(t0 + 600 * k - 1)
+        back_online += monitor.touch(EUI, t0 + 600 * k)
+    assert back_online <= 1          # a lo sumo el primer hueco, antes de aprender
+    assert monitor._interval[EUI] == 600
+    assert monitor.expire(t0 + 600 * 28 + 2000) == []
+    assert monitor.expire(t0 + 600 * 28 + 2500) == [EUI]
+
+
+def test_forget_stops_watching():
+    monitor = OfflineMonitor()
+    t0 = monitor.wheel._current * monitor.wheel.tick_s
+    monitor.touch(EUI, t0)
+    monitor.forget(EUI)
+    assert monitor.expire(t0 + 10_000) == []
+    assert monitor.health() == []
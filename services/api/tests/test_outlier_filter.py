@@ -0,0 +1,97 @@
+import pickle
+import random
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.services.mqtt_client import _build_rows
+from app.services.outlier_filter import OutlierFilter
+
+EUI = "A840411D3181BD6B"
+
+
+def make_filter(window: int = 7) -> OutlierFilter:
+    return OutlierFilter(window=window, k=3.0, min_dev=3.0, min_samples=3)
+
+
+def feed(flt: OutlierFilter, values, eui: str = EUI) -> list[tuple[float, bool]]:
+    return [flt.update(eui, v) for v in values]
+
+
+def test_short_echo_replaced_by_median():
+    flt = make_filter()
+    feed(flt, [250.0, 251.0, 249.5, 250.5, 250.0])
+    filtered, rejected = flt.update(EUI, 42.0)
+    assert rejected
+    assert filtered == pytest.approx(250.0)
+    assert flt.stats()["rejected"] == 1
+
+
+def test_noise_is_accepted():
+    flt = make_filter()
+    rng = random.Random(3)
+    values = [250 + rng.gauss(0, 1.0) for _ in range(500)]
+    assert not any(rejected for _, rejected in feed(flt, values))
+
+
+def test_burst_of_echoes_rejected():
+    flt = make_filter()
+    feed(flt, [250.0] * 7)
+    assert [r for _, r in feed(flt, [40.0, 45.0, 38.0])] == [True, True, True]
+    assert flt.update(EUI, 250.2) == (250.2, False)
+
+
+def test_sustained_step_accepted_after_half_window():
+    flt = make_filter()
+    feed(flt, [250.0] * 7)
+    results = feed(flt, [200.0] * 5)
+    assert [r for _, r in results] == [True, True, True, False, False]
+    assert results[-1][0] == 200.0
+
+
+def test_median_matches_brute_force():
+    flt = make_filter(window=5)
+    rng = random.Random(11)
+    history = []
+    for _ in range(300):
+        x = round(rng.uniform(0, 50), 1)
+        history.append(x)
+        flt.update(EUI, x)
+        base = flt._slots[EUI] * 5
+        count = flt._count[flt._slots[EUI]]
+        assert list(flt._sorted[base:base + count]) == sorted(history[-5:])
+
+
+def test_devices_are_independent_and_window_zero_disables():
+    flt = make_filter()
+    feed(flt, [250.0] * 7, eui="A")
+    feed(flt, [100.0] * 7, eui="B")
+    assert flt.update("B", 101.0) == (101.0, False)
+    assert flt.update("A", 101.0)[1]
+
+    off = make_filter(window=0)
+    assert off.update(EUI, 1.0) == (1.0, False)
+    assert len(off) == 0
+
+
+def test_snapshot_roundtrip():
+    flt = make_filter()
+    feed(flt, [250.0, 251.0, 249.0, 250.0])
+    restored = make_filter()
+    restored.restore(pickle.loads(pickle.dumps(flt.snapshot())))
+    assert restored.update(EUI, 40.0) == flt.update(EUI, 40.0)
+
+
+@pytest.mark.parametrize("storage", ["legacy", "compact"])
+def test_raw_distance_stored_only_when_rejected(monkeypatch, storage):
+    monkeypatch.setattr(settings, "READINGS_STORAGE", storage)
+    decoded = {"distance_cm": 250.0, "battery_mv": 3800, "battery_pct": 67, "has_gps": False}
+    rows = _build_rows(
+        reading_id=uuid.uuid4(), device_eui=EUI, time=datetime.now(timezone.utc),
+        decoded=decoded, water_level=50.0, fill_pct=16.7, alert_level="NORMAL",
+        rssi=-80, snr=7.5, distance_raw_cm=42.0,
+    )
+    assert rows[0].distance_cm == 250.0
+    assert rows[0].distance_raw_cm == 42.0
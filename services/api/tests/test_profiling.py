@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import profiling
+from app.core.profiling import LoopBlockDetector, profile_loop, profile_request_middleware
+
+
+def _busy(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _client(monkeypatch, token="s3cret"):
+    monkeypatch.setattr(profiling.settings, "ADMIN_TOKEN", token)
+    monkeypatch.setattr(profiling.settings, "PROFILE_INTERVAL_MS", 1.0)
+    app = FastAPI()
+    app.middleware("http")(profile_request_middleware)
+
+    @app.get("/slow")
+    async def slow():
+        _busy(0.1)
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_request_profile_returns_folded_stacks(monkeypatch):
+    with _client(monkeypatch) as client:
+        r = client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "s3cret"})
+    assert r.status_code == 200
+    assert r.headers["x-profile-status"] == "200"
+    lines = r.text.splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("_busy (tests/test_profiling.py" in line for line in lines)
+
+
+def test_request_profile_requires_token(monkeypatch):
+    with _client(monkeypatch) as client:
+        assert client.get("/slow?profile=1", headers={"X-Admin-Token": "nope"}).status_code == 403
+        plain = client.get("/slow")
+    assert plain.json() == {"ok": True}
+
+
+async def test_profile_loop_keeps_only_root_samples():
+    async def target():
+        for _ in range(10):
+            _busy(0.01)
+            await asyncio.sleep(0.005)
+
+    async def other():
+        for _ in range(10):
+            _busy(0.01)
+            await asyncio.sleep(0.005)
+
+    tasks = [asyncio.create_task(target()), asyncio.create_task(other())]
+    profile = await profile_loop(0.15, root=target.__code__, interval_s=0.002)
+    await asyncio.gather(*tasks)
+    assert profile.matched > 0
+    assert profile.samples > profile.matched
+    assert all(stack.startswith("target (") for stack in profile.counts)
+
+
+async def test_loop_block_detector_reports_matching_stack():
+    detector = LoopBlockDetector(threshold_ms=40, paths=["tests/test_profiling.py"])
+    detector.start()
+    await asyncio.sleep(0.05)
+    _busy(0.2)                       # bloquea el loop desde este archivo
+    await asyncio.sleep(0.1)
+    await detector.stop()
+    assert detector.blocks == 1
+    block = detector.recent[0]
+    assert block["blocked_ms"] >= 150
+    assert block["origin"].startswith("_busy (tests/test_profiling.py")
+
+
+async def test_loop_block_detector_disabled_is_noop():
+    detector = LoopBlockDetector(threshold_ms=0, paths=["routers/"])
+    detector.start()
+    assert detector.running is False
+    await detector.stop()
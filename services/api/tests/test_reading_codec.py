@@ -0,0 +1,120 @@
+import gzip
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import msgpack
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.database import get_read_db
+from app.routers import sensors
+from app.services.reading_codec import (
+    COLUMNS,
+    columns_from_rows,
+    compress,
+    encode_columns,
+    negotiate_format,
+)
+from app.services.recent_buffer import RecentReadingsBuffer
+
+EUI = "B840411D3181BD6C"
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_row(k: int) -> tuple:
+    return (uuid.uuid4(), T0 + timedelta(seconds=30 * k), 250.0, None, 50.0, 16.7,
+            80, -90, None, None, None, 0.1, None, "NORMAL")
+
+
+def test_negotiate_format():
+    assert negotiate_format(None) == "json"
+    assert negotiate_format("application/msgpack, */*") == "msgpack"
+    assert negotiate_format("application/vnd.aquaalert.columnar+json;q=0.9") == "columnar"
+    assert negotiate_format("application/msgpack", "json") == "json"
+
+
+def test_columnar_json_from_rows():
+    rows = [make_row(1), make_row(0)]
+    body = json.loads(encode_columns(EUI, columns_from_rows(rows), "columnar"))
+    assert body["device_eui"] == EUI
+    assert body["count"] == 2
+    assert list(body["columns"]) == list(COLUMNS)
+    assert body["columns"]["id"][0] == str(rows[0][0])
+    assert body["columns"]["time"][1] == int(T0.timestamp() * 1000)
+    assert body["columns"]["snr"] == [None, None]
+
+
+def test_msgpack_ids_are_binary():
+    rows = [make_row(0)]
+    body = msgpack.unpackb(encode_columns(EUI, columns_from_rows(rows), "msgpack"))
+    assert body["columns"]["id"] == [rows[0][0].bytes]
+    assert body["columns"]["battery_pct"] == [80]
+
+
+def test_raw_distance_in_columnar_formats():
+    rows = [make_row(1), make_row(0)]
+    rows[0] = rows[0][:3] + (812.0,) + rows[0][4:]
+    columns = columns_from_rows(rows)
+    for fmt, load in (("columnar", json.loads), ("msgpack", msgpack.unpackb)):
+        body = load(encode_columns(EUI, columns, fmt))
+        assert body["columns"]["distance_raw_cm"] == [812.0, None]
+        assert body["columns"]["distance_cm"] == [250.0, 250.0]
+
+
+def test_compress_only_when_accepted_and_large():
+    small = b"x" * 100
+    large = json.dumps(list(range(2000))).encode()
+    assert compress(small, "gzip") == (small, None)
+    assert compress(large, None) == (large, None)
+    body, encoding = compress(large, "gzip, deflate")
+    assert encoding == "gzip" and gzip.decompress(body) == large
+    assert compress(large, "br")[1] == "br"
+
+
+def test_buffer_columns_match_rows():
+    buf = RecentReadingsBuffer(hours=1, interval_s=30, max_mb=1)
+    buf._started_at = T0.timestamp()
+    rows = [make_row(k) for k in range(5)]
+    for row in rows:
+        buf.append(EUI, dict(zip(COLUMNS, row)))
+    since = T0 + timedelta(seconds=45)
+    columns = buf.window_columns(EUI, since, limit=10)
+    windowed = buf.window(EUI, since, limit=10)
+    assert columns["time"] == [r["time"].timestamp() for r in windowed]
+    assert columns["id"] == [uuid.UUID(r["id"]).bytes for r in windowed]
+    assert columns["rssi"] == [-90, -90, -90]
+    # Ventana más vieja que el buffer → hay que ir a la DB
+    assert buf.window_columns(EUI, T0 - timedelta(hours=1), limit=10) is None
+
+
+def test_readings_endpoint_formats(monkeypatch):
+    buf = RecentReadingsBuffer(hours=1, interval_s=30, max_mb=1)
+    now = datetime.now(timezone.utc)
+    buf._started_at = (now - timedelta(hours=1)).timestamp()
+    for k in range(60):
+        row = dict(zip(COLUMNS, make_row(k)))
+        row["time"] = now - timedelta(seconds=30 * (60 - k))
+        buf.append(EUI, row)
+    monkeypatch.setattr(sensors, "recent_buffer", buf)
+
+    app = FastAPI()
+    app.include_router(sensors.router, prefix="/sensors")
+
+    async def no_db():
+        yield None
+
+    app.dependency_overrides[get_read_db] = no_db
+    client = TestClient(app)
+    url = f"/sensors/{EUI}/readings?hours=1&limit=50"
+
+    rows = client.get(url).json()
+    assert len(rows) == 50 and rows[0]["device_eui"] == EUI
+
+    columnar = client.get(url, headers={"Accept": "application/vnd.aquaalert.columnar+json"})
+    assert columnar.headers["content-type"] == "application/vnd.aquaalert.columnar+json"
+    assert columnar.json()["columns"]["id"] == [r["id"] for r in rows]
+
+    packed = client.get(url + "&format=msgpack", headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["content-encoding"] == "gzip"
+    assert msgpack.unpackb(packed.content)["count"] == 50
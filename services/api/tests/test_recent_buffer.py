@@ -0,0 +1,92 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.services.recent_buffer import RecentReadingsBuffer
+
+EUI = "A840411D3181BD6B"
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_reading(t: datetime, fill_pct: float = 10.0, alert_level: str = "NORMAL") -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "time": t,
+        "distance_cm": 250.0,
+        "water_level_cm": 50.0,
+        "fill_pct": fill_pct,
+        "battery_pct": 67,
+        "rssi": -80,
+        "snr": None,
+        "latitude": None,
+        "longitude": None,
+        "alert_level": alert_level,
+    }
+
+
+def make_buffer(hours: int = 1, max_mb: int = 1) -> RecentReadingsBuffer:
+    buf = RecentReadingsBuffer(hours=hours, interval_s=30, max_mb=max_mb)
+    buf._started_at = T0.timestamp()
+    return buf
+
+
+def test_latest_roundtrip():
+    buf = make_buffer()
+    reading = make_reading(T0 + timedelta(seconds=30), alert_level="WARNING")
+    buf.append(EUI, reading)
+    latest = buf.latest(EUI)
+    assert latest["id"] == str(reading["id"])
+    assert latest["time"] == reading["time"]
+    assert latest["battery_pct"] == 67
+    assert latest["snr"] is None
+    assert latest["alert_level"] == "WARNING"
+
+
+def test_window_newest_first_with_limit():
+    buf = make_buffer()
+    for i in range(10):
+        buf.append(EUI, make_reading(T0 + timedelta(seconds=30 * i), fill_pct=i))
+    rows = buf.window(EUI, T0, limit=3)
+    assert [r["fill_pct"] for r in rows] == [9, 8, 7]
+
+
+def test_window_older_than_coverage_misses():
+    buf = make_buffer()
+    buf.append(EUI, make_reading(T0 + timedelta(seconds=30)))
+    assert buf.window(EUI, T0 - timedelta(hours=1), limit=100) is None
+    assert len(buf.window(EUI, T0, limit=100)) == 1
+    assert buf.stats()["hits"] == 1
+    assert buf.stats()["misses"] == 1
+
+
+def test_wraparound_moves_coverage():
+    buf = make_buffer()  # 1 h / 30 s = 120 slots
+    for i in range(150):
+        buf.append(EUI, make_reading(T0 + timedelta(seconds=30 * i)))
+    assert buf.window(EUI, T0, limit=1000) is None
+    rows = buf.window(EUI, T0 + timedelta(seconds=30 * 30), limit=1000)
+    assert len(rows) == 120
+
+
+def test_unknown_device_misses():
+    buf = make_buffer()
+    assert buf.latest(EUI) is None
+    assert buf.window(EUI, T0, limit=10) is None
+
+
+def test_invalidate_forces_db_for_older_windows():
+    buf = make_buffer()
+    buf.append(EUI, make_reading(T0 + timedelta(seconds=30)))
+    buf.invalidate(EUI)
+    assert buf.latest(EUI) is None
+    buf.append(EUI, make_reading(T0 + timedelta(seconds=60)))
+    assert buf.window(EUI, T0, limit=10) is None
+
+
+def test_memory_budget_evicts_lru():
+    buf = make_buffer(hours=24, max_mb=1)  # 2880 slots × 105 B → 3 devices por MB
+    assert buf.max_devices == 3
+    for n in range(4):
+        buf.append(f"{n:016X}", make_reading(T0 + timedelta(seconds=30)))
+    assert buf.latest(f"{0:016X}") is None
+    assert buf.stats()["evictions"] == 1
+    assert buf.stats()["devices"] == 3
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+
+from app.models.device import Device
+from app.models.reading import CompactReading, SensorReading
+from app.services.recompute_jobs import RecomputeJob, _derived_values
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_device() -> Device:
+    return Device(
+        device_eui="A840411D3181BD6B",
+        bridge_height_cm=350.0,
+        threshold_watch_pct=50.0,
+        threshold_warning_pct=70.0,
+        threshold_critical_pct=85.0,
+    )
+
+
+def compile_update(model) -> str:
+    stmt = update(model).values(**_derived_values(make_device(), model))
+    return str(stmt.compile(dialect=postgresql.dialect(),
+                            compile_kwargs={"literal_binds": True}))
+
+
+def test_legacy_update_rewrites_all_derived_columns():
+    sql = compile_update(SensorReading)
+    assert "water_level_cm=greatest(0.0, 350.0 - sensor_readings.distance_cm)" in sql
+    assert "fill_pct=least(100.0," in sql
+    assert "'CRITICAL'" in sql
+
+
+def test_compact_update_only_touches_alert_code():
+    sql = compile_update(CompactReading)
+    assert "alert_code=CASE" in sql
+    assert "water_level_cm" not in sql
+
+
+def test_progress_follows_cursor():
+    job = RecomputeJob(device_eui="X", range_start=T0, range_end=T0 + timedelta(days=4))
+    assert job.progress_pct == 0.0
+    job.cursor = T0 + timedelta(days=1)
+    assert job.progress_pct == 25.0
+    job.status = "done"
+    assert job.progress_pct == 100.0
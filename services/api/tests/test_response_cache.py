@@ -0,0 +1,100 @@
+import time
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.database import get_read_db
+from app.routers import sensors
+from app.services.recent_buffer import recent_buffer
+from app.services.response_cache import ResponseCache, response_cache
+
+EUI = "A840411D3181BD6B"
+
+
+def test_entry_valid_only_for_its_version():
+    cache = ResponseCache(ttl_s=60, max_mb=1)
+    cache.put("latest:X", cache.version("X"), b"{}")
+    assert cache.get("latest:X", cache.version("X")) is not None
+    cache.bump("X")
+    assert cache.get("latest:X", cache.version("X")) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_bump_invalidates_fleet_version():
+    cache = ResponseCache(ttl_s=60, max_mb=1)
+    fleet = cache.version()
+    cache.bump("A")
+    assert cache.version() == fleet + 1
+    assert cache.version("B") == 0
+
+
+def test_etag_depends_on_content():
+    cache = ResponseCache(ttl_s=60, max_mb=1)
+    a = cache.put("k", 3, b'{"a":1}')
+    b = cache.put("k", 3, b'{"a":1}')
+    c = cache.put("k", 3, b'{"a":2}')
+    assert a.etag == b.etag != c.etag
+    assert cache.matches(a, f'"other", {a.etag}')
+    assert not cache.matches(c, a.etag)
+
+
+def test_lru_respects_memory_budget():
+    cache = ResponseCache(ttl_s=60, max_mb=0.001)   # ~1 KB
+    for n in range(10):
+        cache.put(f"k{n}", 0, b"x" * 200)
+    assert cache.stats()["bytes"] <= 1048
+    assert cache.get("k9", 0) is not None
+    assert cache.get("k0", 0) is None
+    assert cache.evictions > 0
+
+
+def test_expired_entry_is_regenerated():
+    cache = ResponseCache(ttl_s=0.0001, max_mb=1)
+    cache.put("k", 0, b"{}")
+    time.sleep(0.001)
+    assert cache.get("k", 0) is None
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.include_router(sensors.router, prefix="/sensors")
+
+    async def no_db():
+        yield None   # /latest sale del buffer: nunca toca la sesión
+
+    app.dependency_overrides[get_read_db] = no_db
+    return TestClient(app)
+
+
+def test_latest_conditional_get():
+    recent_buffer.append(EUI, {
+        "id": uuid.uuid4(), "time": datetime.now(timezone.utc),
+        "distance_cm": 250.0, "water_level_cm": 50.0, "fill_pct": 16.7,
+        "battery_pct": 80, "rssi": -90, "snr": 7.0, "latitude": None,
+        "longitude": None, "alert_level": "NORMAL",
+    })
+    response_cache.bump(EUI)
+    client = _client()
+
+    first = client.get(f"/sensors/{EUI}/latest")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    again = client.get(f"/sensors/{EUI}/latest", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    # Nuevo uplink (o cambio de config) → ETag viejo deja de valer
+    recent_buffer.append(EUI, {
+        "id": uuid.uuid4(), "time": datetime.now(timezone.utc),
+        "distance_cm": 200.0, "water_level_cm": 100.0, "fill_pct": 33.3,
+        "battery_pct": 80, "rssi": -90, "snr": 7.0, "latitude": None,
+        "longitude": None, "alert_level": "NORMAL",
+    })
+    response_cache.bump(EUI)
+    changed = client.get(f"/sensors/{EUI}/latest", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["water_level_cm"] == 100.0
@@ -0,0 +1,100 @@
+import pytest
+
+from app.models.device import Device
+from app.services.alert_service import evaluate_rise
+from app.services.rise_rate import RiseRateEstimator, minutes_to_level
+
+EUI = "A840411D3181BD6B"
+
+
+def make_device(**overrides) -> Device:
+    fields = dict(
+        device_eui=EUI,
+        bridge_height_cm=300.0,
+        threshold_watch_pct=50.0,
+        threshold_warning_pct=70.0,
+        threshold_critical_pct=85.0,
+        threshold_rise_cm_min=1.0,
+    )
+    fields.update(overrides)
+    return Device(**fields)
+
+
+def feed(est: RiseRateEstimator, rate_cm_min: float, n: int = 20, start: float = 100.0):
+    rate = None
+    for k in range(n):
+        t = k * 30.0
+        rate = est.update(EUI, t, start + rate_cm_min * t / 60)
+    return rate
+
+
+def test_needs_a_few_samples():
+    est = RiseRateEstimator(tau_s=900)
+    assert est.update(EUI, 0.0, 100.0) is None
+    assert est.update(EUI, 30.0, 100.5) is None
+
+
+def test_linear_rise_is_exact():
+    est = RiseRateEstimator(tau_s=900)
+    assert feed(est, 2.0) == pytest.approx(2.0)
+
+
+def test_flat_and_falling():
+    est = RiseRateEstimator(tau_s=900)
+    assert feed(est, 0.0) == pytest.approx(0.0, abs=1e-9)
+    est = RiseRateEstimator(tau_s=900)
+    assert feed(est, -0.5) == pytest.approx(-0.5)
+
+
+def test_devices_are_independent():
+    est = RiseRateEstimator(tau_s=900)
+    feed(est, 3.0)
+    assert est.update("0" * 16, 0.0, 50.0) is None
+    assert len(est) == 2
+
+
+def test_reset_forgets_history():
+    est = RiseRateEstimator(tau_s=900)
+    feed(est, 3.0)
+    est.reset(EUI)
+    assert est.update(EUI, 1000.0, 10.0) is None
+
+
+def test_minutes_to_level():
+    assert minutes_to_level(200.0, 255.0, 5.5) == pytest.approx(10.0)
+    assert minutes_to_level(260.0, 255.0, 1.0) == 0.0
+    assert minutes_to_level(200.0, 255.0, -1.0) is None
+    assert minutes_to_level(200.0, 255.0, None) is None
+
+
+def test_rising_fast_by_rate():
+    minutes, rising = evaluate_rise(make_device(), 50.0, 1.5, was_rising=False)
+    assert rising is True
+    assert minutes == pytest.approx((255.0 - 50.0) / 1.5)
+
+
+def test_rising_fast_by_time_to_critical():
+    minutes, rising = evaluate_rise(make_device(), 240.0, 0.5, was_rising=False)
+    assert minutes == pytest.approx(30.0)
+    assert rising is True
+
+
+def test_rising_fast_hysteresis():
+    device = make_device()
+    assert evaluate_rise(device, 50.0, 0.6, was_rising=False)[1] is False
+    assert evaluate_rise(device, 50.0, 0.6, was_rising=True)[1] is True
+
+
+def test_zero_rise_threshold_is_respected():
+    # 0 = cualquier subida es RISING_FAST; no se reemplaza por el default
+    device = make_device(threshold_rise_cm_min=0.0)
+    assert evaluate_rise(device, 50.0, 0.1, was_rising=False)[1] is True
+    assert evaluate_rise(make_device(threshold_rise_cm_min=None), 50.0, 0.6, was_rising=False)[1] is False
+
+
+def test_mark_rising_fires_once():
+    est = RiseRateEstimator(tau_s=900)
+    assert est.mark_rising(EUI, True) is True
+    assert est.mark_rising(EUI, True) is False
+    assert est.mark_rising(EUI, False) is False
+    assert est.mark_rising(EUI, True) is True
@@ -0,0 +1,123 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.services.river_network import RiverNetwork, lagged_xcorr, summarize_windows
+
+
+def _flood_series(n: int, rng, peaks=3) -> np.ndarray:
+    """Nivel base + crecidas gaussianas + ruido del sensor."""
+    t = np.arange(n, dtype=float)
+    level = np.full(n, 80.0)
+    for c in rng.uniform(0.1 * n, 0.9 * n, peaks):
+        level += 120 * np.exp(-((t - c) / 20) ** 2)
+    return level + rng.normal(0, 0.5, n)
+
+
+def test_recovers_lag_for_every_row():
+    rng = np.random.default_rng(1)
+    w, max_lag, lags = 300, 40, np.array([0, 7, 23])
+    up = np.stack([np.diff(_flood_series(w + max_lag + 1, rng)) for _ in lags])
+    down = np.stack([np.roll(u, k) for u, k in zip(up, lags)])
+
+    best, corr = lagged_xcorr(up[:, :w], down, max_lag)
+    assert list(best) == list(lags)
+    assert np.all(corr > 0.9)
+
+
+def test_gaps_and_flat_windows_are_nan():
+    up = np.zeros((2, 50))
+    down = np.zeros((2, 60))
+    up[1] = np.nan
+    best, corr = lagged_xcorr(up, down, max_lag=10)
+    assert np.isnan(best).all() and np.isnan(corr).all()
+
+
+def test_summary_ignores_weak_windows():
+    lags = np.array([[10.0, 12.0, 40.0], [5.0, np.nan, 5.0]])
+    corrs = np.array([[0.9, 0.8, 0.2], [0.1, np.nan, 0.3]])
+    lag, corr, used = summarize_windows(lags, corrs, min_corr=0.6)
+    assert lag[0] == pytest.approx(11.0) and corr[0] == pytest.approx(0.85)
+    assert used.tolist() == [2, 0]
+    assert np.isnan(lag[1])
+
+
+def _network() -> RiverNetwork:
+    return RiverNetwork(bucket_min=5, history_days=2, window_h=12, step_h=3,
+                        max_lag_h=2, refresh_s=60)
+
+
+def test_downstream_eta_takes_shortest_path():
+    net = _network()
+    net._links = [("A", "B", 4.0), ("B", "C", 3.6), ("A", "C", 20.0), ("D", "A", 1.0)]
+    net._build_estimates()   # sin ventanas: tiempo de viaje por distancia
+    assert net.downstream_eta("A") == [
+        {"device_eui": "B", "eta_min": pytest.approx(66.7), "hops": 1},
+        {"device_eui": "C", "eta_min": pytest.approx(126.7), "hops": 2},
+    ]
+    assert net.downstream_eta("C") == []
+
+
+def test_flood_transition_fires_once():
+    net = _network()
+    assert not net.entered_flood("A", "WATCH")
+    assert net.entered_flood("A", "WARNING")
+    assert not net.entered_flood("A", "CRITICAL")
+    assert not net.entered_flood("A", "NORMAL")
+    assert net.entered_flood("A", "CRITICAL")
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _FakeDb:
+    """Responde tramos y luego buckets de nivel (desde from_bucket)."""
+
+    def __init__(self, links, levels: dict[str, np.ndarray], last_bucket: int):
+        self.links = links
+        self.levels = levels
+        self.last_bucket = last_bucket
+        self.fetched = []
+        self._calls = 0
+
+    async def execute(self, _stmt):
+        self._calls += 1
+        if self._calls % 2:
+            return _Result(self.links)
+        since = _stmt.compile().params["time_1"].timestamp() // 300
+        rows = []
+        for eui, series in self.levels.items():
+            first = self.last_bucket - len(series) + 1
+            for k, level in enumerate(series):
+                if first + k >= since:
+                    rows.append((eui, first + k, float(level)))
+        self.fetched.append(len(rows))
+        return _Result(rows)
+
+
+async def test_refresh_estimates_travel_time_incrementally():
+    rng = np.random.default_rng(3)
+    net = _network()
+    now_b = int(time.time() // net.bucket_s)
+    up = _flood_series(net.n_buckets + 24, rng, peaks=8)
+    levels = {"UP": up[24:], "DOWN": up[24 - 9:-9] * 0.8 + 5}   # 9 buckets = 45 min
+    db = _FakeDb([("UP", "DOWN", 10.0)], levels, now_b)
+
+    estimates = await net.get(db)
+    assert estimates[0]["source"] == "correlation"
+    assert estimates[0]["travel_min"] == pytest.approx(45.0)
+    assert estimates[0]["speed_kmh"] == pytest.approx(13.33, abs=0.01)
+    windows = dict(net._windows)
+
+    net.invalidate()
+    await net.get(db)
+    # Segunda pasada: solo los buckets desde el último cargado
+    assert db.fetched[1] < db.fetched[0] / 50
+    reused = [s for s in windows if net._windows[s][0] is windows[s][0]]
+    assert len(reused) >= len(windows) - 2
@@ -0,0 +1,169 @@
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core import migrations
+from app.core.startup import DEFERRED_MODULES, StartupTimer
+from app.services import warm_state
+from app.services.geo_index import GeoIndex
+from app.services.level_forecast import LevelForecaster
+from app.services.offline_monitor import OfflineMonitor
+from app.services.recent_buffer import RecentReadingsBuffer
+from app.services.rise_rate import RiseRateEstimator
+
+EUI = "A840411D3181BD6B"
+
+
+def test_discover_orders_and_filters(tmp_path):
+    for name in ("010_tracks.sql", "002_compact.sql", "001_gps.sql", "README.md", "x_1.sql"):
+        (tmp_path / name).write_text("SELECT 1;")
+    found = migrations.discover(str(tmp_path))
+    assert [(m.version, m.name) for m in found] == [(1, "gps"), (2, "compact"), (10, "tracks")]
+    assert [m.version for m in migrations.pending(found, 2)] == [10]
+    assert migrations.pending(found, 10) == []
+
+
+def test_discover_rejects_duplicate_versions(tmp_path):
+    (tmp_path / "003_a.sql").write_text("")
+    (tmp_path / "003_b.sql").write_text("")
+    with pytest.raises(ValueError):
+        migrations.discover(str(tmp_path))
+
+
+def test_discover_missing_dir(tmp_path):
+    assert migrations.discover(str(tmp_path / "nope")) == []
+
+
+def test_baseline_adopts_only_manual_migrations(tmp_path):
+    for name in ("001_gps.sql", "002_compact.sql", "003_rise.sql"):
+        (tmp_path / name).write_text("SELECT 1;")
+    found = migrations.discover(str(tmp_path))
+    skipped = migrations.adopted(found, 1)
+    assert [m.version for m in skipped] == [1]
+    assert [m.version for m in migrations.pending(found, skipped[-1].version)] == [2, 3]
+    assert migrations.adopted(found, -1) == found
+    assert migrations.adopted(found, 0) == []
+
+
+def test_default_baseline_runs_migrations_after_001():
+    from app.core.config import Settings
+
+    assert Settings().SCHEMA_BASELINE_VERSION == 1
+
+
+def test_repo_migrations_are_discoverable():
+    root = os.path.join(os.path.dirname(__file__), "../../../infra/postgres/migrations")
+    found = migrations.discover(root)
+    assert found and found[0].version == 1
+
+
+def test_app_import_leaves_deferred_modules_unloaded():
+    code = ("import sys, app.main; "
+            f"print(','.join(m for m in {DEFERRED_MODULES!r} if m.split('.')[0] in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.path.join(os.path.dirname(__file__), ".."), check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_startup_timer_phases_and_marks():
+    now = [0.0]
+    timer = StartupTimer(clock=lambda: now[0])
+    with timer.phase("migrations"):
+        now[0] += 0.25
+    timer.mark("ready")
+    now[0] += 1.0
+    timer.mark("ready")  # solo cuenta la primera vez
+    assert timer.as_dict() == {
+        "phases_ms": {"migrations": 250.0},
+        "since_start_ms": {"ready": 250.0},
+    }
+
+
+# ─── Snapshot del estado en memoria ──────────────────
+def fresh_components(monkeypatch):
+    components = {
+        "recent_buffer": RecentReadingsBuffer(hours=1, interval_s=30, max_mb=1),
+        "offline_monitor": OfflineMonitor(),
+        "geo_index": GeoIndex(cell_deg=0.05, move_threshold_m=50),
+        "rise_estimator": RiseRateEstimator(tau_s=600),
+        "level_forecaster": LevelForecaster(
+            alpha=0.2, beta=0.05, z=1.64, min_samples=5, reset_gap_s=3600,
+        ),
+    }
+    for name, component in components.items():
+        monkeypatch.setattr(warm_state, name, component)
+    return components
+
+
+def fill(c: dict, now: float):
+    for k in range(20):
+        t = now - (20 - k) * 30
+        level = 100.0 + k
+        c["recent_buffer"].append(EUI, {
+            "id": uuid.uuid4(),
+            "time": datetime.fromtimestamp(t, timezone.utc),
+            "distance_cm": 300.0 - level,
+            "water_level_cm": level,
+            "fill_pct": level / 4,
+            "battery_pct": 80,
+            "rssi": -90,
+            "snr": 7.5,
+            "latitude": None,
+            "longitude": None,
+            "alert_level": "NORMAL",
+        })
+        c["offline_monitor"].touch(EUI, t)
+        c["rise_estimator"].update(EUI, t, level)
+        c["level_forecaster"].update(EUI, t, level)
+    c["geo_index"].observe_fix(EUI, -33.45, -70.66)
+
+
+def test_snapshot_roundtrip(tmp_path, monkeypatch):
+    path = str(tmp_path / "state" / "warm.pkl")
+    now = time.time()
+    before = fresh_components(monkeypatch)
+    fill(before, now)
+    report = warm_state.save(path)
+    assert report["bytes"] > 0
+
+    after = fresh_components(monkeypatch)
+    written_at = warm_state.load(path, max_age_s=60)
+    assert written_at == pytest.approx(now, abs=5)
+
+    assert after["recent_buffer"].latest(EUI) == before["recent_buffer"].latest(EUI)
+    assert after["offline_monitor"].health()[0]["status"] == "ONLINE"
+    assert after["offline_monitor"].last_seen(EUI) == before["offline_monitor"].last_seen(EUI)
+    assert after["geo_index"].position(EUI) == (-33.45, -70.66)
+    at = now + 1800
+    assert after["level_forecaster"].predict(EUI, at) == before["level_forecaster"].predict(EUI, at)
+    t = now + 30
+    assert after["rise_estimator"].update(EUI, t, 121.0) == before["rise_estimator"].update(EUI, t, 121.0)
+
+
+def test_snapshot_rejects_stale_or_incompatible(tmp_path, monkeypatch):
+    path = str(tmp_path / "warm.pkl")
+    fill(fresh_components(monkeypatch), time.time())
+    warm_state.save(path)
+
+    after = fresh_components(monkeypatch)
+    later = time.time() + 7200
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert warm_state.load(path, max_age_s=3600) is None
+    assert after["recent_buffer"].latest(EUI) is None
+
+    monkeypatch.undo()
+    fresh_components(monkeypatch)
+    monkeypatch.setattr(warm_state, "FORMAT_VERSION", warm_state.FORMAT_VERSION + 1)
+    assert warm_state.load(path, max_age_s=3600) is None
+
+
+def test_snapshot_missing_or_corrupt(tmp_path):
+    assert warm_state.load(str(tmp_path / "none.pkl"), max_age_s=60) is None
+    broken = tmp_path / "broken.pkl"
+    broken.write_bytes(b"not a pickle")
+    assert warm_state.load(str(broken), max_age_s=60) is None
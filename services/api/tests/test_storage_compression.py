@@ -0,0 +1,154 @@
+import json
+import math
+import random
+import struct
+from base64 import b64encode
+from contextlib import asynccontextmanager
+
+import pytest
+from structlog.testing import capture_logs
+
+from app.core.config import settings
+from app.models.reading import CompactReading, GpsFix
+from app.services import mqtt_client
+from app.services.storage_compression import ReadingCompressor, reconstruct
+from benchmarks.suite import _device, _patched_ingest
+
+EUI = "A840411D3181BD6B"
+
+
+def replay(comp: ReadingCompressor, values, tolerance, codes=None, step_s=30.0):
+    """Índices de las lecturas guardadas (la fila es el índice)."""
+    stored = []
+    for i, v in enumerate(values):
+        code = codes[i] if codes else 0
+        stored += comp.offer(EUI, i * step_s, v, tolerance, i, code=code)
+    stored += comp.drain()
+    return sorted(stored)
+
+
+def river(n: int, seed: int = 5) -> list[float]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        flood = 80 * max(0.0, math.sin((i - 600) / 300)) if 600 < i < 1500 else 0.0
+        out.append(60 + flood + rng.gauss(0, 0.4))
+    return out
+
+
+@pytest.mark.parametrize("mode", ["swinging_door", "deadband"])
+def test_reconstruction_within_tolerance(mode):
+    values = river(3000)
+    comp = ReadingCompressor(mode=mode, heartbeat_s=3600)
+    stored = replay(comp, values, tolerance=2.0)
+    assert stored[0] == 0
+    assert len(stored) < len(values) / 4
+    rebuilt = reconstruct([i * 30.0 for i in stored], [values[i] for i in stored],
+                          [i * 30.0 for i in range(len(values))], mode)
+    assert max(abs(a - b) for a, b in zip(rebuilt, values)) <= 2.0 + 1e-9
+
+
+def test_swinging_door_stores_fewer_rows_on_ramps():
+    values = [i * 0.5 for i in range(400)]   # subida lineal pura
+    sdt = replay(ReadingCompressor("swinging_door", heartbeat_s=1e9), values, 1.0)
+    band = replay(ReadingCompressor("deadband", heartbeat_s=1e9), values, 1.0)
+    assert len(sdt) == 2
+    assert len(band) > 100
+
+
+def test_without_tolerance_every_row_is_stored():
+    comp = ReadingCompressor("swinging_door", heartbeat_s=900)
+    assert replay(comp, [50.0] * 10, None) == list(range(10))
+    assert comp.stats()["ratio"] == 1.0
+
+
+def test_heartbeat_and_alert_change_force_rows():
+    comp = ReadingCompressor("swinging_door", heartbeat_s=300)   # 10 lecturas
+    stored = replay(comp, [50.0] * 35, tolerance=1.0)
+    assert stored == [0, 10, 20, 30, 34]
+
+    comp = ReadingCompressor("swinging_door", heartbeat_s=1e9)
+    codes = [0] * 5 + [2] * 5
+    assert replay(comp, [50.0] * 10, 1.0, codes=codes) == [0, 5, 9]
+
+
+def test_disabling_releases_held_row():
+    comp = ReadingCompressor("swinging_door", heartbeat_s=1e9)
+    assert comp.offer(EUI, 0, 50.0, 1.0, "a") == ["a"]
+    assert comp.offer(EUI, 30, 50.0, 1.0, "b") == []
+    assert comp.offer(EUI, 60, 50.0, None, "c") == ["b", "c"]
+    assert comp.drain() == []
+
+
+class _Session:
+    """Sesión del ingest: devuelve siempre el device y junta las filas agregadas."""
+
+    def __init__(self, device):
+        self.device = device
+        self.added = []
+
+    async def execute(self, _stmt):
+        return self
+
+    def scalar_one_or_none(self):
+        return self.device
+
+    def add(self, row):
+        self.added.append(row)
+
+    def add_all(self, rows):
+        self.added.extend(rows)
+
+
+async def _ingest(monkeypatch, eui: str, raw: bytes, uplinks: int):
+    """Corre el ingest real con `uplinks` uplinks iguales de un device con tolerancia."""
+    device = _device(0)
+    device.device_eui = eui
+    device.storage_tolerance_cm = 5.0
+    session = _Session(device)
+
+    @asynccontextmanager
+    async def get_db_session():
+        yield session
+
+    buffered = []
+    monkeypatch.setattr(mqtt_client.recent_buffer, "append",
+                        lambda e, reading: buffered.append((e, reading)))
+    monkeypatch.setattr(mqtt_client, "reading_compressor",
+                        ReadingCompressor("deadband", heartbeat_s=900))
+    body = json.dumps({"deviceInfo": {"devEui": eui},
+                       "data": b64encode(raw).decode(),
+                       "rxInfo": [{"rssi": -95, "snr": 7.5}]}).encode()
+    client = mqtt_client.MQTTClient()
+    patches = _patched_ingest(get_db_session)
+    for p in patches:
+        p.start()
+    try:
+        with capture_logs() as logs:
+            for _ in range(uplinks):
+                await client._process_message(f"application/1/device/{eui}/event/up", body)
+    finally:
+        for p in patches:
+            p.stop()
+    return session.added, logs, buffered
+
+
+async def test_ingest_logs_only_written_rows(monkeypatch):
+    eui = "C0FFEE0000000048"
+    added, logs, buffered = await _ingest(monkeypatch, eui, struct.pack(">HH", 2000, 3900), 3)
+
+    events = [e["event"] for e in logs if e["event"].startswith("reading.")]
+    assert events == ["reading.saved", "reading.compressed", "reading.compressed"]
+    assert len(added) == 1
+    # El buffer sirve la serie sin comprimir: ve los tres uplinks
+    assert [e for e, _ in buffered] == [eui] * 3
+
+
+async def test_gps_uplinks_are_stored_in_compact_mode(monkeypatch):
+    # La vista compacta parte de las lecturas: un GpsFix sin lectura no se vería
+    monkeypatch.setattr(settings, "READINGS_STORAGE", "compact")
+    raw = struct.pack(">HHii", 2000, 3900, 20659699, -103349609)
+    added, _, _ = await _ingest(monkeypatch, "C0FFEE0000000049", raw, 3)
+
+    assert sum(isinstance(r, CompactReading) for r in added) == 3
+    assert sum(isinstance(r, GpsFix) for r in added) == 3